@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comparativos', '0005_comparativoinventario_nombre_sistema1_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='itemcomparativo',
+            index=models.Index(fields=['comparativo', 'diferencia_sistema1'], name='comparativo_compara_711c41_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itemcomparativo',
+            index=models.Index(fields=['comparativo', 'diferencia_sistema2'], name='comparativo_compara_92f47f_idx'),
+        ),
+    ]
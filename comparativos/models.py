@@ -55,6 +55,11 @@ class ItemComparativo(models.Model):
         verbose_name = "Item Comparativo"
         verbose_name_plural = "Items Comparativos"
         unique_together = [['comparativo', 'producto']]
+        indexes = [
+            # Items con diferencia contra cada sistema
+            models.Index(fields=['comparativo', 'diferencia_sistema1']),
+            models.Index(fields=['comparativo', 'diferencia_sistema2']),
+        ]
     
     def __str__(self):
         return f"{self.producto.nombre} - Comparativo {self.comparativo.id}"
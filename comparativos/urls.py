@@ -11,6 +11,7 @@ urlpatterns = [
     path('<int:pk>/procesar/', views.procesar_comparativo, name='procesar'),
     path('<int:pk>/exportar/', views.exportar_comparativo, name='exportar'),
     path('<int:pk>/asignar-recontar/', views.asignar_productos_recontar, name='asignar_recontar'),
+    path('<int:pk>/candidatos-recontar/', views.candidatos_recontar, name='candidatos_recontar'),
     path('descargar-ejemplo/', views.descargar_ejemplo, name='descargar_ejemplo'),
 ]
 
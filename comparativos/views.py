@@ -12,7 +12,26 @@ from io import BytesIO
 from .models import ComparativoInventario, InventarioSistema, ItemComparativo
 from .forms import ComparativoInventarioForm, InventarioSistemaForm
 from productos.models import Producto
-from conteo.models import Conteo, ItemConteo
+from conteo.models import Conteo
+from conteo.instantaneas import cargar_instantaneas, ultimas_cantidades
+from conteo.discrepancias import candidatos_reconteo
+
+
+def _umbrales_discrepancia(datos):
+    """Umbrales de ``candidatos_reconteo`` enviados en ``datos`` (los vacíos se omiten)"""
+    umbrales = {}
+    for campo, tipo in (('diferencia_minima', int), ('diferencia_relativa_minima', float), ('impacto_minimo', float)):
+        valor = (datos.get(campo) or '').strip()
+        if valor:
+            umbrales[campo] = tipo(valor)
+    return umbrales
+
+
+def _ultimas_cantidades(conteos):
+    """Cantidad de cada producto en el conteo más reciente (primero de ``conteos``) que lo contiene"""
+    conteos = list(conteos)
+    instantaneas = cargar_instantaneas(conteo.id for conteo in conteos)
+    return ultimas_cantidades([instantaneas[conteo.id] for conteo in conteos])
 
 
 @login_required
@@ -49,14 +68,7 @@ def crear_comparativo(request):
             
             if conteos_finalizados.exists():
                 # Obtener el último conteo por producto (no sumar, solo el más reciente)
-                cantidad_por_producto = {}
-                
-                for conteo in conteos_finalizados:
-                    items = ItemConteo.objects.filter(conteo=conteo).select_related('producto')
-                    for item in items:
-                        # Solo usar el primer conteo encontrado para cada producto (el más reciente)
-                        if item.producto_id not in cantidad_por_producto:
-                            cantidad_por_producto[item.producto_id] = item.cantidad
+                cantidad_por_producto = _ultimas_cantidades(conteos_finalizados)
                 
                 # Obtener todos los productos (activos e inactivos)
                 productos = Producto.objects.all()
@@ -105,14 +117,7 @@ def subir_inventario(request, pk):
         
         if conteos_finalizados.exists():
             # Obtener el último conteo por producto (no sumar, solo el más reciente)
-            cantidad_por_producto = {}
-            
-            for conteo in conteos_finalizados:
-                items = ItemConteo.objects.filter(conteo=conteo).select_related('producto')
-                for item in items:
-                    # Solo usar el primer conteo encontrado para cada producto (el más reciente)
-                    if item.producto_id not in cantidad_por_producto:
-                        cantidad_por_producto[item.producto_id] = item.cantidad
+            cantidad_por_producto = _ultimas_cantidades(conteos_finalizados)
             
             # Crear o actualizar items para todos los productos
             with transaction.atomic():
@@ -277,33 +282,19 @@ def procesar_comparativo(request, pk):
                     pass
     
     # Obtener el último conteo por producto (no sumar, solo el más reciente)
+    instantaneas = cargar_instantaneas(conteo.id for conteo in conteos_finalizados)
     cantidad_por_producto = {}
     
     # Primero procesar reconteos (tienen prioridad y están ordenados por fecha)
     if productos_reconteo_ids and conteos_reconteo.exists():
-        for conteo in conteos_reconteo:
-            items_reconteo = ItemConteo.objects.filter(
-                conteo=conteo,
-                producto_id__in=productos_reconteo_ids
-            ).select_related('producto')
-            
-            for item in items_reconteo:
-                # Solo usar el primer conteo encontrado para cada producto (el más reciente)
-                if item.producto_id not in cantidad_por_producto:
-                    cantidad_por_producto[item.producto_id] = item.cantidad
+        cantidad_por_producto.update(ultimas_cantidades(
+            [instantaneas[conteo.id] for conteo in conteos_reconteo], incluir=productos_reconteo_ids
+        ))
     
     # Luego procesar conteos normales (solo para productos que no están en reconteos)
-    for conteo in conteos_finalizados:
-        items_normales = ItemConteo.objects.filter(
-            conteo=conteo
-        ).exclude(
-            producto_id__in=productos_reconteo_ids
-        ).select_related('producto')
-        
-        for item in items_normales:
-            # Solo usar el primer conteo encontrado para cada producto (el más reciente)
-            if item.producto_id not in cantidad_por_producto:
-                cantidad_por_producto[item.producto_id] = item.cantidad
+    cantidad_por_producto.update(ultimas_cantidades(
+        [instantaneas[conteo.id] for conteo in conteos_finalizados], excluir=productos_reconteo_ids
+    ))
     
     # Obtener todos los productos (activos e inactivos) para asegurar que todos estén en el comparativo
     productos = Producto.objects.all()
@@ -361,18 +352,15 @@ def detalle_comparativo(request, pk):
     items = comparativo.items.all().select_related('producto').order_by('producto__marca', 'producto__nombre')
     
     # Obtener información sobre los conteos finalizados que se están usando
-    # Optimizado: usar agregaciones de base de datos
-    from django.db.models import Sum, Count
     conteos_finalizados = Conteo.objects.filter(estado='finalizado').order_by('numero_conteo', '-fecha_fin')
+    # Totales desde las instantáneas de los conteos finalizados (una consulta para todos)
+    instantaneas = cargar_instantaneas(conteo.id for conteo in conteos_finalizados)
     conteos_info = []
     for conteo in conteos_finalizados:
-        # Usar agregación en lugar de sum() en Python
-        total_cantidad_conteo = conteo.items.aggregate(total=Sum('cantidad'))['total'] or 0
-        total_items_conteo = conteo.items.count()
         conteos_info.append({
             'conteo': conteo,
-            'total_items': total_items_conteo,
-            'total_cantidad': total_cantidad_conteo,
+            'total_items': len(instantaneas[conteo.id]),
+            'total_cantidad': int(instantaneas[conteo.id][:, 1].sum()),
         })
     
     # Estadísticas - optimizado usando agregaciones de base de datos
@@ -860,6 +848,16 @@ def asignar_productos_recontar(request, pk):
         accion = request.POST.get('accion', 'crear')  # 'crear' o 'agregar'
         conteo_id = request.POST.get('conteo_id')
         
+        # Sin productos seleccionados: tomar los que difieren entre conteos según los umbrales
+        if not producto_ids and request.POST.get('seleccion') == 'discrepancias':
+            try:
+                umbrales = _umbrales_discrepancia(request.POST)
+            except ValueError:
+                return JsonResponse({'success': False, 'error': 'Umbrales de diferencia inválidos.'})
+            producto_ids = [str(pid) for pid in candidatos_reconteo(**umbrales).values_list('producto_id', flat=True)]
+            if not producto_ids:
+                return JsonResponse({'success': False, 'error': 'No hay productos con diferencias entre conteos que superen los umbrales.'})
+        
         if not producto_ids:
             return JsonResponse({'success': False, 'error': 'Debe seleccionar al menos un producto.'})
         
@@ -957,3 +955,14 @@ def asignar_productos_recontar(request, pk):
     
     return JsonResponse({'success': False, 'error': 'Método no permitido.'})
 
+
+@login_required
+def candidatos_recontar(request, pk):
+    """Productos con diferencias entre Conteo 1, 2 y 3 que superan los umbrales indicados (JSON)"""
+    get_object_or_404(ComparativoInventario, pk=pk)
+    try:
+        umbrales = _umbrales_discrepancia(request.GET)
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Umbrales de diferencia inválidos.'})
+    productos = list(candidatos_reconteo(**umbrales).values_list('producto_id', flat=True))
+    return JsonResponse({'success': True, 'productos': productos, 'total': len(productos)})
@@ -0,0 +1,84 @@
+"""
+Archivo de conteos finalizados antiguos.
+
+``MovimientoConteo`` crece una fila por escaneo e ``ItemConteo`` guarda todos los
+conteos históricos, y ambas tablas atienden las rutas más usadas (lista de
+movimientos, dashboard, stock). ``archivar_conteo`` saca de ellas un conteo
+finalizado, en una transacción:
+
+- Los items quedan en la instantánea del conteo (``conteo.instantaneas``) y se
+  eliminan de ``ItemConteo``.
+- Los movimientos se copian, con sus ids, a ``MovimientoArchivado`` y se eliminan
+  de ``MovimientoConteo``; sus totales siguen en ``AcumuladoMovimientos`` para los
+  reportes (ver ``movimientos.acumulados``).
+- Las claves de idempotencia del conteo se eliminan (solo sirven mientras se escanea).
+
+Las filas se copian y eliminan con SQL directo: no pasan por las señales de items
+y movimientos (que descartarían la instantánea o el avance por pareja). Los
+conteos archivados se leen desde la instantánea (stock, lista de conteos,
+reportes) y sus movimientos desde el archivo (movimientos por conteo). Ver
+``scripts/archivar_conteos.py``.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from megaInventario.dashboard import DashboardSnapshot
+from movimientos.models import MovimientoArchivado, MovimientoConteo
+from movimientos.registro import volcar_todos
+from .instantaneas import congelar_conteo
+from .models import Conteo, ItemConteo, SolicitudIdempotente
+
+# Respuesta a las escrituras sobre un conteo archivado: sus items solo están en la
+# instantánea, que no se descarta, y los items nuevos quedarían fuera de ella
+ERROR_CONTEO_ARCHIVADO = 'El conteo está archivado y no se puede modificar.'
+
+# Columnas copiadas de MovimientoConteo a MovimientoArchivado
+COLUMNAS_MOVIMIENTO = [
+    'id', 'conteo_id', 'item_conteo_id', 'producto_id', 'usuario_id', 'tipo',
+    'cantidad_anterior', 'cantidad_nueva', 'cantidad_cambiada', 'fecha_movimiento', 'observaciones',
+]
+
+
+def conteos_para_archivar(dias):
+    """Conteos finalizados hace más de ``dias`` días y todavía no archivados"""
+    return Conteo.objects.filter(
+        estado='finalizado',
+        fecha_fin__lt=timezone.now() - timedelta(days=dias),
+        fecha_archivo__isnull=True,
+    ).order_by('fecha_fin')
+
+
+def archivar_conteo(conteo):
+    """
+    Archiva los items y movimientos de un conteo finalizado.
+    Retorna {'items': n, 'movimientos': n}.
+    """
+    if conteo.estado != 'finalizado':
+        raise ValueError('Solo se pueden archivar conteos finalizados')
+    if conteo.fecha_archivo:
+        return {'items': 0, 'movimientos': 0}
+
+    qn = connection.ops.quote_name
+    with transaction.atomic():
+        # Movimientos pendientes de volcar (escritura diferida) primero
+        volcar_todos(conteo_id=conteo.id)
+        instantanea = congelar_conteo(conteo)
+
+        columnas = ', '.join(qn(columna) for columna in COLUMNAS_MOVIMIENTO)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {qn(MovimientoArchivado._meta.db_table)} ({columnas}) '
+                f'SELECT {columnas} FROM {qn(MovimientoConteo._meta.db_table)} WHERE {qn("conteo_id")} = %s',
+                [conteo.id],
+            )
+            archivados = cursor.rowcount
+            for modelo in (MovimientoConteo, ItemConteo, SolicitudIdempotente):
+                cursor.execute(f'DELETE FROM {qn(modelo._meta.db_table)} WHERE {qn("conteo_id")} = %s', [conteo.id])
+
+        conteo.fecha_archivo = timezone.now()
+        conteo.save(update_fields=['fecha_archivo'])
+        DashboardSnapshot.invalidar()
+
+    return {'items': instantanea.total_items, 'movimientos': archivados}
@@ -0,0 +1,107 @@
+"""
+Catálogo compacto de productos para que el scanner resuelva códigos sin conexión.
+
+El catálogo de un usuario son los productos asignados a sus parejas activas
+(o todos los productos si no tiene asignaciones, igual que ``agregar_item``).
+Su versión tiene la forma ``<asignaciones>.<cambio>.<total>``:
+
+- ``asignaciones``: versión de la caché de asignaciones (ver ``usuarios.asignaciones``).
+- ``cambio``: mayor ``version_catalogo`` de los productos (ver ``ContadorCatalogo``).
+- ``total``: cantidad de productos del catálogo.
+
+Con la versión del cliente se puede responder solo con los productos modificados
+desde entonces. El número de cambio lo toma cada guardado o ``update()`` de
+productos en su transacción y se confirman en orden, así que no se pierden
+cambios confirmados tarde (como pasaba con ``fecha_actualizacion``, que además
+``update()`` no modifica). Si cambiaron las asignaciones o se eliminaron
+productos (eliminar un producto renueva la versión de asignaciones) se envía el
+catálogo completo.
+"""
+import json
+
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from productos.models import Producto
+from usuarios.asignaciones import parejas_activas_usuario, productos_asignados_usuario, version_asignaciones
+
+COLUMNAS_CATALOGO = ('id', 'codigo_barras', 'codigo', 'nombre', 'marca', 'atributo', 'imagen')
+TIEMPO_CACHE_CATALOGO = 60 * 60
+
+
+def productos_catalogo(usuario, asignaciones=None):
+    """
+    Retorna (queryset de productos del catálogo, clave del catálogo).
+    ``asignaciones`` es la versión de las asignaciones, si ya se leyó.
+    """
+    if asignaciones is None:
+        asignaciones = version_asignaciones()
+    parejas_ids = parejas_activas_usuario(usuario, asignaciones)
+    if productos_asignados_usuario(usuario, asignaciones):
+        asignados = Producto.parejas_asignadas.through.objects.filter(
+            parejaconteo_id__in=parejas_ids
+        ).values('producto_id')
+        clave = 'parejas-' + '-'.join(str(pareja_id) for pareja_id in sorted(parejas_ids))
+        return Producto.objects.filter(id__in=asignados), clave
+    return Producto.objects.all(), 'todos'
+
+
+def version_catalogo(productos, asignaciones=None):
+    """Calcula la versión del catálogo con una sola consulta agregada"""
+    if asignaciones is None:
+        asignaciones = version_asignaciones()
+    resumen = productos.order_by().aggregate(cambio=Max('version_catalogo'), total=Count('id'))
+    return f"{asignaciones}.{resumen['cambio'] or 0}.{resumen['total']}"
+
+
+def _filas(productos):
+    """Filas compactas (listas en el orden de COLUMNAS_CATALOGO)"""
+    storage = Producto._meta.get_field('imagen').storage
+    filas = []
+    for fila in productos.order_by('id').values_list(*COLUMNAS_CATALOGO):
+        fila = list(fila)
+        fila[-1] = storage.url(fila[-1]) if fila[-1] else None
+        filas.append(fila)
+    return filas
+
+
+def catalogo_completo(productos, clave, version):
+    """Catálogo completo serializado en JSON, precalculado y cacheado por clave y versión"""
+    clave_cache = f'catalogo:{clave}:{version}'
+    contenido = cache.get(clave_cache)
+    if contenido is None:
+        contenido = json.dumps({
+            'success': True,
+            'version': version,
+            'completo': True,
+            'columnas': COLUMNAS_CATALOGO,
+            'productos': _filas(productos),
+        }, separators=(',', ':'))
+        cache.set(clave_cache, contenido, TIEMPO_CACHE_CATALOGO)
+    return contenido
+
+
+def cambios_catalogo(productos, version_cliente, version):
+    """
+    Productos modificados desde ``version_cliente``.
+
+    Retorna None si la versión del cliente no permite un delta
+    (formato inválido, otras asignaciones o un número de cambio posterior al
+    actual, como las versiones anteriores basadas en fechas).
+    """
+    try:
+        asignaciones, cambio, _total = (int(parte) for parte in version_cliente.split('.'))
+    except ValueError:
+        return None
+
+    asignaciones_actual, cambio_actual, _ = (int(parte) for parte in version.split('.'))
+    if asignaciones != asignaciones_actual or cambio > cambio_actual:
+        return None
+
+    return {
+        'success': True,
+        'version': version,
+        'completo': False,
+        'columnas': COLUMNAS_CATALOGO,
+        'productos': _filas(productos.filter(version_catalogo__gt=cambio)),
+    }
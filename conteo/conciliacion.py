@@ -0,0 +1,162 @@
+"""
+Conciliación de ``ItemConteo.cantidad`` con el registro de movimientos.
+
+Las verificaciones de congruencia (``tests/verificar_congruencia_sistema.py``)
+filtraban los movimientos de cada item y los sumaban en Python: una consulta por
+item sobre todo el registro. ``conciliar_conteo`` lee los movimientos del conteo
+una sola vez, en orden cronológico, y reconstruye la cantidad esperada de todos
+sus productos con NumPy:
+
+- ``agregar`` y ``modificar`` suman su ``cantidad_cambiada``.
+- ``eliminar`` deja el producto sin item (la cantidad vuelve a 0).
+
+El resultado se compara con los items del conteo. Solo las diferencias de
+cantidad se pueden reparar (``reparar_diferencias``, con una actualización
+condicionada a la cantidad leída para no pisar escaneos posteriores); los items sin
+movimientos, los eliminados en el registro que siguen existiendo y los que
+faltan se informan. ``conciliar`` reparte los conteos en un pool de procesos,
+que solo leen: las reparaciones se hacen en el proceso principal. Cada proceso
+inicializa Django al arrancar: con ``spawn`` (Windows, macOS) no hereda el
+estado del principal. Ver
+``scripts/conciliar_movimientos_conteos.py``.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+import numpy as np
+from django.db import connections, transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from megaInventario.dashboard import DashboardSnapshot
+from movimientos.models import MovimientoConteo
+from movimientos.registro import escritura_diferida, volcar_todos
+from .discrepancias import actualizar_discrepancias
+from .instantaneas import FORMATO, descartar_instantanea
+from .models import Conteo, ItemConteo
+from .progreso import recalcular_progreso
+
+
+def cantidades_esperadas(conteo_id):
+    """
+    Cantidades que resultan de reproducir los movimientos del conteo, como arreglos
+    (productos, cantidades, con_item) ordenados por producto; ``con_item`` es False
+    si el último movimiento del producto lo eliminó.
+    """
+    filas = list(
+        MovimientoConteo.objects.filter(conteo_id=conteo_id).order_by('fecha_movimiento', 'id').annotate(
+            reinicio=Case(When(tipo='eliminar', then=Value(1)), default=Value(0), output_field=IntegerField())
+        ).values_list('producto_id', 'cantidad_cambiada', 'reinicio')
+    )
+    if not filas:
+        vacio = np.zeros(0, dtype=FORMATO)
+        return vacio, vacio, np.zeros(0, dtype=bool)
+
+    # Orden estable por producto: cada producto queda contiguo y en orden cronológico
+    movimientos = np.array(filas, dtype=FORMATO)
+    movimientos = movimientos[np.argsort(movimientos[:, 0], kind='stable')]
+    productos = movimientos[:, 0]
+    reinicios = movimientos[:, 2] == 1
+
+    aportes = np.where(reinicios, 0, movimientos[:, 1])
+    acumulados = np.concatenate(([0], np.cumsum(aportes)))
+    inicios = np.flatnonzero(np.concatenate(([True], productos[1:] != productos[:-1])))
+    finales = np.concatenate((inicios[1:], [len(productos)])) - 1
+
+    # Cada producto suma los movimientos posteriores a su última eliminación
+    ultimos_reinicios = np.maximum.reduceat(np.where(reinicios, np.arange(len(productos)), -1), inicios)
+    desde = np.where(ultimos_reinicios >= 0, ultimos_reinicios, inicios)
+    cantidades = acumulados[finales + 1] - acumulados[desde]
+    return productos[inicios], cantidades, ultimos_reinicios != finales
+
+
+def conciliar_conteo(conteo_id):
+    """
+    Compara los items del conteo con las cantidades del registro de movimientos.
+    Retorna un dict con ``diferencias`` (item_id, producto_id, cantidad_item,
+    cantidad_esperada), ``sobrantes`` (items eliminados en el registro), ``faltantes``
+    (producto_id, cantidad_esperada) y ``sin_movimientos`` (item_id, producto_id).
+    """
+    productos, cantidades, con_item = cantidades_esperadas(conteo_id)
+    esperadas = dict(zip(productos.tolist(), zip(cantidades.tolist(), con_item.tolist())))
+
+    resultado = {
+        'conteo_id': conteo_id, 'items': 0, 'productos': len(esperadas),
+        'diferencias': [], 'sobrantes': [], 'faltantes': [], 'sin_movimientos': [],
+    }
+    con_items = set()
+    for item_id, producto_id, cantidad in ItemConteo.objects.filter(
+        conteo_id=conteo_id
+    ).order_by('producto_id').values_list('id', 'producto_id', 'cantidad'):
+        resultado['items'] += 1
+        con_items.add(producto_id)
+        if producto_id not in esperadas:
+            resultado['sin_movimientos'].append((item_id, producto_id))
+            continue
+        cantidad_esperada, existe = esperadas[producto_id]
+        if not existe:
+            resultado['sobrantes'].append((item_id, producto_id))
+        elif cantidad != cantidad_esperada:
+            resultado['diferencias'].append((item_id, producto_id, cantidad, cantidad_esperada))
+
+    resultado['faltantes'] = [
+        (producto_id, cantidad)
+        for producto_id, (cantidad, existe) in esperadas.items()
+        if existe and producto_id not in con_items
+    ]
+    return resultado
+
+
+def reparar_diferencias(conteo, diferencias):
+    """
+    Lleva los items con diferencias a la cantidad del registro y actualiza lo que
+    depende de ellos (avance por pareja, instantánea, discrepancias, dashboard).
+    Cada item solo se actualiza si todavía tiene la cantidad leída al conciliar: en
+    un conteo en proceso, un escaneo posterior no se pisa (se verá en la próxima
+    conciliación). Retorna la cantidad de items realmente reparados.
+    """
+    if not diferencias:
+        return 0
+    with transaction.atomic():
+        # update() no emite señales: las tablas derivadas se actualizan a continuación
+        reparados = [
+            producto_id
+            for item_id, producto_id, cantidad, cantidad_esperada in diferencias
+            if ItemConteo.objects.filter(id=item_id, cantidad=cantidad).update(cantidad=cantidad_esperada)
+        ]
+        if not reparados:
+            return 0
+        recalcular_progreso(conteos_ids=[conteo.id])
+        if conteo.estado == 'finalizado':
+            descartar_instantanea(conteo)
+            actualizar_discrepancias(reparados)
+        DashboardSnapshot.invalidar()
+    return len(reparados)
+
+
+def conciliar(conteos_ids, procesos=1):
+    """
+    Concilia los conteos indicados y genera sus resultados (en el orden de
+    ``conteos_ids``). Con ``procesos`` > 1 los conteos se reparten en un pool de procesos.
+    """
+    conteos_ids = list(conteos_ids)
+    if escritura_diferida():
+        # Los movimientos pendientes todavía no están en el registro
+        for conteo_id in conteos_ids:
+            volcar_todos(conteo_id=conteo_id)
+
+    if procesos <= 1 or len(conteos_ids) <= 1:
+        for conteo_id in conteos_ids:
+            yield conciliar_conteo(conteo_id)
+        return
+
+    # Los procesos hijos abren sus propias conexiones: no heredar las del proceso principal
+    connections.close_all()
+    # El inicializador no puede estar en este módulo: con spawn, importarlo ya requiere Django
+    # inicializado (DJANGO_SETTINGS_MODULE se hereda del entorno)
+    with ProcessPoolExecutor(max_workers=procesos, initializer=django.setup) as pool:
+        yield from pool.map(conciliar_conteo, conteos_ids)
+
+
+def conteos_conciliables():
+    """Conteos con items en ``ItemConteo`` (los archivados solo tienen su instantánea)"""
+    return Conteo.objects.filter(fecha_archivo__isnull=True).order_by('id')
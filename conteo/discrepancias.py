@@ -0,0 +1,172 @@
+"""
+Discrepancias entre Conteo 1, 2 y 3 (``DiscrepanciaConteo``).
+
+Para cada producto y cada número de conteo se toma el conteo finalizado más
+reciente que cubre el producto: los conteos completos cubren todo el catálogo
+(un producto sin item cuenta 0) y los reconteos solo los productos de sus
+observaciones. La fila guarda los conteos y cantidades usados, la diferencia
+máxima entre ellos (absoluta y como porcentaje de la cantidad máxima) y su
+impacto en valor (diferencia por precio). Solo hay filas para productos con
+alguna cantidad mayor que 0.
+
+La tabla se actualiza al finalizar un conteo (``actualizar_discrepancias_conteo``)
+y solo para los productos que ese conteo puede cambiar: los de un reconteo, o
+los de la instantánea de un conteo completo más los que ya tienen fila. Las
+cantidades salen de las instantáneas (``conteo.instantaneas``). Eliminar o
+editar conteos finalizados deja filas desactualizadas hasta la reconstrucción
+(``scripts/reconstruir_discrepancias_conteos.py``).
+"""
+from decimal import Decimal
+
+import numpy as np
+
+from productos.models import Producto
+from .instantaneas import FORMATO, cargar_instantaneas
+from .models import Conteo, DiscrepanciaConteo
+
+NUMEROS_CONTEO = (1, 2, 3)
+
+# Productos por lote en las consultas con ``__in``
+TAMANO_LOTE = 2000
+
+CAMPOS_ACTUALIZADOS = [
+    'conteo_1', 'conteo_2', 'conteo_3', 'cantidad_1', 'cantidad_2', 'cantidad_3',
+    'diferencia_absoluta', 'diferencia_relativa', 'impacto_valor', 'fecha_actualizacion',
+]
+
+
+def _conteos_por_numero(productos):
+    """
+    Conteo finalizado más reciente de cada número que cubre cada producto, como
+    {numero: arreglo de conteo_id (0 si ninguno)} alineado con ``productos``.
+    """
+    asignaciones = {numero: np.zeros(len(productos), dtype=FORMATO) for numero in NUMEROS_CONTEO}
+    conteos = Conteo.objects.filter(
+        estado='finalizado', numero_conteo__in=NUMEROS_CONTEO
+    ).order_by('numero_conteo', '-fecha_fin').only('id', 'numero_conteo', 'observaciones')
+    for conteo in conteos:
+        asignacion = asignaciones[conteo.numero_conteo]
+        pendientes = asignacion == 0
+        if not pendientes.any():
+            continue
+        productos_reconteo = conteo.productos_reconteo_ids()
+        if productos_reconteo is not None:
+            pendientes &= np.isin(productos, np.array(productos_reconteo, dtype=FORMATO))
+        asignacion[pendientes] = conteo.id
+    return asignaciones
+
+
+def calcular_discrepancias(productos_ids):
+    """Discrepancias de los productos indicados, calculadas desde las instantáneas (sin guardar)"""
+    productos = np.unique(np.fromiter(productos_ids, dtype=FORMATO))
+    if not len(productos):
+        return []
+
+    asignaciones = _conteos_por_numero(productos)
+    instantaneas = cargar_instantaneas({
+        int(conteo_id) for asignacion in asignaciones.values() for conteo_id in np.unique(asignacion) if conteo_id
+    })
+
+    # Cantidades (3, n) y cuáles están cubiertas por algún conteo
+    cantidades = np.zeros((len(NUMEROS_CONTEO), len(productos)), dtype=FORMATO)
+    for fila, numero in enumerate(NUMEROS_CONTEO):
+        asignacion = asignaciones[numero]
+        for conteo_id in np.unique(asignacion):
+            if not conteo_id:
+                continue
+            mascara = asignacion == conteo_id
+            arreglo = instantaneas[int(conteo_id)]
+            buscados = productos[mascara]
+            posiciones = np.minimum(np.searchsorted(arreglo[:, 0], buscados), max(len(arreglo) - 1, 0))
+            if len(arreglo):
+                encontrados = arreglo[posiciones, 0] == buscados
+                cantidades[fila, mascara] = np.where(encontrados, arreglo[posiciones, 1], 0)
+    cubiertas = np.stack([asignaciones[numero] != 0 for numero in NUMEROS_CONTEO])
+
+    maximos = np.where(cubiertas, cantidades, np.iinfo(FORMATO).min).max(axis=0)
+    minimos = np.where(cubiertas, cantidades, np.iinfo(FORMATO).max).min(axis=0)
+    con_datos = cubiertas.any(axis=0) & (maximos > 0)
+
+    precios = {}
+    indices = np.flatnonzero(con_datos)
+    for inicio in range(0, len(indices), TAMANO_LOTE):
+        lote = productos[indices[inicio:inicio + TAMANO_LOTE]].tolist()
+        precios.update(Producto.objects.filter(id__in=lote).values_list('id', 'precio'))
+
+    discrepancias = []
+    for indice in indices.tolist():
+        producto_id = int(productos[indice])
+        if producto_id not in precios:
+            # Producto eliminado después del conteo
+            continue
+        diferencia = int(maximos[indice] - minimos[indice])
+        valores = {}
+        for fila, numero in enumerate(NUMEROS_CONTEO):
+            cubierta = cubiertas[fila, indice]
+            valores[f'conteo_{numero}_id'] = int(asignaciones[numero][indice]) if cubierta else None
+            valores[f'cantidad_{numero}'] = int(cantidades[fila, indice]) if cubierta else None
+        discrepancias.append(DiscrepanciaConteo(
+            producto_id=producto_id,
+            diferencia_absoluta=diferencia,
+            diferencia_relativa=round(diferencia / int(maximos[indice]) * 100, 2),
+            impacto_valor=(precios[producto_id] or Decimal('0')) * diferencia,
+            **valores,
+        ))
+    return discrepancias
+
+
+def actualizar_discrepancias(productos_ids):
+    """
+    Recalcula y guarda las discrepancias de los productos indicados; elimina las filas de
+    los que ya no tienen cantidades. Retorna la cantidad de filas escritas.
+    """
+    productos_ids = set(productos_ids)
+    discrepancias = calcular_discrepancias(productos_ids)
+    DiscrepanciaConteo.objects.bulk_create(
+        discrepancias,
+        update_conflicts=True,
+        unique_fields=['producto'],
+        update_fields=CAMPOS_ACTUALIZADOS,
+        batch_size=500,
+    )
+    sin_datos = sorted(productos_ids - {discrepancia.producto_id for discrepancia in discrepancias})
+    for inicio in range(0, len(sin_datos), TAMANO_LOTE):
+        DiscrepanciaConteo.objects.filter(producto_id__in=sin_datos[inicio:inicio + TAMANO_LOTE]).delete()
+    return len(discrepancias)
+
+
+def actualizar_discrepancias_conteo(conteo):
+    """Actualiza las discrepancias de los productos que cambian al finalizar ``conteo``"""
+    productos_reconteo = conteo.productos_reconteo_ids()
+    if productos_reconteo is not None:
+        return actualizar_discrepancias(productos_reconteo)
+    # Un conteo completo pasa a ser el más reciente de su número para todo el catálogo:
+    # cambian sus productos y los que ya tenían cantidades (que ahora cuentan 0)
+    productos = set(cargar_instantaneas([conteo.id])[conteo.id][:, 0].tolist())
+    productos.update(DiscrepanciaConteo.objects.values_list('producto_id', flat=True))
+    return actualizar_discrepancias(productos)
+
+
+def recalcular_discrepancias():
+    """Reconstruye la tabla completa desde las instantáneas de los conteos finalizados"""
+    conteos_ids = Conteo.objects.filter(
+        estado='finalizado', numero_conteo__in=NUMEROS_CONTEO
+    ).values_list('id', flat=True)
+    productos = set()
+    for arreglo in cargar_instantaneas(conteos_ids).values():
+        productos.update(arreglo[:, 0].tolist())
+    productos.update(DiscrepanciaConteo.objects.values_list('producto_id', flat=True))
+    return actualizar_discrepancias(productos)
+
+
+def candidatos_reconteo(diferencia_minima=None, diferencia_relativa_minima=None, impacto_minimo=None):
+    """
+    Discrepancias que superan todos los umbrales indicados (sin umbrales, cualquier
+    diferencia), ordenadas por impacto en valor.
+    """
+    discrepancias = DiscrepanciaConteo.objects.filter(diferencia_absoluta__gte=max(diferencia_minima or 0, 1))
+    if diferencia_relativa_minima is not None:
+        discrepancias = discrepancias.filter(diferencia_relativa__gte=diferencia_relativa_minima)
+    if impacto_minimo is not None:
+        discrepancias = discrepancias.filter(impacto_valor__gte=impacto_minimo)
+    return discrepancias.order_by('-impacto_valor', '-diferencia_absoluta', 'producto_id')
@@ -0,0 +1,107 @@
+"""
+Estadísticas por conteo para la lista de conteos, calculadas en una sola consulta.
+
+``conteos_con_estadisticas`` anota sobre el queryset de conteos:
+
+- ``total_items`` y ``total_cantidad``: subconsultas agregadas sobre ItemConteo
+  (en los conteos archivados, los totales de su instantánea).
+- ``productos_pendientes`` (solo conteos en proceso): productos distintos
+  asignados a las parejas del conteo que todavía no fueron contados, con una
+  subconsulta correlacionada sobre la tabla de asignaciones. No se suma el avance
+  por pareja: un producto asignado a dos parejas contaría dos veces.
+
+Los reconteos (conteos creados desde un comparativo, con "Productos: 1,2,3" en
+las observaciones) se limitan a una lista de productos que solo está en el
+texto; sus pendientes se resuelven después, con dos consultas para todos ellos.
+"""
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Prefetch, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from productos.models import Producto
+from usuarios.models import ParejaConteo
+from .models import Conteo, ItemConteo
+
+
+class ConteoSubconsulta(Subquery):
+    """Cantidad de filas de una subconsulta (COUNT sobre la subconsulta completa)"""
+    template = '(SELECT COUNT(*) FROM (%(subquery)s) _subconsulta)'
+    output_field = IntegerField()
+
+
+def _subconsulta_items(agregado):
+    return Subquery(
+        ItemConteo.objects.filter(conteo_id=OuterRef('pk'))
+        .order_by()
+        .values('conteo_id')
+        .annotate(valor=agregado)
+        .values('valor'),
+        output_field=IntegerField(),
+    )
+
+
+def _total_conteo(subconsulta, total_archivado):
+    """Total desde los items o, en los conteos archivados (sin items), desde su instantánea"""
+    return Case(
+        When(fecha_archivo__isnull=False, then=Coalesce(F(total_archivado), Value(0))),
+        default=Coalesce(subconsulta, Value(0)),
+        output_field=IntegerField(),
+    )
+
+
+def _subconsulta_pendientes():
+    """Productos distintos asignados a las parejas del conteo y sin item en el conteo"""
+    parejas_conteo = Conteo.parejas.through.objects.filter(conteo_id=OuterRef(OuterRef('pk'))).values('parejaconteo_id')
+    contados = ItemConteo.objects.filter(conteo_id=OuterRef(OuterRef('pk'))).values('producto_id')
+    return ConteoSubconsulta(
+        Producto.parejas_asignadas.through.objects.filter(parejaconteo_id__in=parejas_conteo)
+        .exclude(producto_id__in=contados)
+        .order_by()
+        .values('producto_id')
+        .distinct()
+    )
+
+
+def conteos_con_estadisticas(conteos):
+    """
+    Anota ``total_items``, ``total_cantidad`` y ``productos_pendientes`` sobre ``conteos``
+    y carga las relaciones que muestra la lista.
+    """
+    return conteos.select_related(
+        'usuario_1', 'usuario_2', 'usuario_creador', 'usuario_modificador'
+    ).prefetch_related(
+        Prefetch('parejas', queryset=ParejaConteo.objects.select_related('usuario_1', 'usuario_2'))
+    ).annotate(
+        total_items=_total_conteo(_subconsulta_items(Count('id')), 'instantanea__total_items'),
+        total_cantidad=_total_conteo(_subconsulta_items(Sum('cantidad')), 'instantanea__total_cantidad'),
+        productos_pendientes=Case(
+            When(estado='en_proceso', then=_subconsulta_pendientes()),
+            default=None,
+            output_field=IntegerField(),
+        ),
+    )
+
+
+def completar_pendientes_reconteos(conteos):
+    """
+    Corrige ``productos_pendientes`` de los reconteos en proceso de ``conteos``
+    (ya evaluados) con dos consultas en total.
+    """
+    reconteos = {}
+    for conteo in conteos:
+        if conteo.estado == 'en_proceso':
+            productos_ids = conteo.productos_reconteo_ids()
+            if productos_ids is not None:
+                reconteos[conteo.id] = (conteo, set(productos_ids))
+    if not reconteos:
+        return
+
+    todos_ids = set().union(*(productos_ids for _, productos_ids in reconteos.values()))
+    existentes = set(Producto.objects.filter(id__in=todos_ids).order_by().values_list('id', flat=True))
+    contados = {conteo_id: set() for conteo_id in reconteos}
+    for conteo_id, producto_id in ItemConteo.objects.filter(
+        conteo_id__in=list(reconteos), producto_id__in=existentes
+    ).order_by().values_list('conteo_id', 'producto_id'):
+        contados[conteo_id].add(producto_id)
+
+    for conteo_id, (conteo, productos_ids) in reconteos.items():
+        conteo.productos_pendientes = len((productos_ids & existentes) - contados[conteo_id])
@@ -0,0 +1,147 @@
+"""
+Eventos de progreso por conteo para actualizar las páginas sin recargarlas.
+
+Cada movimiento registrado (ver ``movimientos.registro``) publica un evento al
+confirmarse la transacción. Los eventos se guardan en la caché con un número de
+secuencia por conteo; los clientes piden los eventos posteriores al último que
+recibieron, por Server-Sent Events o long-poll (``conteo:eventos_conteo``).
+
+Si faltan eventos (expiraron o la caché se reinició) el cliente recibe
+``reiniciar`` y debe recargar el estado completo.
+
+Con varios procesos los eventos solo se comparten si ``CACHES`` usa un backend
+compartido (Redis, Memcached, base de datos): con la caché local por defecto un
+cliente atendido por otro proceso no vería los eventos. ``eventos_en_vivo``
+decide si la página se suscribe o, como antes, consulta el avance cada
+``INTERVALO_SONDEO_PROGRESO`` segundos (``CONTEO_EVENTOS_EN_VIVO`` lo fuerza).
+
+Cada flujo abierto (SSE o long-poll con espera) ocupa un hilo del servidor hasta
+25 segundos consultando la caché cada medio segundo; ``reservar_flujo`` limita
+cuántos hay a la vez por proceso (``CONTEO_MAX_FLUJOS_EVENTOS``). Los que no
+entran reciben una respuesta inmediata y el cliente vuelve a intentar más tarde.
+"""
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from usuarios.asignaciones import parejas_activas_usuario, version_asignaciones
+
+TIEMPO_CACHE_EVENTOS = 60 * 15
+# Eventos entregados por respuesta
+LIMITE_EVENTOS = 200
+# Segundos entre consultas del avance en las páginas sin eventos en vivo
+INTERVALO_SONDEO_PROGRESO = 15
+MAX_FLUJOS_POR_DEFECTO = 4
+
+# Backends de caché propios de cada proceso
+CACHES_LOCALES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+_flujos_abiertos = 0
+_lock_flujos = Lock()
+
+
+def eventos_en_vivo():
+    """Indica si los eventos publicados llegan a todos los procesos (caché compartida)"""
+    forzado = getattr(settings, 'CONTEO_EVENTOS_EN_VIVO', None)
+    if forzado is not None:
+        return forzado
+    return settings.CACHES['default']['BACKEND'] not in CACHES_LOCALES
+
+
+def reservar_flujo():
+    """Reserva un flujo de eventos en este proceso; False si ya se alcanzó el máximo"""
+    global _flujos_abiertos
+    with _lock_flujos:
+        if _flujos_abiertos >= getattr(settings, 'CONTEO_MAX_FLUJOS_EVENTOS', MAX_FLUJOS_POR_DEFECTO):
+            return False
+        _flujos_abiertos += 1
+        return True
+
+
+def liberar_flujo():
+    """Libera un flujo reservado con ``reservar_flujo``"""
+    global _flujos_abiertos
+    with _lock_flujos:
+        _flujos_abiertos -= 1
+
+
+def _clave_secuencia(conteo_id):
+    return f'conteo:{conteo_id}:eventos'
+
+
+def _clave_evento(conteo_id, numero):
+    return f'conteo:{conteo_id}:evento:{numero}'
+
+
+def ultimo_evento(conteo_id):
+    """Número del último evento publicado del conteo (0 si no hay)"""
+    return cache.get(_clave_secuencia(conteo_id), 0)
+
+
+def _publicar(conteo_id, eventos):
+    clave = _clave_secuencia(conteo_id)
+    cache.add(clave, 0, None)
+    try:
+        ultimo = cache.incr(clave, len(eventos))
+    except ValueError:
+        # La clave expiró entre add e incr
+        cache.add(clave, len(eventos), None)
+        ultimo = cache.get(clave, len(eventos))
+
+    primero = ultimo - len(eventos) + 1
+    datos = {}
+    for numero, evento in enumerate(eventos, start=primero):
+        evento['id'] = numero
+        datos[_clave_evento(conteo_id, numero)] = evento
+    cache.set_many(datos, TIEMPO_CACHE_EVENTOS)
+
+
+def publicar_movimientos(movimientos):
+    """Publica un evento por movimiento al confirmarse la transacción actual"""
+    por_conteo = {}
+    # La versión de las asignaciones se lee una vez para todo el lote
+    version = version_asignaciones() if movimientos else None
+    for movimiento in movimientos:
+        por_conteo.setdefault(movimiento.conteo_id, []).append({
+            'tipo': movimiento.tipo,
+            'item_id': movimiento.item_conteo_id,
+            'producto_id': movimiento.producto_id,
+            'usuario_id': movimiento.usuario_id,
+            'pareja_ids': sorted(parejas_activas_usuario(movimiento.usuario, version)),
+            'cantidad_anterior': movimiento.cantidad_anterior,
+            'cantidad_nueva': movimiento.cantidad_nueva,
+            'cantidad_cambiada': movimiento.cantidad_cambiada,
+        })
+
+    for conteo_id, eventos in por_conteo.items():
+        transaction.on_commit(lambda conteo_id=conteo_id, eventos=eventos: _publicar(conteo_id, eventos))
+
+
+def eventos_desde(conteo_id, desde, limite=LIMITE_EVENTOS):
+    """
+    Eventos del conteo posteriores a ``desde`` (hasta ``limite``).
+    Retorna None si el cliente debe recargar el estado completo.
+    """
+    ultimo = ultimo_evento(conteo_id)
+    if desde > ultimo:
+        # La secuencia se reinició (caché vaciada)
+        return None
+    if desde == ultimo:
+        return []
+
+    claves = [_clave_evento(conteo_id, numero) for numero in range(desde + 1, min(ultimo, desde + limite) + 1)]
+    datos = cache.get_many(claves)
+    eventos = []
+    for posicion, clave in enumerate(claves):
+        if clave not in datos:
+            # Al final pueden faltar eventos que se están publicando; en medio, expiraron
+            if any(siguiente in datos for siguiente in claves[posicion + 1:]):
+                return None
+            break
+        eventos.append(datos[clave])
+    return eventos
@@ -0,0 +1,74 @@
+"""
+Claves de idempotencia para las escrituras del scanner.
+
+El cliente genera una clave por escaneo (encabezado ``Idempotency-Key`` o campo
+``idempotency_key``) y la reenvía en cada reintento. La clave se reserva en la
+misma transacción que la escritura, con una restricción única por conteo: si
+llega un duplicado (aunque sea en paralelo) la inserción de la clave falla y se
+devuelve la respuesta guardada del primer envío, sin volver a escribir.
+"""
+from django.db import IntegrityError, transaction
+
+from .models import SolicitudIdempotente
+
+LONGITUD_MAXIMA_CLAVE = SolicitudIdempotente._meta.get_field('clave').max_length
+
+
+def clave_idempotencia(request):
+    """Clave de idempotencia de la petición ('' si no se envió)"""
+    return (request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key') or '').strip()
+
+
+def respuesta_registrada(conteo, clave):
+    """Respuesta guardada para la clave, o None"""
+    if not clave:
+        return None
+    return SolicitudIdempotente.objects.filter(conteo=conteo, clave=clave).values_list('respuesta', flat=True).first()
+
+
+def ejecutar_una_vez(conteo, clave, operacion):
+    """
+    Ejecuta ``operacion()`` (que retorna un dict serializable) una sola vez por
+    conteo y clave. Los reintentos con la misma clave reciben la respuesta original.
+    Si ``operacion`` lanza una excepción la clave no queda registrada.
+    """
+    if not clave:
+        return operacion()
+
+    respuesta = respuesta_registrada(conteo, clave)
+    if respuesta is not None:
+        return respuesta
+
+    try:
+        with transaction.atomic():
+            solicitud = SolicitudIdempotente.objects.create(conteo=conteo, clave=clave)
+            respuesta = operacion()
+            solicitud.respuesta = respuesta
+            solicitud.save(update_fields=['respuesta'])
+    except IntegrityError:
+        # Un envío concurrente con la misma clave terminó primero
+        respuesta = respuesta_registrada(conteo, clave)
+        if respuesta is None:
+            raise
+    return respuesta
+
+
+def registrar_claves(conteo, respuestas):
+    """
+    Guarda en bloque las respuestas de varias claves ({clave: respuesta}).
+    Debe llamarse dentro de la transacción de la escritura; falla con
+    IntegrityError si alguna clave ya fue registrada por otro envío.
+    """
+    SolicitudIdempotente.objects.bulk_create([
+        SolicitudIdempotente(conteo=conteo, clave=clave, respuesta=respuesta)
+        for clave, respuesta in respuestas.items()
+    ])
+
+
+def respuestas_registradas(conteo, claves):
+    """Respuestas guardadas para varias claves ({clave: respuesta})"""
+    if not claves:
+        return {}
+    return dict(
+        SolicitudIdempotente.objects.filter(conteo=conteo, clave__in=claves).values_list('clave', 'respuesta')
+    )
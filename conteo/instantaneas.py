@@ -0,0 +1,218 @@
+"""
+Instantáneas compactas de los conteos finalizados.
+
+Un conteo finalizado ya no cambia, pero los comparativos y las comparaciones
+volvían a leer sus items fila por fila. Al finalizar (``finalizar_conteo``) los
+items se congelan en ``ConteoInstantanea``: un blob con los pares
+(producto_id, cantidad) como enteros de 64 bits little-endian, ordenados por
+producto. Cargar un conteo es leer una fila y un ``numpy.frombuffer`` (sin
+copiar); cargar varios, una sola consulta.
+
+Las lecturas solo usan instantáneas de conteos finalizados (reabrir un conteo
+deja la suya sin efecto) y nunca escriben: los conteos finalizados sin
+instantánea se leen de sus items. Si se modifican items de un conteo ya
+finalizado, su instantánea se descarta hasta que se vuelva a finalizar o se
+congele con el script de verificación (``--congelar``); la de un conteo
+archivado (``conteo.archivo``) es la única copia de sus items y no se descarta
+ni se vuelve a congelar. ``verificar_instantanea`` compara la instantánea con las
+filas de ``ItemConteo`` (ver ``scripts/verificar_instantaneas_conteos.py``).
+"""
+import hashlib
+
+import numpy as np
+from django.db import connection
+from django.db.models import F
+
+from productos.models import Producto
+from .models import Conteo, ConteoInstantanea, ItemConteo
+
+FORMATO = np.dtype('<i8')
+
+
+def empaquetar(filas):
+    """Empaqueta pares (producto_id, cantidad) ordenados por producto"""
+    return np.array(filas, dtype=FORMATO).reshape(-1, 2).tobytes()
+
+
+def desempaquetar(datos):
+    """Arreglo de solo lectura de forma (n, 2): columna 0 producto_id, columna 1 cantidad"""
+    return np.frombuffer(datos, dtype=FORMATO).reshape(-1, 2)
+
+
+def _filas_conteo(conteo_id):
+    return list(
+        ItemConteo.objects.filter(conteo_id=conteo_id).order_by('producto_id').values_list('producto_id', 'cantidad')
+    )
+
+
+def congelar_conteo(conteo):
+    """Congela los items actuales del conteo en su instantánea (la reemplaza si existe)"""
+    if conteo.fecha_archivo:
+        raise ValueError('El conteo está archivado: sus items solo están en la instantánea')
+    filas = _filas_conteo(conteo.id)
+    datos = empaquetar(filas)
+    instantanea, _ = ConteoInstantanea.objects.update_or_create(
+        conteo_id=conteo.id,
+        defaults={
+            'datos': datos,
+            'total_items': len(filas),
+            'total_cantidad': sum(cantidad for _, cantidad in filas),
+            'huella': hashlib.sha256(datos).hexdigest(),
+        },
+    )
+    return instantanea
+
+
+def descartar_instantanea(conteo):
+    """Descarta la instantánea de un conteo finalizado cuyos items cambiaron (salvo si está archivado)"""
+    if conteo.estado == 'finalizado' and not conteo.fecha_archivo:
+        ConteoInstantanea.objects.filter(conteo_id=conteo.id).delete()
+
+
+def cargar_instantaneas(conteos_ids):
+    """
+    Items de los conteos como {conteo_id: arreglo (n, 2)}: de la instantánea en los
+    conteos finalizados que la tienen y de sus items en los demás (una consulta más).
+    """
+    conteos_ids = list(conteos_ids)
+    arreglos = {
+        conteo_id: desempaquetar(datos)
+        for conteo_id, datos in ConteoInstantanea.objects.filter(
+            conteo_id__in=conteos_ids, conteo__estado='finalizado'
+        ).values_list('conteo_id', 'datos')
+    }
+
+    faltantes = [conteo_id for conteo_id in conteos_ids if conteo_id not in arreglos]
+    if faltantes:
+        filas = {conteo_id: [] for conteo_id in faltantes}
+        for conteo_id, producto_id, cantidad in ItemConteo.objects.filter(
+            conteo_id__in=faltantes
+        ).order_by('conteo_id', 'producto_id').values_list('conteo_id', 'producto_id', 'cantidad'):
+            filas[conteo_id].append((producto_id, cantidad))
+        for conteo_id, filas_conteo in filas.items():
+            arreglos[conteo_id] = desempaquetar(empaquetar(filas_conteo))
+    return arreglos
+
+
+def cargar_instantanea(conteo):
+    """Items del conteo como arreglo (n, 2) ordenado por producto"""
+    return cargar_instantaneas([conteo.id])[conteo.id]
+
+
+def cantidad_archivada(producto_id):
+    """
+    Cantidad del producto en el conteo archivado más reciente que lo contiene (sus items
+    solo están en la instantánea), o None. Búsqueda binaria en cada instantánea.
+    """
+    for datos in ConteoInstantanea.objects.filter(
+        conteo__estado='finalizado', conteo__fecha_archivo__isnull=False
+    ).order_by('-conteo__fecha_fin').values_list('datos', flat=True).iterator():
+        arreglo = desempaquetar(datos)
+        posicion = np.searchsorted(arreglo[:, 0], producto_id)
+        if posicion < len(arreglo) and arreglo[posicion, 0] == producto_id:
+            return int(arreglo[posicion, 1])
+    return None
+
+
+def ultimas_cantidades(arreglos, incluir=None, excluir=None):
+    """
+    Cantidad de cada producto en el primero de ``arreglos`` (en orden de prioridad) que lo
+    contiene, como {producto_id: cantidad}. ``incluir``/``excluir`` limitan los productos.
+    """
+    arreglos = [arreglo for arreglo in arreglos if len(arreglo)]
+    if not arreglos:
+        return {}
+    todos = np.concatenate(arreglos)
+    # np.unique retorna el índice de la primera aparición de cada producto
+    productos, primeros = np.unique(todos[:, 0], return_index=True)
+    cantidades = todos[primeros, 1]
+    if incluir is not None:
+        mascara = np.isin(productos, np.fromiter(incluir, dtype=FORMATO))
+        productos, cantidades = productos[mascara], cantidades[mascara]
+    if excluir:
+        mascara = ~np.isin(productos, np.fromiter(excluir, dtype=FORMATO))
+        productos, cantidades = productos[mascara], cantidades[mascara]
+    return dict(zip(productos.tolist(), cantidades.tolist()))
+
+
+def stocks_actuales(productos_ids=None):
+    """
+    Stock actual de varios productos como {producto_id: cantidad}, igual que
+    ``Producto.get_stock_actual``: la cantidad del último conteo finalizado que los
+    incluye. Los productos sin conteos no aparecen (stock 0). ``productos_ids``
+    limita los productos.
+
+    El último item de cada producto en los conteos no archivados sale de una
+    consulta (``DISTINCT ON`` en PostgreSQL; en otros motores, un recorrido
+    ordenado). Las instantáneas archivadas se desempaquetan de la más reciente a la
+    más antigua solo mientras queden productos que puedan estar en un conteo
+    archivado posterior a su último item.
+    """
+    if productos_ids is not None:
+        productos_ids = set(productos_ids)
+        if not productos_ids:
+            return {}
+    orden_conteos = (F('fecha_fin').desc(nulls_last=True), '-id')
+    conteos = list(Conteo.objects.filter(estado='finalizado').order_by(*orden_conteos).values_list('id', 'fecha_archivo'))
+    prioridad = {conteo_id: posicion for posicion, (conteo_id, _) in enumerate(conteos)}
+
+    items = ItemConteo.objects.filter(conteo__estado='finalizado', conteo__fecha_archivo__isnull=True)
+    if productos_ids is not None:
+        items = items.filter(producto_id__in=productos_ids)
+    items = items.order_by('producto_id', F('conteo__fecha_fin').desc(nulls_last=True), '-conteo_id')
+    if connection.features.can_distinct_on_fields:
+        items = items.distinct('producto_id')
+    # {producto_id: (prioridad del conteo, cantidad)}
+    ultimos = {}
+    for producto_id, conteo_id, cantidad in items.values_list('producto_id', 'conteo_id', 'cantidad').iterator():
+        if producto_id not in ultimos:
+            ultimos[producto_id] = (prioridad[conteo_id], cantidad)
+
+    if any(fecha_archivo for _, fecha_archivo in conteos):
+        pendientes = productos_ids if productos_ids is not None else set(Producto.objects.values_list('id', flat=True))
+        for conteo_id, datos in ConteoInstantanea.objects.filter(
+            conteo__estado='finalizado', conteo__fecha_archivo__isnull=False
+        ).order_by(
+            F('conteo__fecha_fin').desc(nulls_last=True), '-conteo_id'
+        ).values_list('conteo_id', 'datos').iterator(chunk_size=10):
+            posicion = prioridad[conteo_id]
+            # Los productos con un item en un conteo posterior ya están resueltos
+            pendientes = {
+                producto_id for producto_id in pendientes
+                if producto_id not in ultimos or ultimos[producto_id][0] > posicion
+            }
+            if not pendientes:
+                break
+            arreglo = desempaquetar(datos)
+            arreglo = arreglo[np.isin(arreglo[:, 0], np.fromiter(pendientes, dtype=FORMATO))]
+            for producto_id, cantidad in arreglo.tolist():
+                ultimos[producto_id] = (posicion, cantidad)
+
+    return {producto_id: cantidad for producto_id, (_, cantidad) in ultimos.items()}
+
+
+def verificar_instantanea(instantanea):
+    """
+    Compara la instantánea con las filas actuales del conteo (en los conteos archivados,
+    que ya no tienen filas, solo la huella y los totales).
+    Retorna una lista de errores (vacía si coinciden).
+    """
+    errores = []
+    datos = bytes(instantanea.datos)
+    if hashlib.sha256(datos).hexdigest() != instantanea.huella:
+        errores.append('La huella SHA-256 no coincide con los datos')
+
+    arreglo = desempaquetar(datos)
+    if len(arreglo) != instantanea.total_items or int(arreglo[:, 1].sum()) != instantanea.total_cantidad:
+        errores.append('Los totales no coinciden con los datos')
+
+    if instantanea.conteo.fecha_archivo:
+        return errores
+
+    congelados = dict(zip(arreglo[:, 0].tolist(), arreglo[:, 1].tolist()))
+    actuales = dict(_filas_conteo(instantanea.conteo_id))
+    for producto_id in sorted(congelados.keys() | actuales.keys()):
+        congelada, actual = congelados.get(producto_id), actuales.get(producto_id)
+        if congelada != actual:
+            errores.append(f'Producto {producto_id}: instantánea {congelada}, items {actual}')
+    return errores
@@ -0,0 +1,223 @@
+"""
+Listas paginadas y progreso del detalle de conteo.
+
+La página de detalle solo muestra la primera página de items de la pareja; el
+resto de los items, los productos pendientes y los items de otros usuarios se
+piden por JSON (``conteo:lista_conteo``) a medida que se necesitan, con la
+búsqueda resuelta en el servidor.
+
+Las listas usan paginación por clave (keyset): el cursor es el valor de las
+columnas de orden de la última fila enviada, de modo que cada página cuesta lo
+mismo sin importar su profundidad y no se repiten ni saltan filas si entre
+página y página se cuentan productos.
+
+- Pendientes: productos asignados no contados por nadie, por (marca, nombre, id).
+- Contados: items de la pareja del usuario, del más reciente al más antiguo (-id).
+- Otros: items del resto de los usuarios (solo administradores), por -id.
+"""
+import base64
+import binascii
+import json
+
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+from productos.models import Producto
+from productos.busqueda import filtro_busqueda
+from usuarios.models import ParejaConteo
+from usuarios.asignaciones import parejas_activas_usuario, productos_asignados_usuario, version_asignaciones
+
+LISTAS = ('pendientes', 'contados', 'otros')
+
+# Filas por página y tope por página
+LIMITE_LISTA = 50
+LIMITE_MAXIMO_LISTA = 200
+
+CAMPOS_PRODUCTO = ('id', 'codigo_barras', 'codigo', 'nombre', 'marca', 'atributo', 'imagen')
+CAMPOS_ITEM = (
+    'id', 'producto_id', 'cantidad', 'usuario_conteo__username',
+    *(f'producto__{campo}' for campo in CAMPOS_PRODUCTO if campo != 'id'),
+)
+
+
+def usuarios_pareja_ids(usuario):
+    """Ids del usuario y de los integrantes de sus parejas activas"""
+    ids = {usuario.pk}
+    parejas_ids = parejas_activas_usuario(usuario)
+    if parejas_ids:
+        for usuario_1_id, usuario_2_id in ParejaConteo.objects.filter(id__in=parejas_ids).values_list(
+            'usuario_1_id', 'usuario_2_id'
+        ):
+            ids.update((usuario_1_id, usuario_2_id))
+    return ids
+
+
+def productos_asignados_conteo(usuario, conteo):
+    """
+    Retorna (queryset de productos asignados a las parejas del usuario, cantidad).
+
+    Si el conteo se creó desde un comparativo solo cuentan los productos del reconteo.
+    """
+    version = version_asignaciones()
+    asignados_ids = productos_asignados_usuario(usuario, version)
+    reconteo_ids = conteo.productos_reconteo_ids()
+    if reconteo_ids is not None:
+        asignados_ids = asignados_ids.intersection(reconteo_ids)
+    if not asignados_ids:
+        return Producto.objects.none(), 0
+
+    asignados = Producto.parejas_asignadas.through.objects.filter(
+        parejaconteo_id__in=parejas_activas_usuario(usuario, version)
+    ).values('producto_id')
+    productos = Producto.objects.filter(id__in=asignados)
+    if reconteo_ids is not None:
+        productos = productos.filter(id__in=reconteo_ids)
+    return productos, len(asignados_ids)
+
+
+def progreso_conteo(conteo, usuario, es_admin=False, usuarios_ids=None):
+    """
+    Estadísticas de avance del usuario en el conteo, con una consulta agregada
+    sobre los items y un conteo de pendientes.
+    """
+    if usuarios_ids is None:
+        usuarios_ids = usuarios_pareja_ids(usuario)
+    reconteo_ids = conteo.productos_reconteo_ids()
+
+    pareja = Q(usuario_conteo_id__in=usuarios_ids)
+    agregados = {
+        'total_items': Count('id', filter=pareja),
+        'total_cantidad': Sum('cantidad', filter=pareja),
+    }
+    if es_admin:
+        agregados['total_items_todos'] = Count('id')
+        agregados['total_cantidad_todos'] = Sum('cantidad')
+    if reconteo_ids is not None:
+        # En un reconteo el avance solo considera los productos del reconteo
+        agregados['items_progreso'] = Count('id', filter=pareja & Q(producto_id__in=reconteo_ids))
+    resumen = conteo.items.order_by().aggregate(**agregados)
+
+    productos, total_productos = productos_asignados_conteo(usuario, conteo)
+    items_progreso = resumen.pop('items_progreso', resumen['total_items'])
+    progreso = {
+        'total_items': resumen['total_items'],
+        'total_cantidad': resumen['total_cantidad'] or 0,
+        'total_productos': total_productos,
+        'pendientes': productos_pendientes(conteo, productos).count() if total_productos else 0,
+        'porcentaje_contado': (items_progreso / total_productos * 100) if total_productos > 0 else 0,
+    }
+    if es_admin:
+        progreso['total_items_todos'] = resumen['total_items_todos']
+        progreso['total_cantidad_todos'] = resumen['total_cantidad_todos'] or 0
+    return progreso
+
+
+def productos_pendientes(conteo, productos):
+    """Productos que no fueron contados por ningún usuario en el conteo"""
+    return productos.exclude(id__in=conteo.items.order_by().values('producto_id'))
+
+
+def items_conteo(conteo, usuarios_ids, otros=False):
+    """Items de la pareja (o, con ``otros``, de los demás usuarios), del más reciente al más antiguo"""
+    items = conteo.items.all()
+    if otros:
+        items = items.exclude(usuario_conteo_id__in=usuarios_ids)
+    else:
+        items = items.filter(usuario_conteo_id__in=usuarios_ids)
+    return items.order_by('-id')
+
+
+def codificar_cursor(valores):
+    """Cursor opaco con los valores de orden de la última fila de la página"""
+    return base64.urlsafe_b64encode(json.dumps(valores, separators=(',', ':')).encode()).decode()
+
+
+def decodificar_cursor(cursor, longitud):
+    """Valores del cursor, o None si el cursor está vacío o es inválido"""
+    if not cursor:
+        return None
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(valores, list) or len(valores) != longitud:
+        return None
+    return valores
+
+
+def limite_lista(valor):
+    """Límite de filas pedido por el cliente, acotado al tope del servidor"""
+    try:
+        return min(max(int(valor), 1), LIMITE_MAXIMO_LISTA)
+    except (TypeError, ValueError):
+        return LIMITE_LISTA
+
+
+def _url_imagen(imagen):
+    return Producto._meta.get_field('imagen').storage.url(imagen) if imagen else None
+
+
+def _serializar_producto(fila, prefijo=''):
+    producto = {campo: fila[prefijo + campo] for campo in CAMPOS_PRODUCTO if prefijo + campo in fila}
+    for campo in ('codigo', 'marca', 'atributo'):
+        producto[campo] = producto[campo] or ''
+    producto['imagen'] = _url_imagen(producto['imagen'])
+    return producto
+
+
+def _serializar_item(fila):
+    producto = _serializar_producto(fila, 'producto__')
+    producto['id'] = fila['producto_id']
+    return {
+        'id': fila['id'],
+        'producto_id': fila['producto_id'],
+        'cantidad': fila['cantidad'],
+        'usuario': fila['usuario_conteo__username'] or '',
+        'producto': producto,
+    }
+
+
+def _pagina(filas, limite, clave_cursor, serializar):
+    """Arma la respuesta de una página a partir de ``limite + 1`` filas"""
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    return {
+        'resultados': [serializar(fila) for fila in filas],
+        'hay_mas': hay_mas,
+        'siguiente_cursor': codificar_cursor(clave_cursor(filas[-1])) if hay_mas else None,
+    }
+
+
+def pagina_pendientes(conteo, usuario, busqueda='', cursor='', limite=LIMITE_LISTA):
+    """Página de productos pendientes ordenada por (marca, nombre, id)"""
+    productos, total_productos = productos_asignados_conteo(usuario, conteo)
+    if not total_productos:
+        return _pagina([], limite, None, _serializar_producto)
+
+    productos = productos_pendientes(conteo, productos).annotate(marca_orden=Coalesce('marca', Value('')))
+    if busqueda:
+        productos = productos.filter(filtro_busqueda(busqueda))
+    valores = decodificar_cursor(cursor, 3)
+    if valores is not None:
+        marca, nombre, producto_id = valores
+        productos = productos.filter(
+            Q(marca_orden__gt=marca) |
+            Q(marca_orden=marca, nombre__gt=nombre) |
+            Q(marca_orden=marca, nombre=nombre, id__gt=producto_id)
+        )
+    filas = list(
+        productos.order_by('marca_orden', 'nombre', 'id').values(*CAMPOS_PRODUCTO, 'marca_orden')[:limite + 1]
+    )
+    return _pagina(filas, limite, lambda fila: [fila['marca_orden'], fila['nombre'], fila['id']], _serializar_producto)
+
+
+def pagina_items(conteo, usuarios_ids, otros=False, busqueda='', cursor='', limite=LIMITE_LISTA):
+    """Página de items (de la pareja o de otros usuarios) ordenada por -id"""
+    items = items_conteo(conteo, usuarios_ids, otros=otros)
+    if busqueda:
+        items = items.filter(producto_id__in=Producto.objects.filter(filtro_busqueda(busqueda)).values('id'))
+    valores = decodificar_cursor(cursor, 1)
+    if valores is not None:
+        items = items.filter(id__lt=valores[0])
+    filas = list(items.values(*CAMPOS_ITEM)[:limite + 1])
+    return _pagina(filas, limite, lambda fila: [fila['id']], _serializar_item)
@@ -6,6 +6,9 @@ class Migration(migrations.Migration):
 
     dependencies = [
         ('conteo', '0003_rename_sesion_to_conteo'),
+        # Las claves foráneas a SesionConteo deben existir antes del renombre
+        ('comparativos', '0001_initial'),
+        ('reportes', '0001_initial'),
     ]
 
     operations = [
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conteo', '0007_conteo_fecha_creacion_conteo_fecha_modificacion_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolicitudIdempotente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, verbose_name='Clave de Idempotencia')),
+                ('respuesta', models.JSONField(blank=True, null=True, verbose_name='Respuesta')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('conteo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='solicitudes_idempotentes', to='conteo.conteo', verbose_name='Conteo')),
+            ],
+            options={
+                'verbose_name': 'Solicitud Idempotente',
+                'verbose_name_plural': 'Solicitudes Idempotentes',
+                'unique_together': {('conteo', 'clave')},
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:12
+
+from django.db import migrations, models
+from django.db.models import Max
+import django.db.models.deletion
+
+
+def calcular_progreso_existente(apps, schema_editor):
+    """Calcula el avance de las parejas de los conteos existentes (igual que conteo.progreso.recalcular_progreso)"""
+    Conteo = apps.get_model('conteo', 'Conteo')
+    ItemConteo = apps.get_model('conteo', 'ItemConteo')
+    ConteoProgresoPareja = apps.get_model('conteo', 'ConteoProgresoPareja')
+    MovimientoConteo = apps.get_model('movimientos', 'MovimientoConteo')
+    Producto = apps.get_model('productos', 'Producto')
+    ProductoParejas = Producto.parejas_asignadas.through
+
+    asignados = {}
+    for pareja_id, producto_id in ProductoParejas.objects.values_list('parejaconteo_id', 'producto_id'):
+        asignados.setdefault(pareja_id, set()).add(producto_id)
+
+    filas = []
+    for conteo in Conteo.objects.prefetch_related('parejas'):
+        productos_reconteo = None
+        if conteo.observaciones and 'Productos:' in conteo.observaciones:
+            ids = conteo.observaciones.split('Productos:')[1].strip().split(',')
+            productos_reconteo = {int(pid.strip()) for pid in ids if pid.strip().isdigit()} or None
+        cantidades = dict(ItemConteo.objects.filter(conteo_id=conteo.id).values_list('producto_id', 'cantidad'))
+        actividad = dict(
+            MovimientoConteo.objects.filter(conteo_id=conteo.id).order_by().values('producto_id')
+            .annotate(ultima=Max('fecha_movimiento')).values_list('producto_id', 'ultima')
+        )
+        for pareja in conteo.parejas.all():
+            productos = asignados.get(pareja.id, set())
+            if productos_reconteo is not None:
+                productos = productos & productos_reconteo
+            contados = productos & cantidades.keys()
+            fechas = [actividad[producto_id] for producto_id in productos if producto_id in actividad]
+            filas.append(ConteoProgresoPareja(
+                conteo_id=conteo.id,
+                pareja_id=pareja.id,
+                asignados=len(productos),
+                contados=len(contados),
+                cantidad_total=sum(cantidades[producto_id] for producto_id in contados),
+                ultima_actividad=max(fechas) if fechas else None,
+            ))
+    ConteoProgresoPareja.objects.bulk_create(filas, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0003_perfilusuario_pin'),
+        ('conteo', '0008_solicitudidempotente'),
+        ('movimientos', '0002_movimientopendiente'),
+        ('productos', '0009_producto_codigo_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConteoProgresoPareja',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asignados', models.IntegerField(default=0, verbose_name='Productos Asignados')),
+                ('contados', models.IntegerField(default=0, verbose_name='Productos Contados')),
+                ('cantidad_total', models.IntegerField(default=0, verbose_name='Cantidad Total')),
+                ('ultima_actividad', models.DateTimeField(blank=True, null=True, verbose_name='Última Actividad')),
+                ('conteo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progreso_parejas', to='conteo.conteo', verbose_name='Conteo')),
+                ('pareja', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progreso_conteos', to='usuarios.parejaconteo', verbose_name='Pareja')),
+            ],
+            options={
+                'verbose_name': 'Progreso de Pareja',
+                'verbose_name_plural': 'Progreso de Parejas',
+                'unique_together': {('conteo', 'pareja')},
+            },
+        ),
+        migrations.RunPython(calcular_progreso_existente, migrations.RunPython.noop),
+    ]
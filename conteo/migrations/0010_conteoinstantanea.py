@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conteo', '0009_conteoprogresopareja'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConteoInstantanea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('datos', models.BinaryField(verbose_name='Datos')),
+                ('total_items', models.IntegerField(default=0, verbose_name='Total de Items')),
+                ('total_cantidad', models.BigIntegerField(default=0, verbose_name='Cantidad Total')),
+                ('huella', models.CharField(max_length=64, verbose_name='Huella SHA-256')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('conteo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='instantanea', to='conteo.conteo', verbose_name='Conteo')),
+            ],
+            options={
+                'verbose_name': 'Instantánea de Conteo',
+                'verbose_name_plural': 'Instantáneas de Conteos',
+            },
+        ),
+    ]
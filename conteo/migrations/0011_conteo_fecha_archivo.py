@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conteo', '0010_conteoinstantanea'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conteo',
+            name='fecha_archivo',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Archivo'),
+        ),
+    ]
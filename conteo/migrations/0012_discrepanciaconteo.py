@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0009_producto_codigo_index'),
+        ('conteo', '0011_conteo_fecha_archivo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscrepanciaConteo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad_1', models.IntegerField(blank=True, null=True, verbose_name='Cantidad Conteo 1')),
+                ('cantidad_2', models.IntegerField(blank=True, null=True, verbose_name='Cantidad Conteo 2')),
+                ('cantidad_3', models.IntegerField(blank=True, null=True, verbose_name='Cantidad Conteo 3')),
+                ('diferencia_absoluta', models.IntegerField(default=0, verbose_name='Diferencia Absoluta')),
+                ('diferencia_relativa', models.FloatField(default=0, verbose_name='Diferencia Relativa (%)')),
+                ('impacto_valor', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Impacto en Valor')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, verbose_name='Fecha de Actualización')),
+                ('conteo_1', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='conteo.conteo', verbose_name='Conteo 1')),
+                ('conteo_2', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='conteo.conteo', verbose_name='Conteo 2')),
+                ('conteo_3', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='conteo.conteo', verbose_name='Conteo 3')),
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='discrepancia', to='productos.producto', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Discrepancia entre Conteos',
+                'verbose_name_plural': 'Discrepancias entre Conteos',
+                'indexes': [models.Index(fields=['-diferencia_absoluta'], name='conteo_disc_diferen_977622_idx'), models.Index(fields=['-diferencia_relativa'], name='conteo_disc_diferen_860ec8_idx'), models.Index(fields=['-impacto_valor'], name='conteo_disc_impacto_6263d1_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conteo', '0012_discrepanciaconteo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conteo',
+            index=models.Index(fields=['estado', 'fecha_fin'], name='conteo_sesi_estado_0144de_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conteo',
+            index=models.Index(fields=['estado', 'fecha_modificacion'], name='conteo_sesi_estado_fdaf74_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='itemconteo',
+            index=models.Index(fields=['conteo', 'usuario_conteo'], name='conteo_item_conteo__a73db0_idx'),
+        ),
+    ]
@@ -31,6 +31,8 @@ class Conteo(models.Model):
     usuario_modificador = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='conteos_modificados', verbose_name="Usuario Modificador")
     fecha_creacion = models.DateTimeField(auto_now_add=True, null=True, blank=True, verbose_name="Fecha de Creación")
     fecha_modificacion = models.DateTimeField(auto_now=True, null=True, blank=True, verbose_name="Fecha de Modificación")
+    # Conteos archivados: sus items están solo en la instantánea y sus movimientos en el archivo
+    fecha_archivo = models.DateTimeField(null=True, blank=True, verbose_name="Fecha de Archivo")
     
     class Meta:
         verbose_name = "Conteo"
@@ -38,6 +40,12 @@ class Conteo(models.Model):
         ordering = ['numero_conteo', '-fecha_inicio']
         unique_together = [['nombre', 'numero_conteo']]
         db_table = 'conteo_sesionconteo'  # Mantener el nombre de tabla para compatibilidad
+        indexes = [
+            # Conteos finalizados por fecha de fin (stock actual, archivo, instantáneas)
+            models.Index(fields=['estado', 'fecha_fin']),
+            # Conteos en proceso sin actividad (alerta del dashboard)
+            models.Index(fields=['estado', 'fecha_modificacion']),
+        ]
     
     def __str__(self):
         parejas_str = ", ".join([f"{p.usuario_1.username} & {p.usuario_2.username}" for p in self.parejas.all()])
@@ -60,6 +68,17 @@ class Conteo(models.Model):
             usuarios.add(self.usuario_2)
         return list(usuarios)
 
+    def productos_reconteo_ids(self):
+        """
+        Ids de productos de un conteo creado desde un comparativo ("Productos: 1,2,3"
+        en las observaciones), o None si el conteo no está limitado a productos específicos.
+        """
+        if not self.observaciones or 'Productos:' not in self.observaciones:
+            return None
+        productos_str = self.observaciones.split('Productos:')[1].strip()
+        ids = [int(pid.strip()) for pid in productos_str.split(',') if pid.strip().isdigit()]
+        return ids or None
+
 
 class ItemConteo(models.Model):
     conteo = models.ForeignKey(Conteo, on_delete=models.CASCADE, related_name='items', verbose_name="Conteo")
@@ -73,7 +92,121 @@ class ItemConteo(models.Model):
         verbose_name_plural = "Items de Conteo"
         unique_together = [['conteo', 'producto']]
         ordering = ['-fecha_conteo']
+        indexes = [
+            # Items contados por la pareja del usuario (ver conteo.listas)
+            models.Index(fields=['conteo', 'usuario_conteo']),
+        ]
     
     def __str__(self):
         return f"{self.producto.nombre} - {self.cantidad} unidades"
 
+
+class ConteoProgresoPareja(models.Model):
+    """
+    Avance de una pareja en un conteo, mantenido incrementalmente (ver ``conteo.progreso``).
+    ``asignados`` son los productos asignados a la pareja (en reconteos, solo los del reconteo)
+    y ``contados``/``cantidad_total`` los items del conteo de esos productos.
+    """
+    conteo = models.ForeignKey(Conteo, on_delete=models.CASCADE, related_name='progreso_parejas', verbose_name="Conteo")
+    pareja = models.ForeignKey('usuarios.ParejaConteo', on_delete=models.CASCADE, related_name='progreso_conteos', verbose_name="Pareja")
+    asignados = models.IntegerField(default=0, verbose_name="Productos Asignados")
+    contados = models.IntegerField(default=0, verbose_name="Productos Contados")
+    cantidad_total = models.IntegerField(default=0, verbose_name="Cantidad Total")
+    ultima_actividad = models.DateTimeField(null=True, blank=True, verbose_name="Última Actividad")
+    
+    class Meta:
+        verbose_name = "Progreso de Pareja"
+        verbose_name_plural = "Progreso de Parejas"
+        unique_together = [['conteo', 'pareja']]
+    
+    def __str__(self):
+        return f"{self.conteo.nombre} - {self.pareja}: {self.contados}/{self.asignados}"
+    
+    @property
+    def pendientes(self):
+        return max(self.asignados - self.contados, 0)
+    
+    @property
+    def porcentaje(self):
+        return round(self.contados / self.asignados * 100, 1) if self.asignados else 0
+
+
+
+class ConteoInstantanea(models.Model):
+    """
+    Items de un conteo finalizado congelados en un arreglo compacto: pares
+    (producto_id, cantidad) como enteros de 64 bits little-endian, ordenados por
+    producto (ver ``conteo.instantaneas``).
+    """
+    conteo = models.OneToOneField(Conteo, on_delete=models.CASCADE, related_name='instantanea', verbose_name="Conteo")
+    datos = models.BinaryField(verbose_name="Datos")
+    total_items = models.IntegerField(default=0, verbose_name="Total de Items")
+    total_cantidad = models.BigIntegerField(default=0, verbose_name="Cantidad Total")
+    huella = models.CharField(max_length=64, verbose_name="Huella SHA-256")
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+    
+    class Meta:
+        verbose_name = "Instantánea de Conteo"
+        verbose_name_plural = "Instantáneas de Conteos"
+    
+    def __str__(self):
+        return f"{self.conteo.nombre} - {self.total_items} items"
+
+
+class DiscrepanciaConteo(models.Model):
+    """
+    Diferencia entre Conteo 1, 2 y 3 para un producto (ver ``conteo.discrepancias``).
+    Para cada número de conteo se toma el conteo finalizado más reciente que cubre el
+    producto; ``diferencia_relativa`` es el porcentaje de la diferencia sobre la cantidad máxima.
+    """
+    producto = models.OneToOneField(Producto, on_delete=models.CASCADE, related_name='discrepancia', verbose_name="Producto")
+    conteo_1 = models.ForeignKey(Conteo, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Conteo 1")
+    conteo_2 = models.ForeignKey(Conteo, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Conteo 2")
+    conteo_3 = models.ForeignKey(Conteo, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name="Conteo 3")
+    cantidad_1 = models.IntegerField(null=True, blank=True, verbose_name="Cantidad Conteo 1")
+    cantidad_2 = models.IntegerField(null=True, blank=True, verbose_name="Cantidad Conteo 2")
+    cantidad_3 = models.IntegerField(null=True, blank=True, verbose_name="Cantidad Conteo 3")
+    diferencia_absoluta = models.IntegerField(default=0, verbose_name="Diferencia Absoluta")
+    diferencia_relativa = models.FloatField(default=0, verbose_name="Diferencia Relativa (%)")
+    impacto_valor = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Impacto en Valor")
+    fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name="Fecha de Actualización")
+    
+    class Meta:
+        verbose_name = "Discrepancia entre Conteos"
+        verbose_name_plural = "Discrepancias entre Conteos"
+        indexes = [
+            models.Index(fields=['-diferencia_absoluta']),
+            models.Index(fields=['-diferencia_relativa']),
+            models.Index(fields=['-impacto_valor']),
+        ]
+    
+    def __str__(self):
+        return f"{self.producto.nombre}: {self.cantidad_1}/{self.cantidad_2}/{self.cantidad_3}"
+    
+    @property
+    def cantidades(self):
+        """Pares (número de conteo, cantidad) de los conteos que cubren el producto"""
+        return [
+            (numero, cantidad)
+            for numero, cantidad in ((1, self.cantidad_1), (2, self.cantidad_2), (3, self.cantidad_3))
+            if cantidad is not None
+        ]
+
+
+class SolicitudIdempotente(models.Model):
+    """
+    Respuesta registrada para una clave de idempotencia enviada por el scanner.
+    Si el cliente reintenta con la misma clave se devuelve la respuesta original sin volver a escribir.
+    """
+    conteo = models.ForeignKey(Conteo, on_delete=models.CASCADE, related_name='solicitudes_idempotentes', verbose_name="Conteo")
+    clave = models.CharField(max_length=64, verbose_name="Clave de Idempotencia")
+    respuesta = models.JSONField(null=True, blank=True, verbose_name="Respuesta")
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
+    
+    class Meta:
+        verbose_name = "Solicitud Idempotente"
+        verbose_name_plural = "Solicitudes Idempotentes"
+        unique_together = [['conteo', 'clave']]
+    
+    def __str__(self):
+        return f"{self.conteo.nombre} - {self.clave}"
@@ -0,0 +1,174 @@
+"""
+Avance por pareja de cada conteo (``ConteoProgresoPareja``).
+
+Cada fila guarda, para un par (conteo, pareja), cuántos productos tiene asignados
+la pareja, cuántos de ellos ya tienen item en el conteo, la cantidad total
+contada y la fecha de la última escritura. Las filas se mantienen con
+incrementos atómicos (``F()``) en lugar de recalcular el cruce de asignaciones
+contra ``ItemConteo``:
+
+- ``registrar_progreso``: escrituras de items (``conteo.registro``, edición de
+  items y creación/eliminación de items, ver ``conteo.signals``).
+- ``registrar_asignaciones``: productos asignados o desasignados de una pareja.
+- ``recalcular_progreso``: parejas agregadas o quitadas de un conteo, y la
+  reconstrucción completa (``scripts/reconstruir_progreso_parejas.py``).
+
+Un producto asignado a dos parejas de un conteo cuenta para ambas. Los cambios
+que no emiten señales (eliminación de productos, ``update()``/``delete()``
+masivos sobre items) dejan las filas desactualizadas hasta la reconstrucción.
+"""
+from django.db.models import Exists, F, Max, OuterRef
+from django.utils import timezone
+
+from movimientos.models import MovimientoConteo
+from productos.models import Producto
+from .models import Conteo, ConteoProgresoPareja, ItemConteo
+
+ConteoParejas = Conteo.parejas.through
+ProductoParejas = Producto.parejas_asignadas.through
+
+
+def registrar_progreso(conteo, cambios):
+    """
+    Aplica al avance de las parejas del conteo los cambios de sus items.
+    ``cambios`` es {producto_id: (items, cantidad)}: +1/-1 item creado o eliminado
+    (0 si solo cambió la cantidad) y la diferencia de cantidad.
+    """
+    productos_reconteo = conteo.productos_reconteo_ids()
+    if productos_reconteo is not None:
+        productos_reconteo = set(productos_reconteo)
+        cambios = {producto_id: cambio for producto_id, cambio in cambios.items() if producto_id in productos_reconteo}
+    if not cambios:
+        return
+
+    por_pareja = {}
+    for pareja_id, producto_id in ProductoParejas.objects.filter(
+        producto_id__in=list(cambios),
+        parejaconteo_id__in=ConteoParejas.objects.filter(conteo_id=conteo.id).values('parejaconteo_id'),
+    ).values_list('parejaconteo_id', 'producto_id'):
+        items, cantidad = cambios[producto_id]
+        acumulado = por_pareja.setdefault(pareja_id, [0, 0])
+        acumulado[0] += items
+        acumulado[1] += cantidad
+
+    ahora = timezone.now()
+    for pareja_id, (items, cantidad) in por_pareja.items():
+        ConteoProgresoPareja.objects.filter(conteo_id=conteo.id, pareja_id=pareja_id).update(
+            contados=F('contados') + items,
+            cantidad_total=F('cantidad_total') + cantidad,
+            ultima_actividad=ahora,
+        )
+
+
+def registrar_asignaciones(asignaciones, signo):
+    """
+    Aplica productos asignados (``signo`` 1) o desasignados (-1) al avance de las
+    parejas en sus conteos. ``asignaciones`` es un iterable de (pareja_id, producto_id).
+    """
+    productos_por_pareja = {}
+    for pareja_id, producto_id in asignaciones:
+        productos_por_pareja.setdefault(pareja_id, set()).add(producto_id)
+    if not productos_por_pareja:
+        return
+
+    enlaces = list(ConteoParejas.objects.filter(
+        parejaconteo_id__in=list(productos_por_pareja)
+    ).values_list('conteo_id', 'parejaconteo_id'))
+    if not enlaces:
+        return
+    conteos = {
+        conteo.id: conteo.productos_reconteo_ids()
+        for conteo in Conteo.objects.filter(id__in={conteo_id for conteo_id, _ in enlaces}).only('id', 'observaciones')
+    }
+
+    todos_productos = set().union(*productos_por_pareja.values())
+    items = {}
+    for conteo_id, producto_id, cantidad in ItemConteo.objects.filter(
+        conteo_id__in=list(conteos), producto_id__in=todos_productos
+    ).order_by().values_list('conteo_id', 'producto_id', 'cantidad'):
+        items[(conteo_id, producto_id)] = cantidad
+
+    for conteo_id, pareja_id in enlaces:
+        productos = productos_por_pareja[pareja_id]
+        if conteos[conteo_id] is not None:
+            productos = productos & set(conteos[conteo_id])
+        if not productos:
+            continue
+        contados = [items[(conteo_id, producto_id)] for producto_id in productos if (conteo_id, producto_id) in items]
+        ConteoProgresoPareja.objects.filter(conteo_id=conteo_id, pareja_id=pareja_id).update(
+            asignados=F('asignados') + signo * len(productos),
+            contados=F('contados') + signo * len(contados),
+            cantidad_total=F('cantidad_total') + signo * sum(contados),
+        )
+
+
+def calcular_progreso(conteo, parejas_ids):
+    """Avance de las parejas ``parejas_ids`` en el conteo, calculado desde cero"""
+    asignados = {pareja_id: set() for pareja_id in parejas_ids}
+    for pareja_id, producto_id in ProductoParejas.objects.filter(
+        parejaconteo_id__in=parejas_ids
+    ).values_list('parejaconteo_id', 'producto_id'):
+        asignados[pareja_id].add(producto_id)
+
+    productos_reconteo = conteo.productos_reconteo_ids()
+    if productos_reconteo is not None:
+        productos_reconteo = set(productos_reconteo)
+        asignados = {pareja_id: productos & productos_reconteo for pareja_id, productos in asignados.items()}
+
+    todos_productos = set().union(*asignados.values())
+    cantidades = dict(ItemConteo.objects.filter(
+        conteo_id=conteo.id, producto_id__in=todos_productos
+    ).order_by().values_list('producto_id', 'cantidad'))
+    actividad = dict(MovimientoConteo.objects.filter(
+        conteo_id=conteo.id, producto_id__in=todos_productos
+    ).order_by().values('producto_id').annotate(ultima=Max('fecha_movimiento')).values_list('producto_id', 'ultima'))
+
+    progreso = []
+    for pareja_id, productos in asignados.items():
+        contados = productos & cantidades.keys()
+        fechas = [actividad[producto_id] for producto_id in productos if producto_id in actividad]
+        progreso.append(ConteoProgresoPareja(
+            conteo_id=conteo.id,
+            pareja_id=pareja_id,
+            asignados=len(productos),
+            contados=len(contados),
+            cantidad_total=sum(cantidades[producto_id] for producto_id in contados),
+            ultima_actividad=max(fechas) if fechas else None,
+        ))
+    return progreso
+
+
+def recalcular_progreso(conteos_ids=None, parejas_ids=None):
+    """
+    Recalcula el avance de las parejas de los conteos indicados (o de los conteos de las
+    parejas indicadas; todo si no se indica nada) y elimina las filas de parejas que ya no
+    están en su conteo. Retorna la cantidad de filas escritas.
+    """
+    enlaces = ConteoParejas.objects.all()
+    filas = ConteoProgresoPareja.objects.all()
+    if conteos_ids is not None:
+        enlaces = enlaces.filter(conteo_id__in=conteos_ids)
+        filas = filas.filter(conteo_id__in=conteos_ids)
+    if parejas_ids is not None:
+        enlaces = enlaces.filter(parejaconteo_id__in=parejas_ids)
+        filas = filas.filter(pareja_id__in=parejas_ids)
+
+    filas.exclude(Exists(ConteoParejas.objects.filter(
+        conteo_id=OuterRef('conteo_id'), parejaconteo_id=OuterRef('pareja_id')
+    ))).delete()
+
+    parejas_por_conteo = {}
+    for conteo_id, pareja_id in enlaces.values_list('conteo_id', 'parejaconteo_id'):
+        parejas_por_conteo.setdefault(conteo_id, []).append(pareja_id)
+
+    escritas = 0
+    for conteo in Conteo.objects.filter(id__in=list(parejas_por_conteo)).only('id', 'observaciones'):
+        progreso = calcular_progreso(conteo, parejas_por_conteo[conteo.id])
+        ConteoProgresoPareja.objects.bulk_create(
+            progreso,
+            update_conflicts=True,
+            unique_fields=['conteo', 'pareja'],
+            update_fields=['asignados', 'contados', 'cantidad_total', 'ultima_actividad'],
+        )
+        escritas += len(progreso)
+    return escritas
@@ -0,0 +1,381 @@
+"""
+Registro de cantidades contadas.
+
+Las cantidades se suman con un UPDATE atómico (``cantidad = cantidad + n``) en
+lugar de leer, sumar y guardar, de modo que dos usuarios escaneando el mismo
+producto al mismo tiempo no pierden incrementos. En SQLite (>= 3.35) y
+PostgreSQL el UPDATE usa RETURNING para obtener la cantidad resultante en la
+misma sentencia; en otros motores se bloquean las filas con ``select_for_update``.
+El movimiento se registra a partir de la cantidad resultante, por lo que
+``cantidad_anterior``/``cantidad_nueva`` son exactos aun con escrituras concurrentes.
+
+También permite ingresar muchos escaneos en una sola petición (ráfagas de
+escaneo o escaneos encolados sin conexión): resuelve todos los productos con
+una consulta, suma las cantidades y registra los movimientos en bloque dentro
+de una única transacción.
+"""
+import sqlite3
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from productos.models import Producto
+from movimientos.models import MovimientoConteo
+from movimientos.registro import registrar_movimientos
+from usuarios.asignaciones import productos_asignados_usuario
+from .archivo import ERROR_CONTEO_ARCHIVADO
+from .models import ItemConteo
+from .idempotencia import LONGITUD_MAXIMA_CLAVE, registrar_claves, respuestas_registradas
+from .progreso import registrar_progreso
+from .instantaneas import descartar_instantanea
+
+# Máximo de líneas aceptadas por petición
+LIMITE_LINEAS_LOTE = 500
+
+
+def _validar_linea(linea):
+    """Retorna (codigo, producto_id, cantidad, error) de una línea del lote"""
+    if not isinstance(linea, dict):
+        return None, None, None, 'Línea inválida'
+
+    codigo = str(linea.get('barcode') or '').strip()
+    producto_id = linea.get('producto_id')
+    if producto_id not in (None, ''):
+        try:
+            producto_id = int(producto_id)
+        except (TypeError, ValueError):
+            return None, None, None, 'ID de producto inválido'
+    else:
+        producto_id = None
+
+    if not codigo and producto_id is None:
+        return None, None, None, 'Código de barras o ID de producto requerido'
+
+    try:
+        cantidad = int(linea.get('cantidad', 0))
+    except (TypeError, ValueError):
+        return None, None, None, 'Cantidad inválida'
+    if cantidad < 0:
+        return None, None, None, 'La cantidad no puede ser negativa'
+
+    return codigo, producto_id, cantidad, None
+
+
+def _resolver_productos(codigos, ids):
+    """
+    Resuelve códigos (de barras o internos) e ids a ids de producto con una sola consulta.
+    El código de barras tiene prioridad sobre el código interno.
+    """
+    if not codigos and not ids:
+        return {}, set()
+
+    filas = Producto.objects.filter(
+        Q(codigo_barras__in=codigos) | Q(codigo__in=codigos) | Q(id__in=ids)
+    ).order_by('-id').values_list('id', 'codigo_barras', 'codigo')
+
+    por_codigo = {}
+    existentes = set()
+    for producto_id, codigo_barras, codigo in filas:
+        existentes.add(producto_id)
+        # Orden descendente: el menor id queda al final, igual que la búsqueda exacta individual
+        if codigo in codigos:
+            por_codigo[('codigo', codigo)] = producto_id
+        if codigo_barras in codigos:
+            por_codigo[('codigo_barras', codigo_barras)] = producto_id
+
+    resueltos = {}
+    for codigo in codigos:
+        producto_id = por_codigo.get(('codigo_barras', codigo)) or por_codigo.get(('codigo', codigo))
+        if producto_id:
+            resueltos[codigo] = producto_id
+    return resueltos, existentes
+
+
+def _soporta_returning():
+    """Indica si el motor soporta UPDATE ... RETURNING"""
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def _incrementar(conteo_id, incrementos, usuario_id):
+    """
+    Suma atómicamente ``incrementos`` ({producto_id: cantidad}) a los items existentes del conteo.
+    Retorna {producto_id: (item_id, cantidad_nueva)} de los items actualizados.
+    """
+    if not incrementos:
+        return {}
+
+    productos_ids = sorted(incrementos)
+    if _soporta_returning():
+        qn = connection.ops.quote_name
+        casos = ' '.join(['WHEN %s THEN %s'] * len(productos_ids))
+        marcadores = ', '.join(['%s'] * len(productos_ids))
+        sql = (
+            f'UPDATE {qn(ItemConteo._meta.db_table)} '
+            f'SET {qn("cantidad")} = {qn("cantidad")} + CASE {qn("producto_id")} {casos} END, '
+            f'{qn("usuario_conteo_id")} = %s '
+            f'WHERE {qn("conteo_id")} = %s AND {qn("producto_id")} IN ({marcadores}) '
+            f'RETURNING {qn("producto_id")}, {qn("id")}, {qn("cantidad")}'
+        )
+        params = []
+        for producto_id in productos_ids:
+            params.extend([producto_id, incrementos[producto_id]])
+        params.extend([usuario_id, conteo_id])
+        params.extend(productos_ids)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return {producto_id: (item_id, cantidad) for producto_id, item_id, cantidad in cursor.fetchall()}
+
+    # Sin RETURNING: bloquear las filas, sumar con F() y releer dentro de la misma transacción
+    items = ItemConteo.objects.filter(conteo_id=conteo_id, producto_id__in=productos_ids).order_by('id')
+    bloqueados = list(items.select_for_update().values_list('producto_id', 'id'))
+    for producto_id, item_id in bloqueados:
+        ItemConteo.objects.filter(id=item_id).update(
+            cantidad=F('cantidad') + incrementos[producto_id],
+            usuario_conteo_id=usuario_id,
+        )
+    return {producto_id: (item_id, cantidad) for producto_id, item_id, cantidad in items.values_list('producto_id', 'id', 'cantidad')}
+
+
+def _crear_items(conteo_id, productos_ids, usuario_id):
+    """
+    Crea con cantidad 0 los items de ``productos_ids`` que no existen en el conteo.
+    Retorna los productos cuyos items insertó esta llamada: si otro usuario crea el
+    mismo item al mismo tiempo, se ignora el conflicto y el item no cuenta como creado.
+    """
+    productos_ids = sorted(productos_ids)
+    if _soporta_returning():
+        qn = connection.ops.quote_name
+        fecha = connection.ops.adapt_datetimefield_value(timezone.now())
+        filas = ', '.join(['(%s, %s, 0, %s, %s)'] * len(productos_ids))
+        sql = (
+            f'INSERT INTO {qn(ItemConteo._meta.db_table)} '
+            f'({qn("conteo_id")}, {qn("producto_id")}, {qn("cantidad")}, {qn("fecha_conteo")}, {qn("usuario_conteo_id")}) '
+            f'VALUES {filas} ON CONFLICT DO NOTHING RETURNING {qn("producto_id")}'
+        )
+        params = []
+        for producto_id in productos_ids:
+            params.extend([conteo_id, producto_id, fecha, usuario_id])
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return {producto_id for producto_id, in cursor.fetchall()}
+
+    # Sin RETURNING: un INSERT por item, cada uno en su propio savepoint
+    creados = set()
+    for producto_id in productos_ids:
+        try:
+            with transaction.atomic():
+                ItemConteo.objects.bulk_create([
+                    ItemConteo(conteo_id=conteo_id, producto_id=producto_id, cantidad=0, usuario_conteo_id=usuario_id)
+                ])
+        except IntegrityError:
+            continue
+        creados.add(producto_id)
+    return creados
+
+
+def sumar_cantidades(conteo, usuario, incrementos):
+    """
+    Suma las cantidades a los items del conteo, creándolos si no existen, sin
+    perder incrementos concurrentes, y actualiza el avance de las parejas.
+    Debe llamarse dentro de una transacción.
+
+    Retorna {producto_id: (item_id, cantidad_nueva, creado)}.
+    """
+    if conteo.fecha_archivo:
+        raise ValueError(ERROR_CONTEO_ARCHIVADO)
+    resultado = {
+        producto_id: (item_id, cantidad, False)
+        for producto_id, (item_id, cantidad) in _incrementar(conteo.id, incrementos, usuario.id).items()
+    }
+
+    faltantes = {producto_id: incrementos[producto_id] for producto_id in incrementos if producto_id not in resultado}
+    if faltantes:
+        # Si otro usuario crea el item al mismo tiempo se suma sobre el suyo
+        creados = _crear_items(conteo.id, faltantes, usuario.id)
+        for producto_id, (item_id, cantidad) in _incrementar(conteo.id, faltantes, usuario.id).items():
+            resultado[producto_id] = (item_id, cantidad, producto_id in creados)
+
+    registrar_progreso(conteo, {
+        producto_id: (1 if creado else 0, incrementos[producto_id])
+        for producto_id, (item_id, cantidad, creado) in resultado.items()
+    })
+    descartar_instantanea(conteo)
+    return resultado
+
+
+def sumar_cantidad(conteo, producto, usuario, cantidad):
+    """
+    Suma ``cantidad`` al item del producto y registra el movimiento.
+    Retorna (item_id, cantidad_nueva).
+    """
+    with transaction.atomic():
+        item_id, cantidad_nueva, creado = sumar_cantidades(conteo, usuario, {producto.id: cantidad})[producto.id]
+        registrar_movimientos([MovimientoConteo(
+            conteo=conteo,
+            item_conteo_id=item_id,
+            producto=producto,
+            usuario=usuario,
+            tipo='agregar' if creado else 'modificar',
+            cantidad_anterior=cantidad_nueva - cantidad,
+            cantidad_nueva=cantidad_nueva,
+            cantidad_cambiada=cantidad,
+        )])
+    return item_id, cantidad_nueva
+
+
+def registrar_lote(conteo, usuario, lineas):
+    """
+    Registra un lote de escaneos en el conteo.
+
+    Cada línea es un dict con ``barcode`` o ``producto_id``, ``cantidad`` y
+    opcionalmente ``client_ts`` y ``client_id``. Las líneas se aplican en orden
+    de ``client_ts`` (estable respecto al orden recibido). Retorna una lista de
+    resultados por línea, en el orden original.
+
+    ``client_id`` funciona como clave de idempotencia: las líneas ya registradas
+    en un envío anterior (o repetidas en el mismo lote) no se vuelven a aplicar
+    y reciben su resultado original.
+    """
+    if conteo.fecha_archivo:
+        return [
+            {
+                'client_id': linea.get('client_id') if isinstance(linea, dict) else None,
+                'success': False,
+                'error': ERROR_CONTEO_ARCHIVADO,
+            }
+            for linea in lineas
+        ]
+    try:
+        return _registrar_lote(conteo, usuario, lineas)
+    except IntegrityError:
+        # Otro envío concurrente registró alguna de las mismas claves: reintentar con sus resultados
+        return _registrar_lote(conteo, usuario, lineas)
+
+
+def _clave_linea(linea):
+    client_id = linea.get('client_id') if isinstance(linea, dict) else None
+    clave = str(client_id).strip() if client_id not in (None, '') else ''
+    return clave if len(clave) <= LONGITUD_MAXIMA_CLAVE else ''
+
+
+def _registrar_lote(conteo, usuario, lineas):
+    resultados = [None] * len(lineas)
+    claves = [_clave_linea(linea) for linea in lineas]
+    previas = respuestas_registradas(conteo, {clave for clave in claves if clave})
+    primera_linea = {}
+    repetidas = []
+
+    validas = []
+    for indice, linea in enumerate(lineas):
+        clave = claves[indice]
+        if clave in previas:
+            resultados[indice] = previas[clave]
+            continue
+        if clave:
+            if clave in primera_linea:
+                repetidas.append((indice, primera_linea[clave]))
+                continue
+            primera_linea[clave] = indice
+
+        codigo, producto_id, cantidad, error = _validar_linea(linea)
+        client_id = linea.get('client_id') if isinstance(linea, dict) else None
+        if error:
+            resultados[indice] = {'client_id': client_id, 'success': False, 'error': error}
+        else:
+            try:
+                client_ts = float(linea.get('client_ts') or 0)
+            except (TypeError, ValueError):
+                client_ts = 0
+            validas.append((client_ts, indice, client_id, codigo, producto_id, cantidad))
+
+    validas.sort(key=lambda linea: (linea[0], linea[1]))
+
+    codigos = {linea[3] for linea in validas if linea[4] is None}
+    ids = {linea[4] for linea in validas if linea[4] is not None}
+    resueltos, existentes = _resolver_productos(codigos, ids)
+
+    asignados = productos_asignados_usuario(usuario)
+
+    # Resolver el producto de cada línea
+    aplicables = []
+    for client_ts, indice, client_id, codigo, producto_id, cantidad in validas:
+        if producto_id is None:
+            producto_id = resueltos.get(codigo)
+            if producto_id is None:
+                resultados[indice] = {'client_id': client_id, 'success': False, 'error': f'Producto no encontrado: {codigo}'}
+                continue
+        elif producto_id not in existentes:
+            resultados[indice] = {'client_id': client_id, 'success': False, 'error': f'Producto con ID {producto_id} no encontrado'}
+            continue
+
+        if asignados and producto_id not in asignados:
+            resultados[indice] = {
+                'client_id': client_id,
+                'success': False,
+                'error': 'Este producto no está asignado a su pareja de conteo'
+            }
+            continue
+
+        aplicables.append((indice, client_id, producto_id, cantidad))
+
+    if not aplicables:
+        return _completar_repetidas(resultados, repetidas)
+
+    incrementos = {}
+    for indice, client_id, producto_id, cantidad in aplicables:
+        incrementos[producto_id] = incrementos.get(producto_id, 0) + cantidad
+
+    with transaction.atomic():
+        items = sumar_cantidades(conteo, usuario, incrementos)
+
+        # Reconstruir la cantidad de cada línea a partir de la cantidad final de su item
+        acumulado = {
+            producto_id: cantidad_nueva - incrementos[producto_id]
+            for producto_id, (item_id, cantidad_nueva, creado) in items.items()
+        }
+        movimientos = []
+        registrados = set()
+        for indice, client_id, producto_id, cantidad in aplicables:
+            item_id, cantidad_nueva, creado = items[producto_id]
+            cantidad_anterior = acumulado[producto_id]
+            acumulado[producto_id] += cantidad
+            # Solo la primera línea de un item recién creado es un 'agregar'
+            es_nuevo = creado and producto_id not in registrados
+            registrados.add(producto_id)
+
+            movimientos.append(MovimientoConteo(
+                conteo=conteo,
+                item_conteo_id=item_id,
+                producto_id=producto_id,
+                usuario=usuario,
+                tipo='agregar' if es_nuevo else 'modificar',
+                cantidad_anterior=cantidad_anterior,
+                cantidad_nueva=acumulado[producto_id],
+                cantidad_cambiada=cantidad,
+            ))
+            resultados[indice] = {
+                'client_id': client_id,
+                'success': True,
+                'producto_id': producto_id,
+                'item_id': item_id,
+                'cantidad': acumulado[producto_id],
+            }
+
+        registrar_movimientos(movimientos)
+        registrar_claves(conteo, {
+            claves[indice]: resultados[indice] for indice, client_id, producto_id, cantidad in aplicables if claves[indice]
+        })
+
+    return _completar_repetidas(resultados, repetidas)
+
+
+def _completar_repetidas(resultados, repetidas):
+    """Las líneas repetidas dentro del lote reciben el resultado de su primera aparición"""
+    for indice, original in repetidas:
+        resultados[indice] = resultados[original]
+    return resultados
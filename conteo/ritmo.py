@@ -0,0 +1,183 @@
+"""
+Ritmo de conteo y tiempo estimado para terminar los conteos en proceso.
+
+Los movimientos (escaneos) de los últimos ``CONTEO_VENTANA_RITMO`` minutos (15
+por defecto) se agrupan por conteo, usuario y minuto con una sola consulta
+sobre el índice de fecha del registro. De ahí salen, por conteo, pareja y
+usuario:
+
+- ``escaneos_por_minuto``: movimientos de agregar y modificar.
+- ``productos_por_minuto``: movimientos de agregar (productos contados por
+  primera vez), que son los que descuentan pendientes.
+
+La tasa es el promedio de la ventana, contada desde el primer minuto con
+movimientos si el conteo empezó después (un conteo que arrancó hace 3 minutos
+no se promedia sobre 15). El tiempo estimado divide los productos pendientes
+(los de ``conteo.estadisticas``: asignados a las parejas y sin contar, o los del
+reconteo) por ``productos_por_minuto``; sin parejas con avance, los pendientes
+son los productos del catálogo sin item. Con escritura diferida también se leen
+los movimientos pendientes de volcar.
+
+``ritmo_conteos`` cachea el resultado ``CONTEO_TIEMPO_CACHE_RITMO`` segundos (5
+por defecto), así que el dashboard puede consultarlo cada pocos segundos.
+"""
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMinute
+from django.utils import timezone
+
+from movimientos.models import MovimientoConteo, MovimientoPendiente
+from movimientos.registro import escritura_diferida
+from productos.models import Producto
+from .estadisticas import completar_pendientes_reconteos, conteos_con_estadisticas
+from .models import Conteo, ConteoProgresoPareja
+
+CLAVE_RITMO = 'conteo:ritmo'
+VENTANA_POR_DEFECTO = 15
+TIEMPO_CACHE_POR_DEFECTO = 5
+
+
+def ventana_ritmo():
+    return getattr(settings, 'CONTEO_VENTANA_RITMO', VENTANA_POR_DEFECTO)
+
+
+def tiempo_cache_ritmo():
+    return getattr(settings, 'CONTEO_TIEMPO_CACHE_RITMO', TIEMPO_CACHE_POR_DEFECTO)
+
+
+def _cubetas(conteos_ids, desde):
+    """
+    Escaneos y productos nuevos desde ``desde`` como
+    {conteo_id: {usuario_id: {minuto: [escaneos, nuevos]}}}.
+    """
+    modelos = [MovimientoConteo, MovimientoPendiente] if escritura_diferida() else [MovimientoConteo]
+    cubetas = {}
+    for modelo in modelos:
+        for fila in modelo.objects.filter(
+            conteo_id__in=conteos_ids, fecha_movimiento__gte=desde, tipo__in=['agregar', 'modificar']
+        ).order_by().values(
+            'conteo_id', 'usuario_id', minuto=TruncMinute('fecha_movimiento', tzinfo=dt_timezone.utc)
+        ).annotate(escaneos=Count('id'), nuevos=Count('id', filter=Q(tipo='agregar'))):
+            cubeta = cubetas.setdefault(fila['conteo_id'], {}).setdefault(fila['usuario_id'], {}).setdefault(fila['minuto'], [0, 0])
+            cubeta[0] += fila['escaneos']
+            cubeta[1] += fila['nuevos']
+    return cubetas
+
+
+def _estimacion(pendientes, productos_por_minuto, ahora):
+    """(minutos, fecha) estimados para contar ``pendientes``; (None, None) sin ritmo"""
+    if not pendientes:
+        return 0, ahora
+    if not productos_por_minuto:
+        return None, None
+    minutos = round(pendientes / productos_por_minuto, 1)
+    return minutos, ahora + timedelta(minutes=minutos)
+
+
+def _tasas(por_minuto, minutos):
+    escaneos = sum(cubeta[0] for cubeta in por_minuto)
+    nuevos = sum(cubeta[1] for cubeta in por_minuto)
+    return round(escaneos / minutos, 2), round(nuevos / minutos, 2)
+
+
+def calcular_ritmo(ahora=None):
+    """Ritmo y tiempo estimado de los conteos en proceso (sin caché)"""
+    ahora = ahora or timezone.now()
+    ventana = ventana_ritmo()
+    # Minutos completos de la ventana más el minuto en curso
+    ultimo_minuto = ahora.astimezone(dt_timezone.utc).replace(second=0, microsecond=0)
+    minutos_ventana = [ultimo_minuto - timedelta(minutes=i) for i in range(ventana - 1, -1, -1)]
+
+    conteos = list(conteos_con_estadisticas(Conteo.objects.filter(estado='en_proceso')).order_by('id'))
+    completar_pendientes_reconteos(conteos)
+    conteos_ids = [conteo.id for conteo in conteos]
+    cubetas = _cubetas(conteos_ids, minutos_ventana[0])
+
+    avance_parejas = {}
+    for conteo_id, pareja_id, asignados, contados in ConteoProgresoPareja.objects.filter(
+        conteo_id__in=conteos_ids
+    ).values_list('conteo_id', 'pareja_id', 'asignados', 'contados'):
+        avance_parejas[(conteo_id, pareja_id)] = asignados - contados
+    conteos_con_avance = {conteo_id for conteo_id, _ in avance_parejas}
+    total_productos = Producto.objects.count() if set(conteos_ids) - conteos_con_avance else 0
+
+    usuarios_ids = {usuario_id for por_usuario in cubetas.values() for usuario_id in por_usuario}
+    nombres = dict(User.objects.filter(id__in=usuarios_ids).values_list('id', 'username'))
+
+    resultado = []
+    for conteo in conteos:
+        por_usuario = cubetas.get(conteo.id, {})
+        todos = [cubeta for por_minuto in por_usuario.values() for cubeta in por_minuto.values()]
+        primer_minuto = min((minuto for por_minuto in por_usuario.values() for minuto in por_minuto), default=None)
+        # Promedio sobre la ventana o desde el primer minuto con movimientos (al menos un minuto)
+        minutos = ventana
+        if primer_minuto is not None:
+            minutos = max(min((ahora - primer_minuto).total_seconds() / 60, ventana), 1)
+        escaneos_por_minuto, productos_por_minuto = _tasas(todos, minutos)
+
+        if conteo.productos_reconteo_ids() is not None or conteo.id in conteos_con_avance:
+            pendientes = conteo.productos_pendientes or 0
+        else:
+            pendientes = max(total_productos - conteo.total_items, 0)
+        eta_minutos, fecha_estimada = _estimacion(pendientes, productos_por_minuto, ahora)
+
+        serie = {}
+        for por_minuto in por_usuario.values():
+            for minuto, (escaneos, _) in por_minuto.items():
+                serie[minuto] = serie.get(minuto, 0) + escaneos
+
+        parejas = []
+        for pareja in conteo.parejas.all():
+            cubetas_pareja = [
+                cubeta
+                for usuario_id in {pareja.usuario_1_id, pareja.usuario_2_id}
+                for cubeta in por_usuario.get(usuario_id, {}).values()
+            ]
+            escaneos_pareja, productos_pareja = _tasas(cubetas_pareja, minutos)
+            pendientes_pareja = avance_parejas.get((conteo.id, pareja.id), 0)
+            eta_pareja, _ = _estimacion(pendientes_pareja, productos_pareja, ahora)
+            parejas.append({
+                'nombre': f'{pareja.usuario_1.username} & {pareja.usuario_2.username}',
+                'color': pareja.color,
+                'escaneos_por_minuto': escaneos_pareja,
+                'productos_por_minuto': productos_pareja,
+                'pendientes': pendientes_pareja,
+                'eta_minutos': eta_pareja,
+            })
+
+        usuarios = []
+        for usuario_id, por_minuto in por_usuario.items():
+            escaneos_usuario, productos_usuario = _tasas(por_minuto.values(), minutos)
+            usuarios.append({
+                'username': nombres.get(usuario_id, ''),
+                'escaneos_por_minuto': escaneos_usuario,
+                'productos_por_minuto': productos_usuario,
+            })
+        usuarios.sort(key=lambda x: (-x['escaneos_por_minuto'], x['username']))
+
+        resultado.append({
+            'conteo': {'id': conteo.id, 'nombre': conteo.nombre, 'numero_conteo': conteo.numero_conteo},
+            'escaneos_por_minuto': escaneos_por_minuto,
+            'productos_por_minuto': productos_por_minuto,
+            'pendientes': pendientes,
+            'eta_minutos': eta_minutos,
+            'fecha_estimada': fecha_estimada,
+            'serie': [serie.get(minuto, 0) for minuto in minutos_ventana],
+            'parejas': parejas,
+            'usuarios': usuarios,
+        })
+
+    return {'generado': ahora, 'ventana_minutos': ventana, 'conteos': resultado}
+
+
+def ritmo_conteos():
+    """Ritmo de los conteos en proceso desde la caché o calculado (y cacheado)"""
+    ritmo = cache.get(CLAVE_RITMO)
+    if ritmo is None:
+        ritmo = calcular_ritmo()
+        cache.set(CLAVE_RITMO, ritmo, tiempo_cache_ritmo())
+    return ritmo
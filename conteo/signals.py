@@ -0,0 +1,92 @@
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from megaInventario.dashboard import DashboardSnapshot
+from movimientos.acumulados import registrar_acumulados
+from movimientos.models import MovimientoConteo
+from movimientos.signals import movimientos_registrados
+from .models import Conteo, ItemConteo
+from .instantaneas import descartar_instantanea
+from .progreso import ProductoParejas, recalcular_progreso, registrar_asignaciones, registrar_progreso
+
+
+@receiver(post_save, sender=Conteo)
+@receiver(post_delete, sender=Conteo)
+@receiver(post_save, sender=ItemConteo)
+@receiver(post_delete, sender=ItemConteo)
+@receiver(post_delete, sender=MovimientoConteo)
+@receiver(movimientos_registrados)
+def invalidar_dashboard(sender, **kwargs):
+    """Invalida la instantánea del dashboard al modificar conteos, items o movimientos"""
+    DashboardSnapshot.invalidar()
+
+
+@receiver(post_save, sender=ItemConteo)
+def item_creado(sender, instance, created, **kwargs):
+    """Suma el item creado al avance de las parejas (las cantidades editadas se registran en la vista)"""
+    if created:
+        registrar_progreso(instance.conteo, {instance.producto_id: (1, instance.cantidad)})
+
+
+@receiver(post_delete, sender=ItemConteo)
+def item_eliminado(sender, instance, origin=None, **kwargs):
+    """Descuenta el item eliminado directamente (no en cascada) del avance de las parejas"""
+    if getattr(origin, 'model', type(origin)) is ItemConteo:
+        registrar_progreso(instance.conteo, {instance.producto_id: (-1, -instance.cantidad)})
+
+
+@receiver(post_save, sender=ItemConteo)
+@receiver(post_delete, sender=ItemConteo)
+def item_modificado(sender, instance, origin=None, **kwargs):
+    """Descarta la instantánea de un conteo finalizado al modificar sus items"""
+    if getattr(origin, 'model', type(origin)) is not Conteo:
+        descartar_instantanea(instance.conteo)
+
+
+@receiver(post_save, sender=MovimientoConteo)
+def movimiento_guardado(sender, instance, created, **kwargs):
+    """Suma a los acumulados los movimientos guardados uno a uno (bulk_create se registra en movimientos.registro)"""
+    if created:
+        registrar_acumulados([instance])
+
+
+@receiver(post_delete, sender=MovimientoConteo)
+def movimiento_eliminado(sender, instance, origin=None, **kwargs):
+    """Resta de los acumulados los movimientos eliminados directamente (en cascada se eliminan sus filas)"""
+    if getattr(origin, 'model', type(origin)) is MovimientoConteo:
+        registrar_acumulados([instance], signo=-1)
+
+
+@receiver(m2m_changed, sender=Conteo.parejas.through)
+def parejas_conteo_modificadas(sender, instance, action, reverse, **kwargs):
+    """Crea o elimina las filas de avance al agregar o quitar parejas de un conteo"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if reverse:
+            recalcular_progreso(parejas_ids=[instance.pk])
+        else:
+            recalcular_progreso(conteos_ids=[instance.pk])
+
+
+@receiver(m2m_changed, sender=ProductoParejas)
+def asignaciones_modificadas(sender, instance, action, reverse, pk_set, **kwargs):
+    """Actualiza el avance de las parejas al asignar o desasignar productos"""
+    if action == 'post_add':
+        registrar_asignaciones(_pares(instance, reverse, pk_set), 1)
+    elif action in ('pre_remove', 'pre_clear'):
+        # Solo se descuentan las asignaciones que existen antes de quitarlas
+        filtro = {'parejaconteo_id': instance.pk} if reverse else {'producto_id': instance.pk}
+        if pk_set is not None:
+            filtro['producto_id__in' if reverse else 'parejaconteo_id__in'] = pk_set
+        instance._asignaciones_quitadas = list(
+            ProductoParejas.objects.filter(**filtro).values_list('parejaconteo_id', 'producto_id')
+        )
+    elif action in ('post_remove', 'post_clear'):
+        registrar_asignaciones(getattr(instance, '_asignaciones_quitadas', []), -1)
+        instance._asignaciones_quitadas = []
+
+
+def _pares(instance, reverse, pk_set):
+    """(pareja_id, producto_id) de los ids del cambio"""
+    if reverse:
+        return [(instance.pk, producto_id) for producto_id in pk_set]
+    return [(pareja_id, instance.pk) for pareja_id in pk_set]
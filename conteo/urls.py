@@ -6,10 +6,16 @@ app_name = 'conteo'
 urlpatterns = [
     path('', views.lista_conteos, name='lista_conteos'),
     path('crear/', views.crear_conteo, name='crear_conteo'),
+    path('ritmo/', views.ritmo_conteos_api, name='ritmo_conteos'),
     path('<int:pk>/', views.detalle_conteo, name='detalle_conteo'),
     path('<int:pk>/finalizar/', views.finalizar_conteo, name='finalizar_conteo'),
+    path('<int:pk>/eventos/', views.eventos_conteo, name='eventos_conteo'),
+    path('<int:pk>/progreso/', views.progreso_conteo_api, name='progreso_conteo'),
+    path('<int:pk>/lista/<str:lista>/', views.lista_conteo, name='lista_conteo'),
     path('<int:conteo_id>/agregar-item/', views.agregar_item, name='agregar_item'),
+    path('<int:conteo_id>/agregar-lote/', views.agregar_items_lote, name='agregar_items_lote'),
     path('buscar-producto/', views.buscar_producto, name='buscar_producto'),
+    path('catalogo/', views.catalogo_productos, name='catalogo_productos'),
     path('item/<int:item_id>/editar/', views.editar_item, name='editar_item'),
     path('item/<int:item_id>/eliminar/', views.eliminar_item, name='eliminar_item'),
     path('comparar/', views.comparar_conteos, name='comparar_conteos'),
@@ -1,24 +1,62 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
 from django.db import transaction
-from django.db.models import Sum, Count, Q
+from django.db.models import Q
+import json
+import time
+
 from .models import Conteo, ItemConteo
+from .archivo import ERROR_CONTEO_ARCHIVADO
+from .registro import LIMITE_LINEAS_LOTE, registrar_lote, sumar_cantidad
+from .idempotencia import LONGITUD_MAXIMA_CLAVE, clave_idempotencia, ejecutar_una_vez
+from .eventos import (
+    INTERVALO_SONDEO_PROGRESO, eventos_desde, eventos_en_vivo, liberar_flujo, reservar_flujo, ultimo_evento,
+)
+from .estadisticas import completar_pendientes_reconteos, conteos_con_estadisticas
+from .progreso import registrar_progreso
+from .instantaneas import cargar_instantaneas, congelar_conteo
+from .discrepancias import actualizar_discrepancias_conteo
+from .ritmo import ritmo_conteos
+from .listas import (
+    LIMITE_LISTA, LISTAS, codificar_cursor, items_conteo, limite_lista, pagina_items, pagina_pendientes,
+    progreso_conteo, usuarios_pareja_ids,
+)
+from .catalogo import COLUMNAS_CATALOGO, productos_catalogo, version_catalogo, catalogo_completo, cambios_catalogo
 from .forms import ConteoForm, ItemConteoForm, CompararConteosForm
 from productos.models import Producto
+from productos.busqueda import buscar_productos, buscar_por_codigo_exacto
 from movimientos.models import MovimientoConteo
+from movimientos.registro import registrar_movimientos, volcar_todos
 from usuarios.models import ParejaConteo
+from usuarios.asignaciones import parejas_activas_usuario, productos_asignados_usuario, version_asignaciones
+
+
+# Campos usados para resolver la búsqueda al agregar un item
+CAMPOS_AGREGAR_ITEM = ('codigo_barras', 'codigo', 'nombre', 'marca', 'descripcion', 'atributo')
+
+# Búsqueda del scanner: resultados por página, tope por página y profundidad máxima
+LIMITE_BUSQUEDA = 20
+LIMITE_MAXIMO_BUSQUEDA = 50
+PROFUNDIDAD_MAXIMA_BUSQUEDA = 500
+CAMPOS_RESULTADO_BUSQUEDA = ('id', 'nombre', 'codigo_barras', 'marca', 'categoria', 'atributo', 'imagen')
+
+# Eventos de progreso: intervalo de consulta, espera máxima del long-poll y duración de cada
+# conexión SSE (el navegador se reconecta solo, enviando Last-Event-ID)
+INTERVALO_EVENTOS = 0.5
+ESPERA_MAXIMA_EVENTOS = 25
+DURACION_FLUJO_EVENTOS = 25
+# Espera antes de reconectar cuando el proceso ya tiene el máximo de flujos abiertos
+REINTENTO_FLUJO_OCUPADO = 15
 
 
 @login_required
 def lista_conteos(request):
     """Lista todos los conteos organizados por número de conteo"""
-    from django.db.models import Sum
-    
     numero_conteo = request.GET.get('numero_conteo', '')
     
-    conteos = Conteo.objects.all().prefetch_related('items', 'parejas')
+    conteos = Conteo.objects.all()
     
     if numero_conteo:
         try:
@@ -26,106 +64,14 @@ def lista_conteos(request):
         except ValueError:
             pass
     
-    # Organizar por número de conteo con estadísticas
-    conteos_por_numero = {}
-    for num in [1, 2, 3]:
-        conteos_num = list(conteos.filter(numero_conteo=num))
-        # Agregar estadísticas a cada conteo
-        for conteo in conteos_num:
-            conteo.total_items = conteo.items.count()
-            conteo.total_cantidad = conteo.items.aggregate(Sum('cantidad'))['cantidad__sum'] or 0
-            
-            # Para conteos en proceso, calcular productos pendientes
-            if conteo.estado == 'en_proceso':
-                # Verificar si el conteo fue creado desde un comparativo
-                productos_ids_conteo = None
-                if conteo.observaciones and 'Productos:' in conteo.observaciones:
-                    try:
-                        productos_str = conteo.observaciones.split('Productos:')[1].strip()
-                        productos_ids_conteo = [int(pid.strip()) for pid in productos_str.split(',') if pid.strip().isdigit()]
-                    except (ValueError, AttributeError):
-                        pass
-                
-                # Obtener productos asignados
-                if productos_ids_conteo:
-                    # Si tiene productos específicos del conteo
-                    productos_asignados = Producto.objects.filter(id__in=productos_ids_conteo)
-                else:
-                    # Obtener productos asignados a las parejas del conteo
-                    parejas_conteo = conteo.parejas.all()
-                    if parejas_conteo.exists():
-                        productos_asignados = Producto.objects.filter(
-                            parejas_asignadas__in=parejas_conteo
-                        ).distinct()
-                    else:
-                        # Si no hay parejas asignadas, no hay productos asignados
-                        productos_asignados = Producto.objects.none()
-                
-                # Obtener productos ya contados en el conteo (por cualquier usuario)
-                productos_contados_ids = set(conteo.items.values_list('producto_id', flat=True))
-                
-                # Si el conteo tiene productos específicos, filtrar solo los items de esos productos
-                if productos_ids_conteo:
-                    productos_contados_ids = productos_contados_ids.intersection(set(productos_ids_conteo))
-                
-                # Calcular productos pendientes
-                if productos_contados_ids:
-                    productos_pendientes = productos_asignados.exclude(id__in=productos_contados_ids)
-                else:
-                    productos_pendientes = productos_asignados
-                
-                conteo.productos_pendientes = productos_pendientes.count()
-            else:
-                conteo.productos_pendientes = None
-        conteos_por_numero[num] = conteos_num
+    # Una sola consulta con las estadísticas anotadas alimenta la vista general y los grupos por número
+    conteos = list(conteos_con_estadisticas(conteos))
+    completar_pendientes_reconteos(conteos)
     
-    # Agregar estadísticas a todos los conteos para la vista general
+    conteos_por_numero = {num: [] for num in [1, 2, 3]}
     for conteo in conteos:
-        conteo.total_items = conteo.items.count()
-        conteo.total_cantidad = conteo.items.aggregate(Sum('cantidad'))['cantidad__sum'] or 0
-        
-        # Para conteos en proceso, calcular productos pendientes
-        if conteo.estado == 'en_proceso':
-            # Verificar si el conteo fue creado desde un comparativo
-            productos_ids_conteo = None
-            if conteo.observaciones and 'Productos:' in conteo.observaciones:
-                try:
-                    productos_str = conteo.observaciones.split('Productos:')[1].strip()
-                    productos_ids_conteo = [int(pid.strip()) for pid in productos_str.split(',') if pid.strip().isdigit()]
-                except (ValueError, AttributeError):
-                    pass
-            
-            # Obtener productos asignados
-            if productos_ids_conteo:
-                # Si tiene productos específicos del conteo
-                productos_asignados = Producto.objects.filter(id__in=productos_ids_conteo)
-            else:
-                # Obtener productos asignados a las parejas del conteo
-                parejas_conteo = conteo.parejas.all()
-                if parejas_conteo.exists():
-                    productos_asignados = Producto.objects.filter(
-                        parejas_asignadas__in=parejas_conteo
-                    ).distinct()
-                else:
-                    # Si no hay parejas asignadas, no hay productos asignados
-                    productos_asignados = Producto.objects.none()
-            
-            # Obtener productos ya contados en el conteo (por cualquier usuario)
-            productos_contados_ids = set(conteo.items.values_list('producto_id', flat=True))
-            
-            # Si el conteo tiene productos específicos, filtrar solo los items de esos productos
-            if productos_ids_conteo:
-                productos_contados_ids = productos_contados_ids.intersection(set(productos_ids_conteo))
-            
-            # Calcular productos pendientes
-            if productos_contados_ids:
-                productos_pendientes = productos_asignados.exclude(id__in=productos_contados_ids)
-            else:
-                productos_pendientes = productos_asignados
-            
-            conteo.productos_pendientes = productos_pendientes.count()
-        else:
-            conteo.productos_pendientes = None
+        if conteo.numero_conteo in conteos_por_numero:
+            conteos_por_numero[conteo.numero_conteo].append(conteo)
     
     return render(request, 'conteo/lista_conteos.html', {
         'conteos': conteos,
@@ -157,166 +103,103 @@ def crear_conteo(request):
 def detalle_conteo(request, pk):
     """Detalle de conteo con scanner"""
     conteo = get_object_or_404(Conteo, pk=pk)
+    # Último evento antes de leer el estado: la página aplica los eventos posteriores
+    evento_inicial = ultimo_evento(conteo.id)
     
     # Obtener parejas del usuario (donde es usuario_1 o usuario_2)
     parejas_usuario = ParejaConteo.objects.filter(
         Q(usuario_1=request.user) | Q(usuario_2=request.user),
         activa=True
-    )
+    ).select_related('usuario_1', 'usuario_2')
     
-    # Obtener todos los usuarios de las parejas del usuario actual
-    usuarios_pareja = set()
-    usuarios_pareja.add(request.user)  # Incluir el usuario actual
-    for pareja in parejas_usuario:
-        usuarios_pareja.add(pareja.usuario_1)
-        usuarios_pareja.add(pareja.usuario_2)
+    # Usuarios de las parejas del usuario actual (incluido él mismo)
+    usuarios_ids = usuarios_pareja_ids(request.user)
     
     # Verificar si el usuario es admin/superuser
     es_admin = request.user.is_superuser or request.user.is_staff
     
-    # Si es admin, puede ver todos los items; si no, solo los de su pareja
-    if es_admin:
-        # Para admin: obtener todos los items del conteo
-        items_todos_qs = conteo.items.all().select_related('producto', 'usuario_conteo')
-        items_pareja_qs = conteo.items.filter(usuario_conteo__in=usuarios_pareja).select_related('producto', 'usuario_conteo')
-        
-        # Obtener IDs de items de la pareja para filtrar
-        items_pareja_ids = set(items_pareja_qs.values_list('id', flat=True))
-        
-        # Items de otros usuarios (no de la pareja)
-        items_otros = [item for item in items_todos_qs if item.id not in items_pareja_ids]
-        
-        items = items_pareja_qs  # Por defecto mostrar solo los de la pareja
-        items_todos = items_todos_qs
-    else:
-        # Para usuario normal: solo items de su pareja
-        items_pareja_qs = conteo.items.filter(usuario_conteo__in=usuarios_pareja).select_related('producto', 'usuario_conteo')
-        items = items_pareja_qs
-        items_todos = None
-        items_otros = []
-    
-    # Verificar si el conteo fue creado desde un comparativo
-    # Si tiene "Productos:" en las observaciones, usar solo esos productos
-    productos_del_conteo = None
-    productos_ids_conteo = None
-    if conteo.observaciones and 'Productos:' in conteo.observaciones:
-        try:
-            productos_str = conteo.observaciones.split('Productos:')[1].strip()
-            productos_ids_conteo = [int(pid.strip()) for pid in productos_str.split(',') if pid.strip().isdigit()]
-            if productos_ids_conteo:
-                productos_del_conteo = Producto.objects.filter(id__in=productos_ids_conteo)
-        except (ValueError, AttributeError):
-            productos_ids_conteo = None
-    
-    # Obtener productos asignados a las parejas del usuario
-    # Si el conteo tiene productos específicos (creado desde comparativo), filtrar solo los asignados a la pareja del usuario
-    if productos_del_conteo is not None:
-        # Si es un reconteo, usar solo los productos del reconteo que están asignados a la pareja del usuario
-        if parejas_usuario.exists():
-            productos_asignados = productos_del_conteo.filter(
-                parejas_asignadas__in=parejas_usuario
-            ).distinct()
-        else:
-            # Si el usuario no tiene parejas, no hay productos asignados
-            productos_asignados = Producto.objects.none()
-        tiene_productos_asignados = productos_asignados.exists()
-    else:
-        # Obtener productos asignados a las parejas del usuario (no todas las parejas del conteo)
-        if parejas_usuario.exists():
-            productos_asignados = Producto.objects.filter(
-                parejas_asignadas__in=parejas_usuario
-            ).distinct()
-            tiene_productos_asignados = productos_asignados.exists()
-        else:
-            # Si no hay parejas del usuario, no hay productos asignados
-            productos_asignados = Producto.objects.none()
-            tiene_productos_asignados = False
-    
-    # Estadísticas (solo de los items contados por la pareja)
-    if es_admin:
-        total_items = items_pareja_qs.count()
-        total_cantidad = items_pareja_qs.aggregate(Sum('cantidad'))['cantidad__sum'] or 0
-        total_items_todos = items_todos.count()
-        total_cantidad_todos = items_todos.aggregate(Sum('cantidad'))['cantidad__sum'] or 0
-    else:
-        total_items = items.count()
-        total_cantidad = items.aggregate(Sum('cantidad'))['cantidad__sum'] or 0
-        total_items_todos = total_items
-        total_cantidad_todos = total_cantidad
-    
-    # Total de productos asignados al usuario (o del conteo si fue creado desde comparativo)
-    total_productos_asignados = productos_asignados.count()
-    
-    # Calcular porcentaje de productos contados
-    # Si el conteo tiene productos específicos, solo contar items de esos productos
-    if productos_del_conteo is not None:
-        # Contar solo items que corresponden a productos del conteo
-        items_del_conteo = items.filter(producto_id__in=productos_ids_conteo)
-        total_items_para_progreso = items_del_conteo.count()
-        porcentaje_contado = (total_items_para_progreso / total_productos_asignados * 100) if total_productos_asignados > 0 else 0
-    else:
-        # Lógica normal: porcentaje basado en items contados vs productos asignados
-        porcentaje_contado = (total_items / total_productos_asignados * 100) if total_productos_asignados > 0 else 0
-    
-    # Obtener IDs de productos ya contados en ESTE conteo (por CUALQUIER usuario)
-    # Esto asegura que si un producto fue contado por cualquier usuario, no aparezca en pendientes
-    productos_contados_ids_todos = set(conteo.items.values_list('producto_id', flat=True))
-    
-    # Si el conteo tiene productos específicos, filtrar solo los items de esos productos
-    if productos_del_conteo is not None:
-        productos_contados_ids_todos = productos_contados_ids_todos.intersection(set(productos_ids_conteo))
+    # Estadísticas con una consulta agregada; los pendientes y los items de otros usuarios
+    # se cargan por JSON desde la página (lista_conteo)
+    progreso = progreso_conteo(conteo, request.user, es_admin=es_admin, usuarios_ids=usuarios_ids)
     
-    # Obtener IDs de productos contados por la pareja (para mostrar en "contados")
-    if es_admin:
-        productos_contados_ids_pareja = set(items_pareja_qs.values_list('producto_id', flat=True))
-    else:
-        productos_contados_ids_pareja = set(items.values_list('producto_id', flat=True))
-    
-    # Si el conteo tiene productos específicos, filtrar solo los items de esos productos
-    if productos_del_conteo is not None:
-        productos_contados_ids_pareja = productos_contados_ids_pareja.intersection(set(productos_ids_conteo))
-    
-    # Separar productos en contados y no contados
-    # Contados: solo los contados por la pareja (para mostrar en la tab de contados)
-    # No contados: productos que NO han sido contados por NINGÚN usuario en el conteo
-    if productos_contados_ids_pareja:
-        productos_contados = productos_asignados.filter(id__in=productos_contados_ids_pareja).order_by('marca', 'nombre')
-    else:
-        productos_contados = productos_asignados.none()
-    
-    # Productos pendientes: excluir TODOS los productos que ya fueron contados en el conteo
-    if productos_contados_ids_todos:
-        productos_no_contados = productos_asignados.exclude(id__in=productos_contados_ids_todos).order_by('marca', 'nombre')
-    else:
-        # Si no hay productos contados en el conteo, todos los productos asignados están pendientes
-        productos_no_contados = productos_asignados.order_by('marca', 'nombre')
+    # Solo la primera página de items de la pareja; el resto se pide con el cursor
+    items = list(items_conteo(conteo, usuarios_ids).select_related('producto')[:LIMITE_LISTA + 1])
+    siguiente_cursor = codificar_cursor([items[LIMITE_LISTA - 1].id]) if len(items) > LIMITE_LISTA else None
+    items = items[:LIMITE_LISTA]
     
     return render(request, 'conteo/detalle_conteo.html', {
         'conteo': conteo,
-        'items': items,  # Items de la pareja por defecto
-        'items_otros': items_otros if es_admin else [],  # Items de otros usuarios para admin
-        'total_items': total_items,
-        'total_cantidad': total_cantidad,
-        'total_items_todos': total_items_todos if es_admin else None,
-        'total_cantidad_todos': total_cantidad_todos if es_admin else None,
-        'total_productos': total_productos_asignados,
-        'porcentaje_contado': porcentaje_contado,
+        'items': items,  # Primera página de items de la pareja
+        'siguiente_cursor': siguiente_cursor,
+        'total_items': progreso['total_items'],
+        'total_cantidad': progreso['total_cantidad'],
+        'total_items_todos': progreso.get('total_items_todos'),
+        'total_cantidad_todos': progreso.get('total_cantidad_todos'),
+        'total_productos': progreso['total_productos'],
+        'total_pendientes': progreso['pendientes'],
+        'porcentaje_contado': progreso['porcentaje_contado'],
         'parejas_usuario': parejas_usuario,
-        'productos_asignados': productos_asignados,
-        'productos_contados': productos_contados,
-        'productos_no_contados': productos_no_contados,
-        'productos_contados_ids': productos_contados_ids_pareja,
-        'productos_contados_ids_todos': productos_contados_ids_todos,
         'es_admin': es_admin,
+        'limite_lista': LIMITE_LISTA,
+        'evento_inicial': evento_inicial,
+        'eventos_en_vivo': eventos_en_vivo(),
+        'intervalo_sondeo': INTERVALO_SONDEO_PROGRESO,
+        'usuarios_pareja_ids': sorted(usuarios_ids),
     })
 
 
+@login_required
+def lista_conteo(request, pk, lista):
+    """
+    API con una página de productos pendientes, items contados por la pareja o
+    items de otros usuarios (solo administradores).
+    
+    Parámetros: ``busqueda``, ``cursor`` (el ``siguiente_cursor`` de la página anterior) y ``limit``.
+    """
+    if lista not in LISTAS:
+        return JsonResponse({'success': False, 'error': 'Lista inválida'}, status=404)
+    conteo = get_object_or_404(Conteo, pk=pk)
+    
+    es_admin = request.user.is_superuser or request.user.is_staff
+    if lista == 'otros' and not es_admin:
+        return JsonResponse({'success': False, 'error': 'No tiene permisos para ver los items de otros usuarios'}, status=403)
+    
+    busqueda = request.GET.get('busqueda', '').strip()
+    cursor = request.GET.get('cursor', '').strip()
+    limite = limite_lista(request.GET.get('limit', LIMITE_LISTA))
+    
+    if lista == 'pendientes':
+        pagina = pagina_pendientes(conteo, request.user, busqueda=busqueda, cursor=cursor, limite=limite)
+    else:
+        pagina = pagina_items(
+            conteo, usuarios_pareja_ids(request.user), otros=(lista == 'otros'),
+            busqueda=busqueda, cursor=cursor, limite=limite
+        )
+    return JsonResponse({'success': True, 'lista': lista, **pagina})
+
+
+@login_required
+def progreso_conteo_api(request, pk):
+    """API con las estadísticas de avance del usuario en el conteo"""
+    conteo = get_object_or_404(Conteo, pk=pk)
+    es_admin = request.user.is_superuser or request.user.is_staff
+    return JsonResponse({'success': True, **progreso_conteo(conteo, request.user, es_admin=es_admin)})
+
+
+@login_required
+def ritmo_conteos_api(request):
+    """API con el ritmo de conteo y el tiempo estimado de los conteos en proceso (cacheado unos segundos)"""
+    return JsonResponse({'success': True, **ritmo_conteos()})
+
+
 @login_required
 def agregar_item(request, conteo_id):
     """Agrega o actualiza un item en el conteo"""
     conteo = get_object_or_404(Conteo, pk=conteo_id)
     
     if request.method == 'POST':
+        if conteo.fecha_archivo:
+            return JsonResponse({'success': False, 'error': ERROR_CONTEO_ARCHIVADO})
         busqueda = request.POST.get('busqueda', '').strip()
         producto_id = request.POST.get('producto_id', '')
         cantidad = int(request.POST.get('cantidad', 0))
@@ -326,30 +209,27 @@ def agregar_item(request, conteo_id):
         if not busqueda and not producto_id:
             return JsonResponse({'success': False, 'error': 'Búsqueda o ID de producto requerido'})
         
+        # Clave de idempotencia del scanner: los reintentos reciben la respuesta original
+        clave = clave_idempotencia(request)
+        if len(clave) > LONGITUD_MAXIMA_CLAVE:
+            return JsonResponse({'success': False, 'error': 'Clave de idempotencia inválida'})
+        
         try:
-            # Obtener parejas del usuario (donde es usuario_1 o usuario_2)
-            parejas_usuario = ParejaConteo.objects.filter(
-                Q(usuario_1=request.user) | Q(usuario_2=request.user),
-                activa=True
-            )
+            # Productos asignados a las parejas activas del usuario (conjuntos de ids cacheados)
+            version = version_asignaciones()
+            parejas_usuario_ids = parejas_activas_usuario(request.user, version)
+            productos_asignados_ids = productos_asignados_usuario(request.user, version)
             
             # Si tiene productos asignados, verificar que esté asignado; si no, permitir cualquier producto
-            if parejas_usuario.exists():
-                productos_asignados = Producto.objects.filter(
-                    parejas_asignadas__in=parejas_usuario
-                ).distinct()
-                tiene_productos_asignados = productos_asignados.exists()
-            else:
-                tiene_productos_asignados = False
+            tiene_productos_asignados = bool(productos_asignados_ids)
             
             # Si se proporciona un ID
             if producto_id:
                 if tiene_productos_asignados:
                     # Si tiene productos asignados, verificar que esté asignado
-                    producto = Producto.objects.filter(
-                        id=producto_id,
-                        parejas_asignadas__in=parejas_usuario
-                    ).first()
+                    producto = None
+                    if producto_id.isdigit() and int(producto_id) in productos_asignados_ids:
+                        producto = Producto.objects.filter(id=producto_id).first()
                     if not producto:
                         return JsonResponse({
                             'success': False,
@@ -367,36 +247,22 @@ def agregar_item(request, conteo_id):
                 # Buscar productos
                 if tiene_productos_asignados:
                     # Si tiene productos asignados, buscar solo esos
-                    productos = productos_asignados
+                    productos = Producto.objects.filter(
+                        parejas_asignadas__in=parejas_usuario_ids
+                    ).distinct()
                 else:
                     # Si no tiene productos asignados, buscar todos
                     productos = Producto.objects.all()
                 
-                # Intentar buscar por ID si es un número
-                try:
-                    busqueda_id = int(busqueda)
-                    producto = productos.filter(
-                        Q(id=busqueda_id) |
-                        Q(codigo_barras__iexact=busqueda) |
-                        Q(codigo_barras__icontains=busqueda) |
-                        Q(codigo__iexact=busqueda) |
-                        Q(codigo__icontains=busqueda) |
-                        Q(nombre__icontains=busqueda) |
-                        Q(marca__icontains=busqueda) |
-                        Q(atributo__icontains=busqueda)
-                    ).first()
-                except ValueError:
-                    producto = productos.filter(
-                        Q(codigo_barras__iexact=busqueda) |
-                        Q(codigo_barras__icontains=busqueda) |
-                        Q(codigo__iexact=busqueda) |
-                        Q(codigo__icontains=busqueda) |
-                        Q(nombre__icontains=busqueda) |
-                        Q(marca__icontains=busqueda) |
-                        Q(descripcion__icontains=busqueda) |
-                        Q(atributo__icontains=busqueda)
-                    ).first()
-                
+                # Camino rápido: el scanner envía el código completo (búsqueda exacta cacheada)
+                producto = buscar_por_codigo_exacto(busqueda)
+                if producto and tiene_productos_asignados and producto.id not in productos_asignados_ids:
+                    producto = None
+
+                # Si no hay coincidencia exacta, buscar con el índice de texto
+                if not producto:
+                    producto = buscar_productos(productos, busqueda, campos=CAMPOS_AGREGAR_ITEM).first()
+
                 if not producto:
                     if tiene_productos_asignados:
                         return JsonResponse({
@@ -409,52 +275,24 @@ def agregar_item(request, conteo_id):
                             'error': f'Producto no encontrado: {busqueda}'
                         })
             
-            with transaction.atomic():
-                cantidad_anterior = 0
-                item, created = ItemConteo.objects.get_or_create(
-                    conteo=conteo,
-                    producto=producto,
-                    defaults={
-                        'cantidad': cantidad,
-                        'usuario_conteo': request.user
-                    }
-                )
-                
-                if not created:
-                    # Si ya existe, sumar la cantidad
-                    cantidad_anterior = item.cantidad
-                    item.cantidad += cantidad
-                    item.usuario_conteo = request.user
-                    item.save()
-                    tipo_movimiento = 'modificar'
-                else:
-                    tipo_movimiento = 'agregar'
-                
-                # Registrar movimiento
-                MovimientoConteo.objects.create(
-                    conteo=conteo,
-                    item_conteo=item,
-                    producto=producto,
-                    usuario=request.user,
-                    tipo=tipo_movimiento,
-                    cantidad_anterior=cantidad_anterior,
-                    cantidad_nueva=item.cantidad,
-                    cantidad_cambiada=cantidad,
-                )
+            def registrar():
+                # Suma atómica (sin leer-modificar-guardar) y registro del movimiento
+                item_id, cantidad_total = sumar_cantidad(conteo, producto, request.user, cantidad)
+                return {
+                    'success': True,
+                    'producto': {
+                        'nombre': producto.nombre,
+                        'codigo_barras': producto.codigo_barras,
+                        'marca': producto.marca or '',
+                        'atributo': producto.atributo or '',
+                        'cantidad': cantidad_total,
+                        'imagen': producto.imagen.url if producto.imagen else None
+                    },
+                    'item_id': item_id,
+                    'mensaje': f'Producto agregado: {producto.nombre} (Total: {cantidad_total})'
+                }
             
-            return JsonResponse({
-                'success': True,
-                'producto': {
-                    'nombre': producto.nombre,
-                    'codigo_barras': producto.codigo_barras,
-                    'marca': producto.marca or '',
-                    'atributo': producto.atributo or '',
-                    'cantidad': item.cantidad,
-                    'imagen': producto.imagen.url if producto.imagen else None
-                },
-                'item_id': item.id,
-                'mensaje': f'Producto agregado: {producto.nombre} (Total: {item.cantidad})'
-            })
+            return JsonResponse(ejecutar_una_vez(conteo, clave, registrar))
             
         except Producto.DoesNotExist:
             return JsonResponse({'success': False, 'error': f'Producto con código {codigo_barras} no encontrado'})
@@ -464,106 +302,230 @@ def agregar_item(request, conteo_id):
     return JsonResponse({'success': False, 'error': 'Método no permitido'})
 
 
+@login_required
+def agregar_items_lote(request, conteo_id):
+    """
+    Agrega muchos escaneos en una sola petición (ráfagas o escaneos encolados sin conexión).
+    
+    Recibe JSON ``{"lineas": [{"barcode" | "producto_id", "cantidad", "client_ts", "client_id"}, ...]}``
+    y retorna un resultado por línea, en el mismo orden.
+    """
+    conteo = get_object_or_404(Conteo, pk=conteo_id)
+    
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'})
+    if conteo.fecha_archivo:
+        return JsonResponse({'success': False, 'error': ERROR_CONTEO_ARCHIVADO})
+    
+    try:
+        datos = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'JSON inválido'}, status=400)
+    
+    lineas = datos.get('lineas') if isinstance(datos, dict) else None
+    if not isinstance(lineas, list) or not lineas:
+        return JsonResponse({'success': False, 'error': 'Se requiere una lista de líneas'}, status=400)
+    if len(lineas) > LIMITE_LINEAS_LOTE:
+        return JsonResponse({
+            'success': False,
+            'error': f'Máximo {LIMITE_LINEAS_LOTE} líneas por petición'
+        }, status=400)
+    
+    resultados = registrar_lote(conteo, request.user, lineas)
+    return JsonResponse({
+        'success': True,
+        'resultados': resultados,
+        'aplicadas': sum(1 for resultado in resultados if resultado['success']),
+    })
+
 @login_required
 def buscar_producto(request):
-    """API para buscar producto por código de barras, nombre, ID o cualquier atributo"""
+    """
+    API para buscar producto por código de barras, nombre, ID o cualquier atributo.
+    
+    Los resultados se ordenan por relevancia y se paginan con ``limit`` y ``cursor``;
+    en lugar del total se indica ``hay_mas`` y el ``siguiente_cursor``.
+    """
     busqueda = request.GET.get('busqueda', '').strip()
     
     if not busqueda:
         return JsonResponse({'success': False, 'error': 'Búsqueda requerida'})
     
-    # Obtener parejas del usuario (donde es usuario_1 o usuario_2)
-    parejas_usuario = ParejaConteo.objects.filter(
-        Q(usuario_1=request.user) | Q(usuario_2=request.user),
-        activa=True
-    )
-    
-    # Si tiene productos asignados, buscar solo esos; si no, buscar todos
-    if parejas_usuario.exists():
-        productos_asignados = Producto.objects.filter(
-            parejas_asignadas__in=parejas_usuario
+    # Si tiene productos asignados, buscar solo esos; si no (o si no tiene parejas), buscar todos
+    version = version_asignaciones()
+    if productos_asignados_usuario(request.user, version):
+        productos = Producto.objects.filter(
+            parejas_asignadas__in=parejas_activas_usuario(request.user, version)
         ).distinct()
-        # Si hay productos asignados, usar solo esos; si no, usar todos
-        if productos_asignados.exists():
-            productos = productos_asignados
-        else:
-            productos = Producto.objects.all()
     else:
-        # Si no tiene parejas, buscar todos los productos
         productos = Producto.objects.all()
     
     # Buscar en todos los campos relevantes: código de barras, código, nombre, marca, descripción, categoría, atributo
-    # Intentar buscar por ID si es un número
+    # (incluye búsqueda por ID si es un número) usando el índice de texto y ordenando por relevancia
+    productos = buscar_productos(productos, busqueda)
+    
+    # Paginación: límite por página (con tope en el servidor) y cursor opaco con el desplazamiento
     try:
-        busqueda_id = int(busqueda)
-        productos = productos.filter(
-            Q(id=busqueda_id) |
-            Q(codigo_barras__icontains=busqueda) |
-            Q(codigo_barras__iexact=busqueda) |
-            Q(codigo__icontains=busqueda) |
-            Q(codigo__iexact=busqueda) |
-            Q(nombre__icontains=busqueda) |
-            Q(marca__icontains=busqueda) |
-            Q(descripcion__icontains=busqueda) |
-            Q(categoria__icontains=busqueda) |
-            Q(atributo__icontains=busqueda)
-        )
+        limite = min(max(int(request.GET.get('limit', LIMITE_BUSQUEDA)), 1), LIMITE_MAXIMO_BUSQUEDA)
     except ValueError:
-        # Si no es un número, buscar por texto en todos los campos
-        productos = productos.filter(
-            Q(codigo_barras__icontains=busqueda) |
-            Q(codigo_barras__iexact=busqueda) |
-            Q(codigo__icontains=busqueda) |
-            Q(codigo__iexact=busqueda) |
-            Q(nombre__icontains=busqueda) |
-            Q(marca__icontains=busqueda) |
-            Q(descripcion__icontains=busqueda) |
-            Q(categoria__icontains=busqueda) |
-            Q(atributo__icontains=busqueda)
-        )
+        limite = LIMITE_BUSQUEDA
+    cursor = request.GET.get('cursor', '').strip()
+    desplazamiento = int(cursor) if cursor.isdigit() else 0
+    desplazamiento = min(desplazamiento, PROFUNDIDAD_MAXIMA_BUSQUEDA)
     
-    # Obtener el total antes de evaluar el queryset
-    total_productos = productos.count()
+    # Solo los campos que necesita el popup del scanner; se pide una fila extra para saber si hay más
+    filas = list(productos.values(*CAMPOS_RESULTADO_BUSQUEDA)[desplazamiento:desplazamiento + limite + 1])
+    hay_mas = len(filas) > limite and desplazamiento + limite < PROFUNDIDAD_MAXIMA_BUSQUEDA
+    resultados = [_serializar_resultado_busqueda(fila) for fila in filas[:limite]]
     
-    if total_productos == 0:
+    if not resultados:
         return JsonResponse({'success': False, 'error': 'No se encontraron productos'})
-    elif total_productos == 1:
-            # Si hay un solo resultado, retornarlo directamente
-            producto = productos.first()
-            return JsonResponse({
-                'success': True,
-                'producto': {
-                    'id': producto.id,
-                    'nombre': producto.nombre,
-                    'codigo_barras': producto.codigo_barras,
-                    'marca': producto.marca or '',
-                    'categoria': producto.categoria or '',
-                    'atributo': producto.atributo or '',
-                    'imagen': producto.imagen.url if producto.imagen else None,
-                },
-                'unico': True
-            })
+    elif len(filas) == 1 and desplazamiento == 0:
+        # Si hay un solo resultado, retornarlo directamente
+        return JsonResponse({
+            'success': True,
+            'producto': resultados[0],
+            'unico': True
+        })
     else:
-        # Si hay múltiples resultados, retornar la lista
-        resultados = []
-        for producto in productos:
-            resultados.append({
-                'id': producto.id,
-                'nombre': producto.nombre,
-                'codigo_barras': producto.codigo_barras,
-                'marca': producto.marca or '',
-                'categoria': producto.categoria or '',
-                'atributo': producto.atributo or '',
-                'imagen': producto.imagen.url if producto.imagen else None,
-            })
+        # Si hay múltiples resultados, retornar la página de resultados
         return JsonResponse({
             'success': True,
             'productos': resultados,
             'unico': False,
-            'total': total_productos
+            'hay_mas': hay_mas,
+            'siguiente_cursor': str(desplazamiento + limite) if hay_mas else None,
         })
 
 
+@login_required
+def catalogo_productos(request):
+    """
+    API con el catálogo compacto de productos asignados al usuario, para que el
+    scanner resuelva los códigos localmente y solo envíe las cantidades.
+    
+    Soporta ETag / If-None-Match y ``desde=<version>`` para recibir solo los cambios.
+    """
+    asignaciones = version_asignaciones()
+    productos, clave = productos_catalogo(request.user, asignaciones)
+    version = version_catalogo(productos, asignaciones)
+    etag = f'"{version}"'
+    
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    
+    desde = request.GET.get('desde', '').strip()
+    cambios = None
+    if desde == version:
+        cambios = {'success': True, 'version': version, 'completo': False, 'columnas': COLUMNAS_CATALOGO, 'productos': []}
+    elif desde:
+        cambios = cambios_catalogo(productos, desde, version)
+    
+    if cambios is not None:
+        response = JsonResponse(cambios)
+    else:
+        # Catálogo completo precalculado por asignación de parejas y versión
+        response = HttpResponse(catalogo_completo(productos, clave, version), content_type='application/json')
+    
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+def eventos_conteo(request, pk):
+    """
+    Eventos de progreso del conteo posteriores al encabezado Last-Event-ID (al reconectar) o a ``desde``.
+    
+    Con ``Accept: text/event-stream`` responde como Server-Sent Events; si no, como
+    long-poll JSON que espera hasta ``espera`` segundos a que haya eventos nuevos.
+    Sin caché compartida (ver ``conteo.eventos``) no hay flujo SSE (204: el navegador
+    no reconecta) y el long-poll no espera.
+    """
+    conteo = get_object_or_404(Conteo, pk=pk)
+    desde = request.headers.get('Last-Event-ID') or request.GET.get('desde') or '0'
+    desde = int(desde) if desde.isdigit() else 0
+    en_vivo = eventos_en_vivo()
+    
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        if not en_vivo:
+            return HttpResponse(status=204)
+        response = StreamingHttpResponse(_flujo_eventos(conteo.id, desde), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    try:
+        espera = min(max(float(request.GET.get('espera', 0)), 0), ESPERA_MAXIMA_EVENTOS)
+    except ValueError:
+        espera = 0
+    reservado = en_vivo and espera > 0 and reservar_flujo()
+    if not reservado:
+        espera = 0
+    try:
+        limite = time.monotonic() + espera
+        while True:
+            eventos = eventos_desde(conteo.id, desde)
+            if eventos is None:
+                return JsonResponse({'success': True, 'reiniciar': True, 'eventos': [], 'ultimo': ultimo_evento(conteo.id)})
+            if eventos or time.monotonic() >= limite:
+                break
+            time.sleep(INTERVALO_EVENTOS)
+    finally:
+        if reservado:
+            liberar_flujo()
+    
+    return JsonResponse({
+        'success': True,
+        'reiniciar': False,
+        'eventos': eventos,
+        'ultimo': eventos[-1]['id'] if eventos else desde,
+    })
+
+
+def _flujo_eventos(conteo_id, desde):
+    """Generador de Server-Sent Events; termina tras DURACION_FLUJO_EVENTOS para liberar el proceso"""
+    if not reservar_flujo():
+        # Proceso ocupado: el navegador reconecta tras la espera indicada
+        yield f'retry: {REINTENTO_FLUJO_OCUPADO * 1000}\n\n'
+        return
+    try:
+        yield f'retry: {int(INTERVALO_EVENTOS * 4000)}\n\n'
+        inicio = ultimo_envio = time.monotonic()
+        while time.monotonic() < inicio + DURACION_FLUJO_EVENTOS:
+            eventos = eventos_desde(conteo_id, desde)
+            if eventos is None:
+                yield f'event: reiniciar\ndata: {json.dumps({"ultimo": ultimo_evento(conteo_id)})}\n\n'
+                return
+            for evento in eventos:
+                desde = evento['id']
+                yield f'id: {desde}\nevent: movimiento\ndata: {json.dumps(evento)}\n\n'
+            if eventos:
+                ultimo_envio = time.monotonic()
+                continue
+            if time.monotonic() - ultimo_envio >= 10:
+                # Comentario para mantener viva la conexión a través de proxies
+                yield ': latido\n\n'
+                ultimo_envio = time.monotonic()
+            time.sleep(INTERVALO_EVENTOS)
+    finally:
+        liberar_flujo()
+
+def _serializar_resultado_busqueda(fila):
+    """Convierte una fila de values() en el diccionario que usa el scanner"""
+    return {
+        'id': fila['id'],
+        'nombre': fila['nombre'],
+        'codigo_barras': fila['codigo_barras'],
+        'marca': fila['marca'] or '',
+        'categoria': fila['categoria'] or '',
+        'atributo': fila['atributo'] or '',
+        'imagen': Producto._meta.get_field('imagen').storage.url(fila['imagen']) if fila['imagen'] else None,
+    }
+
+
 @login_required
 def finalizar_conteo(request, pk):
     """Finaliza un conteo - Solo administradores"""
@@ -574,12 +536,22 @@ def finalizar_conteo(request, pk):
     
     conteo = get_object_or_404(Conteo, pk=pk)
     
+    if conteo.fecha_archivo:
+        messages.error(request, ERROR_CONTEO_ARCHIVADO)
+        return redirect('conteo:lista_conteos')
+    
     if request.method == 'POST':
         from django.utils import timezone
+        # Con escritura diferida, volcar los movimientos pendientes antes de cerrar el conteo
+        volcar_todos(conteo_id=conteo.id)
         conteo.estado = 'finalizado'
         conteo.fecha_fin = timezone.now()
         conteo.usuario_modificador = request.user
-        conteo.save()
+        with transaction.atomic():
+            conteo.save()
+            # Congelar los items: comparativos y comparaciones leen la instantánea
+            congelar_conteo(conteo)
+            actualizar_discrepancias_conteo(conteo)
         messages.success(request, 'Conteo finalizado exitosamente.')
         return redirect('conteo:lista_conteos')
     
@@ -597,43 +569,56 @@ def editar_item(request, item_id):
     conteo_id = item.conteo.id
     conteo = item.conteo
     producto = item.producto
-    cantidad_anterior = item.cantidad
     
     if request.method == 'POST':
+        if conteo.fecha_archivo:
+            return JsonResponse({'success': False, 'error': ERROR_CONTEO_ARCHIVADO})
         try:
             nueva_cantidad = int(request.POST.get('cantidad', 0))
             if nueva_cantidad < 0:
                 return JsonResponse({'success': False, 'error': 'La cantidad no puede ser negativa'})
             
-            with transaction.atomic():
-                # Actualizar cantidad
-                item.cantidad = nueva_cantidad
-                item.usuario_conteo = request.user
-                item.save()
-                
-                # Registrar movimiento
-                MovimientoConteo.objects.create(
-                    conteo=conteo,
-                    item_conteo=item,
-                    producto=producto,
-                    usuario=request.user,
-                    tipo='modificar',
-                    cantidad_anterior=cantidad_anterior,
-                    cantidad_nueva=nueva_cantidad,
-                    cantidad_cambiada=nueva_cantidad - cantidad_anterior
-                )
+            clave = clave_idempotencia(request)
+            if len(clave) > LONGITUD_MAXIMA_CLAVE:
+                return JsonResponse({'success': False, 'error': 'Clave de idempotencia inválida'})
             
-            return JsonResponse({
-                'success': True,
-                'mensaje': f'Cantidad actualizada: {nueva_cantidad}',
-                'cantidad': nueva_cantidad,
-                'producto': {
-                    'nombre': producto.nombre,
-                    'codigo_barras': producto.codigo_barras,
-                    'marca': producto.marca or '',
-                    'atributo': producto.atributo or '',
+            def registrar():
+                with transaction.atomic():
+                    # Releer el item bloqueado: un escaneo concurrente pudo cambiar la cantidad
+                    item_bloqueado = ItemConteo.objects.select_for_update().get(pk=item.pk)
+                    cantidad_anterior = item_bloqueado.cantidad
+                    
+                    # Actualizar cantidad
+                    item_bloqueado.cantidad = nueva_cantidad
+                    item_bloqueado.usuario_conteo = request.user
+                    item_bloqueado.save()
+                    registrar_progreso(conteo, {producto.id: (0, nueva_cantidad - cantidad_anterior)})
+                    
+                    # Registrar movimiento
+                    registrar_movimientos([MovimientoConteo(
+                        conteo=conteo,
+                        item_conteo=item_bloqueado,
+                        producto=producto,
+                        usuario=request.user,
+                        tipo='modificar',
+                        cantidad_anterior=cantidad_anterior,
+                        cantidad_nueva=nueva_cantidad,
+                        cantidad_cambiada=nueva_cantidad - cantidad_anterior
+                    )])
+                
+                return {
+                    'success': True,
+                    'mensaje': f'Cantidad actualizada: {nueva_cantidad}',
+                    'cantidad': nueva_cantidad,
+                    'producto': {
+                        'nombre': producto.nombre,
+                        'codigo_barras': producto.codigo_barras,
+                        'marca': producto.marca or '',
+                        'atributo': producto.atributo or '',
+                    }
                 }
-            })
+            
+            return JsonResponse(ejecutar_una_vez(conteo, clave, registrar))
         except ValueError:
             return JsonResponse({'success': False, 'error': 'Cantidad inválida'})
         except Exception as e:
@@ -667,7 +652,7 @@ def eliminar_item(request, item_id):
     if request.method == 'POST':
         with transaction.atomic():
             # Registrar movimiento antes de eliminar
-            MovimientoConteo.objects.create(
+            registrar_movimientos([MovimientoConteo(
                 conteo=conteo,
                 item_conteo=None,  # Item será eliminado
                 producto=producto,
@@ -676,7 +661,7 @@ def eliminar_item(request, item_id):
                 cantidad_anterior=cantidad_eliminada,
                 cantidad_nueva=0,
                 cantidad_cambiada=-cantidad_eliminada
-            )
+            )])
             item.delete()
         messages.success(request, 'Item eliminado exitosamente.')
         return redirect('conteo:detalle_conteo', pk=conteo_id)
@@ -716,6 +701,13 @@ def detalle_comparacion(request, conteos_ids):
     # Obtener todos los productos
     productos = Producto.objects.all().order_by('marca', 'nombre')
     
+    # Items de cada conteo desde su instantánea (una consulta para todos)
+    instantaneas = cargar_instantaneas([conteo.id for conteo in conteos])
+    cantidades_conteos = {
+        conteo_id: dict(zip(arreglo[:, 0].tolist(), arreglo[:, 1].tolist()))
+        for conteo_id, arreglo in instantaneas.items()
+    }
+    
     # Crear diccionario con cantidades por producto por conteo
     comparacion_data = []
     for producto in productos:
@@ -732,8 +724,7 @@ def detalle_comparacion(request, conteos_ids):
         cantidades = []
         cantidades_por_conteo = []
         for conteo in conteos:
-            item = ItemConteo.objects.filter(conteo=conteo, producto=producto).first()
-            cantidad = item.cantidad if item else 0
+            cantidad = cantidades_conteos[conteo.id].get(producto.id, 0)
             cantidades_por_conteo.append((conteo.id, cantidad))
             cantidades.append(cantidad)
         
@@ -761,16 +752,15 @@ def detalle_comparacion(request, conteos_ids):
         
         comparacion_data.append(producto_data)
     
-    # Estadísticas generales
-    productos_con_diferencias = sum(1 for p in comparacion_data if any(d != 0 for d in p['diferencias'].values()))
+    # Estadísticas generales (las diferencias guardadas son siempre distintas de 0)
+    productos_con_diferencias = sum(1 for p in comparacion_data if p['diferencias'])
     
     total_items_por_conteo = {}
     for conteo in conteos:
-        total_items = ItemConteo.objects.filter(conteo=conteo).count()
-        total_cantidad = ItemConteo.objects.filter(conteo=conteo).aggregate(Sum('cantidad'))['cantidad__sum'] or 0
+        arreglo = instantaneas[conteo.id]
         total_items_por_conteo[conteo.id] = {
-            'items': total_items,
-            'cantidad': total_cantidad,
+            'items': len(arreglo),
+            'cantidad': int(arreglo[:, 1].sum()),
         }
     
     estadisticas = {
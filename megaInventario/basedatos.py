@@ -0,0 +1,73 @@
+"""
+Configuración de la base de datos desde variables de entorno.
+
+Sin variables se usa SQLite (``db.sqlite3`` en la raíz del proyecto), como en
+desarrollo. Con ``DB_ENGINE=postgresql`` se usa PostgreSQL, que permite que
+las parejas escaneen en paralelo (SQLite tiene un único bloqueo de escritura
+para toda la base):
+
+- ``DB_NAME``, ``DB_USER``, ``DB_PASSWORD``, ``DB_HOST``, ``DB_PORT``: conexión.
+- ``DB_CONN_MAX_AGE``: segundos que se reutiliza cada conexión (60 por
+  defecto; 0 cierra la conexión al final de cada request).
+- ``DB_CONN_HEALTH_CHECKS``: verifica la conexión reutilizada antes de cada
+  request (activado por defecto), para no fallar con conexiones cortadas.
+- ``DB_POOLER``: la conexión pasa por un pool en modo transacción (PgBouncer):
+  desactiva los cursores del lado del servidor, que no sobreviven a un cambio
+  de conexión entre transacciones.
+- ``DB_SSLMODE``, ``DB_CONNECT_TIMEOUT``: opciones de libpq.
+- ``DB_TEST_NAME``: base de datos del runner de pruebas de Django.
+
+Con PostgreSQL hace falta ``psycopg2`` (o ``psycopg``). Los índices de búsqueda
+(migraciones ``productos.0008`` y ``movimientos.0004``) se crean solo si el
+servidor tiene la extensión ``pg_trgm``.
+"""
+import os
+
+MOTORES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+}
+
+CONN_MAX_AGE_POR_DEFECTO = 60
+CONNECT_TIMEOUT_POR_DEFECTO = 10
+
+
+def _booleano(valor, por_defecto):
+    if valor is None or valor == '':
+        return por_defecto
+    return valor.strip().lower() in ('1', 'true', 'si', 'sí', 'yes', 'on')
+
+
+def configuracion_base_datos(base_dir, entorno=None):
+    """Configuración de la base de datos ``default`` según las variables de ``entorno``"""
+    entorno = os.environ if entorno is None else entorno
+    motor = entorno.get('DB_ENGINE', 'sqlite').strip().lower()
+    if motor not in MOTORES:
+        raise ValueError(f'DB_ENGINE debe ser uno de: {", ".join(MOTORES)} (no {motor!r})')
+
+    if motor == 'sqlite':
+        return {
+            'ENGINE': MOTORES[motor],
+            'NAME': entorno.get('DB_NAME') or base_dir / 'db.sqlite3',
+        }
+
+    configuracion = {
+        'ENGINE': MOTORES[motor],
+        'NAME': entorno.get('DB_NAME', 'megainventario'),
+        'USER': entorno.get('DB_USER', ''),
+        'PASSWORD': entorno.get('DB_PASSWORD', ''),
+        'HOST': entorno.get('DB_HOST', 'localhost'),
+        'PORT': entorno.get('DB_PORT', ''),
+        'CONN_MAX_AGE': int(entorno.get('DB_CONN_MAX_AGE', CONN_MAX_AGE_POR_DEFECTO)),
+        'CONN_HEALTH_CHECKS': _booleano(entorno.get('DB_CONN_HEALTH_CHECKS'), True),
+        'DISABLE_SERVER_SIDE_CURSORS': _booleano(entorno.get('DB_POOLER'), False),
+        'OPTIONS': {
+            'connect_timeout': int(entorno.get('DB_CONNECT_TIMEOUT', CONNECT_TIMEOUT_POR_DEFECTO)),
+            'application_name': 'megaInventario',
+        },
+    }
+    if entorno.get('DB_SSLMODE'):
+        configuracion['OPTIONS']['sslmode'] = entorno['DB_SSLMODE']
+    if entorno.get('DB_TEST_NAME'):
+        configuracion['TEST'] = {'NAME': entorno['DB_TEST_NAME']}
+    return configuracion
@@ -0,0 +1,409 @@
+"""
+Instantánea de las estadísticas del dashboard.
+
+``DashboardSnapshot.obtener()`` calcula todos los datos del dashboard con unas
+pocas consultas agrupadas y los guarda en la caché durante
+``DASHBOARD_TIEMPO_CACHE`` segundos (30 por defecto). La instantánea se
+invalida al confirmarse cambios en conteos, items o movimientos (ver
+``conteo.signals``), de modo que el tiempo de caché solo acota lo que puede
+tardar en reflejarse un cambio hecho sin señales (por ejemplo desde la shell).
+
+Los aciertos y fallos de la caché se cuentan en la propia caché y se muestran
+en el dashboard a los administradores (``DashboardSnapshot.estadisticas_cache``).
+Con varios procesos los contadores y la instantánea solo se comparten si
+``CACHES`` usa un backend compartido.
+
+Los conteos archivados (``conteo.archivo``) ya no tienen items ni movimientos en
+las tablas activas: el total de movimientos sale de ``AcumuladoMovimientos`` y
+los productos más contados y el stock suman las instantáneas archivadas.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+import numpy as np
+
+from conteo.instantaneas import desempaquetar, stocks_actuales
+from conteo.models import Conteo, ConteoInstantanea, ConteoProgresoPareja, ItemConteo
+from movimientos.models import AcumuladoMovimientos, MovimientoConteo
+from productos.models import Producto
+from usuarios.models import ParejaConteo
+
+CLAVE_SNAPSHOT = 'dashboard:snapshot'
+CLAVE_ACIERTOS = 'dashboard:cache:aciertos'
+CLAVE_FALLOS = 'dashboard:cache:fallos'
+TIEMPO_CACHE_POR_DEFECTO = 30
+
+# Productos revisados para la alerta de stock en 0
+PRODUCTOS_ALERTA_STOCK = 10
+# Productos mostrados entre los más contados
+TOP_PRODUCTOS = 5
+# Las cantidades archivadas solo cambian al archivar o eliminar conteos (y entonces cambia su clave)
+TIEMPO_CACHE_ARCHIVADOS = 60 * 60 * 24
+
+
+def _contar_varios(consultas):
+    """Cuenta varios querysets con una sola consulta (una subconsulta COUNT por queryset)"""
+    partes, parametros = [], []
+    for queryset in consultas.values():
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        partes.append(f'(SELECT COUNT(*) FROM ({sql}) _conteo)')
+        parametros.extend(params)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(partes), parametros)
+        return dict(zip(consultas, cursor.fetchone()))
+
+
+def _incrementar(clave):
+    cache.add(clave, 0, None)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, 1, None)
+
+
+class DashboardSnapshot:
+    """Estadísticas del dashboard calculadas con consultas agrupadas y cacheadas"""
+
+    @staticmethod
+    def tiempo_cache():
+        return getattr(settings, 'DASHBOARD_TIEMPO_CACHE', TIEMPO_CACHE_POR_DEFECTO)
+
+    @classmethod
+    def obtener(cls):
+        """Datos del dashboard desde la caché o calculados (y cacheados)"""
+        datos = cache.get(CLAVE_SNAPSHOT)
+        if datos is not None:
+            _incrementar(CLAVE_ACIERTOS)
+            return datos
+        _incrementar(CLAVE_FALLOS)
+        datos = cls.calcular()
+        cache.set(CLAVE_SNAPSHOT, datos, cls.tiempo_cache())
+        return datos
+
+    @staticmethod
+    def invalidar():
+        """Descarta la instantánea al confirmarse la transacción actual"""
+        transaction.on_commit(lambda: cache.delete(CLAVE_SNAPSHOT))
+
+    @staticmethod
+    def estadisticas_cache():
+        """Aciertos, fallos y tasa de aciertos (%) de la caché del dashboard"""
+        aciertos = cache.get(CLAVE_ACIERTOS, 0)
+        fallos = cache.get(CLAVE_FALLOS, 0)
+        total = aciertos + fallos
+        return {
+            'aciertos': aciertos,
+            'fallos': fallos,
+            'tasa_aciertos': round(aciertos / total * 100, 1) if total else 0,
+        }
+
+    @classmethod
+    def calcular(cls):
+        """Calcula todos los datos del dashboard (sin caché)"""
+        ahora = timezone.now()
+        hace_24_horas = ahora - timedelta(hours=24)
+
+        totales = _contar_varios({
+            'total_productos': Producto.objects.all(),
+            'total_usuarios': User.objects.filter(is_active=True),
+            'total_parejas': ParejaConteo.objects.filter(activa=True),
+            'conteos_sin_parejas': Conteo.objects.filter(
+                estado='en_proceso', parejas__isnull=True
+            ).exclude(usuario_1__isnull=True, usuario_2__isnull=True).distinct(),
+            # Rango del índice (estado, fecha_modificacion)
+            'conteos_sin_actividad': Conteo.objects.filter(
+                estado='en_proceso', fecha_modificacion__lt=hace_24_horas
+            ),
+        })
+
+        datos = {
+            **cls._estadisticas_conteos(),
+            'total_productos': totales['total_productos'],
+            # Incluye los movimientos de los conteos archivados
+            'total_movimientos': AcumuladoMovimientos.objects.aggregate(total=Sum('total'))['total'] or 0,
+            'total_usuarios': totales['total_usuarios'],
+            'total_parejas': totales['total_parejas'],
+            'progreso_conteos': cls._progreso_conteos(totales['total_productos']),
+            'actividades': cls._actividades(hace_24_horas),
+            'top_productos': cls._top_productos(),
+            # Top usuarios más activos (últimas 24 horas)
+            'top_usuarios': list(
+                MovimientoConteo.objects.filter(
+                    fecha_movimiento__gte=hace_24_horas
+                ).values('usuario__username').annotate(
+                    total_movimientos=Count('id')
+                ).order_by('-total_movimientos')[:5]
+            ),
+            'generado': ahora,
+        }
+        datos['alertas'] = cls._alertas(totales['conteos_sin_actividad'], totales['conteos_sin_parejas'])
+        return datos
+
+    @staticmethod
+    def _estadisticas_conteos():
+        """Totales por estado y número de conteo con una consulta agrupada"""
+        conteos_por_numero = {num: {'total': 0, 'en_proceso': 0, 'finalizados': 0} for num in [1, 2, 3]}
+        resumen = {'total_conteos': 0, 'conteos_en_proceso': 0, 'conteos_finalizados': 0}
+
+        filas = Conteo.objects.order_by().values('numero_conteo', 'estado').annotate(total=Count('id'))
+        for fila in filas:
+            resumen['total_conteos'] += fila['total']
+            por_numero = conteos_por_numero.get(fila['numero_conteo'])
+            if por_numero is not None:
+                por_numero['total'] += fila['total']
+            if fila['estado'] == 'en_proceso':
+                resumen['conteos_en_proceso'] += fila['total']
+                if por_numero is not None:
+                    por_numero['en_proceso'] += fila['total']
+            elif fila['estado'] == 'finalizado':
+                resumen['conteos_finalizados'] += fila['total']
+                if por_numero is not None:
+                    por_numero['finalizados'] += fila['total']
+
+        resumen['conteos_por_numero'] = conteos_por_numero
+        return resumen
+
+    @staticmethod
+    def _progreso_conteos(total_productos_sistema):
+        """Avance de los conteos en proceso, ordenado por porcentaje descendente"""
+        conteos = list(
+            Conteo.objects.filter(estado='en_proceso').order_by().annotate(
+                items_contados=Count('items'),
+                items_con_cantidad=Count('items', filter=Q(items__cantidad__gt=0)),
+                total_cantidad=Sum('items__cantidad'),
+            ).only('id', 'nombre', 'numero_conteo', 'observaciones')
+        )
+
+        # Los reconteos solo avanzan con sus productos: una consulta para todos
+        reconteos = {}
+        for conteo in conteos:
+            productos_ids = conteo.productos_reconteo_ids()
+            if productos_ids is not None:
+                reconteos[conteo.id] = {'productos': set(productos_ids), 'contados': 0, 'con_cantidad': 0}
+        if reconteos:
+            for conteo_id, producto_id, cantidad in ItemConteo.objects.filter(
+                conteo_id__in=list(reconteos)
+            ).order_by().values_list('conteo_id', 'producto_id', 'cantidad'):
+                reconteo = reconteos[conteo_id]
+                if producto_id in reconteo['productos']:
+                    reconteo['contados'] += 1
+                    reconteo['con_cantidad'] += cantidad > 0
+
+        # Avance de cada pareja: una fila por (conteo, pareja) de la tabla de avance
+        parejas = {}
+        for fila in ConteoProgresoPareja.objects.filter(conteo_id__in=[conteo.id for conteo in conteos]).values(
+            'conteo_id', 'pareja__usuario_1__username', 'pareja__usuario_2__username', 'pareja__color',
+            'asignados', 'contados', 'cantidad_total', 'ultima_actividad',
+        ).order_by('pareja__usuario_1__username', 'pareja__usuario_2__username'):
+            parejas.setdefault(fila['conteo_id'], []).append({
+                'nombre': f"{fila['pareja__usuario_1__username']} & {fila['pareja__usuario_2__username']}",
+                'color': fila['pareja__color'],
+                'asignados': fila['asignados'],
+                'contados': fila['contados'],
+                'cantidad_total': fila['cantidad_total'],
+                'porcentaje': round(fila['contados'] / fila['asignados'] * 100, 1) if fila['asignados'] else 0,
+                'ultima_actividad': fila['ultima_actividad'],
+            })
+
+        progreso = []
+        for conteo in conteos:
+            reconteo = reconteos.get(conteo.id)
+            if reconteo is not None:
+                total_productos_conteo = len(reconteo['productos'])
+                items_contados = reconteo['contados']
+                items_con_cantidad = reconteo['con_cantidad']
+            else:
+                total_productos_conteo = total_productos_sistema
+                items_contados = conteo.items_contados
+                items_con_cantidad = conteo.items_con_cantidad
+            porcentaje = (items_contados / total_productos_conteo * 100) if total_productos_conteo > 0 else 0
+            progreso.append({
+                'conteo': {'id': conteo.id, 'nombre': conteo.nombre, 'numero_conteo': conteo.numero_conteo},
+                'items_contados': items_contados,
+                'total_productos_sistema': total_productos_conteo,
+                'items_con_cantidad': items_con_cantidad,
+                'items_con_cero': items_contados - items_con_cantidad,
+                'porcentaje': round(porcentaje, 1),
+                'total_cantidad': conteo.total_cantidad or 0,
+                'parejas': parejas.get(conteo.id, []),
+            })
+
+        progreso.sort(key=lambda x: x['porcentaje'], reverse=True)
+        return progreso
+
+    @staticmethod
+    def _contados_archivados():
+        """
+        (producto_ids, total_contado, veces_contado) de los conteos archivados, cuyos items
+        solo están en la instantánea. Esas instantáneas no cambian: el resultado se cachea
+        por conjunto de conteos archivados y solo se desempaquetan al archivar o eliminar uno.
+        """
+        archivadas = ConteoInstantanea.objects.filter(conteo__fecha_archivo__isnull=False)
+        resumen = archivadas.aggregate(total=Count('conteo_id'), suma=Sum('conteo_id'), ultimo=Max('conteo_id'))
+        if not resumen['total']:
+            return None
+        clave = f"dashboard:archivados:{resumen['total']}:{resumen['suma']}:{resumen['ultimo']}"
+        contados = cache.get(clave)
+        if contados is None:
+            todos = np.concatenate([
+                desempaquetar(datos) for datos in archivadas.values_list('datos', flat=True).iterator()
+            ])
+            productos, posiciones = np.unique(todos[:, 0], return_inverse=True)
+            totales = np.zeros(len(productos), dtype=todos.dtype)
+            np.add.at(totales, posiciones, todos[:, 1])
+            contados = (productos, totales, np.bincount(posiciones, minlength=len(productos)))
+            cache.set(clave, contados, TIEMPO_CACHE_ARCHIVADOS)
+        return contados
+
+    @classmethod
+    def _top_productos(cls):
+        """Productos más contados: items de los conteos activos más los de las instantáneas archivadas"""
+        columnas = ('producto__nombre', 'producto__codigo_barras', 'producto__atributo')
+        items = ItemConteo.objects.order_by()
+        archivados = cls._contados_archivados()
+        if archivados is None:
+            return list(
+                items.values(*columnas).annotate(
+                    total_contado=Sum('cantidad'), veces_contado=Count('id')
+                ).order_by('-total_contado')[:TOP_PRODUCTOS]
+            )
+
+        activos = np.array(
+            list(items.values('producto_id').annotate(
+                total_contado=Sum('cantidad'), veces_contado=Count('id')
+            ).values_list('producto_id', 'total_contado', 'veces_contado')),
+            dtype=np.int64,
+        ).reshape(-1, 3)
+        productos, posiciones = np.unique(np.concatenate((activos[:, 0], archivados[0])), return_inverse=True)
+        totales = np.zeros(len(productos), dtype=np.int64)
+        veces = np.zeros(len(productos), dtype=np.int64)
+        np.add.at(totales, posiciones, np.concatenate((activos[:, 1], archivados[1])))
+        np.add.at(veces, posiciones, np.concatenate((activos[:, 2], archivados[2])))
+
+        # Orden estable: a igual total, el de menor id primero
+        primeros = np.argsort(-totales, kind='stable')[:TOP_PRODUCTOS]
+        datos = {
+            fila['id']: fila
+            for fila in Producto.objects.filter(id__in=productos[primeros].tolist()).values('id', 'nombre', 'codigo_barras', 'atributo')
+        }
+        top = []
+        for posicion in primeros.tolist():
+            producto = datos.get(int(productos[posicion]))
+            if producto is None:
+                continue
+            top.append({
+                'producto__nombre': producto['nombre'],
+                'producto__codigo_barras': producto['codigo_barras'],
+                'producto__atributo': producto['atributo'],
+                'total_contado': int(totales[posicion]),
+                'veces_contado': int(veces[posicion]),
+            })
+        return top
+
+    @staticmethod
+    def _productos_sin_stock():
+        """
+        Cuántos de los primeros productos tienen stock 0 (igual que ``Producto.get_stock_actual``:
+        la cantidad del último conteo finalizado que los incluye, también si está archivado).
+        Ver ``conteo.instantaneas.stocks_actuales`` (DISTINCT ON donde está disponible).
+        """
+        productos_ids = list(Producto.objects.values_list('id', flat=True)[:PRODUCTOS_ALERTA_STOCK])
+        stocks = stocks_actuales(productos_ids)
+        return sum(1 for producto_id in productos_ids if not stocks.get(producto_id))
+
+    @classmethod
+    def _alertas(cls, conteos_sin_actividad, conteos_sin_parejas):
+        alertas = []
+
+        # Conteos en proceso sin actividad reciente (más de 24 horas)
+        if conteos_sin_actividad:
+            alertas.append({
+                'tipo': 'warning',
+                'icono': 'clock-history',
+                'titulo': 'Conteos sin actividad reciente',
+                'mensaje': f'{conteos_sin_actividad} conteo(s) en proceso sin actividad en las últimas 24 horas',
+                'link': '/conteo/',
+                'link_texto': 'Ver conteos'
+            })
+
+        # Productos sin stock (calculado desde conteos)
+        productos_sin_stock = cls._productos_sin_stock()
+        if productos_sin_stock:
+            alertas.append({
+                'tipo': 'danger',
+                'icono': 'exclamation-triangle',
+                'titulo': 'Productos sin stock',
+                'mensaje': f'{productos_sin_stock} producto(s) tienen stock en 0',
+                'link': '/productos/?stock=0',
+                'link_texto': 'Ver productos'
+            })
+
+        # Conteos sin parejas asignadas
+        if conteos_sin_parejas:
+            alertas.append({
+                'tipo': 'info',
+                'icono': 'people',
+                'titulo': 'Conteos sin parejas asignadas',
+                'mensaje': f'{conteos_sin_parejas} conteo(s) en proceso no tienen parejas asignadas',
+                'link': '/conteo/',
+                'link_texto': 'Ver conteos'
+            })
+        return alertas
+
+    @staticmethod
+    def _actividades(hace_24_horas):
+        """Las 10 actividades más recientes (conteos creados, finalizados y movimientos importantes)"""
+        actividades = []
+
+        # Conteos creados recientemente
+        for conteo in Conteo.objects.filter(
+            fecha_creacion__gte=hace_24_horas
+        ).select_related('usuario_creador').order_by('-fecha_creacion')[:5]:
+            actividades.append({
+                'tipo': 'conteo_creado',
+                'icono': 'plus-circle',
+                'color': 'success',
+                'mensaje': f'Conteo "{conteo.nombre}" creado por {conteo.usuario_creador.username if conteo.usuario_creador else "Sistema"}',
+                'fecha': conteo.fecha_creacion,
+                'link': f'/conteo/{conteo.id}/'
+            })
+
+        # Conteos finalizados recientemente
+        for conteo in Conteo.objects.filter(
+            estado='finalizado',
+            fecha_fin__gte=hace_24_horas
+        ).select_related('usuario_modificador').order_by('-fecha_fin')[:5]:
+            actividades.append({
+                'tipo': 'conteo_finalizado',
+                'icono': 'check-circle',
+                'color': 'primary',
+                'mensaje': f'Conteo "{conteo.nombre}" finalizado por {conteo.usuario_modificador.username if conteo.usuario_modificador else "Sistema"}',
+                'fecha': conteo.fecha_fin,
+                'link': f'/conteo/{conteo.id}/'
+            })
+
+        # Movimientos importantes (agregar/eliminar)
+        for movimiento in MovimientoConteo.objects.filter(
+            fecha_movimiento__gte=hace_24_horas,
+            tipo__in=['agregar', 'eliminar']
+        ).values(
+            'tipo', 'fecha_movimiento', 'conteo_id', 'conteo__nombre', 'producto__nombre', 'usuario__username'
+        ).order_by('-fecha_movimiento')[:5]:
+            tipo_texto = 'agregado' if movimiento['tipo'] == 'agregar' else 'eliminado'
+            actividades.append({
+                'tipo': 'movimiento',
+                'icono': 'activity',
+                'color': 'info',
+                'mensaje': f'Producto "{movimiento["producto__nombre"]}" {tipo_texto} en conteo "{movimiento["conteo__nombre"]}" por {movimiento["usuario__username"]}',
+                'fecha': movimiento['fecha_movimiento'],
+                'link': f'/movimientos/conteo/{movimiento["conteo_id"]}/'
+            })
+
+        # Ordenar actividades por fecha
+        actividades.sort(key=lambda x: x['fecha'], reverse=True)
+        return actividades[:10]
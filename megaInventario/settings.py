@@ -5,6 +5,8 @@ Django settings for megaInventario project.
 from pathlib import Path
 import os
 
+from .basedatos import configuracion_base_datos
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -75,11 +77,10 @@ WSGI_APPLICATION = 'megaInventario.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLite por defecto; DB_ENGINE=postgresql y las variables DB_* configuran PostgreSQL
+# con conexiones persistentes (ver megaInventario/basedatos.py)
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': configuracion_base_datos(BASE_DIR),
 }
 
 
@@ -133,6 +134,32 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+# Movimientos de conteo: con escritura diferida se registran en una tabla de pendientes
+# y se vuelcan en bloque con scripts/volcar_movimientos_pendientes.py
+MOVIMIENTOS_ESCRITURA_DIFERIDA = False
+
+# Segundos que se cachea la instantánea del dashboard (se invalida también al modificar conteos)
+DASHBOARD_TIEMPO_CACHE = 30
+
+# Ritmo de conteo del dashboard: minutos de movimientos promediados y segundos de caché
+# (el dashboard lo consulta cada CONTEO_TIEMPO_CACHE_RITMO segundos)
+CONTEO_VENTANA_RITMO = 15
+CONTEO_TIEMPO_CACHE_RITMO = 5
+
+# Eventos en vivo de los conteos (SSE / long-poll): necesitan una caché compartida entre
+# procesos (Redis, Memcached, base de datos). None: solo si CACHES no es local a cada
+# proceso; sin ellos la página del conteo consulta el avance cada 15 segundos
+CONTEO_EVENTOS_EN_VIVO = None
+# Flujos de eventos abiertos a la vez por proceso (cada uno ocupa un hilo hasta 25 segundos)
+CONTEO_MAX_FLUJOS_EVENTOS = 4
+
+# Segundos que se cachean los totales de las listas de movimientos (paginadas por cursor)
+MOVIMIENTOS_TIEMPO_CACHE_TOTALES = 60
+
+# Segundos hasta reconstruir las facetas de los filtros de movimientos (entre tanto se
+# actualizan con los movimientos nuevos)
+MOVIMIENTOS_TIEMPO_FACETAS = 3600
+
 # Login URL
 LOGIN_URL = '/usuarios/login/'
 LOGIN_REDIRECT_URL = '/'
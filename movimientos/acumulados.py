@@ -0,0 +1,154 @@
+"""
+Acumulados de movimientos por hora (``AcumuladoMovimientos``).
+
+Los reportes de movimientos (resumen, por conteo y por usuario) agrupaban y
+sumaban el registro completo en cada request. Ahora leen una tabla con el total
+de movimientos y la cantidad cambiada por (conteo, usuario, producto, tipo,
+hora UTC), que se mantiene con sumas atómicas (``INSERT ... ON CONFLICT DO
+UPDATE``) en la misma transacción que el registro:
+
+- ``registrar_acumulados``: movimientos insertados con ``bulk_create``
+  (``movimientos.registro``) o guardados uno a uno, y movimientos eliminados
+  directamente (ver ``conteo.signals``).
+- ``acumular_pendientes``: movimientos volcados desde la tabla de pendientes
+  (escritura diferida).
+- ``recalcular_acumulados``: reconstrucción desde ``MovimientoConteo`` y
+  ``MovimientoArchivado`` (``scripts/reconstruir_acumulados_movimientos.py``).
+
+Archivar un conteo no toca sus filas, así que los reportes siguen incluyendo
+los conteos archivados. Eliminar un conteo, producto o usuario elimina sus
+filas en cascada. Los cambios que no pasan por estos caminos (``update()`` de
+movimientos, inserciones con SQL directo) dejan las filas desactualizadas hasta
+la reconstrucción.
+"""
+from datetime import timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef, Sum
+from django.db.models.functions import TruncHour
+
+from conteo.models import Conteo
+from productos.models import Producto
+from .models import AcumuladoMovimientos, MovimientoArchivado, MovimientoConteo, MovimientoPendiente
+
+COLUMNAS_CLAVE = ('conteo_id', 'usuario_id', 'producto_id', 'tipo', 'hora')
+
+# Filas por sentencia al sumar acumulados
+TAMANO_LOTE = 500
+
+
+def hora_acumulado(fecha):
+    """Hora (UTC) del acumulado de un movimiento"""
+    if fecha.tzinfo is not None:
+        fecha = fecha.astimezone(dt_timezone.utc)
+    return fecha.replace(minute=0, second=0, microsecond=0)
+
+
+def _sumar(acumulados):
+    """
+    Suma ``acumulados`` ({(conteo_id, usuario_id, producto_id, tipo, hora): [total, cantidad]})
+    a la tabla y elimina las filas que quedan sin movimientos.
+    """
+    if not acumulados:
+        return
+    qn = connection.ops.quote_name
+    tabla = qn(AcumuladoMovimientos._meta.db_table)
+    columnas = ', '.join(qn(columna) for columna in COLUMNAS_CLAVE)
+    sql = (
+        f'INSERT INTO {tabla} ({columnas}, {qn("total")}, {qn("cantidad_total")}) '
+        f'VALUES (%s, %s, %s, %s, %s, %s, %s) '
+        f'ON CONFLICT ({columnas}) DO UPDATE SET '
+        f'{qn("total")} = {tabla}.{qn("total")} + excluded.{qn("total")}, '
+        f'{qn("cantidad_total")} = {tabla}.{qn("cantidad_total")} + excluded.{qn("cantidad_total")}'
+    )
+    filas = [
+        (conteo_id, usuario_id, producto_id, tipo, connection.ops.adapt_datetimefield_value(hora), total, cantidad)
+        for (conteo_id, usuario_id, producto_id, tipo, hora), (total, cantidad) in acumulados.items()
+    ]
+    # Sin transacción propia: se llama dentro de la transacción del registro o de la eliminación
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(filas), TAMANO_LOTE):
+            cursor.executemany(sql, filas[inicio:inicio + TAMANO_LOTE])
+    if any(total < 0 for total, _ in acumulados.values()):
+        AcumuladoMovimientos.objects.filter(
+            conteo_id__in={clave[0] for clave in acumulados}, total__lte=0
+        ).delete()
+
+
+def registrar_acumulados(movimientos, signo=1):
+    """
+    Suma (``signo`` 1) o resta (-1) los movimientos indicados (MovimientoConteo con
+    ``fecha_movimiento``) a sus acumulados.
+    """
+    acumulados = {}
+    for movimiento in movimientos:
+        clave = (
+            movimiento.conteo_id, movimiento.usuario_id, movimiento.producto_id,
+            movimiento.tipo, hora_acumulado(movimiento.fecha_movimiento),
+        )
+        acumulado = acumulados.setdefault(clave, [0, 0])
+        acumulado[0] += signo
+        acumulado[1] += signo * movimiento.cantidad_cambiada
+    _sumar(acumulados)
+
+
+def _agrupar(movimientos, acumulados):
+    """Agrega a ``acumulados`` los totales por clave de un queryset de movimientos"""
+    for fila in movimientos.order_by().values(
+        'conteo_id', 'usuario_id', 'producto_id', 'tipo', hora=TruncHour('fecha_movimiento', tzinfo=dt_timezone.utc)
+    ).annotate(movimientos=Count('id'), cantidad=Sum('cantidad_cambiada')):
+        clave = (fila['conteo_id'], fila['usuario_id'], fila['producto_id'], fila['tipo'], hora_acumulado(fila['hora']))
+        acumulado = acumulados.setdefault(clave, [0, 0])
+        acumulado[0] += fila['movimientos']
+        acumulado[1] += fila['cantidad'] or 0
+    return acumulados
+
+
+def _con_referencias(movimientos):
+    """Movimientos cuyo conteo, producto y usuario existen (las tablas sin claves foráneas)"""
+    return movimientos.filter(
+        Exists(Conteo.objects.filter(pk=OuterRef('conteo_id'))),
+        Exists(Producto.objects.filter(pk=OuterRef('producto_id'))),
+        Exists(User.objects.filter(pk=OuterRef('usuario_id'))),
+    )
+
+
+def acumular_pendientes(ids):
+    """Suma a los acumulados los movimientos pendientes indicados (los que se vuelcan)"""
+    _sumar(_agrupar(_con_referencias(MovimientoPendiente.objects.filter(id__in=ids)), {}))
+
+
+def recalcular_acumulados(conteos_ids=None):
+    """
+    Reconstruye los acumulados de los conteos indicados (todos si es None) desde el
+    registro y el archivo de movimientos. Retorna la cantidad de filas escritas.
+    """
+    if conteos_ids is None:
+        conteos_ids = Conteo.objects.order_by('id').values_list('id', flat=True)
+    filas = 0
+    for conteo_id in list(conteos_ids):
+        # Un conteo por transacción: la memoria queda acotada a los acumulados de un conteo
+        with transaction.atomic():
+            AcumuladoMovimientos.objects.filter(conteo_id=conteo_id).delete()
+            acumulados = _agrupar(MovimientoConteo.objects.filter(conteo_id=conteo_id), {})
+            _agrupar(_con_referencias(MovimientoArchivado.objects.filter(conteo_id=conteo_id)), acumulados)
+            _sumar(acumulados)
+        filas += len(acumulados)
+    return filas
+
+
+def totales_acumulados(acumulados, campos, limite=None):
+    """
+    Total de movimientos y cantidad cambiada de ``acumulados`` (queryset de
+    AcumuladoMovimientos) agrupados por ``campos``, ordenados por total descendente.
+    """
+    filas = acumulados.order_by().values(*campos).annotate(
+        suma_movimientos=Sum('total'), suma_cantidad=Sum('cantidad_total')
+    ).order_by('-suma_movimientos', *campos)
+    if limite is not None:
+        filas = filas[:limite]
+    return [
+        {**{campo: fila[campo] for campo in campos}, 'total': fila['suma_movimientos'], 'cantidad_total': fila['suma_cantidad']}
+        for fila in filas
+    ]
@@ -0,0 +1,76 @@
+"""
+Búsqueda de texto en el registro de movimientos.
+
+La búsqueda de ``lista_movimientos`` era un OR de 11 ``icontains`` sobre el
+join de movimientos con productos, usuarios y conteos, que recorre el join
+completo. Ahora cada dimensión se resuelve primero a un conjunto de ids y el
+registro se filtra por sus claves foráneas indexadas:
+
+- Productos: índice de texto de productos (``productos.busqueda``).
+- Usuarios y conteos: tablas chicas, ``icontains`` sobre ellas.
+- Observaciones del movimiento: índice de texto propio creado en la migración
+  0004 (FTS5 trigram en SQLite, GIN trigram en PostgreSQL), que solo contiene
+  los movimientos con observaciones.
+
+El resultado es el mismo que el del OR de ``icontains``.
+"""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from conteo.models import Conteo
+from productos.busqueda import LONGITUD_MINIMA_INDICE, filtro_busqueda
+from productos.models import Producto
+
+# Campos de cada dimensión en los que se busca
+CAMPOS_PRODUCTO = ('nombre', 'codigo_barras', 'codigo', 'atributo', 'descripcion')
+CAMPOS_USUARIO = ('username', 'first_name', 'last_name', 'email')
+CAMPOS_CONTEO = ('nombre',)
+
+TABLA_FTS = 'movimientos_movimientoconteo_fts'
+
+
+def _tabla_fts_existe():
+    if not hasattr(connection, '_movimientos_fts_disponible'):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABLA_FTS])
+            connection._movimientos_fts_disponible = cursor.fetchone() is not None
+    return connection._movimientos_fts_disponible
+
+
+def _icontains(busqueda, campos):
+    filtro = Q()
+    for campo in campos:
+        filtro |= Q(**{f'{campo}__icontains': busqueda})
+    return filtro
+
+
+def _filtro_observaciones(busqueda):
+    if connection.vendor == 'sqlite' and len(busqueda) >= LONGITUD_MINIMA_INDICE and _tabla_fts_existe():
+        frase = '"' + busqueda.replace('"', '""') + '"'
+        return Q(id__in=RawSQL(f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s", (frase,)))
+    return Q(observaciones__icontains=busqueda)
+
+
+def filtro_busqueda_movimientos(busqueda):
+    """
+    Q sobre MovimientoConteo equivalente a buscar ``busqueda`` (icontains) en el producto,
+    el usuario, el conteo y las observaciones del movimiento.
+    """
+    productos = Producto.objects.filter(filtro_busqueda(busqueda, CAMPOS_PRODUCTO))
+    try:
+        # filtro_busqueda también acepta el id del producto; la búsqueda original no
+        productos = productos.exclude(Q(id=int(busqueda)) & ~_icontains(busqueda, CAMPOS_PRODUCTO))
+    except ValueError:
+        pass
+
+    usuarios_ids = list(User.objects.filter(_icontains(busqueda, CAMPOS_USUARIO)).values_list('id', flat=True))
+    conteos_ids = list(Conteo.objects.filter(_icontains(busqueda, CAMPOS_CONTEO)).values_list('id', flat=True))
+
+    filtro = Q(producto_id__in=productos.values('id')) | _filtro_observaciones(busqueda)
+    if usuarios_ids:
+        filtro |= Q(usuario_id__in=usuarios_ids)
+    if conteos_ids:
+        filtro |= Q(conteo_id__in=conteos_ids)
+    return filtro
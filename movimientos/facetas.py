@@ -0,0 +1,163 @@
+"""
+Facetas de los filtros de ``lista_movimientos``: usuarios, productos y marcas
+que tienen movimientos, y los conteos.
+
+Antes cada render hacía un DISTINCT sobre todo el registro para cada lista y
+rendereaba miles de ``<option>``. Ahora los conjuntos de ids se guardan en la
+caché junto con el id del último movimiento incluido; cada lectura solo agrega
+los movimientos posteriores (un rango de la clave primaria), y el conjunto
+completo se reconstruye cuando vence (``MOVIMIENTOS_TIEMPO_FACETAS``, una hora
+por defecto), lo que también quita los valores de movimientos archivados.
+
+Los filtros se llenan a medida que se escribe, con ``opciones_faceta``
+(``movimientos:facetas``), sin renderizar las listas completas.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Max, Q
+
+from conteo.models import Conteo
+from productos.busqueda import filtro_busqueda
+from productos.models import Producto
+from .models import MovimientoConteo
+
+FACETAS = ('conteos', 'usuarios', 'productos', 'marcas')
+
+CLAVE_FACETAS = 'movimientos:facetas'
+TIEMPO_FACETAS_POR_DEFECTO = 3600
+
+# Opciones por respuesta y tope pedido por el cliente
+LIMITE_OPCIONES = 20
+LIMITE_MAXIMO_OPCIONES = 100
+
+# Hasta esta cantidad de productos la faceta se filtra con ``id__in``; con más se
+# recorren los productos que coinciden con la búsqueda
+LIMITE_IDS_CONSULTA = 500
+TAMANO_LOTE = 2000
+
+
+def _tiempo_facetas():
+    return getattr(settings, 'MOVIMIENTOS_TIEMPO_FACETAS', TIEMPO_FACETAS_POR_DEFECTO)
+
+
+def facetas_movimientos():
+    """
+    Conjuntos {'usuarios', 'productos', 'marcas'} de los movimientos, actualizados con
+    los movimientos nuevos desde la última lectura.
+    """
+    ahora = time.time()
+    facetas = cache.get(CLAVE_FACETAS)
+    if facetas is None or facetas['vence'] <= ahora:
+        facetas = {'ultimo_id': 0, 'vence': ahora + _tiempo_facetas(), 'usuarios': set(), 'productos': set(), 'marcas': set()}
+
+    ultimo_id = MovimientoConteo.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0
+    if ultimo_id <= facetas['ultimo_id']:
+        return facetas
+
+    productos_nuevos = set()
+    for usuario_id, producto_id in MovimientoConteo.objects.filter(
+        id__gt=facetas['ultimo_id'], id__lte=ultimo_id
+    ).order_by().values_list('usuario_id', 'producto_id').distinct():
+        facetas['usuarios'].add(usuario_id)
+        if producto_id not in facetas['productos']:
+            productos_nuevos.add(producto_id)
+
+    productos_nuevos = sorted(productos_nuevos)
+    for inicio in range(0, len(productos_nuevos), TAMANO_LOTE):
+        lote = productos_nuevos[inicio:inicio + TAMANO_LOTE]
+        facetas['marcas'].update(
+            marca for marca in Producto.objects.filter(id__in=lote).values_list('marca', flat=True) if marca
+        )
+    facetas['productos'].update(productos_nuevos)
+
+    # Se guarda hasta el vencimiento original: la reconstrucción completa sigue programada
+    facetas['ultimo_id'] = ultimo_id
+    cache.set(CLAVE_FACETAS, facetas, max(int(facetas['vence'] - ahora), 1))
+    return facetas
+
+
+def _texto_conteo(conteo):
+    return f'Conteo {conteo.numero_conteo}: {conteo.nombre}'
+
+
+def _texto_usuario(usuario):
+    return usuario.get_full_name() or usuario.username
+
+
+def _opciones_conteos(busqueda, limite):
+    conteos = Conteo.objects.only('id', 'nombre', 'numero_conteo').order_by('-fecha_inicio')
+    if busqueda:
+        conteos = conteos.filter(nombre__icontains=busqueda)
+    return [{'valor': conteo.id, 'texto': _texto_conteo(conteo)} for conteo in conteos[:limite]]
+
+
+def _opciones_usuarios(busqueda, limite):
+    usuarios = User.objects.filter(id__in=facetas_movimientos()['usuarios']).order_by('username')
+    if busqueda:
+        usuarios = usuarios.filter(
+            Q(username__icontains=busqueda) | Q(first_name__icontains=busqueda) | Q(last_name__icontains=busqueda)
+        )
+    return [{'valor': usuario.id, 'texto': _texto_usuario(usuario)} for usuario in usuarios[:limite]]
+
+
+def _opciones_productos(busqueda, limite):
+    ids = facetas_movimientos()['productos']
+    productos = Producto.objects.order_by('nombre', 'id')
+    if busqueda:
+        productos = productos.filter(filtro_busqueda(busqueda))
+    if len(ids) <= LIMITE_IDS_CONSULTA:
+        filas = productos.filter(id__in=ids).values_list('id', 'nombre', 'codigo_barras')[:limite]
+    else:
+        # Faceta grande: recorrer los productos que coinciden y quedarse con los que tienen movimientos
+        filas = []
+        for fila in productos.values_list('id', 'nombre', 'codigo_barras').iterator(chunk_size=TAMANO_LOTE):
+            if fila[0] in ids:
+                filas.append(fila)
+                if len(filas) == limite:
+                    break
+    return [{'valor': producto_id, 'texto': f'{nombre} ({codigo_barras})'} for producto_id, nombre, codigo_barras in filas]
+
+
+def _opciones_marcas(busqueda, limite):
+    busqueda = busqueda.casefold()
+    marcas = sorted(marca for marca in facetas_movimientos()['marcas'] if busqueda in marca.casefold())
+    return [{'valor': marca, 'texto': marca} for marca in marcas[:limite]]
+
+
+OPCIONES = {
+    'conteos': _opciones_conteos,
+    'usuarios': _opciones_usuarios,
+    'productos': _opciones_productos,
+    'marcas': _opciones_marcas,
+}
+
+
+def opciones_faceta(faceta, busqueda='', limite=LIMITE_OPCIONES):
+    """Opciones [{'valor', 'texto'}] de la faceta que coinciden con ``busqueda``"""
+    return OPCIONES[faceta](busqueda.strip(), limite)
+
+
+def limite_opciones(valor):
+    """Límite de opciones pedido por el cliente, acotado al tope del servidor"""
+    try:
+        return min(max(int(valor), 1), LIMITE_MAXIMO_OPCIONES)
+    except (TypeError, ValueError):
+        return LIMITE_OPCIONES
+
+
+def etiquetas_filtros(conteo_id=None, usuario_id=None, producto_id=None):
+    """Textos de los valores seleccionados en los filtros (una consulta por clave primaria cada uno)"""
+    etiquetas = {}
+    if conteo_id and str(conteo_id).isdigit():
+        conteo = Conteo.objects.filter(pk=conteo_id).only('id', 'nombre', 'numero_conteo').first()
+        etiquetas['conteo'] = _texto_conteo(conteo) if conteo else ''
+    if usuario_id and str(usuario_id).isdigit():
+        usuario = User.objects.filter(pk=usuario_id).first()
+        etiquetas['usuario'] = _texto_usuario(usuario) if usuario else ''
+    if producto_id and str(producto_id).isdigit():
+        producto = Producto.objects.filter(pk=producto_id).values_list('nombre', 'codigo_barras').first()
+        etiquetas['producto'] = f'{producto[0]} ({producto[1]})' if producto else ''
+    return etiquetas
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:52
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movimientos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('conteo_id', models.BigIntegerField(verbose_name='Conteo')),
+                ('item_conteo_id', models.BigIntegerField(blank=True, null=True, verbose_name='Item de Conteo')),
+                ('producto_id', models.BigIntegerField(verbose_name='Producto')),
+                ('usuario_id', models.IntegerField(verbose_name='Usuario')),
+                ('tipo', models.CharField(choices=[('agregar', 'Agregar'), ('modificar', 'Modificar'), ('eliminar', 'Eliminar')], max_length=20, verbose_name='Tipo de Movimiento')),
+                ('cantidad_anterior', models.IntegerField(default=0, verbose_name='Cantidad Anterior')),
+                ('cantidad_nueva', models.IntegerField(default=0, verbose_name='Cantidad Nueva')),
+                ('cantidad_cambiada', models.IntegerField(default=0, verbose_name='Cantidad Cambiada')),
+                ('fecha_movimiento', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha del Movimiento')),
+                ('observaciones', models.TextField(blank=True, null=True, verbose_name='Observaciones')),
+            ],
+            options={
+                'verbose_name': 'Movimiento Pendiente',
+                'verbose_name_plural': 'Movimientos Pendientes',
+            },
+        ),
+    ]
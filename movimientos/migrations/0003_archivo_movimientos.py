@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('conteo', '0011_conteo_fecha_archivo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('productos', '0009_producto_codigo_index'),
+        ('movimientos', '0002_movimientopendiente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenMovimientos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('agregar', 'Agregar'), ('modificar', 'Modificar'), ('eliminar', 'Eliminar')], max_length=20, verbose_name='Tipo de Movimiento')),
+                ('total', models.IntegerField(default=0, verbose_name='Total de Movimientos')),
+                ('cantidad_total', models.IntegerField(default=0, verbose_name='Cantidad Total')),
+                ('primera_fecha', models.DateTimeField(verbose_name='Primer Movimiento')),
+                ('ultima_fecha', models.DateTimeField(verbose_name='Último Movimiento')),
+                ('conteo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumen_movimientos', to='conteo.conteo', verbose_name='Conteo')),
+                ('producto', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='productos.producto', verbose_name='Producto')),
+                ('usuario', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Resumen de Movimientos',
+                'verbose_name_plural': 'Resúmenes de Movimientos',
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoArchivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_conteo_id', models.BigIntegerField(blank=True, null=True, verbose_name='Item de Conteo')),
+                ('tipo', models.CharField(choices=[('agregar', 'Agregar'), ('modificar', 'Modificar'), ('eliminar', 'Eliminar')], max_length=20, verbose_name='Tipo de Movimiento')),
+                ('cantidad_anterior', models.IntegerField(default=0, verbose_name='Cantidad Anterior')),
+                ('cantidad_nueva', models.IntegerField(default=0, verbose_name='Cantidad Nueva')),
+                ('cantidad_cambiada', models.IntegerField(default=0, verbose_name='Cantidad Cambiada')),
+                ('fecha_movimiento', models.DateTimeField(verbose_name='Fecha del Movimiento')),
+                ('observaciones', models.TextField(blank=True, null=True, verbose_name='Observaciones')),
+                ('conteo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_archivados', to='conteo.conteo', verbose_name='Conteo')),
+                ('producto', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='productos.producto', verbose_name='Producto')),
+                ('usuario', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Movimiento Archivado',
+                'verbose_name_plural': 'Movimientos Archivados',
+                'ordering': ['-fecha_movimiento'],
+            },
+        ),
+    ]
@@ -0,0 +1,80 @@
+from django.db import migrations
+
+
+def _pg_trgm_disponible(schema_editor):
+    """Indica si el servidor PostgreSQL tiene la extensión pg_trgm"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def crear_indice_busqueda(apps, schema_editor):
+    """Crea el índice de texto sobre las observaciones de los movimientos según el motor"""
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'sqlite':
+        # Tabla FTS5 de contenido externo con tokenizador trigram (búsqueda por subcadena).
+        # Solo se indexan los movimientos con observaciones: la mayoría no tiene y así los
+        # escaneos no pagan el índice.
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS movimientos_movimientoconteo_fts USING fts5("
+            "observaciones, content='movimientos_movimientoconteo', content_rowid='id', tokenize='trigram')"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS movimientos_movimientoconteo_fts_ai AFTER INSERT ON movimientos_movimientoconteo "
+            "WHEN new.observaciones IS NOT NULL BEGIN "
+            "INSERT INTO movimientos_movimientoconteo_fts(rowid, observaciones) VALUES (new.id, new.observaciones); END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS movimientos_movimientoconteo_fts_ad AFTER DELETE ON movimientos_movimientoconteo "
+            "WHEN old.observaciones IS NOT NULL BEGIN "
+            "INSERT INTO movimientos_movimientoconteo_fts(movimientos_movimientoconteo_fts, rowid, observaciones) "
+            "VALUES ('delete', old.id, old.observaciones); END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS movimientos_movimientoconteo_fts_aud AFTER UPDATE OF observaciones ON movimientos_movimientoconteo "
+            "WHEN old.observaciones IS NOT NULL BEGIN "
+            "INSERT INTO movimientos_movimientoconteo_fts(movimientos_movimientoconteo_fts, rowid, observaciones) "
+            "VALUES ('delete', old.id, old.observaciones); END"
+        )
+        schema_editor.execute(
+            "CREATE TRIGGER IF NOT EXISTS movimientos_movimientoconteo_fts_aui AFTER UPDATE OF observaciones ON movimientos_movimientoconteo "
+            "WHEN new.observaciones IS NOT NULL BEGIN "
+            "INSERT INTO movimientos_movimientoconteo_fts(rowid, observaciones) VALUES (new.id, new.observaciones); END"
+        )
+        # Indexar los movimientos existentes con observaciones
+        schema_editor.execute(
+            "INSERT INTO movimientos_movimientoconteo_fts(rowid, observaciones) "
+            "SELECT id, observaciones FROM movimientos_movimientoconteo WHERE observaciones IS NOT NULL"
+        )
+    elif vendor == 'postgresql' and _pg_trgm_disponible(schema_editor):
+        # Índice trigram: PostgreSQL lo usa automáticamente para ILIKE '%texto%'
+        # (sin pg_trgm en el servidor no se crea: las búsquedas recorren la tabla completa)
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS movimientos_movimientoconteo_observaciones_trgm "
+            "ON movimientos_movimientoconteo USING gin (UPPER(observaciones) gin_trgm_ops)"
+        )
+
+
+def eliminar_indice_busqueda(apps, schema_editor):
+    """Elimina el índice de texto de los movimientos"""
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'sqlite':
+        for sufijo in ['ai', 'ad', 'aud', 'aui']:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS movimientos_movimientoconteo_fts_{sufijo}")
+        schema_editor.execute("DROP TABLE IF EXISTS movimientos_movimientoconteo_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS movimientos_movimientoconteo_observaciones_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movimientos', '0003_archivo_movimientos'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_busqueda, eliminar_indice_busqueda),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:42
+
+from datetime import timezone
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Sum
+from django.db.models.functions import TruncHour
+import django.db.models.deletion
+
+
+def acumular_movimientos_existentes(apps, schema_editor):
+    """Acumulados por hora de los movimientos registrados y archivados, un conteo a la vez"""
+    Conteo = apps.get_model('conteo', 'Conteo')
+    Producto = apps.get_model('productos', 'Producto')
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    MovimientoConteo = apps.get_model('movimientos', 'MovimientoConteo')
+    MovimientoArchivado = apps.get_model('movimientos', 'MovimientoArchivado')
+    AcumuladoMovimientos = apps.get_model('movimientos', 'AcumuladoMovimientos')
+
+    archivados = MovimientoArchivado.objects.filter(
+        Exists(Producto.objects.filter(pk=OuterRef('producto_id'))),
+        Exists(User.objects.filter(pk=OuterRef('usuario_id'))),
+    )
+    for conteo_id in Conteo.objects.order_by('id').values_list('id', flat=True):
+        acumulados = {}
+        for movimientos in (MovimientoConteo.objects.filter(conteo_id=conteo_id), archivados.filter(conteo_id=conteo_id)):
+            for fila in movimientos.order_by().values(
+                'usuario_id', 'producto_id', 'tipo', hora=TruncHour('fecha_movimiento', tzinfo=timezone.utc)
+            ).annotate(movimientos=Count('id'), cantidad=Sum('cantidad_cambiada')):
+                clave = (fila['usuario_id'], fila['producto_id'], fila['tipo'], fila['hora'])
+                acumulado = acumulados.setdefault(clave, [0, 0])
+                acumulado[0] += fila['movimientos']
+                acumulado[1] += fila['cantidad'] or 0
+        AcumuladoMovimientos.objects.bulk_create([
+            AcumuladoMovimientos(
+                conteo_id=conteo_id, usuario_id=usuario_id, producto_id=producto_id, tipo=tipo,
+                hora=hora, total=total, cantidad_total=cantidad,
+            )
+            for (usuario_id, producto_id, tipo, hora), (total, cantidad) in acumulados.items()
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0009_producto_codigo_index'),
+        ('conteo', '0012_discrepanciaconteo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('movimientos', '0004_movimiento_indice_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AcumuladoMovimientos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('agregar', 'Agregar'), ('modificar', 'Modificar'), ('eliminar', 'Eliminar')], max_length=20, verbose_name='Tipo de Movimiento')),
+                ('hora', models.DateTimeField(verbose_name='Hora')),
+                ('total', models.IntegerField(default=0, verbose_name='Total de Movimientos')),
+                ('cantidad_total', models.IntegerField(default=0, verbose_name='Cantidad Total')),
+                ('conteo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='acumulados_movimientos', to='conteo.conteo', verbose_name='Conteo')),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='productos.producto', verbose_name='Producto')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Acumulado de Movimientos',
+                'verbose_name_plural': 'Acumulados de Movimientos',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='acumuladomovimientos',
+            index=models.Index(fields=['usuario', 'conteo'], name='movimientos_usuario_9eb310_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='acumuladomovimientos',
+            index=models.Index(fields=['hora'], name='movimientos_hora_4cf5fa_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='acumuladomovimientos',
+            constraint=models.UniqueConstraint(fields=('conteo', 'usuario', 'producto', 'tipo', 'hora'), name='acumulado_movimientos_unico'),
+        ),
+        migrations.RunPython(acumular_movimientos_existentes, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='ResumenMovimientos',
+        ),
+    ]
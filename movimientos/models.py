@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from conteo.models import Conteo, ItemConteo
 from productos.models import Producto
 
@@ -34,3 +35,87 @@ class MovimientoConteo(models.Model):
     
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.producto.nombre} ({self.cantidad_cambiada:+}) por {self.usuario.username}"
+
+
+class MovimientoPendiente(models.Model):
+    """
+    Movimiento pendiente de volcar a MovimientoConteo (modo de escritura diferida).
+    
+    Tabla de solo inserción, sin claves foráneas ni índices secundarios, que se escribe
+    en la misma transacción que el ItemConteo. Un proceso la vuelca en bloque a
+    MovimientoConteo en orden de id (ver ``movimientos.registro``).
+    """
+    conteo_id = models.BigIntegerField(verbose_name="Conteo")
+    item_conteo_id = models.BigIntegerField(null=True, blank=True, verbose_name="Item de Conteo")
+    producto_id = models.BigIntegerField(verbose_name="Producto")
+    usuario_id = models.IntegerField(verbose_name="Usuario")
+    tipo = models.CharField(max_length=20, choices=MovimientoConteo.TIPO_CHOICES, verbose_name="Tipo de Movimiento")
+    cantidad_anterior = models.IntegerField(default=0, verbose_name="Cantidad Anterior")
+    cantidad_nueva = models.IntegerField(default=0, verbose_name="Cantidad Nueva")
+    cantidad_cambiada = models.IntegerField(default=0, verbose_name="Cantidad Cambiada")
+    fecha_movimiento = models.DateTimeField(default=timezone.now, verbose_name="Fecha del Movimiento")
+    observaciones = models.TextField(blank=True, null=True, verbose_name="Observaciones")
+    
+    class Meta:
+        verbose_name = "Movimiento Pendiente"
+        verbose_name_plural = "Movimientos Pendientes"
+    
+    def __str__(self):
+        return f"{self.tipo} - producto {self.producto_id} ({self.cantidad_cambiada:+}) en conteo {self.conteo_id}"
+
+
+class MovimientoArchivado(models.Model):
+    """
+    Movimiento de un conteo archivado (ver ``conteo.archivo``).
+    
+    Conserva el id y los datos del MovimientoConteo original. Solo se consulta por
+    conteo, así que no tiene restricciones de clave foránea ni más índices que el del conteo.
+    """
+    conteo = models.ForeignKey(Conteo, on_delete=models.CASCADE, related_name='movimientos_archivados', verbose_name="Conteo")
+    item_conteo_id = models.BigIntegerField(null=True, blank=True, verbose_name="Item de Conteo")
+    producto = models.ForeignKey(Producto, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+', verbose_name="Producto")
+    usuario = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+', verbose_name="Usuario")
+    tipo = models.CharField(max_length=20, choices=MovimientoConteo.TIPO_CHOICES, verbose_name="Tipo de Movimiento")
+    cantidad_anterior = models.IntegerField(default=0, verbose_name="Cantidad Anterior")
+    cantidad_nueva = models.IntegerField(default=0, verbose_name="Cantidad Nueva")
+    cantidad_cambiada = models.IntegerField(default=0, verbose_name="Cantidad Cambiada")
+    fecha_movimiento = models.DateTimeField(verbose_name="Fecha del Movimiento")
+    observaciones = models.TextField(blank=True, null=True, verbose_name="Observaciones")
+    
+    class Meta:
+        verbose_name = "Movimiento Archivado"
+        verbose_name_plural = "Movimientos Archivados"
+        ordering = ['-fecha_movimiento']
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} - producto {self.producto_id} ({self.cantidad_cambiada:+}) en conteo {self.conteo_id}"
+
+
+class AcumuladoMovimientos(models.Model):
+    """
+    Totales de movimientos por conteo, usuario, producto, tipo y hora (ver ``movimientos.acumulados``).
+    
+    Se mantiene al registrar y eliminar movimientos, e incluye los de conteos archivados:
+    los reportes de movimientos leen estas filas y el registro queda para el detalle.
+    """
+    conteo = models.ForeignKey(Conteo, on_delete=models.CASCADE, related_name='acumulados_movimientos', verbose_name="Conteo")
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', verbose_name="Usuario")
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='+', verbose_name="Producto")
+    tipo = models.CharField(max_length=20, choices=MovimientoConteo.TIPO_CHOICES, verbose_name="Tipo de Movimiento")
+    hora = models.DateTimeField(verbose_name="Hora")
+    total = models.IntegerField(default=0, verbose_name="Total de Movimientos")
+    cantidad_total = models.IntegerField(default=0, verbose_name="Cantidad Total")
+    
+    class Meta:
+        verbose_name = "Acumulado de Movimientos"
+        verbose_name_plural = "Acumulados de Movimientos"
+        constraints = [
+            models.UniqueConstraint(fields=['conteo', 'usuario', 'producto', 'tipo', 'hora'], name='acumulado_movimientos_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['usuario', 'conteo']),
+            models.Index(fields=['hora']),
+        ]
+    
+    def __str__(self):
+        return f"Conteo {self.conteo_id} - {self.tipo} {self.hora:%Y-%m-%d %H}h: {self.total} movimientos"
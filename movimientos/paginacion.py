@@ -0,0 +1,125 @@
+"""
+Paginación por clave (keyset) de las listas de movimientos.
+
+``Paginator`` hacía un COUNT(*) sobre el join filtrado y saltaba filas con
+OFFSET, así que cada página más profunda costaba más. Las listas de movimientos
+se ordenan por (-fecha_movimiento, -id), que cubren los índices de
+``MovimientoConteo``, y cada página se pide con el cursor de la última (o, hacia
+atrás, de la primera) fila de la página anterior: la página N cuesta lo mismo
+que la primera.
+
+El cursor también lleva la posición de su fila para mostrar "desde - hasta"
+sin contar. Los totales y agregados de las listas se cachean por filtros
+durante ``MOVIMIENTOS_TIEMPO_CACHE_TOTALES`` segundos (60 por defecto), por lo
+que pueden ir un poco atrasados respecto de los movimientos más recientes.
+"""
+import hashlib
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.http import urlencode
+
+from conteo.listas import codificar_cursor, decodificar_cursor
+
+POR_PAGINA = 100
+TIEMPO_CACHE_TOTALES_POR_DEFECTO = 60
+
+# Parámetros de la URL que indican la página (no forman parte de los filtros)
+PARAMETROS_PAGINA = ('despues', 'antes', 'page')
+
+
+class PaginaMovimientos:
+    """Página de movimientos con cursores a la página siguiente y a la anterior"""
+
+    def __init__(self, movimientos, inicio, has_previous, has_next):
+        self.object_list = movimientos
+        self.start_index = inicio if movimientos else 0
+        self.end_index = inicio + len(movimientos) - 1 if movimientos else 0
+        self.has_previous = has_previous
+        self.has_next = has_next
+        self.anterior_cursor = _cursor(movimientos[0], inicio) if has_previous else None
+        self.siguiente_cursor = _cursor(movimientos[-1], self.end_index) if has_next else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_other_pages(self):
+        return self.has_previous or self.has_next
+
+
+def _cursor(movimiento, posicion):
+    return codificar_cursor([movimiento.fecha_movimiento.isoformat(), movimiento.id, posicion])
+
+
+def _valores_cursor(cursor):
+    """(fecha, id, posición) del cursor, o None si está vacío o es inválido"""
+    valores = decodificar_cursor(cursor, 3)
+    if valores is None:
+        return None
+    try:
+        fecha = datetime.fromisoformat(valores[0])
+        return fecha, int(valores[1]), max(int(valores[2]), 1)
+    except (TypeError, ValueError):
+        return None
+
+
+def paginar_movimientos(movimientos, parametros, por_pagina=POR_PAGINA):
+    """
+    Página de ``movimientos`` (MovimientoConteo o MovimientoArchivado) según los cursores
+    ``despues``/``antes`` de ``parametros`` (request.GET); sin cursor, la primera página.
+    Una consulta de ``por_pagina + 1`` filas, sin COUNT ni OFFSET.
+    """
+    despues = _valores_cursor(parametros.get('despues'))
+    antes = None if despues else _valores_cursor(parametros.get('antes'))
+
+    if antes:
+        fecha, movimiento_id, posicion = antes
+        filas = list(movimientos.filter(
+            Q(fecha_movimiento__gt=fecha) | Q(fecha_movimiento=fecha, id__gt=movimiento_id)
+        ).order_by('fecha_movimiento', 'id')[:por_pagina + 1])
+        if filas:
+            hay_mas = len(filas) > por_pagina
+            filas = filas[:por_pagina][::-1]
+            inicio = max(posicion - len(filas), 1) if hay_mas else 1
+            return PaginaMovimientos(filas, inicio, has_previous=hay_mas, has_next=True)
+        # Nada más reciente que el cursor: primera página
+
+    if despues:
+        fecha, movimiento_id, posicion = despues
+        movimientos = movimientos.filter(
+            Q(fecha_movimiento__lt=fecha) | Q(fecha_movimiento=fecha, id__lt=movimiento_id)
+        )
+    filas = list(movimientos.order_by('-fecha_movimiento', '-id')[:por_pagina + 1])
+    hay_mas = len(filas) > por_pagina
+    inicio = despues[2] + 1 if despues else 1
+    return PaginaMovimientos(filas[:por_pagina], inicio, has_previous=bool(despues), has_next=hay_mas)
+
+
+def parametros_filtros(parametros, ordenar=False):
+    """Parámetros de la URL sin los de página, para armar los enlaces de las páginas"""
+    pares = [
+        (clave, valor)
+        for clave, valores in parametros.lists() if clave not in PARAMETROS_PAGINA
+        for valor in valores
+    ]
+    return urlencode(sorted(pares) if ordenar else pares)
+
+
+def totales_cacheados(prefijo, parametros, calcular):
+    """
+    Resultado de ``calcular()`` cacheado por ``prefijo`` y los filtros de ``parametros``
+    (totales y agregados de una lista de movimientos).
+    """
+    filtros = parametros_filtros(parametros, ordenar=True) if parametros is not None else ''
+    clave = f'movimientos:totales:{prefijo}:' + hashlib.sha256(filtros.encode()).hexdigest()
+    totales = cache.get(clave)
+    if totales is None:
+        totales = calcular()
+        cache.set(clave, totales, getattr(settings, 'MOVIMIENTOS_TIEMPO_CACHE_TOTALES', TIEMPO_CACHE_TOTALES_POR_DEFECTO))
+    return totales
@@ -0,0 +1,129 @@
+"""
+Registro de movimientos de conteo, con modo opcional de escritura diferida.
+
+Por defecto los movimientos se insertan directamente en MovimientoConteo, en la
+misma transacción que la actualización del ItemConteo.
+
+Con ``MOVIMIENTOS_ESCRITURA_DIFERIDA = True`` se insertan en MovimientoPendiente,
+una tabla de solo inserción sin índices secundarios, también dentro de la misma
+transacción: si el proceso cae antes de confirmar no queda ni el item ni el
+movimiento, y una vez confirmado el movimiento es durable. Un proceso
+(``scripts/volcar_movimientos_pendientes.py``) los vuelca en bloque a
+MovimientoConteo en orden de id, que es el orden de escritura de cada conteo,
+conservando la fecha original del movimiento. Mientras no se vuelquen, los
+movimientos no aparecen en las vistas de movimientos; al finalizar un conteo se
+vuelcan los pendientes de ese conteo.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from conteo.models import Conteo, ItemConteo
+from conteo.eventos import publicar_movimientos
+from productos.models import Producto
+from .acumulados import acumular_pendientes, registrar_acumulados
+from .models import MovimientoConteo, MovimientoPendiente
+from .signals import movimientos_registrados
+
+# Movimientos volcados por transacción
+LOTE_VOLCADO = 5000
+
+COLUMNAS_MOVIMIENTO = (
+    'conteo_id', 'item_conteo_id', 'producto_id', 'usuario_id', 'tipo',
+    'cantidad_anterior', 'cantidad_nueva', 'cantidad_cambiada', 'fecha_movimiento', 'observaciones',
+)
+
+
+def escritura_diferida():
+    """Indica si los movimientos se escriben en la tabla de pendientes"""
+    return getattr(settings, 'MOVIMIENTOS_ESCRITURA_DIFERIDA', False)
+
+
+def registrar_movimientos(movimientos):
+    """
+    Registra una lista de MovimientoConteo (sin guardar). Debe llamarse dentro
+    de la transacción que modifica los items para no perder movimientos.
+    """
+    if not movimientos:
+        return
+    # Eventos de progreso para las páginas abiertas del conteo (se publican al confirmar)
+    publicar_movimientos(movimientos)
+    movimientos_registrados.send(
+        sender=MovimientoConteo, conteo_ids={movimiento.conteo_id for movimiento in movimientos}
+    )
+    if not escritura_diferida():
+        MovimientoConteo.objects.bulk_create(movimientos)
+        registrar_acumulados(movimientos)
+        return
+
+    ahora = timezone.now()
+    MovimientoPendiente.objects.bulk_create([
+        MovimientoPendiente(
+            conteo_id=movimiento.conteo_id,
+            item_conteo_id=movimiento.item_conteo_id,
+            producto_id=movimiento.producto_id,
+            usuario_id=movimiento.usuario_id,
+            tipo=movimiento.tipo,
+            cantidad_anterior=movimiento.cantidad_anterior,
+            cantidad_nueva=movimiento.cantidad_nueva,
+            cantidad_cambiada=movimiento.cantidad_cambiada,
+            fecha_movimiento=movimiento.fecha_movimiento or ahora,
+            observaciones=movimiento.observaciones,
+        )
+        for movimiento in movimientos
+    ])
+
+
+def volcar_movimientos_pendientes(limite=LOTE_VOLCADO, conteo_id=None):
+    """
+    Vuelca hasta ``limite`` movimientos pendientes a MovimientoConteo, en orden de id,
+    con un INSERT ... SELECT y un DELETE en la misma transacción. Retorna la cantidad volcada.
+
+    Los movimientos cuyo conteo, producto o usuario fueron eliminados se descartan
+    (igual que el CASCADE de MovimientoConteo) y los de items eliminados quedan sin item.
+    """
+    with transaction.atomic():
+        pendientes = MovimientoPendiente.objects.order_by('id')
+        if conteo_id is not None:
+            pendientes = pendientes.filter(conteo_id=conteo_id)
+        # Bloquear el lote (en los motores que lo soportan) para que dos procesos no lo vuelquen dos veces
+        ids = list(pendientes.select_for_update().values_list('id', flat=True)[:limite])
+        if not ids:
+            return 0
+
+        qn = connection.ops.quote_name
+        columnas = ', '.join(qn(columna) for columna in COLUMNAS_MOVIMIENTO)
+        seleccion = ', '.join(
+            f'{qn("i")}.{qn("id")}' if columna == 'item_conteo_id' else f'{qn("p")}.{qn(columna)}'
+            for columna in COLUMNAS_MOVIMIENTO
+        )
+        marcadores = ', '.join(['%s'] * len(ids))
+        sql = (
+            f'INSERT INTO {qn(MovimientoConteo._meta.db_table)} ({columnas}) '
+            f'SELECT {seleccion} FROM {qn(MovimientoPendiente._meta.db_table)} {qn("p")} '
+            f'INNER JOIN {qn(Conteo._meta.db_table)} {qn("c")} ON {qn("c")}.{qn("id")} = {qn("p")}.{qn("conteo_id")} '
+            f'INNER JOIN {qn(Producto._meta.db_table)} {qn("pr")} ON {qn("pr")}.{qn("id")} = {qn("p")}.{qn("producto_id")} '
+            f'INNER JOIN {qn(User._meta.db_table)} {qn("u")} ON {qn("u")}.{qn("id")} = {qn("p")}.{qn("usuario_id")} '
+            f'LEFT JOIN {qn(ItemConteo._meta.db_table)} {qn("i")} ON {qn("i")}.{qn("id")} = {qn("p")}.{qn("item_conteo_id")} '
+            f'WHERE {qn("p")}.{qn("id")} IN ({marcadores}) '
+            f'ORDER BY {qn("p")}.{qn("id")}'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, ids)
+        acumular_pendientes(ids)
+        conteo_ids = set(MovimientoPendiente.objects.filter(id__in=ids).values_list('conteo_id', flat=True).distinct())
+        MovimientoPendiente.objects.filter(id__in=ids).delete()
+        movimientos_registrados.send(sender=MovimientoConteo, conteo_ids=conteo_ids)
+
+    return len(ids)
+
+
+def volcar_todos(conteo_id=None, limite=LOTE_VOLCADO):
+    """Vuelca todos los movimientos pendientes (opcionalmente de un conteo). Retorna la cantidad volcada."""
+    total = 0
+    while True:
+        volcados = volcar_movimientos_pendientes(limite=limite, conteo_id=conteo_id)
+        total += volcados
+        if volcados < limite:
+            return total
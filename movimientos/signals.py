@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Enviada al registrar o volcar movimientos en bloque (bulk_create / INSERT ... SELECT no
+# envían post_save). Argumento: ``conteo_ids``, los conteos afectados.
+movimientos_registrados = Signal()
@@ -6,6 +6,7 @@ app_name = 'movimientos'
 urlpatterns = [
     path('', views.lista_movimientos, name='lista'),
     path('resumen/', views.resumen_movimientos, name='resumen'),
+    path('facetas/<str:faceta>/', views.facetas_movimientos, name='facetas'),
     path('conteo/<int:conteo_id>/', views.movimientos_por_conteo, name='por_conteo'),
     path('usuario/<int:usuario_id>/', views.movimientos_por_usuario, name='por_usuario'),
 ]
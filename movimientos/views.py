@@ -1,11 +1,14 @@
 from django.shortcuts import render, get_object_or_404
+from django.http import Http404, JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.db.models import Q, Sum, Count
-from django.core.paginator import Paginator
-from .models import MovimientoConteo
+from .models import AcumuladoMovimientos, MovimientoArchivado, MovimientoConteo
+from .acumulados import totales_acumulados
+from .busqueda import filtro_busqueda_movimientos
+from .facetas import FACETAS, etiquetas_filtros, limite_opciones, opciones_faceta
+from .paginacion import paginar_movimientos, parametros_filtros, totales_cacheados
 from conteo.models import Conteo
-from productos.models import Producto
 
 
 @login_required
@@ -46,50 +49,40 @@ def lista_movimientos(request):
     if fecha_fin:
         movimientos = movimientos.filter(fecha_movimiento__lte=fecha_fin)
     if busqueda:
-        movimientos = movimientos.filter(
-            Q(producto__nombre__icontains=busqueda) |
-            Q(producto__codigo_barras__icontains=busqueda) |
-            Q(producto__codigo__icontains=busqueda) |
-            Q(producto__atributo__icontains=busqueda) |
-            Q(producto__descripcion__icontains=busqueda) |
-            Q(usuario__username__icontains=busqueda) |
-            Q(usuario__first_name__icontains=busqueda) |
-            Q(usuario__last_name__icontains=busqueda) |
-            Q(usuario__email__icontains=busqueda) |
-            Q(conteo__nombre__icontains=busqueda) |
-            Q(observaciones__icontains=busqueda)
-        )
-    
-    # Estadísticas
-    total_movimientos = movimientos.count()
-    movimientos_agregar = movimientos.filter(tipo='agregar').count()
-    movimientos_modificar = movimientos.filter(tipo='modificar').count()
-    movimientos_eliminar = movimientos.filter(tipo='eliminar').count() if mostrar_eliminados else 0
-    total_cantidad_contada = movimientos.aggregate(Sum('cantidad_cambiada'))['cantidad_cambiada__sum'] or 0
-    
-    # Paginación - mostrar más por página
-    paginator = Paginator(movimientos, 100)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    # Opciones para filtros - sin límites
-    conteos = Conteo.objects.all().order_by('-fecha_inicio')
-    usuarios = User.objects.filter(movimientoconteo__isnull=False).distinct().order_by('username')
-    productos = Producto.objects.filter(movimientoconteo__isnull=False).distinct().order_by('nombre')
-    marcas = Producto.objects.filter(movimientoconteo__isnull=False).exclude(marca__isnull=True).exclude(marca='').values_list('marca', flat=True).distinct().order_by('marca')
+        # Resuelta con los índices de texto de productos y observaciones
+        movimientos = movimientos.filter(filtro_busqueda_movimientos(busqueda))
+    
+    # Estadísticas (una consulta, cacheada por filtros)
+    totales = totales_cacheados('lista', request.GET, lambda: movimientos.aggregate(
+        total_movimientos=Count('id'),
+        movimientos_agregar=Count('id', filter=Q(tipo='agregar')),
+        movimientos_modificar=Count('id', filter=Q(tipo='modificar')),
+        movimientos_eliminar=Count('id', filter=Q(tipo='eliminar')),
+        total_cantidad_contada=Sum('cantidad_cambiada'),
+    ))
+    total_movimientos = totales['total_movimientos']
+    movimientos_agregar = totales['movimientos_agregar']
+    movimientos_modificar = totales['movimientos_modificar']
+    movimientos_eliminar = totales['movimientos_eliminar'] if mostrar_eliminados else 0
+    total_cantidad_contada = totales['total_cantidad_contada'] or 0
+    
+    # Paginación por cursor
+    page_obj = paginar_movimientos(movimientos, request.GET)
+    
+    # Las opciones de los filtros se piden al escribir (movimientos:facetas); solo se
+    # resuelven los textos de los valores seleccionados
+    etiquetas = etiquetas_filtros(conteo_id=conteo_id, usuario_id=usuario_id, producto_id=producto_id)
     
     return render(request, 'movimientos/lista.html', {
         'page_obj': page_obj,
+        'parametros_filtros': parametros_filtros(request.GET),
         'total_movimientos': total_movimientos,
         'movimientos_agregar': movimientos_agregar,
         'movimientos_modificar': movimientos_modificar,
         'movimientos_eliminar': movimientos_eliminar,
         'total_cantidad_contada': total_cantidad_contada,
-        'conteos': conteos,
-        'usuarios': usuarios,
-        'productos': productos,
         'mostrar_eliminados': mostrar_eliminados,
-        'marcas': marcas,
+        'etiquetas': etiquetas,
         'filtros': {
             'conteo': conteo_id,
             'usuario': usuario_id,
@@ -107,31 +100,27 @@ def lista_movimientos(request):
 def movimientos_por_conteo(request, conteo_id):
     """Lista los movimientos de un conteo específico"""
     conteo = get_object_or_404(Conteo.objects.prefetch_related('parejas').select_related('usuario_creador', 'usuario_modificador'), pk=conteo_id)
-    movimientos = MovimientoConteo.objects.filter(conteo=conteo).select_related('producto', 'usuario', 'item_conteo').order_by('-fecha_movimiento')
-    
-    # Estadísticas del conteo
-    total_movimientos = movimientos.count()
-    movimientos_por_usuario = movimientos.values('usuario__username').annotate(
-        total=Count('id'),
-        cantidad_total=Sum('cantidad_cambiada')
-    ).order_by('-total')
-    
-    movimientos_por_producto = movimientos.values('producto__nombre', 'producto__codigo_barras').annotate(
-        total=Count('id'),
-        cantidad_total=Sum('cantidad_cambiada')
-    ).order_by('-total')
-    
-    # Paginación - mostrar más por página
-    paginator = Paginator(movimientos, 100)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if conteo.fecha_archivo:
+        # Conteo archivado: sus movimientos están en el archivo
+        movimientos = MovimientoArchivado.objects.filter(conteo=conteo).select_related('producto', 'usuario').order_by('-fecha_movimiento')
+    else:
+        movimientos = MovimientoConteo.objects.filter(conteo=conteo).select_related('producto', 'usuario', 'item_conteo').order_by('-fecha_movimiento')
+    
+    # Estadísticas del conteo (acumulados por hora, incluyen los conteos archivados)
+    acumulados = AcumuladoMovimientos.objects.filter(conteo=conteo)
+    estadisticas = {
+        'total_movimientos': acumulados.aggregate(total=Sum('total'))['total'] or 0,
+        'movimientos_por_usuario': totales_acumulados(acumulados, ['usuario__username']),
+        'movimientos_por_producto': totales_acumulados(acumulados, ['producto__nombre', 'producto__atributo', 'producto__codigo_barras']),
+    }
+    
+    # Paginación por cursor
+    page_obj = paginar_movimientos(movimientos, request.GET)
     
     return render(request, 'movimientos/por_conteo.html', {
         'conteo': conteo,
         'page_obj': page_obj,
-        'total_movimientos': total_movimientos,
-        'movimientos_por_usuario': movimientos_por_usuario,
-        'movimientos_por_producto': movimientos_por_producto,
+        **estadisticas,
     })
 
 
@@ -141,69 +130,64 @@ def movimientos_por_usuario(request, usuario_id):
     usuario = get_object_or_404(User, pk=usuario_id)
     movimientos = MovimientoConteo.objects.filter(usuario=usuario).select_related('conteo', 'producto', 'item_conteo', 'conteo__usuario_creador', 'conteo__usuario_modificador').prefetch_related('conteo__parejas').order_by('-fecha_movimiento')
     
-    # Estadísticas del usuario
-    total_movimientos = movimientos.count()
-    movimientos_por_conteo = movimientos.values('conteo__nombre', 'conteo__numero_conteo').annotate(
-        total=Count('id'),
-        cantidad_total=Sum('cantidad_cambiada')
-    ).order_by('-total')
-    
-    movimientos_por_producto = movimientos.values('producto__nombre', 'producto__codigo_barras').annotate(
-        total=Count('id'),
-        cantidad_total=Sum('cantidad_cambiada')
-    ).order_by('-total')
+    # Estadísticas del usuario (acumulados por hora)
+    acumulados = AcumuladoMovimientos.objects.filter(usuario=usuario)
+    estadisticas = {
+        'total_movimientos': acumulados.aggregate(total=Sum('total'))['total'] or 0,
+        'movimientos_por_conteo': totales_acumulados(acumulados, ['conteo__nombre', 'conteo__numero_conteo']),
+        'movimientos_por_producto': totales_acumulados(acumulados, ['producto__nombre', 'producto__atributo', 'producto__codigo_barras']),
+    }
     
-    # Paginación - mostrar más por página
-    paginator = Paginator(movimientos, 100)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Paginación por cursor
+    page_obj = paginar_movimientos(movimientos, request.GET)
     
     return render(request, 'movimientos/por_usuario.html', {
         'usuario': usuario,
         'page_obj': page_obj,
-        'total_movimientos': total_movimientos,
-        'movimientos_por_conteo': movimientos_por_conteo,
-        'movimientos_por_producto': movimientos_por_producto,
+        **estadisticas,
     })
 
 
+@login_required
+def facetas_movimientos(request, faceta):
+    """Opciones de un filtro de la lista de movimientos que coinciden con ``q`` (JSON)"""
+    if faceta not in FACETAS:
+        raise Http404
+    opciones = opciones_faceta(faceta, request.GET.get('q', ''), limite_opciones(request.GET.get('limite')))
+    return JsonResponse({'resultados': opciones})
+
+
 @login_required
 def resumen_movimientos(request):
     """Resumen general de movimientos"""
-    movimientos = MovimientoConteo.objects.all()
-    
-    # Estadísticas generales
-    total_movimientos = movimientos.count()
-    total_usuarios = movimientos.values('usuario').distinct().count()
-    total_productos = movimientos.values('producto').distinct().count()
-    total_conteos = movimientos.values('conteo').distinct().count()
+    # Estadísticas desde los acumulados por hora (incluyen los conteos archivados);
+    # el registro solo se lee para los movimientos recientes
+    acumulados = AcumuladoMovimientos.objects.all()
+    generales = acumulados.aggregate(
+        total_movimientos=Sum('total'),
+        total_usuarios=Count('usuario', distinct=True),
+        total_productos=Count('producto', distinct=True),
+        total_conteos=Count('conteo', distinct=True),
+    )
     
     # Movimientos por tipo
-    por_tipo = movimientos.values('tipo').annotate(
-        total=Count('id'),
-        cantidad_total=Sum('cantidad_cambiada')
-    ).order_by('tipo')
+    por_tipo = totales_acumulados(acumulados, ['tipo'])
+    por_tipo.sort(key=lambda x: x['tipo'])
     
     # Top usuarios
-    top_usuarios = movimientos.values('usuario__username').annotate(
-        total=Count('id'),
-        cantidad_total=Sum('cantidad_cambiada')
-    ).order_by('-total')[:10]
+    top_usuarios = totales_acumulados(acumulados, ['usuario__username'], limite=10)
     
     # Top productos
-    top_productos = movimientos.values('producto__nombre', 'producto__codigo_barras').annotate(
-        total=Count('id'),
-        cantidad_total=Sum('cantidad_cambiada')
-    ).order_by('-total')[:10]
+    top_productos = totales_acumulados(acumulados, ['producto__nombre', 'producto__atributo', 'producto__codigo_barras'], limite=10)
     
     # Movimientos recientes - mostrar más
-    movimientos_recientes = movimientos.select_related('conteo', 'producto', 'usuario', 'item_conteo', 'conteo__usuario_creador', 'conteo__usuario_modificador').prefetch_related('conteo__parejas').order_by('-fecha_movimiento')[:100]
+    movimientos_recientes = MovimientoConteo.objects.select_related('conteo', 'producto', 'usuario', 'item_conteo', 'conteo__usuario_creador', 'conteo__usuario_modificador').prefetch_related('conteo__parejas').order_by('-fecha_movimiento')[:100]
     
     return render(request, 'movimientos/resumen.html', {
-        'total_movimientos': total_movimientos,
-        'total_usuarios': total_usuarios,
-        'total_productos': total_productos,
-        'total_conteos': total_conteos,
+        'total_movimientos': generales['total_movimientos'] or 0,
+        'total_usuarios': generales['total_usuarios'],
+        'total_productos': generales['total_productos'],
+        'total_conteos': generales['total_conteos'],
         'por_tipo': por_tipo,
         'top_usuarios': top_usuarios,
         'top_productos': top_productos,
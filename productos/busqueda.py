@@ -0,0 +1,130 @@
+"""
+Búsqueda de productos apoyada en el índice de texto creado en la migración 0008.
+
+- SQLite: tabla virtual FTS5 ``productos_producto_fts`` con tokenizador trigram.
+- PostgreSQL: índices GIN trigram (pg_trgm) que el planificador usa para ILIKE.
+
+Los resultados se ordenan por relevancia:
+código de barras exacto > código exacto > prefijo > coincidencia en el texto.
+
+Para los escaneos, ``buscar_por_codigo_exacto`` resuelve el código completo
+con índices exactos y una caché LRU antes de recurrir a la búsqueda de texto.
+"""
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .cache import codigos_productos
+from .models import Producto
+
+
+# Campos en los que se busca por defecto
+CAMPOS_BUSQUEDA = ('codigo_barras', 'codigo', 'nombre', 'marca', 'descripcion', 'categoria', 'atributo')
+
+# El tokenizador trigram necesita al menos 3 caracteres para usar el índice
+LONGITUD_MINIMA_INDICE = 3
+
+RELEVANCIA_CODIGO_BARRAS_EXACTO = 0
+RELEVANCIA_CODIGO_EXACTO = 1
+RELEVANCIA_PREFIJO = 2
+RELEVANCIA_TEXTO = 3
+
+
+def _usar_fts():
+    return connection.vendor == 'sqlite' and _tabla_fts_existe()
+
+
+def _tabla_fts_existe():
+    if not hasattr(connection, '_productos_fts_disponible'):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'productos_producto_fts'"
+            )
+            connection._productos_fts_disponible = cursor.fetchone() is not None
+    return connection._productos_fts_disponible
+
+
+def _consulta_fts(busqueda, campos):
+    """Construye la expresión MATCH de FTS5 restringida a los campos indicados"""
+    frase = '"' + busqueda.replace('"', '""') + '"'
+    return '{%s} : %s' % (' '.join(campos), frase)
+
+
+def buscar_por_codigo_exacto(codigo):
+    """
+    Busca un producto por código de barras exacto y, si no existe, por código exacto.
+
+    Usa la caché LRU del proceso, de modo que un código ya resuelto cuesta
+    una sola lectura por clave primaria. Retorna None si no hay coincidencia.
+    """
+    producto_id = codigos_productos.get(codigo)
+    if producto_id is not None:
+        producto = Producto.objects.filter(pk=producto_id).first()
+        # Otro proceso pudo haber cambiado el código del producto
+        if producto and codigo in (producto.codigo_barras, producto.codigo):
+            return producto
+        codigos_productos.eliminar(codigo)
+
+    producto = Producto.objects.filter(codigo_barras=codigo).first()
+    if producto is None:
+        producto = Producto.objects.filter(codigo=codigo).order_by('id').first()
+    if producto is not None:
+        codigos_productos.set(codigo, producto.pk)
+    return producto
+
+
+def filtro_busqueda(busqueda, campos=CAMPOS_BUSQUEDA):
+    """
+    Retorna un Q equivalente a OR de ``campo__icontains=busqueda`` sobre ``campos``,
+    resuelto con el índice de texto cuando está disponible.
+    """
+    if _usar_fts() and len(busqueda) >= LONGITUD_MINIMA_INDICE:
+        ids_coincidentes = RawSQL(
+            "SELECT rowid FROM productos_producto_fts WHERE productos_producto_fts MATCH %s",
+            (_consulta_fts(busqueda, campos),),
+        )
+        filtro = Q(id__in=ids_coincidentes)
+    else:
+        filtro = Q()
+        for campo in campos:
+            filtro |= Q(**{f'{campo}__icontains': busqueda})
+
+    # Búsqueda exacta por ID si es un número
+    try:
+        filtro |= Q(id=int(busqueda))
+    except ValueError:
+        pass
+
+    return filtro
+
+
+def anotar_relevancia(productos, busqueda):
+    """Anota ``relevancia`` (menor es mejor) sobre un queryset de productos"""
+    return productos.annotate(
+        relevancia=Case(
+            When(codigo_barras=busqueda, then=Value(RELEVANCIA_CODIGO_BARRAS_EXACTO)),
+            When(codigo__iexact=busqueda, then=Value(RELEVANCIA_CODIGO_EXACTO)),
+            When(
+                Q(codigo_barras__istartswith=busqueda) |
+                Q(codigo__istartswith=busqueda) |
+                Q(nombre__istartswith=busqueda),
+                then=Value(RELEVANCIA_PREFIJO)
+            ),
+            default=Value(RELEVANCIA_TEXTO),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def buscar_productos(productos, busqueda, campos=CAMPOS_BUSQUEDA, ordenar=True):
+    """
+    Filtra ``productos`` por ``busqueda`` usando el índice de texto.
+
+    Si ``ordenar`` es True los resultados quedan ordenados por relevancia,
+    marca y nombre, y por id para desempatar: el orden es total y las páginas
+    por desplazamiento no repiten ni saltan productos.
+    """
+    productos = productos.filter(filtro_busqueda(busqueda, campos))
+    if ordenar:
+        productos = anotar_relevancia(productos, busqueda).order_by('relevancia', 'marca', 'nombre', 'id')
+    return productos
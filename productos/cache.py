@@ -0,0 +1,80 @@
+"""
+Caché en memoria del proceso para resolver códigos escaneados a productos.
+
+Guarda ``código -> id de producto`` con política LRU. Las entradas se invalidan
+con las señales de guardado/eliminación de Producto (ver ``productos.signals``)
+y, como otros procesos no reciben esas señales, el llamador debe comprobar que
+el producto obtenido sigue teniendo ese código.
+"""
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+
+
+class CacheLRU:
+    """
+    Diccionario LRU con tamaño máximo, seguro entre hilos. Mantiene un índice
+    inverso valor -> claves para que ``eliminar_valor`` no recorra toda la caché.
+    """
+
+    def __init__(self, tamano_maximo):
+        self.tamano_maximo = tamano_maximo
+        self._datos = OrderedDict()
+        self._claves_por_valor = {}
+        self._lock = Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def get(self, clave):
+        with self._lock:
+            try:
+                valor = self._datos[clave]
+            except KeyError:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return valor
+
+    def _quitar_inverso(self, clave, valor):
+        claves = self._claves_por_valor.get(valor)
+        if claves is not None:
+            claves.discard(clave)
+            if not claves:
+                del self._claves_por_valor[valor]
+
+    def set(self, clave, valor):
+        with self._lock:
+            anterior = self._datos.get(clave)
+            if anterior is not None and anterior != valor:
+                self._quitar_inverso(clave, anterior)
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            self._claves_por_valor.setdefault(valor, set()).add(clave)
+            while len(self._datos) > self.tamano_maximo:
+                clave_vieja, valor_viejo = self._datos.popitem(last=False)
+                self._quitar_inverso(clave_vieja, valor_viejo)
+
+    def eliminar(self, clave):
+        with self._lock:
+            valor = self._datos.pop(clave, None)
+            if valor is not None:
+                self._quitar_inverso(clave, valor)
+
+    def eliminar_valor(self, valor):
+        """Elimina todas las claves que apuntan a ``valor``"""
+        with self._lock:
+            for clave in self._claves_por_valor.pop(valor, ()):
+                del self._datos[clave]
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._claves_por_valor.clear()
+
+    def __len__(self):
+        return len(self._datos)
+
+# Caché de códigos de barras / códigos escaneados -> id de producto
+codigos_productos = CacheLRU(getattr(settings, 'PRODUCTOS_CACHE_CODIGOS_TAMANO', 10000))
@@ -0,0 +1,78 @@
+from django.db import migrations
+
+
+# Columnas de Producto indexadas para la búsqueda de texto
+COLUMNAS_BUSQUEDA = ['codigo_barras', 'codigo', 'nombre', 'marca', 'descripcion', 'categoria', 'atributo']
+
+
+def _pg_trgm_disponible(schema_editor):
+    """Indica si el servidor PostgreSQL tiene la extensión pg_trgm"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def crear_indice_busqueda(apps, schema_editor):
+    """Crea el índice de búsqueda según el motor de base de datos"""
+    vendor = schema_editor.connection.vendor
+    columnas = ', '.join(COLUMNAS_BUSQUEDA)
+    nuevas = ', '.join(f'new.{c}' for c in COLUMNAS_BUSQUEDA)
+    viejas = ', '.join(f'old.{c}' for c in COLUMNAS_BUSQUEDA)
+
+    if vendor == 'sqlite':
+        # Tabla FTS5 de contenido externo con tokenizador trigram (búsqueda por subcadena)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS productos_producto_fts USING fts5("
+            f"{columnas}, content='productos_producto', content_rowid='id', tokenize='trigram')"
+        )
+        # Triggers para mantener el índice sincronizado con la tabla de productos
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS productos_producto_fts_ai AFTER INSERT ON productos_producto BEGIN "
+            f"INSERT INTO productos_producto_fts(rowid, {columnas}) VALUES (new.id, {nuevas}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS productos_producto_fts_ad AFTER DELETE ON productos_producto BEGIN "
+            f"INSERT INTO productos_producto_fts(productos_producto_fts, rowid, {columnas}) "
+            f"VALUES ('delete', old.id, {viejas}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS productos_producto_fts_au AFTER UPDATE ON productos_producto BEGIN "
+            f"INSERT INTO productos_producto_fts(productos_producto_fts, rowid, {columnas}) "
+            f"VALUES ('delete', old.id, {viejas}); "
+            f"INSERT INTO productos_producto_fts(rowid, {columnas}) VALUES (new.id, {nuevas}); END"
+        )
+        # Indexar los productos existentes
+        schema_editor.execute("INSERT INTO productos_producto_fts(productos_producto_fts) VALUES ('rebuild')")
+    elif vendor == 'postgresql' and _pg_trgm_disponible(schema_editor):
+        # Índices trigram: PostgreSQL los usa automáticamente para ILIKE '%texto%'
+        # (sin pg_trgm en el servidor no se crea: las búsquedas recorren la tabla completa)
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for columna in COLUMNAS_BUSQUEDA:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS productos_producto_{columna}_trgm "
+                f"ON productos_producto USING gin (UPPER({columna}) gin_trgm_ops)"
+            )
+
+
+def eliminar_indice_busqueda(apps, schema_editor):
+    """Elimina el índice de búsqueda"""
+    vendor = schema_editor.connection.vendor
+
+    if vendor == 'sqlite':
+        for sufijo in ['ai', 'ad', 'au']:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS productos_producto_fts_{sufijo}")
+        schema_editor.execute("DROP TABLE IF EXISTS productos_producto_fts")
+    elif vendor == 'postgresql':
+        for columna in COLUMNAS_BUSQUEDA:
+            schema_editor.execute(f"DROP INDEX IF EXISTS productos_producto_{columna}_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0007_producto_parejas_asignadas'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice_busqueda, eliminar_indice_busqueda),
+    ]
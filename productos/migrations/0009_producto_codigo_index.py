@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 01:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0008_producto_indice_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['codigo'], name='productos_p_codigo_bbe51f_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:03
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+
+def crear_contador(apps, schema_editor):
+    """Crea la única fila del contador de cambios"""
+    ContadorCatalogo = apps.get_model('productos', 'ContadorCatalogo')
+    ContadorCatalogo.objects.get_or_create(pk=1)
+
+
+def restaurar_indice_busqueda(apps, schema_editor):
+    """SQLite recrea la tabla al agregar o quitar la columna y con ella se pierden los triggers del índice FTS5"""
+    if schema_editor.connection.vendor == 'sqlite':
+        indice = import_module('productos.migrations.0008_producto_indice_busqueda')
+        indice.crear_indice_busqueda(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0010_producto_marca_nombre_index'),
+    ]
+
+    operations = [
+        # Al revertir, después de quitar la columna
+        migrations.RunPython(migrations.RunPython.noop, restaurar_indice_busqueda),
+        migrations.CreateModel(
+            name='ContadorCatalogo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.PositiveBigIntegerField(default=0, verbose_name='Valor')),
+            ],
+            options={
+                'verbose_name': 'Contador del Catálogo',
+                'verbose_name_plural': 'Contador del Catálogo',
+            },
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='version_catalogo',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, editable=False, help_text='Número de cambio (ContadorCatalogo) de la última modificación', verbose_name='Versión en el Catálogo'),
+        ),
+        migrations.RunPython(restaurar_indice_busqueda, migrations.RunPython.noop),
+        migrations.RunPython(crear_contador, migrations.RunPython.noop),
+    ]
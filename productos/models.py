@@ -1,4 +1,13 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+
+
+class ProductoQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """Actualiza las filas con un número de cambio nuevo del catálogo (también ``bulk_update``)"""
+        with transaction.atomic(using=self.db):
+            kwargs.setdefault('version_catalogo', ContadorCatalogo.siguiente())
+            return super().update(**kwargs)
 
 
 class Producto(models.Model):
@@ -16,6 +25,13 @@ class Producto(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
     fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name="Fecha de Actualización")
     activo = models.BooleanField(default=True, verbose_name="Activo")
+    version_catalogo = models.PositiveBigIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        verbose_name="Versión en el Catálogo",
+        help_text="Número de cambio (ContadorCatalogo) de la última modificación"
+    )
     parejas_asignadas = models.ManyToManyField(
         'usuarios.ParejaConteo',
         related_name='productos_asignados',
@@ -28,9 +44,25 @@ class Producto(models.Model):
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ['nombre']
+        indexes = [
+            # Búsqueda exacta por código al escanear (ver productos.busqueda)
+            models.Index(fields=['codigo']),
+            # Filtro por marca y orden por defecto de la lista de productos
+            models.Index(fields=['marca', 'nombre']),
+        ]
+
+    objects = ProductoQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.nombre} ({self.codigo_barras})"
+
+    def save(self, *args, **kwargs):
+        # El número de cambio se toma en la misma transacción que el guardado
+        with transaction.atomic():
+            self.version_catalogo = ContadorCatalogo.siguiente()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version_catalogo'}
+            super().save(*args, **kwargs)
     
     def get_stock_actual(self):
         """Calcula el stock actual desde el último conteo físico finalizado"""
@@ -50,5 +82,32 @@ class Producto(models.Model):
             if item:
                 return item.cantidad
         
-        return 0
+        # Los conteos archivados (los más antiguos) solo tienen sus items en la instantánea
+        from conteo.instantaneas import cantidad_archivada
+        return cantidad_archivada(self.id) or 0
+
+
+
+class ContadorCatalogo(models.Model):
+    """
+    Contador de cambios del catálogo de productos (una sola fila). Cada guardado
+    o ``update()`` de productos toma el número siguiente dentro de su transacción;
+    la fila queda bloqueada hasta que esta termina, así que los números se
+    confirman en orden y un cliente que vio el número N no puede perderse un
+    cambio confirmado después con un número menor. Ver ``conteo.catalogo``.
+    """
+    valor = models.PositiveBigIntegerField(default=0, verbose_name="Valor")
+
+    class Meta:
+        verbose_name = "Contador del Catálogo"
+        verbose_name_plural = "Contador del Catálogo"
+
+    def __str__(self):
+        return f"Catálogo v{self.valor}"
 
+    @classmethod
+    def siguiente(cls):
+        """Incrementa el contador y retorna el nuevo valor"""
+        if not cls.objects.filter(pk=1).update(valor=F('valor') + 1):
+            cls.objects.create(pk=1, valor=1)
+        return cls.objects.filter(pk=1).values_list('valor', flat=True).get()
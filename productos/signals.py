@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .cache import codigos_productos
+from .models import Producto
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def invalidar_cache_codigos(sender, instance, **kwargs):
+    """Invalida los códigos cacheados del producto modificado o eliminado"""
+    codigos_productos.eliminar_valor(instance.pk)
+    # Un producto nuevo o editado puede ahora coincidir con estos códigos
+    codigos_productos.eliminar(instance.codigo_barras)
+    if instance.codigo:
+        codigos_productos.eliminar(instance.codigo)
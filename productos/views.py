@@ -3,7 +3,6 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.db import transaction
-from django.db.models import Q
 from django.http import HttpResponse
 from django.utils import timezone
 from django import forms
@@ -12,10 +11,16 @@ from io import BytesIO
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from .models import Producto
 from .forms import ProductoForm, ImportarProductosForm, ImportarProductosAPIForm
+from .busqueda import filtro_busqueda, anotar_relevancia
 from usuarios.models import ParejaConteo
 from conteo.models import Conteo
+from conteo.instantaneas import stocks_actuales
 
 
+# Campos de búsqueda de cada listado
+CAMPOS_LISTA = ('codigo_barras', 'codigo', 'nombre', 'marca', 'descripcion', 'atributo')
+CAMPOS_ASIGNACION = ('codigo_barras', 'codigo', 'nombre', 'marca', 'atributo')
+
 @login_required
 def lista_productos(request):
     """Lista todos los productos con paginación y filtros"""
@@ -30,30 +35,8 @@ def lista_productos(request):
     # Búsqueda por nombre, código de barras, código, atributo o ID
     busqueda = request.GET.get('busqueda', '').strip()
     if busqueda:
-        # Intentar buscar por ID si es un número
-        try:
-            busqueda_id = int(busqueda)
-            productos = productos.filter(
-                Q(id=busqueda_id) |
-                Q(codigo_barras__icontains=busqueda) |
-                Q(codigo_barras__iexact=busqueda) |
-                Q(codigo__icontains=busqueda) |
-                Q(nombre__icontains=busqueda) |
-                Q(marca__icontains=busqueda) |
-                Q(descripcion__icontains=busqueda) |
-                Q(atributo__icontains=busqueda)
-            )
-        except ValueError:
-            # Si no es un número, buscar por texto (código de barras, código, nombre, descripción, atributo)
-            productos = productos.filter(
-                Q(codigo_barras__icontains=busqueda) |
-                Q(codigo_barras__iexact=busqueda) |
-                Q(codigo__icontains=busqueda) |
-                Q(nombre__icontains=busqueda) |
-                Q(marca__icontains=busqueda) |
-                Q(descripcion__icontains=busqueda) |
-                Q(atributo__icontains=busqueda)
-            )
+        # Búsqueda con el índice de texto (incluye búsqueda por ID si es un número)
+        productos = productos.filter(filtro_busqueda(busqueda, campos=CAMPOS_LISTA))
     
     # Filtros
     marca_filtro = request.GET.get('marca', '').strip()
@@ -69,21 +52,15 @@ def lista_productos(request):
         productos = productos.filter(atributo__icontains=atributo_filtro)
     
     stock_filtro = request.GET.get('stock', '').strip()
-    if stock_filtro:
+    if stock_filtro in ('con_stock', 'sin_stock'):
+        # Stock de todos los productos contados, cargado una vez
+        stocks = stocks_actuales()
         if stock_filtro == 'con_stock':
             # Productos con stock > 0
-            productos_ids = []
-            for producto in productos:
-                if producto.get_stock_actual() > 0:
-                    productos_ids.append(producto.id)
-            productos = productos.filter(id__in=productos_ids)
-        elif stock_filtro == 'sin_stock':
-            # Productos con stock = 0
-            productos_ids = []
-            for producto in productos:
-                if producto.get_stock_actual() == 0:
-                    productos_ids.append(producto.id)
-            productos = productos.filter(id__in=productos_ids)
+            productos = productos.filter(id__in=[producto_id for producto_id, stock in stocks.items() if stock > 0])
+        else:
+            # Productos con stock = 0 (incluye los que nunca se contaron)
+            productos = productos.exclude(id__in=[producto_id for producto_id, stock in stocks.items() if stock != 0])
     
     precio_min = request.GET.get('precio_min', '').strip()
     if precio_min:
@@ -101,8 +78,8 @@ def lista_productos(request):
         except ValueError:
             pass
     
-    # Ordenamiento
-    orden = request.GET.get('orden', 'marca')
+    # Ordenamiento (al buscar, por defecto se ordena por relevancia)
+    orden = request.GET.get('orden', 'relevancia' if busqueda else 'marca')
     orden_opciones = {
         'nombre': 'nombre',
         '-nombre': '-nombre',
@@ -115,7 +92,10 @@ def lista_productos(request):
         'codigo_barras': 'codigo_barras',
         '-codigo_barras': '-codigo_barras',
     }
-    if orden in orden_opciones:
+    if busqueda and orden == 'relevancia':
+        # Mostrar primero los resultados más relevantes
+        productos = anotar_relevancia(productos, busqueda).order_by('relevancia', 'marca', 'nombre', 'id')
+    elif orden in orden_opciones:
         productos = productos.order_by(orden_opciones[orden], 'nombre')  # Ordenar por el campo seleccionado y luego por nombre
     else:
         productos = productos.order_by('marca', 'nombre')  # Ordenar por marca y luego por nombre
@@ -129,6 +109,9 @@ def lista_productos(request):
     paginator = Paginator(productos, 100)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    stocks = stocks_actuales([producto.id for producto in page_obj])
+    for producto in page_obj:
+        producto.stock_actual = stocks.get(producto.id, 0)
     
     # Construir URL base para paginación (mantener filtros)
     params = request.GET.copy()
@@ -449,26 +432,7 @@ def asignar_multiples_parejas(request):
     # Filtros de búsqueda
     busqueda = request.GET.get('busqueda', '').strip()
     if busqueda:
-        try:
-            busqueda_id = int(busqueda)
-            productos = productos.filter(
-                Q(id=busqueda_id) |
-                Q(codigo_barras__icontains=busqueda) |
-                Q(codigo_barras__iexact=busqueda) |
-                Q(codigo__icontains=busqueda) |
-                Q(nombre__icontains=busqueda) |
-                Q(marca__icontains=busqueda) |
-                Q(atributo__icontains=busqueda)
-            )
-        except ValueError:
-            productos = productos.filter(
-                Q(codigo_barras__icontains=busqueda) |
-                Q(codigo_barras__iexact=busqueda) |
-                Q(codigo__icontains=busqueda) |
-                Q(nombre__icontains=busqueda) |
-                Q(marca__icontains=busqueda) |
-                Q(atributo__icontains=busqueda)
-            )
+        productos = productos.filter(filtro_busqueda(busqueda, campos=CAMPOS_ASIGNACION))
     
     # Filtros adicionales
     marca_filtro = request.GET.get('marca', '').strip()
@@ -751,6 +715,8 @@ def exportar_productos(request):
     # Obtener todos los productos (activos e inactivos)
     productos = Producto.objects.all().order_by('nombre')
     
+    stocks = stocks_actuales()
+    
     # Preparar datos para el DataFrame
     # Usar nombres de columnas compatibles con la importación (minúsculas, sin espacios o con guiones bajos)
     datos = []
@@ -765,7 +731,7 @@ def exportar_productos(request):
             'atributo': producto.atributo or '',
             'precio': float(producto.precio),
             'unidad_medida': producto.unidad_medida,
-            'stock_actual': producto.get_stock_actual(),  # Stock calculado dinámicamente
+            'stock_actual': stocks.get(producto.id, 0),  # Stock calculado dinámicamente
             'activo': 'Sí' if producto.activo else 'No',
             'fecha_creacion': producto.fecha_creacion.strftime('%Y-%m-%d %H:%M:%S') if producto.fecha_creacion else '',
             'fecha_actualizacion': producto.fecha_actualizacion.strftime('%Y-%m-%d %H:%M:%S') if producto.fecha_actualizacion else '',
@@ -858,7 +824,7 @@ def exportar_productos(request):
             total_cell.border = border
             
             # Total stock
-            total_stock = sum(p.get_stock_actual() for p in productos)
+            total_stock = sum(stocks.get(p.id, 0) for p in productos)
             stock_cell = worksheet[f'J{total_row}']
             stock_cell.value = total_stock
             stock_cell.fill = total_fill
@@ -868,7 +834,7 @@ def exportar_productos(request):
             stock_cell.border = border
             
             # Total valor (precio * stock) - en columna I (unidad_medida) o crear nueva columna
-            total_valor = sum(float(p.precio) * p.get_stock_actual() for p in productos)
+            total_valor = sum(float(p.precio) * stocks.get(p.id, 0) for p in productos)
             worksheet.merge_cells(f'I{total_row}:K{total_row}')
             valor_cell = worksheet[f'I{total_row}']
             valor_cell.value = f'Valor Total Inventario: ${total_valor:,.2f}'
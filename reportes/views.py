@@ -8,7 +8,8 @@ from datetime import datetime, timedelta
 import csv
 import json
 
-from conteo.models import Conteo, ItemConteo
+from conteo.models import Conteo, ConteoInstantanea, ItemConteo
+from conteo.instantaneas import cargar_instantanea, stocks_actuales
 from productos.models import Producto
 from .models import Reporte
 
@@ -41,6 +42,12 @@ def reporte_conteo(request):
     conteos_finalizados = conteos.filter(estado='finalizado').count()
     total_items = ItemConteo.objects.filter(conteo__in=conteos).count()
     total_cantidad = ItemConteo.objects.filter(conteo__in=conteos).aggregate(Sum('cantidad'))['cantidad__sum'] or 0
+    # Los conteos archivados ya no tienen items: sus totales están en la instantánea
+    archivados = ConteoInstantanea.objects.filter(conteo__in=conteos, conteo__fecha_archivo__isnull=False).aggregate(
+        items=Sum('total_items'), cantidad=Sum('total_cantidad')
+    )
+    total_items += archivados['items'] or 0
+    total_cantidad += archivados['cantidad'] or 0
     
     return render(request, 'reportes/reporte_conteo.html', {
         'conteos': conteos,
@@ -73,14 +80,15 @@ def reporte_inventario(request):
     
     # Estadísticas
     total_productos = productos.count()
-    total_stock = sum(p.get_stock_actual() for p in productos)
-    valor_inventario = sum(float(p.precio) * p.get_stock_actual() for p in productos)
+    stocks = stocks_actuales()
+    total_stock = sum(stocks.get(p.id, 0) for p in productos)
+    valor_inventario = sum(float(p.precio) * stocks.get(p.id, 0) for p in productos)
     categorias = Producto.objects.all().values_list('categoria', flat=True).distinct()
     
     # Agregar valor_total a cada producto para el template
     productos_list = []
     for p in productos[:100]:
-        stock = p.get_stock_actual()
+        stock = stocks.get(p.id, 0)
         productos_list.append({
             'producto': p,
             'stock_actual': stock,
@@ -102,16 +110,23 @@ def reporte_inventario(request):
 def reporte_diferencias(request, conteo_id):
     """Reporte de diferencias entre inventario y conteo físico"""
     conteo = Conteo.objects.get(pk=conteo_id)
-    items = conteo.items.all().select_related('producto')
-    
+    if conteo.fecha_archivo:
+        # Conteo archivado: los items están en la instantánea
+        arreglo = cargar_instantanea(conteo)
+        productos = Producto.objects.in_bulk(arreglo[:, 0].tolist())
+        items = [(productos[producto_id], cantidad) for producto_id, cantidad in arreglo.tolist() if producto_id in productos]
+    else:
+        items = [(item.producto, item.cantidad) for item in conteo.items.all().select_related('producto')]
+    
+    stocks = stocks_actuales(producto.id for producto, _ in items)
     diferencias = []
-    for item in items:
-        stock_sistema = item.producto.get_stock_actual()
-        diferencia = item.cantidad - stock_sistema
+    for producto, cantidad in items:
+        stock_sistema = stocks.get(producto.id, 0)
+        diferencia = cantidad - stock_sistema
         diferencias.append({
-            'producto': item.producto,
+            'producto': producto,
             'stock_sistema': stock_sistema,
-            'conteo_fisico': item.cantidad,
+            'conteo_fisico': cantidad,
             'diferencia': diferencia,
             'porcentaje': (diferencia / stock_sistema * 100) if stock_sistema > 0 else 0
         })
@@ -128,7 +143,7 @@ def reporte_diferencias(request, conteo_id):
 @login_required
 def exportar_reporte_conteo(request):
     """Exporta reporte de conteo a CSV"""
-    conteos = Conteo.objects.all()
+    conteos = Conteo.objects.all().select_related('instantanea').defer('instantanea__datos')
     
     response = HttpResponse(content_type='text/csv')
     response['Content-Disposition'] = f'attachment; filename="reporte_conteo_{timezone.now().strftime("%Y%m%d")}.csv"'
@@ -137,8 +152,12 @@ def exportar_reporte_conteo(request):
     writer.writerow(['Nombre', 'Número Conteo', 'Usuario 1', 'Usuario 2', 'Estado', 'Fecha Inicio', 'Fecha Fin', 'Total Items', 'Total Cantidad'])
     
     for conteo in conteos:
-        total_items = conteo.items.count()
-        total_cantidad = conteo.items.aggregate(Sum('cantidad'))['cantidad__sum'] or 0
+        if conteo.fecha_archivo:
+            total_items = conteo.instantanea.total_items
+            total_cantidad = conteo.instantanea.total_cantidad
+        else:
+            total_items = conteo.items.count()
+            total_cantidad = conteo.items.aggregate(Sum('cantidad'))['cantidad__sum'] or 0
         writer.writerow([
             conteo.nombre,
             conteo.numero_conteo,
@@ -171,8 +190,9 @@ def exportar_reporte_inventario(request):
     writer = csv.writer(response)
     writer.writerow(['Código de Barras', 'Nombre', 'Categoría', 'Stock Actual', 'Precio', 'Valor Total'])
     
+    stocks = stocks_actuales()
     for producto in productos:
-        stock = producto.get_stock_actual()
+        stock = stocks.get(producto.id, 0)
         valor_total = producto.precio * stock
         writer.writerow([
             producto.codigo_barras,
@@ -0,0 +1,59 @@
+"""
+Archiva los conteos finalizados antiguos (ver ``conteo.archivo``).
+
+Los items de cada conteo quedan en su instantánea y los movimientos pasan a
+``MovimientoArchivado`` (sus totales siguen en ``AcumuladoMovimientos``), de modo que
+``ItemConteo`` y ``MovimientoConteo`` solo guardan los conteos recientes.
+
+Uso:
+    python scripts/archivar_conteos.py [--dias 90] [--simular]
+"""
+import os
+import sys
+import argparse
+import django
+
+# Configurar encoding para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# Configurar Django
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from conteo.archivo import archivar_conteo, conteos_para_archivar
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archiva los conteos finalizados antiguos')
+    parser.add_argument('--dias', type=int, default=90, help='Antigüedad mínima en días desde la finalización (90 por defecto)')
+    parser.add_argument('--simular', action='store_true', help='Solo listar los conteos que se archivarían')
+    args = parser.parse_args()
+
+    conteos = list(conteos_para_archivar(args.dias))
+    if not conteos:
+        print("No hay conteos para archivar")
+        return
+
+    total_items = total_movimientos = 0
+    for conteo in conteos:
+        if args.simular:
+            print(f"  - {conteo.nombre} (finalizado {conteo.fecha_fin:%Y-%m-%d})")
+            continue
+        resultado = archivar_conteo(conteo)
+        total_items += resultado['items']
+        total_movimientos += resultado['movimientos']
+        print(f"  ✓ {conteo.nombre}: {resultado['items']} items, {resultado['movimientos']} movimientos")
+
+    if args.simular:
+        print(f"Conteos que se archivarían: {len(conteos)}")
+    else:
+        print(f"Conteos archivados: {len(conteos)} ({total_items} items, {total_movimientos} movimientos)")
+
+
+if __name__ == '__main__':
+    main()
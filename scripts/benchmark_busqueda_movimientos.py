@@ -0,0 +1,162 @@
+"""
+Benchmark de la búsqueda en el registro de movimientos: OR de icontains sobre el
+join vs ids resueltos con los índices de texto (``movimientos.busqueda``).
+
+Crea productos, usuarios, un conteo y movimientos sintéticos dentro de una
+transacción (que se revierte al final) y mide, para varias búsquedas, la misma
+forma de consulta que ``lista_movimientos``: los 100 primeros movimientos por
+(-fecha_movimiento, -id). Muestra la mediana en milisegundos.
+
+Uso:
+    python scripts/benchmark_busqueda_movimientos.py [cantidad_movimientos]
+"""
+import os
+import sys
+import random
+import statistics
+import time
+import django
+
+# Configurar encoding para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# Configurar Django
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from conteo.models import Conteo
+from movimientos.busqueda import filtro_busqueda_movimientos
+from movimientos.models import MovimientoConteo
+from productos.models import Producto
+
+CANTIDAD_POR_DEFECTO = 1000000
+CANTIDAD_PRODUCTOS = 20000
+CANTIDAD_USUARIOS = 40
+REPETICIONES = 5
+TAMANO_LOTE = 20000
+
+MARCAS = ['Tersa', 'Lumina', 'Natura', 'Bella', 'Vital', 'Aqua', 'Rosa', 'Sol']
+TIPOS = ['Crema', 'Shampoo', 'Labial', 'Perfume', 'Jabon', 'Serum', 'Gel', 'Locion']
+
+
+def crear_datos(cantidad):
+    """Crea los datos sintéticos con bulk_create"""
+    aleatorio = random.Random(42)
+    productos = []
+    for i in range(CANTIDAD_PRODUCTOS):
+        tipo, marca = aleatorio.choice(TIPOS), aleatorio.choice(MARCAS)
+        productos.append(Producto(
+            codigo_barras=f'BMOV{880000000000 + i}',
+            codigo=f'BM-{i:06d}',
+            nombre=f'{tipo} {marca} {i}',
+            marca=marca,
+            descripcion=f'{tipo} de la línea {marca}',
+            atributo=aleatorio.choice(['Rojo', '250ml', 'Mate', None]),
+        ))
+    productos_ids = [p.id for p in Producto.objects.bulk_create(productos, batch_size=2000)]
+    usuarios_ids = [
+        User.objects.create(username=f'bench_mov_{i}', first_name=f'Contador{i}', last_name='Benchmark').id
+        for i in range(CANTIDAD_USUARIOS)
+    ]
+    conteo = Conteo.objects.create(nombre='Conteo Benchmark Movimientos')
+
+    for inicio in range(0, cantidad, TAMANO_LOTE):
+        MovimientoConteo.objects.bulk_create([
+            MovimientoConteo(
+                conteo_id=conteo.id,
+                producto_id=aleatorio.choice(productos_ids),
+                usuario_id=aleatorio.choice(usuarios_ids),
+                tipo='agregar',
+                cantidad_nueva=1,
+                cantidad_cambiada=1,
+                # Una de cada 200 filas con observaciones
+                observaciones=f'Ajuste manual lote {i}' if i % 200 == 0 else None,
+            )
+            for i in range(inicio, min(inicio + TAMANO_LOTE, cantidad))
+        ], batch_size=2000)
+
+
+def busqueda_legacy(busqueda):
+    """Búsqueda original: OR de 11 icontains sobre el join"""
+    return MovimientoConteo.objects.filter(
+        Q(producto__nombre__icontains=busqueda) |
+        Q(producto__codigo_barras__icontains=busqueda) |
+        Q(producto__codigo__icontains=busqueda) |
+        Q(producto__atributo__icontains=busqueda) |
+        Q(producto__descripcion__icontains=busqueda) |
+        Q(usuario__username__icontains=busqueda) |
+        Q(usuario__first_name__icontains=busqueda) |
+        Q(usuario__last_name__icontains=busqueda) |
+        Q(usuario__email__icontains=busqueda) |
+        Q(conteo__nombre__icontains=busqueda) |
+        Q(observaciones__icontains=busqueda)
+    )
+
+
+def busqueda_indice(busqueda):
+    return MovimientoConteo.objects.filter(filtro_busqueda_movimientos(busqueda))
+
+
+def medir(funcion):
+    """Ejecuta la función REPETICIONES veces y retorna la mediana en ms"""
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def primera_pagina(movimientos):
+    return list(movimientos.order_by('-fecha_movimiento', '-id').values_list('id', flat=True)[:100])
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else CANTIDAD_POR_DEFECTO
+
+    print("=" * 70)
+    print(f"BENCHMARK DE BÚSQUEDA DE MOVIMIENTOS ({cantidad} movimientos sintéticos)")
+    print("=" * 70)
+
+    busquedas = [
+        f'BMOV{880000000000 + CANTIDAD_PRODUCTOS // 2}',  # Código de barras exacto (pocos movimientos)
+        f'BM-{CANTIDAD_PRODUCTOS // 3:06d}',              # Código del producto
+        'Contador7',                                       # Nombre de usuario
+        'lote 4000',                                       # Observaciones
+        'sin coincidencias',                               # Nada: recorre todo el join en legacy
+    ]
+
+    with transaction.atomic():
+        inicio = time.perf_counter()
+        crear_datos(cantidad)
+        print(f"Datos creados en {time.perf_counter() - inicio:.1f} s")
+        print()
+        print(f"{'Búsqueda':<22}{'Resultados':>12}{'Legacy (ms)':>14}{'Índice (ms)':>14}{'Mejora':>10}")
+        print("-" * 72)
+
+        for busqueda in busquedas:
+            resultados = busqueda_indice(busqueda).count()
+            if resultados != busqueda_legacy(busqueda).count():
+                print(f"  ¡Resultados distintos para {busqueda!r}!")
+            tiempo_legacy = medir(lambda: primera_pagina(busqueda_legacy(busqueda)))
+            tiempo_indice = medir(lambda: primera_pagina(busqueda_indice(busqueda)))
+            mejora = tiempo_legacy / tiempo_indice if tiempo_indice else 0
+            print(f"{busqueda:<22}{resultados:>12}{tiempo_legacy:>14.2f}{tiempo_indice:>14.2f}{mejora:>9.1f}x")
+
+        # Revertir los datos sintéticos
+        transaction.set_rollback(True)
+
+    print()
+    print("Datos sintéticos eliminados (transacción revertida).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark de la búsqueda de productos: OR de icontains vs índice de texto.
+
+Crea productos sintéticos dentro de una transacción (que se revierte al final),
+mide ambas estrategias con varias búsquedas y muestra la mediana en milisegundos.
+
+Uso:
+    python scripts/benchmark_busqueda_productos.py [cantidad_productos]
+"""
+import os
+import sys
+import random
+import statistics
+import time
+import django
+
+# Configurar encoding para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# Configurar Django
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.db import transaction
+from django.db.models import Q
+from productos.models import Producto
+from productos.busqueda import buscar_productos, CAMPOS_BUSQUEDA
+
+CANTIDAD_POR_DEFECTO = 50000
+REPETICIONES = 20
+
+MARCAS = ['Tersa', 'Lumina', 'Natura', 'Bella', 'Vital', 'Aqua', 'Rosa', 'Sol']
+TIPOS = ['Crema', 'Shampoo', 'Labial', 'Perfume', 'Jabon', 'Serum', 'Gel', 'Locion']
+ATRIBUTOS = ['Rojo', 'Azul', '250ml', '500ml', 'Mate', 'Brillante', 'Sin aroma', None]
+
+
+def crear_productos(cantidad):
+    """Crea productos sintéticos con bulk_create"""
+    aleatorio = random.Random(42)
+    productos = []
+    for i in range(cantidad):
+        tipo = aleatorio.choice(TIPOS)
+        marca = aleatorio.choice(MARCAS)
+        productos.append(Producto(
+            codigo_barras=f'BENCH{770000000000 + i}',
+            codigo=f'BX-{i:06d}',
+            nombre=f'{tipo} {marca} {i}',
+            marca=marca,
+            descripcion=f'{tipo} de la línea {marca} para pruebas de rendimiento',
+            categoria=tipo,
+            atributo=aleatorio.choice(ATRIBUTOS),
+        ))
+    Producto.objects.bulk_create(productos, batch_size=2000)
+
+
+def busqueda_legacy(busqueda):
+    """Búsqueda original: OR de icontains sobre todos los campos"""
+    filtro = Q()
+    for campo in CAMPOS_BUSQUEDA:
+        filtro |= Q(**{f'{campo}__icontains': busqueda})
+    return Producto.objects.filter(filtro)
+
+
+def medir(funcion):
+    """Ejecuta la función REPETICIONES veces y retorna la mediana en ms"""
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else CANTIDAD_POR_DEFECTO
+
+    print("=" * 70)
+    print(f"BENCHMARK DE BÚSQUEDA DE PRODUCTOS ({cantidad} productos sintéticos)")
+    print("=" * 70)
+
+    busquedas = [
+        f'BENCH{770000000000 + cantidad // 2}',  # Código de barras exacto
+        f'BX-{cantidad // 3:06d}',               # Código exacto
+        'Serum Aqua',                             # Prefijo de nombre
+        'Brillante',                              # Palabra en atributo
+        'línea Vital',                            # Texto en descripción
+    ]
+
+    with transaction.atomic():
+        inicio = time.perf_counter()
+        crear_productos(cantidad)
+        print(f"Productos creados en {time.perf_counter() - inicio:.1f} s")
+        print()
+        print(f"{'Búsqueda':<26}{'Resultados':>12}{'Legacy (ms)':>14}{'Índice (ms)':>14}{'Mejora':>10}")
+        print("-" * 76)
+
+        for busqueda in busquedas:
+            resultados = buscar_productos(Producto.objects.all(), busqueda).count()
+            # Misma forma de consulta que la vista: primeros 20 resultados ordenados
+            tiempo_legacy = medir(lambda: list(busqueda_legacy(busqueda).order_by('marca', 'nombre')[:20]))
+            tiempo_indice = medir(lambda: list(buscar_productos(Producto.objects.all(), busqueda)[:20]))
+            mejora = tiempo_legacy / tiempo_indice if tiempo_indice else 0
+            print(f"{busqueda:<26}{resultados:>12}{tiempo_legacy:>14.2f}{tiempo_indice:>14.2f}{mejora:>9.1f}x")
+
+        # Revertir los productos sintéticos
+        transaction.set_rollback(True)
+
+    print()
+    print("Productos sintéticos eliminados (transacción revertida).")
+
+
+if __name__ == '__main__':
+    main()
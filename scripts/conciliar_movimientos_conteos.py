@@ -0,0 +1,90 @@
+"""
+Concilia las cantidades de los items de conteo con el registro de movimientos
+(ver ``conteo.conciliacion``).
+
+Reconstruye la cantidad esperada de cada producto con una lectura ordenada de
+los movimientos de cada conteo y la compara con ``ItemConteo.cantidad``. Con
+``--reparar`` corrige las diferencias de cantidad; con ``--procesos N`` reparte
+los conteos en N procesos.
+
+Uso:
+    python scripts/conciliar_movimientos_conteos.py [--conteo ID ...] [--reparar] [--procesos N]
+"""
+import os
+import sys
+import argparse
+import django
+
+# Configurar encoding para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# Configurar Django
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from conteo.conciliacion import conciliar, conteos_conciliables, reparar_diferencias
+
+# Detalles mostrados por conteo y categoría
+LIMITE_DETALLES = 20
+
+
+def mostrar(titulo, filas, formato):
+    if not filas:
+        return
+    print(f"    {titulo}: {len(filas)}")
+    for fila in filas[:LIMITE_DETALLES]:
+        print(f"      {formato(*fila)}")
+    if len(filas) > LIMITE_DETALLES:
+        print(f"      ... y {len(filas) - LIMITE_DETALLES} más")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concilia los items de conteo con el registro de movimientos')
+    parser.add_argument('--conteo', type=int, nargs='+', help='IDs de los conteos a conciliar (todos los no archivados por defecto)')
+    parser.add_argument('--reparar', action='store_true', help='Corrige las cantidades de los items con diferencias')
+    parser.add_argument('--procesos', type=int, default=1, help='Procesos en paralelo (1 por defecto)')
+    args = parser.parse_args()
+
+    conteos = conteos_conciliables()
+    if args.conteo:
+        conteos = conteos.filter(id__in=args.conteo)
+    conteos = {conteo.id: conteo for conteo in conteos}
+
+    con_diferencias = 0
+    reparados = 0
+    for resultado in conciliar(conteos, procesos=args.procesos):
+        conteo = conteos[resultado['conteo_id']]
+        problemas = sum(len(resultado[clave]) for clave in ('diferencias', 'sobrantes', 'faltantes', 'sin_movimientos'))
+        if not problemas:
+            print(f"✓ {conteo.nombre} (ID {conteo.id}): {resultado['items']} items")
+            continue
+
+        con_diferencias += 1
+        print(f"✗ {conteo.nombre} (ID {conteo.id}): {resultado['items']} items")
+        mostrar('Cantidades distintas', resultado['diferencias'],
+                lambda item_id, producto_id, cantidad, esperada: f"Item {item_id} (producto {producto_id}): {cantidad}, registro {esperada}")
+        mostrar('Items eliminados en el registro', resultado['sobrantes'],
+                lambda item_id, producto_id: f"Item {item_id} (producto {producto_id})")
+        mostrar('Items faltantes', resultado['faltantes'],
+                lambda producto_id, esperada: f"Producto {producto_id}: registro {esperada}")
+        mostrar('Items sin movimientos', resultado['sin_movimientos'],
+                lambda item_id, producto_id: f"Item {item_id} (producto {producto_id})")
+        if args.reparar and resultado['diferencias']:
+            reparados_conteo = reparar_diferencias(conteo, resultado['diferencias'])
+            reparados += reparados_conteo
+            print(f"    Cantidades reparadas: {reparados_conteo} de {len(resultado['diferencias'])}")
+
+    print(f"\nConteos conciliados: {len(conteos)}, con diferencias: {con_diferencias}")
+    if args.reparar:
+        print(f"Items reparados: {reparados}")
+    if con_diferencias and not args.reparar:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
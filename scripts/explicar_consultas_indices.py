@@ -0,0 +1,308 @@
+"""
+Planes de ejecución de las consultas de las vistas principales con y sin cada
+índice agregado para sus filtros:
+
+- ``Conteo(estado, fecha_fin)``: stock del detalle de producto y conteos para archivar.
+- ``Conteo(estado, fecha_modificacion)``: alerta de conteos sin actividad del dashboard.
+- ``ItemConteo(conteo, usuario_conteo)``: items contados por la pareja (``conteo:lista_conteo``).
+- ``Producto(marca, nombre)``: filtro por marca y orden por defecto de la lista de productos.
+- ``Producto(codigo)``: búsqueda exacta por código al escanear.
+- ``ItemComparativo(comparativo, diferencia_sistema1/2)``: items con diferencia del detalle del comparativo.
+
+Crea datos sintéticos dentro de una transacción (que se revierte al final),
+ejecuta las vistas con el cliente de pruebas de Django (o las funciones que
+usan) y captura sus consultas. Para cada índice elimina el índice dentro de la
+transacción, vuelve a ejecutar las vistas, y muestra para cada consulta que
+filtra u ordena por sus columnas el plan (``EXPLAIN QUERY PLAN`` en SQLite,
+``EXPLAIN`` en PostgreSQL) y la mediana en milisegundos sin y con el índice.
+Las estadísticas del planificador se recalculan (``ANALYZE``) después de crear
+los datos.
+
+Uso:
+    python scripts/explicar_consultas_indices.py [cantidad_productos]
+"""
+import os
+import sys
+import random
+import statistics
+import time
+from datetime import timedelta
+import django
+
+# Configurar encoding para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# Configurar Django
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from comparativos.models import ComparativoInventario, ItemComparativo
+from conteo.archivo import conteos_para_archivar
+from conteo.models import Conteo, ItemConteo
+from megaInventario.dashboard import DashboardSnapshot
+from productos.busqueda import buscar_por_codigo_exacto
+from productos.cache import codigos_productos
+from productos.models import Producto
+
+CANTIDAD_POR_DEFECTO = 20000
+CANTIDAD_USUARIOS = 20
+CANTIDAD_CONTEOS = 2000
+ITEMS_POR_CONTEO = 50
+REPETICIONES = 5
+TAMANO_LOTE = 2000
+LARGO_SQL = 150
+
+MARCAS = ['Tersa', 'Lumina', 'Natura', 'Bella', 'Vital', 'Aqua', 'Rosa', 'Sol']
+TIPOS = ['Crema', 'Shampoo', 'Labial', 'Perfume', 'Jabon', 'Serum', 'Gel', 'Locion']
+
+
+def crear_datos(cantidad):
+    """Crea los datos sintéticos con bulk_create y retorna los objetos que usan las vistas"""
+    aleatorio = random.Random(42)
+    ahora = timezone.now()
+
+    productos_ids = [p.id for p in Producto.objects.bulk_create([
+        Producto(
+            codigo_barras=f'EXP{770000000000 + i}',
+            codigo=f'EX-{i:06d}',
+            nombre=f'{aleatorio.choice(TIPOS)} {i}',
+            marca=aleatorio.choice(MARCAS),
+            precio=aleatorio.randint(1, 500),
+        )
+        for i in range(cantidad)
+    ], batch_size=TAMANO_LOTE)]
+    admin = User.objects.create(username='explain_admin', is_staff=True)
+    usuarios_ids = [User.objects.create(username=f'explain_{i}').id for i in range(CANTIDAD_USUARIOS)]
+
+    # Conteos finalizados durante dos años y algunos en proceso
+    conteos = Conteo.objects.bulk_create([
+        Conteo(
+            nombre=f'Conteo Explain {i}',
+            numero_conteo=i % 3 + 1,
+            estado='en_proceso' if i % 20 == 0 else 'finalizado',
+        )
+        for i in range(CANTIDAD_CONTEOS)
+    ], batch_size=TAMANO_LOTE)
+    for conteo in conteos:
+        fecha = ahora - timedelta(minutes=aleatorio.randint(0, 2 * 365 * 24 * 60))
+        if conteo.estado == 'finalizado':
+            conteo.fecha_fin = fecha
+        else:
+            fecha = ahora - timedelta(minutes=aleatorio.randint(0, 3 * 24 * 60))
+        conteo.fecha_modificacion = fecha
+    Conteo.objects.bulk_update(conteos, ['fecha_fin', 'fecha_modificacion'], batch_size=TAMANO_LOTE)
+
+    items = [
+        ItemConteo(conteo_id=conteo.id, producto_id=producto_id, cantidad=1, usuario_conteo_id=aleatorio.choice(usuarios_ids))
+        for conteo in conteos
+        for producto_id in aleatorio.sample(productos_ids, min(ITEMS_POR_CONTEO, len(productos_ids)))
+    ]
+    # Un conteo en proceso con todo el catálogo contado entre los usuarios
+    conteo_grande = next(conteo for conteo in conteos if conteo.estado == 'en_proceso')
+    contados = {item.producto_id for item in items if item.conteo_id == conteo_grande.id}
+    items.extend(
+        ItemConteo(conteo_id=conteo_grande.id, producto_id=producto_id, cantidad=1, usuario_conteo_id=aleatorio.choice(usuarios_ids))
+        for producto_id in productos_ids if producto_id not in contados
+    )
+    ItemConteo.objects.bulk_create(items, batch_size=TAMANO_LOTE)
+
+    comparativo = ComparativoInventario.objects.create(nombre='Comparativo Explain', usuario=admin)
+    diferencias = [aleatorio.randint(-5, 5) if aleatorio.random() < 0.05 else 0 for _ in productos_ids]
+    ItemComparativo.objects.bulk_create([
+        ItemComparativo(
+            comparativo=comparativo, producto_id=producto_id,
+            cantidad_sistema1=10, cantidad_sistema2=10, cantidad_fisico=10 + diferencia,
+            diferencia_sistema1=diferencia, diferencia_sistema2=-diferencia,
+        )
+        for producto_id, diferencia in zip(productos_ids, diferencias)
+    ], batch_size=TAMANO_LOTE)
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    return {
+        'admin': admin,
+        'contador': User.objects.get(pk=usuarios_ids[0]),
+        'conteo': conteo_grande,
+        'comparativo': comparativo,
+        'producto': Producto.objects.get(pk=productos_ids[len(productos_ids) // 2]),
+    }
+
+
+def casos(datos):
+    """(modelo, campos del índice, descripción, peticiones) de cada índice"""
+    admin = Client()
+    admin.force_login(datos['admin'])
+    contador = Client()
+    contador.force_login(datos['contador'])
+    producto, conteo, comparativo = datos['producto'], datos['conteo'], datos['comparativo']
+
+    def escanear():
+        codigos_productos.eliminar(producto.codigo)
+        buscar_por_codigo_exacto(producto.codigo)
+
+    return [
+        (Conteo, ['estado', 'fecha_fin'], 'Stock del detalle de producto y conteos para archivar', [
+            lambda: admin.get(reverse('productos:detalle', args=[producto.pk])),
+            lambda: list(conteos_para_archivar(90)),
+        ]),
+        (Conteo, ['estado', 'fecha_modificacion'], 'Alerta de conteos sin actividad del dashboard', [
+            DashboardSnapshot.calcular,
+        ]),
+        (ItemConteo, ['conteo', 'usuario_conteo'], 'Items contados por la pareja', [
+            lambda: contador.get(reverse('conteo:lista_conteo', args=[conteo.pk, 'contados'])),
+        ]),
+        (Producto, ['marca', 'nombre'], 'Lista de productos por marca', [
+            lambda: admin.get(reverse('productos:lista'), {'marca': producto.marca}),
+            lambda: admin.get(reverse('productos:lista')),
+        ]),
+        (Producto, ['codigo'], 'Búsqueda exacta por código al escanear', [escanear]),
+        (ItemComparativo, ['comparativo', 'diferencia_sistema1'], 'Items con diferencia contra el sistema 1', [
+            lambda: admin.get(reverse('comparativos:detalle', args=[comparativo.pk])),
+        ]),
+        (ItemComparativo, ['comparativo', 'diferencia_sistema2'], 'Items con diferencia contra el sistema 2', [
+            lambda: admin.get(reverse('comparativos:detalle', args=[comparativo.pk])),
+        ]),
+    ]
+
+
+def indice(modelo, campos):
+    return next(indice for indice in modelo._meta.indexes if list(indice.fields) == campos)
+
+
+def usa_columnas(sql, modelo, campos):
+    """La consulta lee la tabla del modelo y filtra u ordena por todas las columnas del índice"""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return False
+    tabla = connection.ops.quote_name(modelo._meta.db_table)
+    posiciones = [sql.find(clausula) for clausula in (' WHERE ', ' ORDER BY ') if clausula in sql]
+    if tabla not in sql or not posiciones:
+        return False
+    condiciones = sql[min(posiciones):]
+    return all(connection.ops.quote_name(modelo._meta.get_field(campo).column) in condiciones for campo in campos)
+
+
+def capturar(peticiones, modelo, campos):
+    """
+    Consultas (sql, parámetros) sin repetir de las peticiones que usan las columnas
+    del índice. Se filtran al ejecutarse: algunas vistas hacen miles de consultas.
+    """
+    consultas = []
+
+    def registrar(ejecutar, sql, params, many, context):
+        consulta = (sql, tuple(params or ()))
+        if not many and usa_columnas(sql, modelo, campos) and consulta not in consultas:
+            consultas.append(consulta)
+        return ejecutar(sql, params, many, context)
+
+    with connection.execute_wrapper(registrar):
+        for peticion in peticiones:
+            peticion()
+    return consultas
+
+
+def plan(sql, params):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [fila[-1] for fila in cursor.fetchall()]
+        cursor.execute('EXPLAIN ' + sql, params)
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def medir(sql, params):
+    """Ejecuta la consulta REPETICIONES veces y retorna la mediana en ms"""
+    tiempos = []
+    with connection.cursor() as cursor:
+        for _ in range(REPETICIONES):
+            inicio = time.perf_counter()
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tiempos)
+
+
+def explicar(consultas):
+    return {consulta: (plan(*consulta), medir(*consulta)) for consulta in consultas}
+
+
+def ejecutar(sql):
+    # PostgreSQL no modifica índices de una tabla con verificaciones de claves foráneas pendientes
+    connection.check_constraints()
+    with connection.cursor() as cursor:
+        cursor.execute(str(sql))
+
+
+def main():
+    cantidad = int(sys.argv[1]) if len(sys.argv) > 1 else CANTIDAD_POR_DEFECTO
+
+    print("=" * 70)
+    print(f"PLANES DE CONSULTA CON Y SIN ÍNDICES ({cantidad} productos sintéticos, {connection.vendor})")
+    print("=" * 70)
+
+    resumen = []
+    with transaction.atomic():
+        inicio = time.perf_counter()
+        datos = crear_datos(cantidad)
+        print(f"Datos creados en {time.perf_counter() - inicio:.1f} s")
+
+        editor = connection.schema_editor()
+        for modelo, campos, descripcion, peticiones in casos(datos):
+            indice_modelo = indice(modelo, campos)
+            print()
+            print("=" * 70)
+            print(f"{modelo.__name__}({', '.join(campos)}) - {indice_modelo.name}")
+            print(f"  {descripcion}")
+            print("=" * 70)
+
+            # Sin el índice (se elimina dentro de la transacción) y con el índice
+            ejecutar(indice_modelo.remove_sql(modelo, editor))
+            consultas = capturar(peticiones, modelo, campos)
+            sin_indice = explicar(consultas)
+            ejecutar(indice_modelo.create_sql(modelo, editor))
+            con_indice = explicar(capturar(peticiones, modelo, campos))
+
+            if not consultas:
+                print("  Ninguna consulta capturada usa las columnas del índice")
+            total_sin, total_con = 0, 0
+            for numero, consulta in enumerate(consultas, 1):
+                plan_sin, tiempo_sin = sin_indice[consulta]
+                plan_con, tiempo_con = con_indice.get(consulta) or explicar([consulta])[consulta]
+                total_sin += tiempo_sin
+                total_con += tiempo_con
+                sql = consulta[0]
+                sql_corto = sql if len(sql) <= LARGO_SQL else sql[:LARGO_SQL] + '...'
+                print(f"[{numero}] {sql_corto}")
+                print(f"  Sin índice ({tiempo_sin:.2f} ms):")
+                for linea in plan_sin:
+                    print(f"      {linea}")
+                print(f"  Con índice ({tiempo_con:.2f} ms):")
+                for linea in plan_con:
+                    print(f"      {linea}")
+            resumen.append((f"{modelo.__name__}({', '.join(campos)})", len(consultas), total_sin, total_con))
+
+        # Revertir los datos sintéticos
+        transaction.set_rollback(True)
+
+    print()
+    print(f"{'Índice':<46}{'Consultas':>10}{'Sin (ms)':>10}{'Con (ms)':>10}{'Mejora':>9}")
+    print("-" * 85)
+    for nombre, consultas, total_sin, total_con in resumen:
+        mejora = total_sin / total_con if total_con else 0
+        print(f"{nombre:<46}{consultas:>10}{total_sin:>10.2f}{total_con:>10.2f}{mejora:>8.1f}x")
+    print()
+    print("Datos sintéticos eliminados (transacción revertida).")
+
+
+if __name__ == '__main__':
+    main()
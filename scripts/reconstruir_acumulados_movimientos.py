@@ -0,0 +1,46 @@
+"""
+Reconstruye los acumulados de movimientos por hora (AcumuladoMovimientos).
+
+Los acumulados se mantienen al registrar, volcar y eliminar movimientos, y la
+migración los llena con los movimientos existentes. Este script los recalcula
+desde MovimientoConteo y MovimientoArchivado; usarlo después de cambios que no
+pasan por el registro (``update()`` de movimientos, inserciones con SQL directo).
+
+Uso:
+    python scripts/reconstruir_acumulados_movimientos.py [--conteo ID ...]
+"""
+import os
+import sys
+import argparse
+import django
+
+# Configurar encoding para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# Configurar Django
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.db.models import Sum
+from movimientos.acumulados import recalcular_acumulados
+from movimientos.models import AcumuladoMovimientos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconstruye los acumulados de movimientos por hora')
+    parser.add_argument('--conteo', type=int, nargs='+', help='Solo los conteos indicados (por defecto, todos)')
+    args = parser.parse_args()
+
+    filas = recalcular_acumulados(args.conteo)
+    total = AcumuladoMovimientos.objects.aggregate(total=Sum('total'))['total'] or 0
+    print(f"Filas de acumulados escritas: {filas}")
+    print(f"Movimientos acumulados en total: {total}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Reconstruye las discrepancias entre Conteo 1, 2 y 3 (DiscrepanciaConteo).
+
+La tabla se actualiza al finalizar cada conteo, solo para los productos que ese
+conteo cambia. Este script la recalcula desde las instantáneas de todos los
+conteos finalizados; usarlo para llenarla por primera vez y después de eliminar
+conteos finalizados o editar sus items.
+
+Uso:
+    python scripts/reconstruir_discrepancias_conteos.py
+"""
+import os
+import sys
+import django
+
+# Configurar encoding para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# Configurar Django
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.db import transaction
+from conteo.discrepancias import recalcular_discrepancias
+from conteo.models import DiscrepanciaConteo
+
+
+def main():
+    with transaction.atomic():
+        filas = recalcular_discrepancias()
+    con_diferencia = DiscrepanciaConteo.objects.filter(diferencia_absoluta__gt=0).count()
+    print(f"Productos con cantidades: {filas}")
+    print(f"Productos con diferencias entre conteos: {con_diferencia}")
+
+
+if __name__ == '__main__':
+    main()
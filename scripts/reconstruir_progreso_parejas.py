@@ -0,0 +1,44 @@
+"""
+Reconstruye el avance por pareja de los conteos (ConteoProgresoPareja).
+
+El avance se mantiene incrementalmente al escanear, editar o eliminar items, al
+asignar productos y al cambiar las parejas de un conteo. Este script lo
+recalcula desde cero; usarlo después de cambios que no pasan por esas rutas
+(eliminación o sincronización de productos, limpiezas masivas, restauraciones).
+
+Uso:
+    python scripts/reconstruir_progreso_parejas.py [--conteo ID ...]
+"""
+import os
+import sys
+import argparse
+import django
+
+# Configurar encoding para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# Configurar Django
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.db import transaction
+from conteo.progreso import recalcular_progreso
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconstruye el avance por pareja de los conteos')
+    parser.add_argument('--conteo', type=int, nargs='+', help='IDs de los conteos a reconstruir (todos por defecto)')
+    args = parser.parse_args()
+
+    with transaction.atomic():
+        filas = recalcular_progreso(conteos_ids=args.conteo)
+    print(f"Filas de avance reconstruidas: {filas}")
+
+
+if __name__ == '__main__':
+    main()
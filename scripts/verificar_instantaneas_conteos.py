@@ -0,0 +1,75 @@
+"""
+Verifica las instantáneas de los conteos finalizados contra sus items.
+
+Para cada conteo finalizado compara la instantánea congelada al finalizar
+(ConteoInstantanea) con las filas actuales de ItemConteo: huella SHA-256,
+totales y cantidad de cada producto (en los conteos archivados, que ya no
+tienen filas, solo la huella y los totales). Termina con código 1 si hay
+diferencias.
+
+Uso:
+    python scripts/verificar_instantaneas_conteos.py [--conteo ID ...] [--congelar]
+
+    --congelar  Vuelve a congelar los conteos con diferencias y los que no tienen instantánea
+                (salvo los archivados)
+"""
+import os
+import sys
+import argparse
+import django
+
+# Configurar encoding para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# Configurar Django
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from conteo.models import Conteo, ConteoInstantanea
+from conteo.instantaneas import congelar_conteo, verificar_instantanea
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verifica las instantáneas de los conteos finalizados')
+    parser.add_argument('--conteo', type=int, nargs='+', help='IDs de los conteos a verificar (todos los finalizados por defecto)')
+    parser.add_argument('--congelar', action='store_true', help='Vuelve a congelar los conteos con diferencias o sin instantánea')
+    args = parser.parse_args()
+
+    conteos = Conteo.objects.filter(estado='finalizado').order_by('id')
+    if args.conteo:
+        conteos = conteos.filter(id__in=args.conteo)
+    instantaneas = {
+        instantanea.conteo_id: instantanea
+        for instantanea in ConteoInstantanea.objects.filter(conteo__in=conteos).select_related('conteo')
+    }
+
+    con_diferencias = 0
+    for conteo in conteos:
+        instantanea = instantaneas.get(conteo.id)
+        errores = verificar_instantanea(instantanea) if instantanea else ['Sin instantánea']
+        if not errores:
+            print(f"✓ {conteo.nombre} (ID {conteo.id}): {instantanea.total_items} items")
+            continue
+
+        con_diferencias += 1
+        print(f"✗ {conteo.nombre} (ID {conteo.id}):")
+        for error in errores[:20]:
+            print(f"    {error}")
+        if len(errores) > 20:
+            print(f"    ... y {len(errores) - 20} diferencias más")
+        if args.congelar and not conteo.fecha_archivo:
+            congelar_conteo(conteo)
+            print("    Instantánea congelada nuevamente")
+
+    print(f"\nConteos verificados: {len(conteos)}, con diferencias: {con_diferencias}")
+    if con_diferencias and not args.congelar:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
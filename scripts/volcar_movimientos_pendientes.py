@@ -0,0 +1,65 @@
+"""
+Proceso que vuelca los movimientos pendientes (modo de escritura diferida) a MovimientoConteo.
+
+Con MOVIMIENTOS_ESCRITURA_DIFERIDA = True los escaneos registran sus movimientos
+en una tabla de pendientes sin índices; este proceso los vuelca en bloque, en
+orden, y debe quedar ejecutándose mientras haya conteos en curso. Cada lote se
+vuelca en una transacción, por lo que detenerlo en cualquier momento no pierde
+ni duplica movimientos.
+
+Uso:
+    python scripts/volcar_movimientos_pendientes.py [--intervalo SEGUNDOS] [--lote N] [--una-vez]
+"""
+import os
+import sys
+import time
+import argparse
+import django
+
+# Configurar encoding para Windows
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# Configurar Django
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.db import OperationalError
+from movimientos.registro import LOTE_VOLCADO, volcar_movimientos_pendientes, volcar_todos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vuelca los movimientos pendientes a MovimientoConteo')
+    parser.add_argument('--intervalo', type=float, default=1.0, help='Segundos de espera cuando no hay pendientes')
+    parser.add_argument('--lote', type=int, default=LOTE_VOLCADO, help='Movimientos por transacción')
+    parser.add_argument('--una-vez', action='store_true', help='Vuelca todos los pendientes y termina')
+    args = parser.parse_args()
+
+    if args.una_vez:
+        total = volcar_todos(limite=args.lote)
+        print(f"Movimientos volcados: {total}")
+        return
+
+    print(f"Volcando movimientos pendientes cada {args.intervalo}s (Ctrl+C para detener)")
+    try:
+        while True:
+            try:
+                volcados = volcar_movimientos_pendientes(limite=args.lote)
+            except OperationalError as e:
+                # Base de datos ocupada: se reintenta en la siguiente vuelta
+                print(f"Reintentando: {e}")
+                volcados = 0
+            if volcados:
+                print(f"Movimientos volcados: {volcados}")
+            if volcados < args.lote:
+                time.sleep(args.intervalo)
+    except KeyboardInterrupt:
+        print("Detenido")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Test de los acumulados de movimientos por hora: se mantienen al registrar,
+volcar y eliminar movimientos, coinciden con la reconstrucción y los reportes
+de movimientos los leen con una cantidad fija de consultas.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo.models import Conteo
+from conteo.registro import sumar_cantidad
+from movimientos.acumulados import hora_acumulado, recalcular_acumulados
+from movimientos.models import AcumuladoMovimientos, MovimientoConteo
+from movimientos.registro import volcar_todos
+
+
+def acumulados(conteo):
+    return {
+        (a.usuario_id, a.producto_id, a.tipo, a.hora): (a.total, a.cantidad_total)
+        for a in AcumuladoMovimientos.objects.filter(conteo=conteo)
+    }
+
+
+def acumulados_registro(conteo):
+    """Acumulados calculados directamente desde el registro"""
+    esperados = {}
+    for m in MovimientoConteo.objects.filter(conteo=conteo):
+        clave = (m.usuario_id, m.producto_id, m.tipo, hora_acumulado(m.fecha_movimiento))
+        total, cantidad = esperados.get(clave, (0, 0))
+        esperados[clave] = (total + 1, cantidad + m.cantidad_cambiada)
+    return esperados
+
+
+class TestAcumuladosMovimientos(TestCase):
+    """Test de movimientos.acumulados"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.admin = User.objects.create_user(username='test_acum_admin', password='test123', is_staff=True)
+        self.contador = User.objects.create_user(username='test_acum_contador', password='test123')
+        self.productos = [
+            Producto.objects.create(codigo_barras=f'TACU-{i:03d}', nombre=f'Producto Acumulado {i}') for i in range(3)
+        ]
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Acumulados')
+
+    def test_1_registro(self):
+        """Test 1: Registrar, guardar y eliminar movimientos actualiza los acumulados"""
+        sumar_cantidad(self.conteo, self.productos[0], self.admin, 4)
+        sumar_cantidad(self.conteo, self.productos[0], self.admin, 2)
+        sumar_cantidad(self.conteo, self.productos[1], self.contador, 3)
+        suelto = MovimientoConteo.objects.create(
+            conteo=self.conteo, producto=self.productos[2], usuario=self.admin, tipo='agregar', cantidad_cambiada=5
+        )
+        self.assertEqual(acumulados(self.conteo), acumulados_registro(self.conteo))
+        self.assertEqual(sum(total for total, _ in acumulados(self.conteo).values()), 4)
+
+        suelto.delete()
+        self.assertEqual(acumulados(self.conteo), acumulados_registro(self.conteo))
+        self.assertFalse(AcumuladoMovimientos.objects.filter(conteo=self.conteo, producto=self.productos[2]).exists())
+
+        # La reconstrucción coincide con lo mantenido incrementalmente
+        mantenidos = acumulados(self.conteo)
+        recalcular_acumulados([self.conteo.id])
+        self.assertEqual(acumulados(self.conteo), mantenidos)
+
+    @override_settings(MOVIMIENTOS_ESCRITURA_DIFERIDA=True)
+    def test_2_volcado(self):
+        """Test 2: Los movimientos diferidos se acumulan al volcarlos"""
+        sumar_cantidad(self.conteo, self.productos[0], self.admin, 1)
+        sumar_cantidad(self.conteo, self.productos[1], self.contador, 2)
+        self.assertEqual(acumulados(self.conteo), {})
+
+        self.assertEqual(volcar_todos(conteo_id=self.conteo.id), 2)
+        self.assertEqual(acumulados(self.conteo), acumulados_registro(self.conteo))
+        self.assertEqual(len(acumulados(self.conteo)), 2)
+
+    def test_3_vistas(self):
+        """Test 3: Los reportes leen los acumulados con una cantidad fija de consultas"""
+        client = Client()
+        client.login(username='test_acum_admin', password='test123')
+        urls = ['/movimientos/resumen/', f'/movimientos/conteo/{self.conteo.id}/', f'/movimientos/usuario/{self.admin.id}/']
+
+        def consultas():
+            cantidades = []
+            for url in urls:
+                with CaptureQueriesContext(connection) as contexto:
+                    respuesta = client.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertContains(respuesta, 'Producto Acumulado 0')
+                cantidades.append(len(contexto))
+            return cantidades
+
+        sumar_cantidad(self.conteo, self.productos[0], self.admin, 1)
+        pocas = consultas()
+        for producto in self.productos:
+            for _ in range(3):
+                sumar_cantidad(self.conteo, producto, self.admin, 2)
+        otro_conteo = Conteo.objects.create(nombre='Conteo Test Acumulados 2')
+        sumar_cantidad(otro_conteo, self.productos[1], self.admin, 1)
+        self.assertEqual(consultas(), pocas)
+
+        respuesta = client.get(f'/movimientos/conteo/{self.conteo.id}/')
+        self.assertContains(respuesta, '<h5 class="card-title text-primary">10</h5>', html=True)
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+Test del ingreso de escaneos en lote:
+resolución de productos, acumulado de cantidades y movimientos registrados.
+"""
+import os
+import sys
+import json
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from unittest import mock
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo import registro
+from conteo.models import Conteo, ItemConteo
+from movimientos.models import MovimientoConteo
+from usuarios.models import ParejaConteo
+
+
+class TestAgregarItemsLote(TestCase):
+    """Test del endpoint de escaneos en lote"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.usuario1 = User.objects.create_user(username='test_lote_1', password='test123')
+        self.usuario2 = User.objects.create_user(username='test_lote_2', password='test123')
+        self.pareja = ParejaConteo.objects.create(usuario_1=self.usuario1, usuario_2=self.usuario2)
+        self.productos = [
+            Producto.objects.create(codigo_barras=f'TLOTE-{i:03d}', codigo=f'L{i}', nombre=f'Producto Lote {i}')
+            for i in range(3)
+        ]
+        for producto in self.productos[:2]:
+            producto.parejas_asignadas.add(self.pareja)
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Lote')
+        self.client = Client()
+        self.client.login(username='test_lote_1', password='test123')
+
+    def enviar(self, lineas):
+        return self.client.post(
+            f'/conteo/{self.conteo.pk}/agregar-lote/',
+            json.dumps({'lineas': lineas}),
+            content_type='application/json'
+        )
+
+    def test_1_lote_acumula_cantidades(self):
+        """Test 1: Las líneas del mismo producto se acumulan en un solo item"""
+        response = self.enviar([
+            {'barcode': 'TLOTE-000', 'cantidad': 2, 'client_ts': 1, 'client_id': 'a'},
+            {'producto_id': self.productos[1].id, 'cantidad': 5, 'client_ts': 2, 'client_id': 'b'},
+            {'barcode': 'L0', 'cantidad': 3, 'client_ts': 3, 'client_id': 'c'},
+        ])
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['aplicadas'], 3)
+        self.assertEqual([r['client_id'] for r in data['resultados']], ['a', 'b', 'c'])
+        self.assertEqual(data['resultados'][2]['cantidad'], 5)
+
+        item = ItemConteo.objects.get(conteo=self.conteo, producto=self.productos[0])
+        self.assertEqual(item.cantidad, 5)
+
+    def test_2_movimientos_en_orden(self):
+        """Test 2: Cada línea registra un movimiento, aplicado en orden de client_ts"""
+        self.enviar([
+            {'barcode': 'TLOTE-000', 'cantidad': 4, 'client_ts': 20, 'client_id': 'segundo'},
+            {'barcode': 'TLOTE-000', 'cantidad': 1, 'client_ts': 10, 'client_id': 'primero'},
+        ])
+        movimientos = list(
+            MovimientoConteo.objects.filter(conteo=self.conteo).order_by('id')
+            .values_list('tipo', 'cantidad_anterior', 'cantidad_nueva', 'cantidad_cambiada')
+        )
+        self.assertEqual(movimientos, [('agregar', 0, 1, 1), ('modificar', 1, 5, 4)])
+
+    def test_3_lineas_rechazadas(self):
+        """Test 3: Las líneas inválidas o no asignadas se rechazan sin afectar a las demás"""
+        data = self.enviar([
+            {'barcode': 'NO-EXISTE', 'cantidad': 1, 'client_id': 'x'},
+            {'barcode': 'TLOTE-002', 'cantidad': 1, 'client_id': 'y'},
+            {'barcode': 'TLOTE-001', 'cantidad': -1, 'client_id': 'z'},
+            {'barcode': 'TLOTE-001', 'cantidad': 1, 'client_id': 'ok'},
+        ]).json()
+        self.assertEqual([r['success'] for r in data['resultados']], [False, False, False, True])
+        self.assertEqual(ItemConteo.objects.filter(conteo=self.conteo).count(), 1)
+
+    def test_4_suma_sobre_item_existente(self):
+        """Test 4: El lote suma sobre los items ya contados con agregar_item"""
+        self.client.post(
+            f'/conteo/{self.conteo.pk}/agregar-item/',
+            {'producto_id': self.productos[0].id, 'cantidad': 10}
+        )
+        data = self.enviar([{'barcode': 'TLOTE-000', 'cantidad': 2, 'client_id': 'a'}]).json()
+        self.assertEqual(data['resultados'][0]['cantidad'], 12)
+        self.assertEqual(
+            MovimientoConteo.objects.filter(conteo=self.conteo, tipo='modificar').get().cantidad_anterior, 10
+        )
+
+    def test_5_consultas_constantes(self):
+        """Test 5: El número de consultas no crece con el número de líneas"""
+        lineas = [{'barcode': 'TLOTE-000', 'cantidad': 1, 'client_id': str(i)} for i in range(50)]
+        self.enviar([{'barcode': 'TLOTE-000', 'cantidad': 1}])
+        # Incluye la consulta de las parejas que mantiene el avance por pareja, la suma de los acumulados
+        # y la versión de las asignaciones (al validar las líneas y al publicar los eventos)
+        with self.assertNumQueries(14):
+            self.enviar(lineas)
+        self.assertEqual(ItemConteo.objects.get(conteo=self.conteo).cantidad, 51)
+
+    def test_6_item_creado_segun_insercion(self):
+        """Test 6: Un item cuenta como creado solo si lo insertó este registro, aun con cantidad 0"""
+        data = self.enviar([{'barcode': 'TLOTE-000', 'cantidad': 0, 'client_id': 'a'}]).json()
+        self.assertTrue(data['resultados'][0]['success'])
+        data = self.enviar([{'barcode': 'TLOTE-000', 'cantidad': 0, 'client_id': 'b'}]).json()
+        self.assertEqual(
+            list(MovimientoConteo.objects.filter(conteo=self.conteo).order_by('id').values_list('tipo', flat=True)),
+            ['agregar', 'modificar']
+        )
+
+        # Otro usuario crea el item entre la suma sobre los existentes y la inserción
+        incrementar = registro._incrementar
+
+        def incrementar_con_competencia(conteo_id, incrementos, usuario_id):
+            if not ItemConteo.objects.filter(conteo_id=conteo_id, producto=self.productos[1]).exists():
+                ItemConteo.objects.bulk_create([
+                    ItemConteo(conteo_id=conteo_id, producto=self.productos[1], cantidad=0, usuario_conteo=self.usuario2)
+                ])
+                return {}
+            return incrementar(conteo_id, incrementos, usuario_id)
+
+        with mock.patch.object(registro, '_incrementar', incrementar_con_competencia):
+            data = self.enviar([{'barcode': 'TLOTE-001', 'cantidad': 3, 'client_id': 'c'}]).json()
+        self.assertEqual(data['resultados'][0]['cantidad'], 3)
+        self.assertEqual(MovimientoConteo.objects.filter(conteo=self.conteo).latest('id').tipo, 'modificar')
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
@@ -0,0 +1,189 @@
+"""
+Test del archivo de conteos finalizados: los items quedan en la instantánea,
+los movimientos pasan a MovimientoArchivado (sus totales siguen en
+AcumuladoMovimientos) y las vistas siguen mostrando los datos del conteo.
+"""
+import os
+import sys
+import json
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from datetime import timedelta
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.utils import timezone
+from productos.models import Producto
+from conteo.models import Conteo, ConteoInstantanea, ItemConteo
+from conteo.archivo import ERROR_CONTEO_ARCHIVADO, archivar_conteo, conteos_para_archivar
+from conteo.estadisticas import conteos_con_estadisticas
+from conteo.instantaneas import (
+    cargar_instantanea, congelar_conteo, descartar_instantanea, stocks_actuales, verificar_instantanea
+)
+from conteo.registro import registrar_lote, sumar_cantidad
+from megaInventario.dashboard import DashboardSnapshot
+from movimientos.models import AcumuladoMovimientos, MovimientoArchivado, MovimientoConteo
+
+
+class TestArchivoConteos(TestCase):
+    """Test de conteo.archivo"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.admin = User.objects.create_user(username='test_archivo_admin', password='test123', is_staff=True)
+        self.productos = [
+            Producto.objects.create(codigo_barras=f'TARC-{i:03d}', nombre=f'Producto Archivo {i}') for i in range(3)
+        ]
+        self.client = Client()
+        self.client.login(username='test_archivo_admin', password='test123')
+
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Archivo')
+        sumar_cantidad(self.conteo, self.productos[0], self.admin, 4)
+        sumar_cantidad(self.conteo, self.productos[0], self.admin, 2)
+        sumar_cantidad(self.conteo, self.productos[1], self.admin, 3)
+        self.client.post(f'/conteo/{self.conteo.id}/finalizar/')
+        Conteo.objects.filter(pk=self.conteo.pk).update(fecha_fin=timezone.now() - timedelta(days=120))
+        self.conteo.refresh_from_db()
+
+    def test_1_archivar(self):
+        """Test 1: Archivar saca items y movimientos de las tablas activas y conserva instantánea y totales"""
+        self.assertIn(self.conteo, conteos_para_archivar(90))
+        self.assertNotIn(self.conteo, conteos_para_archivar(180))
+        movimientos_ids = set(MovimientoConteo.objects.filter(conteo=self.conteo).values_list('id', flat=True))
+
+        resultado = archivar_conteo(self.conteo)
+        self.assertEqual(resultado, {'items': 2, 'movimientos': 3})
+        self.assertIsNotNone(self.conteo.fecha_archivo)
+        self.assertNotIn(self.conteo, conteos_para_archivar(90))
+
+        self.assertFalse(ItemConteo.objects.filter(conteo=self.conteo).exists())
+        self.assertFalse(MovimientoConteo.objects.filter(conteo=self.conteo).exists())
+        self.assertEqual(set(MovimientoArchivado.objects.filter(conteo=self.conteo).values_list('id', flat=True)), movimientos_ids)
+
+        acumulados = AcumuladoMovimientos.objects.filter(conteo=self.conteo, producto=self.productos[0])
+        self.assertEqual(sum(a.total for a in acumulados), 2)
+        self.assertEqual(sum(a.cantidad_total for a in acumulados), 6)
+
+        instantanea = ConteoInstantanea.objects.get(conteo=self.conteo)
+        self.assertEqual((instantanea.total_items, instantanea.total_cantidad), (2, 9))
+        self.assertEqual(verificar_instantanea(instantanea), [])
+        self.assertEqual(cargar_instantanea(self.conteo)[:, 1].tolist(), [6, 3])
+
+        # Archivar de nuevo no hace nada
+        self.assertEqual(archivar_conteo(self.conteo), {'items': 0, 'movimientos': 0})
+
+    def test_2_instantanea_protegida(self):
+        """Test 2: La instantánea de un conteo archivado no se descarta ni se vuelve a congelar"""
+        archivar_conteo(self.conteo)
+        descartar_instantanea(self.conteo)
+        self.assertTrue(ConteoInstantanea.objects.filter(conteo=self.conteo).exists())
+        with self.assertRaises(ValueError):
+            congelar_conteo(self.conteo)
+
+        en_proceso = Conteo.objects.create(nombre='Conteo Test Archivo Abierto')
+        with self.assertRaises(ValueError):
+            archivar_conteo(en_proceso)
+
+    def test_3_lectores(self):
+        """Test 3: Stock, lista de conteos y vistas de movimientos leen el archivo"""
+        archivar_conteo(self.conteo)
+        self.assertEqual(self.productos[0].get_stock_actual(), 6)
+        self.assertEqual(self.productos[2].get_stock_actual(), 0)
+
+        conteo = conteos_con_estadisticas(Conteo.objects.filter(pk=self.conteo.pk)).get()
+        self.assertEqual((conteo.total_items, conteo.total_cantidad), (2, 9))
+
+        respuesta = self.client.get(f'/movimientos/conteo/{self.conteo.id}/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Producto Archivo 1')
+
+        respuesta = self.client.get('/movimientos/resumen/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Producto Archivo 0')
+
+        respuesta = self.client.get(f'/conteo/{self.conteo.id}/')
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_4_stocks_en_bloque(self):
+        """Test 4: stocks_actuales coincide con get_stock_actual combinando conteos archivados y recientes"""
+        archivar_conteo(self.conteo)
+        reciente = Conteo.objects.create(nombre='Conteo Test Archivo Reciente')
+        sumar_cantidad(reciente, self.productos[1], self.admin, 7)
+        self.client.post(f'/conteo/{reciente.id}/finalizar/')
+
+        ids = [producto.id for producto in self.productos]
+        stocks = stocks_actuales(ids)
+        self.assertEqual(stocks, {self.productos[0].id: 6, self.productos[1].id: 7})
+        for producto in self.productos:
+            self.assertEqual(stocks.get(producto.id, 0), producto.get_stock_actual())
+        self.assertEqual(stocks_actuales([]), {})
+
+        # Un conteo no archivado anterior al archivado no gana; sin filtro se incluyen todos los productos
+        anterior = Conteo.objects.create(nombre='Conteo Test Archivo Anterior')
+        sumar_cantidad(anterior, self.productos[0], self.admin, 1)
+        self.client.post(f'/conteo/{anterior.id}/finalizar/')
+        Conteo.objects.filter(pk=anterior.pk).update(fecha_fin=self.conteo.fecha_fin - timedelta(days=1))
+        stocks = stocks_actuales()
+        self.assertEqual(stocks[self.productos[0].id], 6)
+        self.assertEqual(stocks[self.productos[1].id], 7)
+        self.assertNotIn(self.productos[2].id, stocks)
+
+        respuesta = self.client.get('/reportes/inventario/', {'busqueda': 'TARC-'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, '<h2>13</h2>', html=True)
+
+    def test_5_escrituras_rechazadas(self):
+        """Test 5: Escanear, cargar un lote o editar un item de un conteo archivado se rechaza sin escribir"""
+        archivar_conteo(self.conteo)
+        # Reabierto a mano: el archivo sigue siendo la única copia de sus items
+        Conteo.objects.filter(pk=self.conteo.pk).update(estado='en_proceso')
+
+        data = self.client.post(
+            f'/conteo/{self.conteo.id}/agregar-item/', {'producto_id': self.productos[2].id, 'cantidad': 1}
+        ).json()
+        self.assertEqual((data['success'], data['error']), (False, ERROR_CONTEO_ARCHIVADO))
+
+        data = self.client.post(
+            f'/conteo/{self.conteo.id}/agregar-lote/',
+            json.dumps({'lineas': [{'producto_id': self.productos[2].id, 'cantidad': 1, 'client_id': 'a'}]}),
+            content_type='application/json'
+        ).json()
+        self.assertEqual((data['success'], data['error']), (False, ERROR_CONTEO_ARCHIVADO))
+        self.conteo.refresh_from_db()
+        self.assertEqual(registrar_lote(self.conteo, self.admin, [{'producto_id': self.productos[2].id, 'cantidad': 1}]), [
+            {'client_id': None, 'success': False, 'error': ERROR_CONTEO_ARCHIVADO}
+        ])
+        with self.assertRaisesMessage(ValueError, ERROR_CONTEO_ARCHIVADO):
+            sumar_cantidad(self.conteo, self.productos[2], self.admin, 1)
+
+        # Fila que no debería existir (por ejemplo, creada antes de esta verificación)
+        item = ItemConteo.objects.create(conteo=self.conteo, producto=self.productos[2], cantidad=1)
+        data = self.client.post(f'/conteo/item/{item.id}/editar/', {'cantidad': 5}).json()
+        self.assertEqual((data['success'], data['error']), (False, ERROR_CONTEO_ARCHIVADO))
+
+        self.assertEqual(list(ItemConteo.objects.filter(conteo=self.conteo).values_list('cantidad', flat=True)), [1])
+        self.assertFalse(MovimientoConteo.objects.filter(conteo=self.conteo).exists())
+
+
+    def test_6_dashboard(self):
+        """Test 6: El dashboard cuenta los movimientos, las cantidades y el stock de los conteos archivados"""
+        antes = DashboardSnapshot.calcular()
+        sin_stock = DashboardSnapshot._productos_sin_stock()
+        archivar_conteo(self.conteo)
+        despues = DashboardSnapshot.calcular()
+
+        self.assertEqual(despues['total_movimientos'], antes['total_movimientos'])
+        self.assertEqual(
+            despues['total_movimientos'], MovimientoConteo.objects.count() + MovimientoArchivado.objects.count()
+        )
+        top = {fila['producto__codigo_barras']: fila for fila in despues['top_productos']}
+        self.assertEqual((top['TARC-000']['total_contado'], top['TARC-000']['veces_contado']), (6, 1))
+        self.assertEqual(DashboardSnapshot._productos_sin_stock(), sin_stock)
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
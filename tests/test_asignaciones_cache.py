@@ -0,0 +1,120 @@
+"""
+Test de la caché de productos asignados por pareja/usuario
+y de su invalidación por señales.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo.models import Conteo
+from usuarios.models import ParejaConteo, VersionAsignaciones
+from unittest import mock
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from usuarios import asignaciones
+from usuarios.asignaciones import productos_asignados_usuario, productos_asignados_pareja
+
+
+class TestAsignacionesCache(TestCase):
+    """Test de la caché de asignaciones"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.usuario1 = User.objects.create_user(username='test_asig_1', password='test123')
+        self.usuario2 = User.objects.create_user(username='test_asig_2', password='test123')
+        self.pareja = ParejaConteo.objects.create(usuario_1=self.usuario1, usuario_2=self.usuario2)
+        self.productos = [
+            Producto.objects.create(codigo_barras=f'TASIG-{i:03d}', nombre=f'Producto Asignacion {i}')
+            for i in range(3)
+        ]
+        self.productos[0].parejas_asignadas.add(self.pareja)
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Asignaciones')
+        self.client = Client()
+        self.client.login(username='test_asig_1', password='test123')
+
+    def test_1_conjunto_asignado(self):
+        """Test 1: El conjunto contiene solo los productos asignados a la pareja"""
+        self.assertEqual(productos_asignados_usuario(self.usuario1), {self.productos[0].id})
+        self.assertEqual(productos_asignados_usuario(self.usuario2), {self.productos[0].id})
+
+    def test_2_consulta_cacheada(self):
+        """Test 2: Una vez calculado, el conjunto solo consulta la versión de las asignaciones"""
+        productos_asignados_usuario(self.usuario1)
+        with self.assertNumQueries(1):
+            self.assertIn(self.productos[0].id, productos_asignados_usuario(self.usuario1))
+
+    def test_3_invalidacion_m2m(self):
+        """Test 3: Asignar y desasignar productos invalida la caché (en ambas direcciones del m2m)"""
+        productos_asignados_usuario(self.usuario1)
+        self.productos[1].parejas_asignadas.add(self.pareja)
+        self.assertIn(self.productos[1].id, productos_asignados_usuario(self.usuario1))
+
+        self.pareja.productos_asignados.remove(self.productos[0])
+        self.assertNotIn(self.productos[0].id, productos_asignados_pareja(self.pareja.id))
+
+    def test_4_invalidacion_pareja_inactiva(self):
+        """Test 4: Desactivar la pareja deja al usuario sin productos asignados"""
+        productos_asignados_usuario(self.usuario1)
+        self.pareja.activa = False
+        self.pareja.save()
+        self.assertEqual(productos_asignados_usuario(self.usuario1), frozenset())
+
+    def test_5_agregar_item_producto_no_asignado(self):
+        """Test 5: agregar_item rechaza productos no asignados a la pareja"""
+        response = self.client.post(
+            f'/conteo/{self.conteo.pk}/agregar-item/',
+            {'producto_id': self.productos[2].id, 'cantidad': 1}
+        )
+        self.assertFalse(response.json()['success'])
+
+        response = self.client.post(
+            f'/conteo/{self.conteo.pk}/agregar-item/',
+            {'producto_id': self.productos[0].id, 'cantidad': 1}
+        )
+        self.assertTrue(response.json()['success'])
+
+    def test_6_invalidacion_desde_otro_proceso(self):
+        """Test 6: Un cambio de versión hecho por otro proceso (solo en la base de datos) invalida la caché local"""
+        productos_asignados_usuario(self.usuario1)
+        # Otro proceso asigna el producto y renueva la versión sin pasar por esta memoria ni esta caché
+        Producto.parejas_asignadas.through.objects.create(producto=self.productos[2], parejaconteo=self.pareja)
+        VersionAsignaciones.objects.filter(pk=1).update(version=12345)
+        self.assertIn(self.productos[2].id, productos_asignados_usuario(self.usuario1))
+
+
+    def test_7_version_leida_una_vez(self):
+        """Test 7: agregar_item lee la versión de las asignaciones una sola vez por petición"""
+        url = f'/conteo/{self.conteo.pk}/agregar-item/'
+        self.client.post(url, {'producto_id': self.productos[0].id, 'cantidad': 1})
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertTrue(self.client.post(url, {'producto_id': self.productos[0].id, 'cantidad': 1}).json()['success'])
+        lecturas = [c for c in consultas.captured_queries if 'usuarios_versionasignaciones' in c['sql']]
+        # Una al validar el producto y otra al publicar el evento del movimiento
+        self.assertLessEqual(len(lecturas), 2)
+
+    def test_8_memoria_acotada(self):
+        """Test 8: La memoria del proceso guarda solo la versión vigente y como máximo MAXIMO_MEMORIA conjuntos"""
+        with mock.patch.object(asignaciones, 'MAXIMO_MEMORIA', 2):
+            for producto in self.productos:
+                producto.parejas_asignadas.add(self.pareja)
+            version = asignaciones.version_asignaciones()
+            for i in range(5):
+                asignaciones._obtener(f'prueba:{i}', lambda: [i], version)
+            self.assertEqual(list(asignaciones._memoria), ['prueba:3', 'prueba:4'])
+
+            VersionAsignaciones.objects.filter(pk=1).update(version=version + 1)
+            productos_asignados_pareja(self.pareja.id)
+            self.assertEqual(list(asignaciones._memoria), [f'pareja:{self.pareja.id}:productos'])
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
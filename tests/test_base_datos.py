@@ -0,0 +1,99 @@
+"""
+Test de la configuración de la base de datos desde variables de entorno y del
+camino con DISTINCT ON (PostgreSQL) de la alerta de productos sin stock.
+
+Para correr toda la suite contra un PostgreSQL local:
+    DB_ENGINE=postgresql DB_NAME=megainventario DB_USER=postgres python manage.py migrate
+    DB_ENGINE=postgresql DB_NAME=megainventario DB_USER=postgres python -m pytest -q
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+import unittest
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from conteo.models import Conteo, ItemConteo
+from megaInventario.basedatos import configuracion_base_datos
+from megaInventario.dashboard import DashboardSnapshot
+from productos.models import Producto
+
+BASE_DIR = Path('/proyecto')
+
+
+class TestConfiguracionBaseDatos(SimpleTestCase):
+    """Test de megaInventario.basedatos"""
+
+    def test_1_sqlite_por_defecto(self):
+        """Test 1: Sin variables se usa SQLite en la raíz del proyecto"""
+        self.assertEqual(configuracion_base_datos(BASE_DIR, {}), {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        })
+        self.assertEqual(configuracion_base_datos(BASE_DIR, {'DB_NAME': '/tmp/otra.sqlite3'})['NAME'], '/tmp/otra.sqlite3')
+        with self.assertRaises(ValueError):
+            configuracion_base_datos(BASE_DIR, {'DB_ENGINE': 'oracle'})
+
+    def test_2_postgresql_con_conexiones_persistentes(self):
+        """Test 2: PostgreSQL con conexiones persistentes y, detrás de un pool, sin cursores del servidor"""
+        configuracion = configuracion_base_datos(BASE_DIR, {
+            'DB_ENGINE': 'postgresql', 'DB_NAME': 'inventario', 'DB_USER': 'inventario',
+            'DB_PASSWORD': 'secreto', 'DB_HOST': 'db', 'DB_PORT': '6432',
+        })
+        self.assertEqual(configuracion['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual((configuracion['NAME'], configuracion['HOST'], configuracion['PORT']), ('inventario', 'db', '6432'))
+        self.assertEqual(configuracion['CONN_MAX_AGE'], 60)
+        self.assertTrue(configuracion['CONN_HEALTH_CHECKS'])
+        self.assertFalse(configuracion['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertNotIn('TEST', configuracion)
+
+        configuracion = configuracion_base_datos(BASE_DIR, {
+            'DB_ENGINE': 'postgresql', 'DB_POOLER': '1', 'DB_CONN_MAX_AGE': '0',
+            'DB_CONN_HEALTH_CHECKS': 'false', 'DB_SSLMODE': 'require', 'DB_TEST_NAME': 'inventario_test',
+        })
+        self.assertTrue(configuracion['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertEqual(configuracion['CONN_MAX_AGE'], 0)
+        self.assertFalse(configuracion['CONN_HEALTH_CHECKS'])
+        self.assertEqual(configuracion['OPTIONS']['sslmode'], 'require')
+        self.assertEqual(configuracion['TEST'], {'NAME': 'inventario_test'})
+
+
+class TestProductosSinStock(TestCase):
+    """Test del camino con DISTINCT ON de DashboardSnapshot._productos_sin_stock"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        # Nombres que quedan primeros en el orden por nombre
+        self.productos = [
+            Producto.objects.create(codigo_barras=f'TBD-{i:03d}', nombre=f'000 Producto Base Datos {i}') for i in range(3)
+        ]
+        ahora = timezone.now()
+        anterior = Conteo.objects.create(nombre='Conteo Test Base Datos 1', estado='finalizado', fecha_fin=ahora - timedelta(days=2))
+        ultimo = Conteo.objects.create(nombre='Conteo Test Base Datos 2', estado='finalizado', fecha_fin=ahora - timedelta(days=1))
+        # Con stock en el último conteo, sin stock en el último conteo y sin conteos
+        ItemConteo.objects.create(conteo=anterior, producto=self.productos[0], cantidad=0)
+        ItemConteo.objects.create(conteo=ultimo, producto=self.productos[0], cantidad=5)
+        ItemConteo.objects.create(conteo=anterior, producto=self.productos[1], cantidad=5)
+        ItemConteo.objects.create(conteo=ultimo, producto=self.productos[1], cantidad=0)
+
+    @unittest.skipUnless(connection.features.can_distinct_on_fields, 'DISTINCT ON solo en PostgreSQL')
+    def test_3_distinct_on_igual_a_subconsulta(self):
+        """Test 3: DISTINCT ON cuenta los mismos productos sin stock que la subconsulta correlacionada"""
+        con_distinct_on = DashboardSnapshot._productos_sin_stock()
+        with mock.patch.object(connection.features, 'can_distinct_on_fields', False):
+            con_subconsulta = DashboardSnapshot._productos_sin_stock()
+        self.assertEqual(con_distinct_on, con_subconsulta)
+        self.assertGreaterEqual(con_distinct_on, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Test de la búsqueda en el registro de movimientos: los ids se resuelven con los
+índices de texto y el resultado coincide con el OR de icontains original.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.core.cache import cache
+from django.db.models import Q
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo.models import Conteo
+from movimientos.busqueda import filtro_busqueda_movimientos
+from movimientos.models import MovimientoConteo
+
+
+def busqueda_original(busqueda):
+    return MovimientoConteo.objects.filter(
+        Q(producto__nombre__icontains=busqueda) |
+        Q(producto__codigo_barras__icontains=busqueda) |
+        Q(producto__codigo__icontains=busqueda) |
+        Q(producto__atributo__icontains=busqueda) |
+        Q(producto__descripcion__icontains=busqueda) |
+        Q(usuario__username__icontains=busqueda) |
+        Q(usuario__first_name__icontains=busqueda) |
+        Q(usuario__last_name__icontains=busqueda) |
+        Q(usuario__email__icontains=busqueda) |
+        Q(conteo__nombre__icontains=busqueda) |
+        Q(observaciones__icontains=busqueda)
+    )
+
+
+class TestBusquedaMovimientos(TestCase):
+    """Test de movimientos.busqueda"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.admin = User.objects.create_user(username='test_busqmov_admin', password='test123', is_staff=True)
+        self.contador = User.objects.create_user(username='test_busqmov_ana', password='test123', first_name='Anabela')
+        self.crema = Producto.objects.create(codigo_barras='TBMV-001', nombre='Crema Nocturna', atributo='Rosado')
+        self.labial = Producto.objects.create(codigo_barras='TBMV-002', codigo='LB-77', nombre='Labial Mate')
+        self.conteo = Conteo.objects.create(nombre='Conteo Bodega Norte')
+        self.otro_conteo = Conteo.objects.create(nombre='Conteo Vitrina')
+        self.movimientos = [
+            MovimientoConteo.objects.create(conteo=self.conteo, producto=self.crema, usuario=self.admin, tipo='agregar'),
+            MovimientoConteo.objects.create(conteo=self.otro_conteo, producto=self.labial, usuario=self.contador, tipo='agregar'),
+            MovimientoConteo.objects.create(
+                conteo=self.otro_conteo, producto=self.crema, usuario=self.admin, tipo='modificar',
+                observaciones='Corrección por caja dañada'
+            ),
+        ]
+
+    def buscar(self, busqueda):
+        ids = {m.id for m in self.movimientos}
+        nuevos = set(MovimientoConteo.objects.filter(filtro_busqueda_movimientos(busqueda)).values_list('id', flat=True)) & ids
+        originales = set(busqueda_original(busqueda).values_list('id', flat=True)) & ids
+        self.assertEqual(nuevos, originales, busqueda)
+        return [i for i, m in enumerate(self.movimientos) if m.id in nuevos]
+
+    def test_1_dimensiones(self):
+        """Test 1: Coincide con la búsqueda original en producto, usuario, conteo y observaciones"""
+        self.assertEqual(self.buscar('nocturna'), [0, 2])
+        self.assertEqual(self.buscar('LB-7'), [1])
+        self.assertEqual(self.buscar('anabela'), [1])
+        self.assertEqual(self.buscar('Bodega'), [0])
+        self.assertEqual(self.buscar('caja dañ'), [2])
+        self.assertEqual(self.buscar('TBMV'), [0, 1, 2])
+        self.assertEqual(self.buscar('zzzz'), [])
+        # Búsquedas cortas (sin índice) y números
+        self.assertEqual(self.buscar('Ro'), [0, 2])
+        self.buscar(str(self.crema.id))
+
+    def test_2_indice_observaciones(self):
+        """Test 2: El índice de observaciones sigue las inserciones, ediciones y eliminaciones"""
+        movimiento = self.movimientos[0]
+        movimiento.observaciones = 'Reconteo solicitado por supervisión'
+        movimiento.save()
+        self.assertEqual(self.buscar('supervisión'), [0])
+
+        movimiento.observaciones = None
+        movimiento.save()
+        self.assertEqual(self.buscar('supervisión'), [])
+
+        self.movimientos[2].delete()
+        self.movimientos.pop()
+        self.assertEqual(self.buscar('caja'), [])
+
+    def test_3_vista(self):
+        """Test 3: lista_movimientos filtra con la búsqueda indexada"""
+        cache.clear()
+        client = Client()
+        client.login(username='test_busqmov_admin', password='test123')
+        respuesta = client.get('/movimientos/', {'busqueda': 'Labial Mate'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'Mostrando 1 - 1 de 1 conteos')
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
@@ -0,0 +1,156 @@
+"""
+Test de la búsqueda de productos con índice de texto:
+sincronización del índice y orden por relevancia.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.test import SimpleTestCase, TestCase, Client
+from django.contrib.auth.models import User
+from productos.models import Producto
+from productos.busqueda import buscar_productos, buscar_por_codigo_exacto
+from productos.cache import CacheLRU, codigos_productos
+from conteo.models import Conteo
+
+
+class TestBusquedaProductos(TestCase):
+    """Test de la búsqueda de productos"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.usuario = User.objects.create_user(username='test_busqueda', password='test123')
+        self.client = Client()
+        self.client.login(username='test_busqueda', password='test123')
+
+        # Producto cuyo nombre contiene el código de barras del producto exacto
+        self.producto_texto = Producto.objects.create(
+            codigo_barras='TBUSQ-0002', nombre='Caja TBUSQ-0001 surtida', marca='TestBusqueda'
+        )
+        self.producto_prefijo = Producto.objects.create(
+            codigo_barras='TBUSQ-0001-X', nombre='Kit prefijo', marca='TestBusqueda'
+        )
+        self.producto_exacto = Producto.objects.create(
+            codigo_barras='TBUSQ-0001', nombre='Crema Hidratante Test', marca='TestBusqueda'
+        )
+
+    def test_1_orden_por_relevancia(self):
+        """Test 1: El código de barras exacto va primero, luego el prefijo y luego el texto"""
+        resultados = list(buscar_productos(Producto.objects.all(), 'TBUSQ-0001'))
+        self.assertEqual(resultados, [self.producto_exacto, self.producto_prefijo, self.producto_texto])
+
+    def test_2_busqueda_por_subcadena(self):
+        """Test 2: Se encuentra el producto por una subcadena del nombre, sin distinguir mayúsculas"""
+        resultados = buscar_productos(Producto.objects.all(), 'hidratante tes')
+        self.assertIn(self.producto_exacto, resultados)
+
+    def test_3_indice_sincronizado(self):
+        """Test 3: El índice refleja actualizaciones y eliminaciones"""
+        self.producto_exacto.nombre = 'Serum Renovado Test'
+        self.producto_exacto.save()
+        self.assertIn(self.producto_exacto, buscar_productos(Producto.objects.all(), 'Renovado'))
+        self.assertNotIn(self.producto_exacto, buscar_productos(Producto.objects.all(), 'Hidratante Test'))
+
+        producto_id = self.producto_exacto.id
+        self.producto_exacto.delete()
+        self.assertFalse(buscar_productos(Producto.objects.filter(id=producto_id), 'Renovado').exists())
+
+    def test_4_busqueda_corta(self):
+        """Test 4: Búsquedas de menos de 3 caracteres siguen funcionando"""
+        resultados = buscar_productos(Producto.objects.filter(marca='TestBusqueda'), 'Ki')
+        self.assertEqual(list(resultados), [self.producto_prefijo])
+
+    def test_5_api_buscar_producto(self):
+        """Test 5: La API del scanner retorna los resultados ordenados por relevancia"""
+        response = self.client.get('/conteo/buscar-producto/', {'busqueda': 'TBUSQ-0001'})
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['productos'][0]['id'], self.producto_exacto.id)
+
+    def test_6_codigo_exacto_cacheado(self):
+        """Test 6: El código exacto se resuelve con una sola lectura por clave primaria"""
+        codigos_productos.limpiar()
+        self.assertEqual(buscar_por_codigo_exacto('TBUSQ-0001'), self.producto_exacto)
+        with self.assertNumQueries(1):
+            self.assertEqual(buscar_por_codigo_exacto('TBUSQ-0001'), self.producto_exacto)
+
+        # Al cambiar el código de barras se invalida la entrada cacheada
+        self.producto_exacto.codigo_barras = 'TBUSQ-0001-NUEVO'
+        self.producto_exacto.save()
+        self.assertIsNone(codigos_productos.get('TBUSQ-0001'))
+        self.assertIsNone(buscar_por_codigo_exacto('TBUSQ-0001'))
+
+    def test_7_agregar_item_codigo_exacto(self):
+        """Test 7: agregar_item usa el producto con el código exacto, no el primero que lo contenga"""
+        conteo = Conteo.objects.create(nombre='Conteo Test Busqueda', usuario_creador=self.usuario)
+        response = self.client.post(
+            f'/conteo/{conteo.pk}/agregar-item/',
+            {'busqueda': 'TBUSQ-0001', 'cantidad': 2}
+        )
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['producto']['codigo_barras'], 'TBUSQ-0001')
+
+    def test_8_api_paginada(self):
+        """Test 8: La API limita los resultados y pagina con cursor sin repetir productos empatados"""
+        # Mismo nombre y marca: la relevancia, la marca y el nombre empatan en todos
+        for i in range(60):
+            Producto.objects.create(codigo_barras=f'TBUSQ-PAG-{i:02d}', nombre='Paginado', marca='TestBusqueda')
+
+        response = self.client.get('/conteo/buscar-producto/', {'busqueda': 'TBUSQ-PAG', 'limit': 2})
+        data = response.json()
+        self.assertEqual(len(data['productos']), 2)
+        self.assertTrue(data['hay_mas'])
+        self.assertNotIn('total', data)
+
+        vistos = [p['id'] for p in data['productos']]
+        while data['hay_mas']:
+            data = self.client.get('/conteo/buscar-producto/', {
+                'busqueda': 'TBUSQ-PAG', 'limit': 7, 'cursor': data['siguiente_cursor']
+            }).json()
+            vistos.extend(p['id'] for p in data['productos'])
+        self.assertEqual(len(vistos), 60)
+        self.assertEqual(len(set(vistos)), 60)
+
+        # El tope del servidor se aplica aunque el cliente pida más
+        data = self.client.get('/conteo/buscar-producto/', {'busqueda': 'TBUSQ-PAG', 'limit': 100000}).json()
+        self.assertTrue(data['success'])
+        self.assertEqual(len(data['productos']), 50)
+        self.assertTrue(data['hay_mas'])
+        siguiente = self.client.get('/conteo/buscar-producto/', {
+            'busqueda': 'TBUSQ-PAG', 'limit': 100000, 'cursor': data['siguiente_cursor']
+        }).json()
+        self.assertEqual(len(siguiente['productos']), 10)
+        self.assertFalse(set(p['id'] for p in data['productos']) & set(p['id'] for p in siguiente['productos']))
+
+class TestCacheLRU(SimpleTestCase):
+    """Test del índice inverso de productos.cache.CacheLRU"""
+
+    def test_1_eliminar_valor(self):
+        """Test 1: eliminar_valor quita todas las claves del valor, también tras reemplazos y desalojos"""
+        cache = CacheLRU(3)
+        cache.set('A', 1)
+        cache.set('B', 1)
+        cache.set('C', 2)
+        cache.set('C', 1)
+        cache.set('D', 3)  # Desaloja 'A'
+        self.assertIsNone(cache.get('A'))
+
+        cache.eliminar_valor(1)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get('D'), 3)
+        self.assertEqual(cache._claves_por_valor, {3: {'D'}})
+
+        cache.eliminar('D')
+        cache.eliminar_valor(3)
+        self.assertEqual((len(cache), cache._claves_por_valor), (0, {}))
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
@@ -0,0 +1,103 @@
+"""
+Test del catálogo offline de productos para el scanner:
+catálogo completo, ETag y cambios desde una versión.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from productos.models import Producto
+from usuarios.models import ParejaConteo
+
+
+class TestCatalogoProductos(TestCase):
+    """Test del catálogo de productos"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.usuario1 = User.objects.create_user(username='test_catalogo_1', password='test123')
+        self.usuario2 = User.objects.create_user(username='test_catalogo_2', password='test123')
+        self.pareja = ParejaConteo.objects.create(usuario_1=self.usuario1, usuario_2=self.usuario2)
+        self.productos = [
+            Producto.objects.create(codigo_barras=f'TCAT-{i:03d}', codigo=f'C{i}', nombre=f'Producto Catalogo {i}')
+            for i in range(3)
+        ]
+        for producto in self.productos[:2]:
+            producto.parejas_asignadas.add(self.pareja)
+        self.client = Client()
+        self.client.login(username='test_catalogo_1', password='test123')
+
+    def obtener(self, **kwargs):
+        return self.client.get('/conteo/catalogo/', **kwargs)
+
+    def test_1_catalogo_completo(self):
+        """Test 1: El catálogo contiene solo los productos asignados a la pareja"""
+        response = self.obtener()
+        data = response.json()
+        self.assertTrue(data['completo'])
+        self.assertEqual(response['ETag'], f'"{data["version"]}"')
+        ids = {fila[data['columnas'].index('id')] for fila in data['productos']}
+        self.assertEqual(ids, {self.productos[0].id, self.productos[1].id})
+
+    def test_2_etag(self):
+        """Test 2: Con el mismo ETag la respuesta es 304"""
+        etag = self.obtener()['ETag']
+        self.assertEqual(self.obtener(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_3_cambios_desde_version(self):
+        """Test 3: Desde una versión anterior solo se envían los productos modificados"""
+        version = self.obtener().json()['version']
+        self.productos[1].nombre = 'Producto Catalogo Renombrado'
+        self.productos[1].save()
+
+        data = self.client.get('/conteo/catalogo/', {'desde': version}).json()
+        self.assertFalse(data['completo'])
+        self.assertEqual(len(data['productos']), 1)
+        self.assertIn('Producto Catalogo Renombrado', data['productos'][0])
+        self.assertNotEqual(data['version'], version)
+
+    def test_4_asignaciones_modificadas(self):
+        """Test 4: Si cambian las asignaciones se envía el catálogo completo"""
+        version = self.obtener().json()['version']
+        self.productos[2].parejas_asignadas.add(self.pareja)
+
+        data = self.client.get('/conteo/catalogo/', {'desde': version}).json()
+        self.assertTrue(data['completo'])
+        self.assertEqual(len(data['productos']), 3)
+
+    def test_5_producto_eliminado(self):
+        """Test 5: Si se elimina un producto se envía el catálogo completo"""
+        version = self.obtener().json()['version']
+        self.productos[0].delete()
+
+        data = self.client.get('/conteo/catalogo/', {'desde': version}).json()
+        self.assertTrue(data['completo'])
+        self.assertEqual(len(data['productos']), 1)
+
+    def test_6_cambios_con_update(self):
+        """Test 6: Los productos modificados con update() también se envían como cambios"""
+        version = self.obtener().json()['version']
+        Producto.objects.filter(id=self.productos[0].id).update(nombre='Producto Catalogo Masivo')
+
+        data = self.client.get('/conteo/catalogo/', {'desde': version}).json()
+        self.assertFalse(data['completo'])
+        self.assertEqual(len(data['productos']), 1)
+        self.assertIn('Producto Catalogo Masivo', data['productos'][0])
+
+    def test_7_numero_de_cambio_posterior(self):
+        """Test 7: Un número de cambio mayor al actual (versión con fechas) recibe el catálogo completo"""
+        asignaciones, _, total = self.obtener().json()['version'].split('.')
+        data = self.client.get('/conteo/catalogo/', {'desde': f'{asignaciones}.1700000000000000.{total}'}).json()
+        self.assertTrue(data['completo'])
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
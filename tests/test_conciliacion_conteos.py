@@ -0,0 +1,138 @@
+"""
+Test de la conciliación de items de conteo con el registro de movimientos:
+reproduce agregar/modificar/eliminar como la verificación de congruencia,
+detecta las diferencias y repara las cantidades.
+"""
+import os
+import sys
+import unittest
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from unittest import mock
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo.models import Conteo, ItemConteo
+from conteo import conciliacion
+from conteo.conciliacion import cantidades_esperadas, conciliar, conciliar_conteo, reparar_diferencias
+from conteo.instantaneas import cargar_instantanea, congelar_conteo
+from conteo.registro import sumar_cantidad
+from movimientos.models import MovimientoConteo
+
+
+def cantidad_reproducida(conteo, producto):
+    """Cantidad calculada como en tests/verificar_congruencia_sistema.py"""
+    cantidad = 0
+    for movimiento in MovimientoConteo.objects.filter(conteo=conteo, producto=producto).order_by('fecha_movimiento', 'id'):
+        if movimiento.tipo == 'eliminar':
+            cantidad = 0
+        else:
+            cantidad += movimiento.cantidad_cambiada
+    return cantidad
+
+
+class TestConciliacionConteos(TestCase):
+    """Test de conteo.conciliacion"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.admin = User.objects.create_user(username='test_conciliacion_admin', password='test123', is_staff=True)
+        self.productos = [
+            Producto.objects.create(codigo_barras=f'TCON-{i:03d}', nombre=f'Producto Conciliacion {i}') for i in range(5)
+        ]
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Conciliacion')
+        for producto in self.productos:
+            sumar_cantidad(self.conteo, producto, self.admin, 4)
+            sumar_cantidad(self.conteo, producto, self.admin, 3)
+
+    def movimiento(self, producto, tipo, cambio):
+        MovimientoConteo.objects.create(
+            conteo=self.conteo, producto=producto, usuario=self.admin, tipo=tipo, cantidad_cambiada=cambio
+        )
+
+    def test_1_reproduccion(self):
+        """Test 1: Las cantidades reproducidas coinciden con la verificación movimiento por movimiento"""
+        self.movimiento(self.productos[1], 'modificar', -2)
+        self.movimiento(self.productos[2], 'eliminar', -7)
+        self.movimiento(self.productos[3], 'eliminar', -7)
+        self.movimiento(self.productos[3], 'agregar', 5)
+
+        productos, cantidades, con_item = cantidades_esperadas(self.conteo.id)
+        self.assertEqual(productos.tolist(), [p.id for p in self.productos])
+        self.assertEqual(cantidades.tolist(), [cantidad_reproducida(self.conteo, p) for p in self.productos])
+        self.assertEqual(cantidades.tolist(), [7, 5, 0, 5, 7])
+        self.assertEqual(con_item.tolist(), [True, True, False, True, True])
+
+        vacio = Conteo.objects.create(nombre='Conteo Test Conciliacion Vacio')
+        self.assertEqual(len(cantidades_esperadas(vacio.id)[0]), 0)
+
+    def test_2_diferencias(self):
+        """Test 2: Detecta cantidades distintas, items sobrantes, faltantes y sin movimientos"""
+        resultado = conciliar_conteo(self.conteo.id)
+        self.assertEqual((resultado['items'], resultado['diferencias'], resultado['faltantes']), (5, [], []))
+
+        item = ItemConteo.objects.get(conteo=self.conteo, producto=self.productos[0])
+        ItemConteo.objects.filter(pk=item.pk).update(cantidad=9)
+        self.movimiento(self.productos[1], 'eliminar', -7)
+        ItemConteo.objects.filter(conteo=self.conteo, producto=self.productos[2]).delete()
+        extra = Producto.objects.create(codigo_barras='TCON-900', nombre='Producto Conciliacion Extra')
+        sin_movimientos = ItemConteo.objects.create(conteo=self.conteo, producto=extra, cantidad=1, usuario_conteo=self.admin)
+
+        resultado = conciliar_conteo(self.conteo.id)
+        self.assertEqual(resultado['diferencias'], [(item.id, self.productos[0].id, 9, 7)])
+        self.assertEqual([producto_id for _, producto_id in resultado['sobrantes']], [self.productos[1].id])
+        self.assertEqual(resultado['faltantes'], [(self.productos[2].id, 7)])
+        self.assertEqual(resultado['sin_movimientos'], [(sin_movimientos.id, extra.id)])
+        self.assertEqual(list(conciliar([self.conteo.id])), [resultado])
+
+    def test_3_reparar(self):
+        """Test 3: Reparar corrige las cantidades y la instantánea del conteo finalizado"""
+        Conteo.objects.filter(pk=self.conteo.pk).update(estado='finalizado')
+        self.conteo.refresh_from_db()
+        congelar_conteo(self.conteo)
+        ItemConteo.objects.filter(conteo=self.conteo, producto__in=self.productos[:2]).update(cantidad=1)
+
+        resultado = conciliar_conteo(self.conteo.id)
+        self.assertEqual(reparar_diferencias(self.conteo, resultado['diferencias']), 2)
+        self.assertEqual(conciliar_conteo(self.conteo.id)['diferencias'], [])
+        self.assertEqual(set(ItemConteo.objects.filter(conteo=self.conteo).values_list('cantidad', flat=True)), {7})
+        # La instantánea congelada antes de reparar se descartó: la vigente tiene las cantidades corregidas
+        self.assertEqual(set(cargar_instantanea(self.conteo)[:, 1].tolist()), {7})
+
+    def test_4_reparar_no_pisa_escaneos_posteriores(self):
+        """Test 4: En un conteo en proceso, un item que cambió después de conciliar no se sobrescribe"""
+        ItemConteo.objects.filter(conteo=self.conteo, producto__in=self.productos[:2]).update(cantidad=1)
+        resultado = conciliar_conteo(self.conteo.id)
+        self.assertEqual(len(resultado['diferencias']), 2)
+
+        # Escaneo entre la conciliación y la reparación
+        sumar_cantidad(self.conteo, self.productos[0], self.admin, 2)
+
+        self.assertEqual(reparar_diferencias(self.conteo, resultado['diferencias']), 1)
+        self.assertEqual(ItemConteo.objects.get(conteo=self.conteo, producto=self.productos[0]).cantidad, 3)
+        self.assertEqual(ItemConteo.objects.get(conteo=self.conteo, producto=self.productos[1]).cantidad, 7)
+
+
+class TestConciliacionProcesos(unittest.TestCase):
+    """Test del pool de procesos (fuera de TestCase: cierra las conexiones del proceso principal)"""
+
+    def test_1_procesos_con_spawn(self):
+        """Test 1: Los procesos iniciados con spawn (Windows) inicializan Django antes de conciliar"""
+        pool_spawn = partial(ProcessPoolExecutor, mp_context=multiprocessing.get_context('spawn'))
+        # Conteos inexistentes: los procesos no ven datos de otras transacciones
+        with mock.patch.object(conciliacion, 'ProcessPoolExecutor', pool_spawn):
+            resultados = list(conciliar([-1, -2], procesos=2))
+        self.assertEqual([resultado['conteo_id'] for resultado in resultados], [-1, -2])
+        self.assertEqual([resultado['items'] for resultado in resultados], [0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
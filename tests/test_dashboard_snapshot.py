@@ -0,0 +1,114 @@
+"""
+Test de la instantánea del dashboard: estadísticas con consultas agrupadas,
+caché, invalidación por señales y contadores de aciertos.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.db import connection
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo.models import Conteo, ItemConteo
+from conteo.registro import sumar_cantidad
+from movimientos.models import MovimientoConteo
+from megaInventario.dashboard import DashboardSnapshot, CLAVE_SNAPSHOT
+
+
+class TestDashboardSnapshot(TestCase):
+    """Test de DashboardSnapshot"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        cache.clear()
+        self.admin = User.objects.create_user(username='test_dashboard_admin', password='test123', is_staff=True)
+        self.productos = [
+            Producto.objects.create(codigo_barras=f'TDSH-{i:03d}', nombre=f'Producto Dashboard {i}') for i in range(3)
+        ]
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Dashboard', numero_conteo=2)
+        self.reconteo = Conteo.objects.create(
+            nombre='Reconteo Test Dashboard', numero_conteo=3,
+            observaciones=f'Productos: {self.productos[0].id},{self.productos[1].id}'
+        )
+        self.client = Client()
+        self.client.login(username='test_dashboard_admin', password='test123')
+
+    def progreso(self, datos, conteo):
+        return next(p for p in datos['progreso_conteos'] if p['conteo']['id'] == conteo.id)
+
+    def test_1_estadisticas(self):
+        """Test 1: Totales, progreso de reconteos y estadísticas por número de conteo"""
+        sumar_cantidad(self.conteo, self.productos[0], self.admin, 4)
+        sumar_cantidad(self.conteo, self.productos[1], self.admin, 0)
+        sumar_cantidad(self.reconteo, self.productos[1], self.admin, 2)
+        sumar_cantidad(self.reconteo, self.productos[2], self.admin, 1)
+
+        datos = DashboardSnapshot.calcular()
+        self.assertEqual(datos['total_productos'], Producto.objects.count())
+        self.assertEqual(datos['total_conteos'], Conteo.objects.count())
+        self.assertEqual(datos['total_movimientos'], MovimientoConteo.objects.count())
+
+        normal = self.progreso(datos, self.conteo)
+        self.assertEqual((normal['items_contados'], normal['items_con_cantidad'], normal['items_con_cero']), (2, 1, 1))
+        self.assertEqual(normal['total_cantidad'], 4)
+        # El reconteo solo avanza con sus productos
+        reconteo = self.progreso(datos, self.reconteo)
+        self.assertEqual((reconteo['items_contados'], reconteo['total_productos_sistema'], reconteo['porcentaje']), (1, 2, 50.0))
+
+        por_numero = Conteo.objects.filter(numero_conteo=3)
+        self.assertEqual(datos['conteos_por_numero'][3]['total'], por_numero.count())
+        self.assertEqual(datos['conteos_por_numero'][3]['en_proceso'], por_numero.filter(estado='en_proceso').count())
+
+    def test_2_cache_e_invalidacion(self):
+        """Test 2: La segunda lectura sale de la caché y un escaneo la invalida al confirmarse"""
+        DashboardSnapshot.obtener()
+        with self.assertNumQueries(0):
+            DashboardSnapshot.obtener()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sumar_cantidad(self.conteo, self.productos[0], self.admin, 1)
+        self.assertIsNone(cache.get(CLAVE_SNAPSHOT))
+        self.assertEqual(self.progreso(DashboardSnapshot.obtener(), self.conteo)['total_cantidad'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Conteo.objects.filter(pk=self.conteo.pk).first().save()
+        self.assertIsNone(cache.get(CLAVE_SNAPSHOT))
+
+        estadisticas = DashboardSnapshot.estadisticas_cache()
+        self.assertEqual((estadisticas['aciertos'], estadisticas['fallos']), (1, 2))
+        self.assertEqual(estadisticas['tasa_aciertos'], 33.3)
+
+    def test_3_consultas_fijas(self):
+        """Test 3: El cálculo usa las mismas consultas sin importar cuántos conteos haya"""
+        def consultas_calculo():
+            with CaptureQueriesContext(connection) as consultas:
+                DashboardSnapshot.calcular()
+            return len(consultas)
+
+        iniciales = consultas_calculo()
+        for i in range(10):
+            conteo = Conteo.objects.create(nombre=f'Conteo Test Dashboard Extra {i}')
+            ItemConteo.objects.create(conteo=conteo, producto=self.productos[i % 3], usuario_conteo=self.admin, cantidad=1)
+        self.assertEqual(consultas_calculo(), iniciales)
+        # Incluye los acumulados de movimientos, el resumen de las instantáneas archivadas y el stock
+        self.assertLessEqual(iniciales, 15)
+
+    def test_4_vista(self):
+        """Test 4: El dashboard se muestra con las tasas de la caché para administradores"""
+        self.client.get('/')
+        respuesta = self.client.get('/')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, '(1/1)')
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
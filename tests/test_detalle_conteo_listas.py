@@ -0,0 +1,165 @@
+"""
+Test del detalle de conteo liviano y sus listas paginadas:
+productos pendientes, items contados por la pareja e items de otros usuarios,
+con paginación por cursor y búsqueda en el servidor.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.core.cache import cache
+from django.db import connection
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo.models import Conteo, ItemConteo
+from conteo.listas import LIMITE_LISTA
+from usuarios.models import ParejaConteo
+
+
+class TestDetalleConteoListas(TestCase):
+    """Test de las listas paginadas del detalle de conteo"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        cache.clear()
+        self.usuario1 = User.objects.create_user(username='test_listas_1', password='test123')
+        self.usuario2 = User.objects.create_user(username='test_listas_2', password='test123')
+        self.otro = User.objects.create_user(username='test_listas_otro', password='test123')
+        self.admin = User.objects.create_user(username='test_listas_admin', password='test123', is_staff=True)
+        self.pareja = ParejaConteo.objects.create(usuario_1=self.usuario1, usuario_2=self.usuario2)
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Listas')
+
+        # Marcas repetidas y sin marca para probar el orden (marca, nombre, id) con empates
+        self.productos = [
+            Producto.objects.create(
+                codigo_barras=f'TLST-{i:03d}',
+                nombre=f'Producto Listas {i % 3}',
+                marca=[None, 'Acme', 'Zeta'][i % 3],
+            )
+            for i in range(9)
+        ]
+        self.pareja.productos_asignados.add(*self.productos)
+
+        self.client = Client()
+        self.client.login(username='test_listas_1', password='test123')
+
+    def contar(self, producto, usuario, cantidad=1):
+        return ItemConteo.objects.create(conteo=self.conteo, producto=producto, usuario_conteo=usuario, cantidad=cantidad)
+
+    def recorrer(self, lista, client=None, **params):
+        """Recorre todas las páginas de una lista y retorna los resultados"""
+        client = client or self.client
+        resultados, cursor = [], ''
+        while True:
+            data = client.get(f'/conteo/{self.conteo.pk}/lista/{lista}/', {**params, 'cursor': cursor}).json()
+            self.assertTrue(data['success'])
+            resultados.extend(data['resultados'])
+            if not data['hay_mas']:
+                return resultados
+            cursor = data['siguiente_cursor']
+
+    def test_1_pendientes_paginados(self):
+        """Test 1: Los pendientes se recorren por cursor sin repetir ni saltar productos"""
+        self.contar(self.productos[0], self.otro)
+        self.contar(self.productos[4], self.usuario2)
+
+        resultados = self.recorrer('pendientes', limit=2)
+        esperados = sorted(
+            (p for p in self.productos if p not in (self.productos[0], self.productos[4])),
+            key=lambda p: (p.marca or '', p.nombre, p.id)
+        )
+        self.assertEqual([r['id'] for r in resultados], [p.id for p in esperados])
+
+    def test_2_pendientes_con_conteo_entre_paginas(self):
+        """Test 2: Contar productos entre página y página no desplaza el cursor"""
+        primera = self.client.get(f'/conteo/{self.conteo.pk}/lista/pendientes/', {'limit': 3}).json()
+        vistos = [r['id'] for r in primera['resultados']]
+        # Se cuenta un producto ya mostrado
+        self.contar(Producto.objects.get(id=vistos[0]), self.usuario1)
+
+        segunda = self.client.get(
+            f'/conteo/{self.conteo.pk}/lista/pendientes/', {'limit': 3, 'cursor': primera['siguiente_cursor']}
+        ).json()
+        esperados = sorted(self.productos, key=lambda p: (p.marca or '', p.nombre, p.id))
+        self.assertEqual([r['id'] for r in segunda['resultados']], [p.id for p in esperados[3:6]])
+
+    def test_3_busqueda_en_servidor(self):
+        """Test 3: La búsqueda filtra en el servidor las listas de pendientes y contados"""
+        resultados = self.recorrer('pendientes', busqueda='TLST-005')
+        self.assertEqual([r['id'] for r in resultados], [self.productos[5].id])
+
+        self.contar(self.productos[1], self.usuario1)
+        self.contar(self.productos[2], self.usuario2)
+        resultados = self.recorrer('contados', busqueda='Zeta')
+        self.assertEqual([r['producto_id'] for r in resultados], [self.productos[2].id])
+
+    def test_4_contados_y_otros(self):
+        """Test 4: Contados son los items de la pareja; otros, los del resto (solo administradores)"""
+        items_pareja = [self.contar(self.productos[i], [self.usuario1, self.usuario2][i % 2]) for i in range(5)]
+        item_otro = self.contar(self.productos[7], self.otro, cantidad=4)
+
+        resultados = self.recorrer('contados', limit=2)
+        self.assertEqual([r['id'] for r in resultados], [item.id for item in reversed(items_pareja)])
+
+        respuesta = self.client.get(f'/conteo/{self.conteo.pk}/lista/otros/')
+        self.assertEqual(respuesta.status_code, 403)
+
+        admin = Client()
+        admin.login(username='test_listas_admin', password='test123')
+        resultados = self.recorrer('otros', client=admin)
+        # Para el admin (sin pareja) todos los items son de otros usuarios
+        self.assertEqual(len(resultados), 6)
+        self.assertEqual(resultados[0]['id'], item_otro.id)
+        self.assertEqual((resultados[0]['usuario'], resultados[0]['cantidad']), ('test_listas_otro', 4))
+
+    def test_5_progreso(self):
+        """Test 5: El progreso cuenta los items de la pareja y los pendientes de todo el conteo"""
+        self.contar(self.productos[0], self.usuario1, cantidad=3)
+        self.contar(self.productos[1], self.usuario2, cantidad=2)
+        self.contar(self.productos[2], self.otro, cantidad=5)
+
+        data = self.client.get(f'/conteo/{self.conteo.pk}/progreso/').json()
+        self.assertEqual(data['total_items'], 2)
+        self.assertEqual(data['total_cantidad'], 5)
+        self.assertEqual(data['total_productos'], 9)
+        self.assertEqual(data['pendientes'], 6)
+        self.assertNotIn('total_items_todos', data)
+
+    def test_6_detalle_solo_primera_pagina(self):
+        """Test 6: El detalle muestra una página de items y no depende de la cantidad de productos"""
+        def consultas_detalle():
+            with CaptureQueriesContext(connection) as consultas:
+                respuesta = self.client.get(f'/conteo/{self.conteo.pk}/')
+            self.assertEqual(respuesta.status_code, 200)
+            return respuesta, len(consultas)
+
+        # La primera visita llena las cachés de asignaciones
+        consultas_detalle()
+        _, consultas_inicial = consultas_detalle()
+
+        productos = Producto.objects.bulk_create([
+            Producto(codigo_barras=f'TLST-M{i:04d}', nombre=f'Masivo {i}') for i in range(LIMITE_LISTA + 20)
+        ])
+        ItemConteo.objects.bulk_create([
+            ItemConteo(conteo=self.conteo, producto=producto, usuario_conteo=self.usuario1, cantidad=1)
+            for producto in productos
+        ])
+        respuesta, consultas_final = consultas_detalle()
+
+        contenido = respuesta.content.decode()
+        self.assertEqual(contenido.count('class="item-card-compact item-pareja"'), LIMITE_LISTA)
+        self.assertNotIn('id="cargar-mas-items-wrapper" style="display: none;"', contenido)
+        self.assertIn(f'id="resumen-items">{LIMITE_LISTA + 20}<', contenido)
+        self.assertEqual(consultas_final, consultas_inicial)
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
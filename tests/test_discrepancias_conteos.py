@@ -0,0 +1,131 @@
+"""
+Test de las discrepancias entre Conteo 1, 2 y 3: se actualizan al finalizar cada
+conteo, solo para los productos que el conteo cambia, y permiten seleccionar
+productos para recontar por umbral.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from decimal import Decimal
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo.models import Conteo, DiscrepanciaConteo
+from conteo.discrepancias import calcular_discrepancias, candidatos_reconteo, recalcular_discrepancias
+from conteo.registro import sumar_cantidad
+from comparativos.models import ComparativoInventario
+
+
+class TestDiscrepanciasConteos(TestCase):
+    """Test de DiscrepanciaConteo"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.admin = User.objects.create_user(username='test_discrepancia_admin', password='test123', is_staff=True)
+        self.productos = [
+            Producto.objects.create(codigo_barras=f'TDIS-{i:03d}', nombre=f'Producto Discrepancia {i}', precio=Decimal('2.50'))
+            for i in range(4)
+        ]
+        self.client = Client()
+        self.client.login(username='test_discrepancia_admin', password='test123')
+
+    def crear_conteo(self, numero_conteo, cantidades, productos_reconteo=None):
+        observaciones = None
+        if productos_reconteo:
+            observaciones = 'Conteo creado desde comparativo "Test". Productos: ' + ','.join(
+                str(self.productos[indice].id) for indice in productos_reconteo
+            )
+        conteo = Conteo.objects.create(
+            nombre=f'Conteo Test Discrepancia {numero_conteo}', numero_conteo=numero_conteo, observaciones=observaciones
+        )
+        for indice, cantidad in cantidades.items():
+            sumar_cantidad(conteo, self.productos[indice], self.admin, cantidad)
+        self.client.post(f'/conteo/{conteo.id}/finalizar/')
+        conteo.refresh_from_db()
+        return conteo
+
+    def discrepancia(self, indice):
+        return DiscrepanciaConteo.objects.get(producto=self.productos[indice])
+
+    def test_1_actualizar_al_finalizar(self):
+        """Test 1: Finalizar conteos completos calcula cantidades, diferencias e impacto"""
+        conteo1 = self.crear_conteo(1, {0: 10, 1: 4})
+        self.assertEqual(self.discrepancia(0).cantidades, [(1, 10)])
+        self.assertEqual(self.discrepancia(0).diferencia_absoluta, 0)
+        self.assertFalse(DiscrepanciaConteo.objects.filter(producto=self.productos[2]).exists())
+
+        conteo2 = self.crear_conteo(2, {0: 6, 2: 3})
+        discrepancia = self.discrepancia(0)
+        self.assertEqual((discrepancia.conteo_1_id, discrepancia.conteo_2_id), (conteo1.id, conteo2.id))
+        self.assertEqual(discrepancia.cantidades, [(1, 10), (2, 6)])
+        self.assertEqual(discrepancia.diferencia_absoluta, 4)
+        self.assertEqual(discrepancia.diferencia_relativa, 40.0)
+        self.assertEqual(discrepancia.impacto_valor, Decimal('10.00'))
+        # El producto 1 no está en el Conteo 2 completo: cuenta 0
+        self.assertEqual(self.discrepancia(1).cantidades, [(1, 4), (2, 0)])
+        self.assertEqual(self.discrepancia(2).cantidades, [(1, 0), (2, 3)])
+
+    def test_2_reconteo_incremental(self):
+        """Test 2: Un reconteo solo recalcula sus productos y coincide con la reconstrucción"""
+        self.crear_conteo(1, {0: 10, 1: 4})
+        self.crear_conteo(2, {0: 6, 1: 4})
+        antes = self.discrepancia(1).fecha_actualizacion
+
+        self.crear_conteo(3, {0: 6, 1: 9}, productos_reconteo=[0])
+        self.assertEqual(self.discrepancia(0).cantidades, [(1, 10), (2, 6), (3, 6)])
+        # El producto 1 no está en el reconteo: ni se toca ni se toma su cantidad
+        self.assertEqual(self.discrepancia(1).fecha_actualizacion, antes)
+        self.assertEqual(self.discrepancia(1).cantidades, [(1, 4), (2, 4)])
+
+        incremental = {
+            d.producto_id: (d.cantidad_1, d.cantidad_2, d.cantidad_3, d.diferencia_absoluta)
+            for d in DiscrepanciaConteo.objects.filter(producto__in=self.productos)
+        }
+        recalcular_discrepancias()
+        reconstruido = {
+            d.producto_id: (d.cantidad_1, d.cantidad_2, d.cantidad_3, d.diferencia_absoluta)
+            for d in DiscrepanciaConteo.objects.filter(producto__in=self.productos)
+        }
+        self.assertEqual(incremental, reconstruido)
+        self.assertEqual(len(calcular_discrepancias([self.productos[3].id])), 0)
+
+    def test_3_seleccion_por_umbral(self):
+        """Test 3: Los candidatos se filtran por umbral y asignar_productos_recontar los usa"""
+        self.crear_conteo(1, {0: 10, 1: 4, 2: 100})
+        self.crear_conteo(2, {0: 6, 1: 3, 2: 99})
+
+        candidatos = list(candidatos_reconteo().filter(producto__in=self.productos).values_list('producto_id', flat=True))
+        self.assertEqual(candidatos, [self.productos[0].id, self.productos[1].id, self.productos[2].id])
+        self.assertEqual(list(candidatos_reconteo(diferencia_minima=2).values_list('producto_id', flat=True)), [self.productos[0].id])
+        relativos = candidatos_reconteo(diferencia_relativa_minima=20).values_list('producto_id', flat=True)
+        self.assertEqual(set(relativos), {self.productos[0].id, self.productos[1].id})
+
+        comparativo = ComparativoInventario.objects.create(nombre='Comparativo Test Discrepancia', usuario=self.admin)
+        respuesta = self.client.get(f'/comparativos/{comparativo.pk}/candidatos-recontar/', {'diferencia_minima': '2'})
+        self.assertEqual(respuesta.json(), {'success': True, 'productos': [self.productos[0].id], 'total': 1})
+
+        respuesta = self.client.post(f'/comparativos/{comparativo.pk}/asignar-recontar/', {
+            'seleccion': 'discrepancias',
+            'diferencia_relativa_minima': '20',
+            'nombre_conteo': 'Reconteo Test Discrepancia',
+            'numero_conteo': '3',
+        })
+        self.assertTrue(respuesta.json()['success'])
+        reconteo = Conteo.objects.get(pk=respuesta.json()['conteo_id'])
+        self.assertEqual(set(reconteo.productos_reconteo_ids()), {self.productos[0].id, self.productos[1].id})
+
+        respuesta = self.client.post(f'/comparativos/{comparativo.pk}/asignar-recontar/', {
+            'seleccion': 'discrepancias', 'diferencia_minima': 'x',
+        })
+        self.assertFalse(respuesta.json()['success'])
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Test de los eventos de progreso por conteo:
+publicación desde el registro de movimientos, long-poll y Server-Sent Events.
+"""
+import os
+import sys
+import json
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.test import TestCase, Client, override_settings
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo.models import Conteo
+from conteo.eventos import eventos_desde, eventos_en_vivo, liberar_flujo, reservar_flujo, ultimo_evento
+from usuarios.models import ParejaConteo
+
+
+class TestEventosConteo(TestCase):
+    """Test de los eventos de progreso"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.usuario1 = User.objects.create_user(username='test_eventos_1', password='test123')
+        self.usuario2 = User.objects.create_user(username='test_eventos_2', password='test123')
+        self.pareja = ParejaConteo.objects.create(usuario_1=self.usuario1, usuario_2=self.usuario2)
+        self.producto = Producto.objects.create(codigo_barras='TEVT-001', nombre='Producto Eventos')
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Eventos')
+        cache.clear()
+        self.client = Client()
+        self.client.login(username='test_eventos_1', password='test123')
+
+    def agregar(self, cantidad):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                f'/conteo/{self.conteo.pk}/agregar-item/',
+                {'producto_id': self.producto.id, 'cantidad': cantidad}
+            ).json()
+
+    def test_1_publicacion_al_confirmar(self):
+        """Test 1: Cada escaneo publica un evento con la cantidad y la pareja"""
+        item_id = self.agregar(2)['item_id']
+        self.agregar(3)
+        eventos = eventos_desde(self.conteo.id, 0)
+        self.assertEqual([e['id'] for e in eventos], [1, 2])
+        self.assertEqual(eventos[1]['item_id'], item_id)
+        self.assertEqual((eventos[1]['tipo'], eventos[1]['cantidad_anterior'], eventos[1]['cantidad_nueva']), ('modificar', 2, 5))
+        self.assertEqual(eventos[1]['pareja_ids'], [self.pareja.id])
+        self.assertEqual(eventos_desde(self.conteo.id, 2), [])
+
+    def test_2_long_poll(self):
+        """Test 2: El long-poll retorna los eventos posteriores a 'desde'"""
+        self.agregar(1)
+        self.agregar(1)
+        data = self.client.get(f'/conteo/{self.conteo.pk}/eventos/', {'desde': 1}).json()
+        self.assertFalse(data['reiniciar'])
+        self.assertEqual([e['id'] for e in data['eventos']], [2])
+        self.assertEqual(data['ultimo'], 2)
+
+    def test_3_reiniciar(self):
+        """Test 3: Si los eventos ya no están disponibles el cliente debe recargar"""
+        self.agregar(1)
+        self.agregar(1)
+        cache.delete(f'conteo:{self.conteo.id}:evento:1')
+        self.assertTrue(self.client.get(f'/conteo/{self.conteo.pk}/eventos/').json()['reiniciar'])
+
+        cache.clear()
+        self.assertEqual(ultimo_evento(self.conteo.id), 0)
+        self.assertTrue(self.client.get(f'/conteo/{self.conteo.pk}/eventos/', {'desde': 2}).json()['reiniciar'])
+
+    @override_settings(CONTEO_EVENTOS_EN_VIVO=True)
+    def test_4_server_sent_events(self):
+        """Test 4: Con Accept text/event-stream se envían los eventos con su id"""
+        self.agregar(4)
+        response = self.client.get(
+            f'/conteo/{self.conteo.pk}/eventos/', HTTP_ACCEPT='text/event-stream', HTTP_LAST_EVENT_ID='0'
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        flujo = iter(response.streaming_content)
+        self.assertTrue(next(flujo).startswith(b'retry:'))
+        mensaje = next(flujo).decode()
+        self.assertTrue(mensaje.startswith('id: 1\nevent: movimiento\n'))
+        self.assertEqual(json.loads(mensaje.split('data: ')[1])['cantidad_nueva'], 4)
+        # Al descartar el flujo el cliente de test lo cierra (liberando su reserva) sin cerrar la conexión
+        del flujo, response
+
+    def test_5_sin_cache_compartida(self):
+        """Test 5: Con la caché local de cada proceso no hay flujo SSE y la página consulta el avance"""
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertFalse(eventos_en_vivo())
+            response = self.client.get(f'/conteo/{self.conteo.pk}/eventos/', HTTP_ACCEPT='text/event-stream')
+            self.assertEqual(response.status_code, 204)
+            pagina = self.client.get(f'/conteo/{self.conteo.pk}/')
+            self.assertContains(pagina, 'setInterval(cargarEstadisticas')
+            self.assertNotContains(pagina, 'escucharEventos();')
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertTrue(eventos_en_vivo())
+
+    @override_settings(CONTEO_EVENTOS_EN_VIVO=True, CONTEO_MAX_FLUJOS_EVENTOS=1)
+    def test_6_maximo_flujos(self):
+        """Test 6: Con el máximo de flujos abiertos el proceso pide reconectar más tarde"""
+        self.agregar(1)
+        self.assertTrue(reservar_flujo())
+        try:
+            response = self.client.get(f'/conteo/{self.conteo.pk}/eventos/', HTTP_ACCEPT='text/event-stream')
+            self.assertEqual(list(response.streaming_content), [b'retry: 15000\n\n'])
+            data = self.client.get(f'/conteo/{self.conteo.pk}/eventos/', {'desde': 1, 'espera': 5}).json()
+            self.assertEqual(data['eventos'], [])
+        finally:
+            liberar_flujo()
+        self.assertTrue(reservar_flujo())
+        liberar_flujo()
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+Test de las facetas de los filtros de movimientos: conjuntos cacheados que se
+actualizan con los movimientos nuevos y opciones pedidas por búsqueda.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo.models import Conteo
+from movimientos.facetas import LIMITE_MAXIMO_OPCIONES, facetas_movimientos, opciones_faceta
+from movimientos.models import MovimientoConteo
+
+
+class TestFacetasMovimientos(TestCase):
+    """Test de movimientos.facetas"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='test_facmov_admin', password='test123', is_staff=True, first_name='Facundo', last_name='Vera'
+        )
+        self.contador = User.objects.create_user(username='test_facmov_eli', password='test123')
+        self.crema = Producto.objects.create(codigo_barras='TFMV-001', nombre='Crema Facetada', marca='TFMV Marca Uno')
+        self.labial = Producto.objects.create(codigo_barras='TFMV-002', nombre='Labial Facetado', marca='TFMV Marca Dos')
+        self.conteo = Conteo.objects.create(nombre='Conteo Facetas TFMV')
+        MovimientoConteo.objects.create(conteo=self.conteo, producto=self.crema, usuario=self.admin, tipo='agregar')
+
+    def test_1_actualizacion_incremental(self):
+        """Test 1: Los movimientos nuevos se agregan a las facetas cacheadas"""
+        facetas = facetas_movimientos()
+        self.assertIn(self.admin.id, facetas['usuarios'])
+        self.assertIn(self.crema.id, facetas['productos'])
+        self.assertIn('TFMV Marca Uno', facetas['marcas'])
+        self.assertNotIn(self.labial.id, facetas['productos'])
+        self.assertNotIn('TFMV Marca Dos', facetas['marcas'])
+
+        MovimientoConteo.objects.create(conteo=self.conteo, producto=self.labial, usuario=self.contador, tipo='agregar')
+        facetas = facetas_movimientos()
+        self.assertIn(self.contador.id, facetas['usuarios'])
+        self.assertIn(self.labial.id, facetas['productos'])
+        self.assertIn('TFMV Marca Dos', facetas['marcas'])
+        self.assertEqual(facetas['ultimo_id'], MovimientoConteo.objects.order_by('-id').values_list('id', flat=True)[0])
+
+    def test_2_opciones(self):
+        """Test 2: Opciones de cada faceta filtradas por búsqueda"""
+        self.assertEqual(opciones_faceta('productos', 'TFMV'), [{'valor': self.crema.id, 'texto': 'Crema Facetada (TFMV-001)'}])
+        self.assertEqual(opciones_faceta('marcas', 'tfmv marca'), [{'valor': 'TFMV Marca Uno', 'texto': 'TFMV Marca Uno'}])
+        self.assertEqual(opciones_faceta('usuarios', 'facundo'), [{'valor': self.admin.id, 'texto': 'Facundo Vera'}])
+        self.assertEqual(opciones_faceta('usuarios', 'test_facmov_eli'), [])
+        self.assertEqual(
+            opciones_faceta('conteos', 'Facetas TFMV'),
+            [{'valor': self.conteo.id, 'texto': f'Conteo {self.conteo.numero_conteo}: Conteo Facetas TFMV'}]
+        )
+
+    def test_3_vistas(self):
+        """Test 3: Endpoint JSON de las facetas y lista sin las listas completas de opciones"""
+        client = Client()
+        client.login(username='test_facmov_admin', password='test123')
+
+        respuesta = client.get('/movimientos/facetas/marcas/', {'q': 'TFMV'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json(), {'resultados': [{'valor': 'TFMV Marca Uno', 'texto': 'TFMV Marca Uno'}]})
+        self.assertEqual(client.get('/movimientos/facetas/tipos/').status_code, 404)
+
+        MovimientoConteo.objects.create(conteo=self.conteo, producto=self.labial, usuario=self.admin, tipo='modificar')
+        respuesta = client.get('/movimientos/facetas/productos/', {'q': 'TFMV', 'limite': '1'})
+        self.assertEqual(len(respuesta.json()['resultados']), 1)
+        respuesta = client.get('/movimientos/facetas/productos/', {'q': 'TFMV', 'limite': str(LIMITE_MAXIMO_OPCIONES + 1)})
+        self.assertEqual(len(respuesta.json()['resultados']), 2)
+
+        respuesta = client.get('/movimientos/', {'producto': self.crema.id, 'usuario': self.admin.id})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, 'value="Crema Facetada (TFMV-001)"')
+        self.assertContains(respuesta, 'value="Facundo Vera"')
+        self.assertNotContains(respuesta, 'Labial Facetado')
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
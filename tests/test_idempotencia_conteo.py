@@ -0,0 +1,155 @@
+"""
+Test de las claves de idempotencia de agregar_item / editar_item y del lote:
+los reintentos con la misma clave devuelven la respuesta original sin volver a escribir,
+también cuando los duplicados llegan en paralelo.
+"""
+import os
+import sys
+import json
+import time
+import threading
+import unittest
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.db import connection, OperationalError
+from productos.models import Producto
+from conteo.models import Conteo, ItemConteo
+from movimientos.models import MovimientoConteo
+
+
+class TestIdempotencia(TestCase):
+    """Test de las claves de idempotencia"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.admin = User.objects.create_user(username='test_idem_admin', password='test123', is_staff=True)
+        self.producto = Producto.objects.create(codigo_barras='TIDEM-001', nombre='Producto Idempotencia')
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Idempotencia')
+        self.client = Client()
+        self.client.login(username='test_idem_admin', password='test123')
+
+    def agregar(self, clave, cantidad=1):
+        return self.client.post(
+            f'/conteo/{self.conteo.pk}/agregar-item/',
+            {'producto_id': self.producto.id, 'cantidad': cantidad},
+            HTTP_IDEMPOTENCY_KEY=clave
+        ).json()
+
+    def test_1_reintento_agregar_item(self):
+        """Test 1: Reenviar la misma clave devuelve la respuesta original sin sumar de nuevo"""
+        primera = self.agregar('clave-1', 3)
+        segunda = self.agregar('clave-1', 3)
+        self.assertEqual(primera, segunda)
+        self.assertEqual(ItemConteo.objects.get(conteo=self.conteo).cantidad, 3)
+        self.assertEqual(MovimientoConteo.objects.filter(conteo=self.conteo).count(), 1)
+
+        self.agregar('clave-2', 3)
+        self.assertEqual(ItemConteo.objects.get(conteo=self.conteo).cantidad, 6)
+
+    def test_2_reintento_editar_item(self):
+        """Test 2: editar_item con la misma clave no registra un segundo movimiento"""
+        item_id = self.agregar('clave-1', 3)['item_id']
+        for _ in range(2):
+            respuesta = self.client.post(
+                f'/conteo/item/{item_id}/editar/', {'cantidad': 10, 'idempotency_key': 'editar-1'}
+            ).json()
+            self.assertTrue(respuesta['success'])
+        self.assertEqual(MovimientoConteo.objects.filter(conteo=self.conteo, cantidad_nueva=10).count(), 1)
+
+    def test_3_lote_reutiliza_clave(self):
+        """Test 3: Un escaneo encolado con la clave de un envío que sí llegó no se cuenta dos veces"""
+        self.agregar('clave-1', 2)
+        data = self.client.post(
+            f'/conteo/{self.conteo.pk}/agregar-lote/',
+            json.dumps({'lineas': [
+                {'producto_id': self.producto.id, 'cantidad': 2, 'client_id': 'clave-1'},
+                {'producto_id': self.producto.id, 'cantidad': 5, 'client_id': 'clave-2'},
+                {'producto_id': self.producto.id, 'cantidad': 5, 'client_id': 'clave-2'},
+            ]}),
+            content_type='application/json'
+        ).json()
+        self.assertTrue(all(resultado['success'] for resultado in data['resultados']))
+        self.assertEqual(ItemConteo.objects.get(conteo=self.conteo).cantidad, 7)
+
+
+class TestIdempotenciaConcurrente(unittest.TestCase):
+    """
+    Duplicados enviados en paralelo. Los hilos usan sus propias conexiones,
+    por lo que los datos se confirman y se eliminan al terminar.
+    """
+
+    HILOS = 8
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.usuario = User.objects.create_user(username='test_idem_concurrente', password='test123')
+        self.producto = Producto.objects.create(codigo_barras='TIDEM-002', nombre='Producto Idempotencia Concurrente')
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Idempotencia Concurrente')
+
+    def tearDown(self):
+        """Eliminar los datos creados por el test"""
+        MovimientoConteo.objects.filter(conteo=self.conteo).delete()
+        self.conteo.delete()
+        self.producto.delete()
+        self.usuario.delete()
+
+    def enviar_en_hilo(self, client, respuestas, errores):
+        try:
+            while True:
+                try:
+                    respuesta = client.post(
+                        f'/conteo/{self.conteo.pk}/agregar-item/',
+                        {'producto_id': self.producto.id, 'cantidad': 4},
+                        HTTP_IDEMPOTENCY_KEY='clave-concurrente'
+                    ).json()
+                except OperationalError as e:
+                    # SQLite puede rechazar la lectura de la sesión por bloqueo: reintentar igual
+                    if 'locked' not in str(e):
+                        raise
+                    time.sleep(0.005)
+                    continue
+                # SQLite puede rechazar la escritura por bloqueo: el cliente reintenta con la misma clave
+                if respuesta['success'] or 'locked' not in respuesta['error']:
+                    break
+                time.sleep(0.005)
+            respuestas.append(respuesta)
+        except Exception as e:
+            errores.append(e)
+        finally:
+            connection.close()
+
+    def test_1_duplicados_concurrentes(self):
+        """Test 1: Solo se aplica una escritura y todos reciben la misma respuesta"""
+        # Las sesiones se crean antes de arrancar los hilos para no competir por django_session
+        clientes = []
+        for _ in range(self.HILOS):
+            client = Client()
+            client.force_login(self.usuario)
+            clientes.append(client)
+
+        respuestas = []
+        errores = []
+        hilos = [
+            threading.Thread(target=self.enviar_en_hilo, args=(client, respuestas, errores)) for client in clientes
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(len(respuestas), self.HILOS)
+        self.assertTrue(all(respuesta == respuestas[0] for respuesta in respuestas))
+        self.assertTrue(respuestas[0]['success'])
+        self.assertEqual(ItemConteo.objects.get(conteo=self.conteo).cantidad, 4)
+        self.assertEqual(MovimientoConteo.objects.filter(conteo=self.conteo).count(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Test de incrementos concurrentes sobre el mismo ItemConteo:
+varios hilos suman cantidades al mismo producto al mismo tiempo y no se
+debe perder ningún incremento ni romper la secuencia de movimientos.
+"""
+import os
+import sys
+import time
+import threading
+import unittest
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection, OperationalError
+from productos.models import Producto
+from conteo.models import Conteo, ItemConteo
+from conteo.registro import sumar_cantidad
+from movimientos.models import MovimientoConteo
+
+HILOS = 8
+INCREMENTOS_POR_HILO = 250
+
+
+class TestIncrementoConcurrente(unittest.TestCase):
+    """
+    Test de incrementos atómicos con escrituras concurrentes.
+    Los hilos usan sus propias conexiones, por lo que los datos se confirman
+    y se eliminan al terminar (sin vaciar el resto de la base de datos).
+    """
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.usuarios = [User.objects.create_user(username=f'test_concurrente_{i}', password='test123') for i in range(2)]
+        self.producto = Producto.objects.create(codigo_barras='TCONC-001', nombre='Producto Concurrente')
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Concurrente')
+
+    def tearDown(self):
+        """Eliminar los datos creados por el test"""
+        MovimientoConteo.objects.filter(conteo=self.conteo).delete()
+        self.conteo.delete()
+        self.producto.delete()
+        for usuario in self.usuarios:
+            usuario.delete()
+
+    def sumar_en_hilo(self, usuario, errores):
+        """Suma de a 1; reintenta si el motor rechaza la escritura por bloqueo (SQLite)"""
+        try:
+            for _ in range(INCREMENTOS_POR_HILO):
+                while True:
+                    try:
+                        sumar_cantidad(self.conteo, self.producto, usuario, 1)
+                        break
+                    except OperationalError:
+                        time.sleep(0.001)
+        except Exception as e:
+            errores.append(e)
+        finally:
+            connection.close()
+
+    def test_1_sin_incrementos_perdidos(self):
+        """Test 1: La cantidad final es exactamente la suma de todos los incrementos"""
+        errores = []
+        hilos = [
+            threading.Thread(target=self.sumar_en_hilo, args=(self.usuarios[i % 2], errores))
+            for i in range(HILOS)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        total = HILOS * INCREMENTOS_POR_HILO
+        self.assertEqual(ItemConteo.objects.get(conteo=self.conteo, producto=self.producto).cantidad, total)
+
+        # El historial de movimientos es exacto: cada movimiento parte de la cantidad del anterior
+        movimientos = list(
+            MovimientoConteo.objects.filter(conteo=self.conteo)
+            .order_by('cantidad_nueva')
+            .values_list('tipo', 'cantidad_anterior', 'cantidad_nueva')
+        )
+        self.assertEqual(len(movimientos), total)
+        self.assertEqual(movimientos[0], ('agregar', 0, 1))
+        self.assertEqual([m[0] for m in movimientos[1:]], ['modificar'] * (total - 1))
+        self.assertEqual([(m[1], m[2]) for m in movimientos], [(n, n + 1) for n in range(total)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Test de los índices de los filtros frecuentes: existen en la base de datos,
+los planes de las consultas los usan y la alerta de conteos sin actividad del
+dashboard cuenta lo mismo que antes.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+import unittest
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from comparativos.models import ItemComparativo
+from conteo.archivo import conteos_para_archivar
+from conteo.listas import items_conteo
+from conteo.models import Conteo, ItemConteo
+from megaInventario.dashboard import DashboardSnapshot
+from productos.models import Producto
+
+INDICES = [
+    (Conteo, ['estado', 'fecha_fin']),
+    (Conteo, ['estado', 'fecha_modificacion']),
+    (ItemConteo, ['conteo', 'usuario_conteo']),
+    (Producto, ['marca', 'nombre']),
+    (Producto, ['codigo']),
+    (ItemComparativo, ['comparativo', 'diferencia_sistema1']),
+    (ItemComparativo, ['comparativo', 'diferencia_sistema2']),
+]
+
+
+def indice(modelo, campos):
+    return next(indice for indice in modelo._meta.indexes if list(indice.fields) == campos)
+
+
+def plan(queryset):
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return ' '.join(fila[-1] for fila in cursor.fetchall())
+
+
+class TestIndicesConsultas(TestCase):
+    """Test de los índices de Conteo, ItemConteo, Producto e ItemComparativo"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.usuario = User.objects.create_user(username='test_indices_usuario', password='test123')
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Índices')
+
+    def test_1_indices_en_base_de_datos(self):
+        """Test 1: Cada índice existe en su tabla con sus columnas"""
+        for modelo, campos in INDICES:
+            with connection.cursor() as cursor:
+                restricciones = connection.introspection.get_constraints(cursor, modelo._meta.db_table)
+            nombre = indice(modelo, campos).name
+            self.assertIn(nombre, restricciones)
+            self.assertEqual(
+                restricciones[nombre]['columns'],
+                [modelo._meta.get_field(campo).column for campo in campos],
+            )
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'Planes de EXPLAIN QUERY PLAN de SQLite')
+    def test_2_planes_usan_indices(self):
+        """Test 2: Los conteos para archivar y los items de la pareja se leen por los índices"""
+        self.assertIn(indice(Conteo, ['estado', 'fecha_fin']).name, plan(conteos_para_archivar(90)))
+        self.assertIn(
+            indice(ItemConteo, ['conteo', 'usuario_conteo']).name,
+            plan(items_conteo(self.conteo, {self.usuario.id})),
+        )
+
+    def test_3_alerta_conteos_sin_actividad(self):
+        """Test 3: La alerta cuenta los conteos en proceso sin modificar en 24 horas"""
+        hace_dos_dias = timezone.now() - timedelta(days=2)
+        antes = Conteo.objects.filter(
+            estado='en_proceso', fecha_modificacion__lt=timezone.now() - timedelta(hours=24)
+        ).count()
+
+        inactivos = [Conteo.objects.create(nombre=f'Conteo Test Índices Inactivo {i}') for i in range(2)]
+        finalizado = Conteo.objects.create(nombre='Conteo Test Índices Finalizado', estado='finalizado')
+        Conteo.objects.filter(id__in=[c.id for c in inactivos + [finalizado]]).update(fecha_modificacion=hace_dos_dias)
+
+        alerta = next(
+            alerta for alerta in DashboardSnapshot.calcular()['alertas']
+            if alerta['titulo'] == 'Conteos sin actividad reciente'
+        )
+        self.assertTrue(alerta['mensaje'].startswith(f'{antes + 2} conteo(s)'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""
+Test de las instantáneas de conteos finalizados: se congelan al finalizar, se
+cargan con numpy.frombuffer, se descartan si cambian los items y alimentan
+comparativos y comparaciones.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+import numpy as np
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo.models import Conteo, ConteoInstantanea, ItemConteo
+from conteo.instantaneas import cargar_instantaneas, congelar_conteo, desempaquetar, ultimas_cantidades, verificar_instantanea
+from conteo.registro import sumar_cantidad
+from comparativos.models import ComparativoInventario
+
+
+class TestInstantaneasConteo(TestCase):
+    """Test de ConteoInstantanea"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.admin = User.objects.create_user(username='test_instantanea_admin', password='test123', is_staff=True)
+        self.productos = [
+            Producto.objects.create(codigo_barras=f'TINS-{i:03d}', nombre=f'Producto Instantanea {i}') for i in range(4)
+        ]
+        self.client = Client()
+        self.client.login(username='test_instantanea_admin', password='test123')
+
+    def crear_conteo(self, nombre, cantidades, numero_conteo=1):
+        conteo = Conteo.objects.create(nombre=nombre, numero_conteo=numero_conteo)
+        for indice, cantidad in cantidades.items():
+            sumar_cantidad(conteo, self.productos[indice], self.admin, cantidad)
+        self.client.post(f'/conteo/{conteo.id}/finalizar/')
+        conteo.refresh_from_db()
+        return conteo
+
+    def test_1_congelar_al_finalizar(self):
+        """Test 1: Finalizar congela los items ordenados por producto y la verificación coincide"""
+        conteo = self.crear_conteo('Conteo Test Instantanea 1', {2: 5, 0: 3, 1: 0})
+        instantanea = ConteoInstantanea.objects.get(conteo=conteo)
+        self.assertEqual((instantanea.total_items, instantanea.total_cantidad), (3, 8))
+
+        arreglo = desempaquetar(instantanea.datos)
+        self.assertEqual(arreglo.dtype, np.dtype('<i8'))
+        self.assertEqual(arreglo.tolist(), [[self.productos[0].id, 3], [self.productos[1].id, 0], [self.productos[2].id, 5]])
+        self.assertEqual(verificar_instantanea(instantanea), [])
+
+        # Una lectura de una sola consulta
+        with self.assertNumQueries(1):
+            cargar_instantaneas([conteo.id])
+
+    def test_2_descartar_al_modificar(self):
+        """Test 2: Modificar items de un conteo finalizado descarta la instantánea; las lecturas usan los items sin escribir"""
+        conteo = self.crear_conteo('Conteo Test Instantanea 2', {0: 1, 1: 2})
+        item = ItemConteo.objects.get(conteo=conteo, producto=self.productos[0])
+
+        ItemConteo.objects.filter(pk=item.pk).update(cantidad=9)
+        errores = verificar_instantanea(ConteoInstantanea.objects.get(conteo=conteo))
+        self.assertEqual(errores, [f'Producto {self.productos[0].id}: instantánea 1, items 9'])
+
+        self.client.post(f'/conteo/item/{item.id}/editar/', {'cantidad': 4})
+        self.assertFalse(ConteoInstantanea.objects.filter(conteo=conteo).exists())
+        with self.assertNumQueries(2):
+            self.assertEqual(cargar_instantaneas([conteo.id])[conteo.id][:, 1].tolist(), [4, 2])
+        self.assertFalse(ConteoInstantanea.objects.filter(conteo=conteo).exists())
+        congelar_conteo(conteo)
+        self.assertEqual(cargar_instantaneas([conteo.id])[conteo.id][:, 1].tolist(), [4, 2])
+
+        sumar_cantidad(conteo, self.productos[3], self.admin, 1)
+        self.assertFalse(ConteoInstantanea.objects.filter(conteo=conteo).exists())
+
+    def test_3_ultimas_cantidades(self):
+        """Test 3: Gana el primer conteo que contiene cada producto, con filtros de inclusión y exclusión"""
+        p = [producto.id for producto in self.productos]
+        reciente = np.array([[p[0], 1], [p[2], 7]], dtype='<i8')
+        anterior = np.array([[p[0], 5], [p[1], 6], [p[3], 8]], dtype='<i8')
+
+        self.assertEqual(ultimas_cantidades([reciente, anterior]), {p[0]: 1, p[1]: 6, p[2]: 7, p[3]: 8})
+        self.assertEqual(ultimas_cantidades([reciente, anterior], incluir={p[0], p[3]}), {p[0]: 1, p[3]: 8})
+        self.assertEqual(ultimas_cantidades([anterior, reciente], excluir={p[1]}), {p[0]: 5, p[2]: 7, p[3]: 8})
+        self.assertEqual(ultimas_cantidades([]), {})
+
+    def test_4_comparativos_y_comparacion(self):
+        """Test 4: El comparativo y la comparación de conteos leen las instantáneas"""
+        primero = self.crear_conteo('Conteo Test Instantanea A', {0: 2, 1: 3})
+        segundo = self.crear_conteo('Conteo Test Instantanea B', {0: 4}, numero_conteo=2)
+
+        respuesta = self.client.get(f'/conteo/comparacion/{primero.id},{segundo.id}/')
+        self.assertEqual(respuesta.status_code, 200)
+
+        comparativo = ComparativoInventario.objects.create(nombre='Comparativo Test Instantanea', usuario=self.admin)
+        self.client.get(f'/comparativos/{comparativo.id}/procesar/')
+        fisico = dict(comparativo.items.filter(producto__in=self.productos).values_list('producto_id', 'cantidad_fisico'))
+        self.assertEqual(fisico[self.productos[0].id], 4)
+        self.assertEqual(fisico[self.productos[1].id], 3)
+        self.assertEqual(fisico[self.productos[2].id], 0)
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Test de la lista de conteos: las estadísticas (items, cantidad y productos
+pendientes) salen de una consulta anotada y la cantidad de consultas no
+depende de cuántos conteos existan.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo.models import Conteo, ItemConteo
+from conteo.estadisticas import conteos_con_estadisticas, completar_pendientes_reconteos
+from usuarios.models import ParejaConteo
+
+# Consultas de la vista: sesión, usuario, conteos, parejas prefetch y reconteos (productos + items)
+PRESUPUESTO_CONSULTAS = 6
+
+
+class TestListaConteosConsultas(TestCase):
+    """Test de la consulta anotada de lista_conteos"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.usuario1 = User.objects.create_user(username='test_lista_1', password='test123')
+        self.usuario2 = User.objects.create_user(username='test_lista_2', password='test123')
+        self.pareja = ParejaConteo.objects.create(usuario_1=self.usuario1, usuario_2=self.usuario2)
+        self.productos = [
+            Producto.objects.create(codigo_barras=f'TLCO-{i:03d}', nombre=f'Producto Lista {i}') for i in range(6)
+        ]
+        self.pareja.productos_asignados.add(*self.productos[:4])
+        self.client = Client()
+        self.client.login(username='test_lista_1', password='test123')
+
+    def crear_conteos(self, cantidad, desde=0):
+        for i in range(desde, desde + cantidad):
+            conteo = Conteo.objects.create(nombre=f'Conteo Test Lista {i}', numero_conteo=i % 3 + 1)
+            conteo.parejas.add(self.pareja)
+            ItemConteo.objects.create(conteo=conteo, producto=self.productos[0], usuario_conteo=self.usuario1, cantidad=2)
+            reconteo = Conteo.objects.create(
+                nombre=f'Reconteo Test Lista {i}', numero_conteo=i % 3 + 1,
+                observaciones=f'Conteo creado desde comparativo. Productos: {self.productos[4].id},{self.productos[5].id}'
+            )
+            ItemConteo.objects.create(conteo=reconteo, producto=self.productos[5], usuario_conteo=self.usuario2, cantidad=1)
+
+    def consultas_lista(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get('/conteo/')
+        self.assertEqual(respuesta.status_code, 200)
+        return len(consultas)
+
+    def test_1_estadisticas(self):
+        """Test 1: Items, cantidad y pendientes de conteos normales, reconteos y finalizados"""
+        self.crear_conteos(1)
+        finalizado = Conteo.objects.create(nombre='Conteo Test Lista Finalizado', estado='finalizado')
+        finalizado.parejas.add(self.pareja)
+
+        conteos = {conteo.nombre: conteo for conteo in conteos_con_estadisticas(Conteo.objects.filter(nombre__contains='Test Lista'))}
+        completar_pendientes_reconteos(conteos.values())
+
+        normal = conteos['Conteo Test Lista 0']
+        self.assertEqual((normal.total_items, normal.total_cantidad, normal.productos_pendientes), (1, 2, 3))
+        reconteo = conteos['Reconteo Test Lista 0']
+        self.assertEqual((reconteo.total_items, reconteo.total_cantidad, reconteo.productos_pendientes), (1, 1, 1))
+        final = conteos['Conteo Test Lista Finalizado']
+        self.assertEqual((final.total_items, final.total_cantidad, final.productos_pendientes), (0, 0, None))
+
+    def test_2_producto_compartido_entre_parejas(self):
+        """Test 2: Un producto asignado a dos parejas del conteo cuenta una sola vez como pendiente"""
+        usuario3 = User.objects.create_user(username='test_lista_3', password='test123')
+        otra_pareja = ParejaConteo.objects.create(usuario_1=usuario3, usuario_2=self.usuario1)
+        otra_pareja.productos_asignados.add(self.productos[3], self.productos[4])
+        conteo = Conteo.objects.create(nombre='Conteo Test Lista Compartido')
+        conteo.parejas.add(self.pareja, otra_pareja)
+        ItemConteo.objects.create(conteo=conteo, producto=self.productos[0], usuario_conteo=self.usuario1, cantidad=1)
+
+        conteo = conteos_con_estadisticas(Conteo.objects.filter(pk=conteo.pk)).get()
+        # Asignados: productos 0-4 (el 3 en las dos parejas); contado: el 0
+        self.assertEqual(conteo.productos_pendientes, 4)
+
+        ItemConteo.objects.create(conteo=conteo, producto=self.productos[3], usuario_conteo=usuario3, cantidad=1)
+        conteo = conteos_con_estadisticas(Conteo.objects.filter(pk=conteo.pk)).get()
+        self.assertEqual(conteo.productos_pendientes, 3)
+
+    def test_3_presupuesto_de_consultas(self):
+        """Test 3: La cantidad de consultas es fija sin importar cuántos conteos existan"""
+        self.crear_conteos(2)
+        self.assertEqual(self.consultas_lista(), PRESUPUESTO_CONSULTAS)
+
+        self.crear_conteos(20, desde=2)
+        self.assertEqual(self.consultas_lista(), PRESUPUESTO_CONSULTAS)
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
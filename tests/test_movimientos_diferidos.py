@@ -0,0 +1,90 @@
+"""
+Test del modo de escritura diferida de movimientos:
+los movimientos se registran como pendientes y se vuelcan en orden a MovimientoConteo.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.test import TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo.models import Conteo, ItemConteo
+from movimientos.models import MovimientoConteo, MovimientoPendiente
+from movimientos.registro import volcar_movimientos_pendientes, volcar_todos
+
+
+@override_settings(MOVIMIENTOS_ESCRITURA_DIFERIDA=True)
+class TestMovimientosDiferidos(TestCase):
+    """Test de la escritura diferida de movimientos"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.admin = User.objects.create_user(username='test_diferido_admin', password='test123', is_staff=True)
+        self.productos = [
+            Producto.objects.create(codigo_barras=f'TDIF-{i:03d}', nombre=f'Producto Diferido {i}')
+            for i in range(2)
+        ]
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Diferido')
+        self.client = Client()
+        self.client.login(username='test_diferido_admin', password='test123')
+
+    def agregar(self, producto, cantidad):
+        return self.client.post(
+            f'/conteo/{self.conteo.pk}/agregar-item/',
+            {'producto_id': producto.id, 'cantidad': cantidad}
+        ).json()
+
+    def test_1_movimientos_pendientes(self):
+        """Test 1: Los escaneos actualizan el item y dejan el movimiento pendiente"""
+        self.agregar(self.productos[0], 2)
+        self.agregar(self.productos[0], 3)
+        self.assertEqual(ItemConteo.objects.get(conteo=self.conteo).cantidad, 5)
+        self.assertFalse(MovimientoConteo.objects.filter(conteo=self.conteo).exists())
+        self.assertEqual(MovimientoPendiente.objects.filter(conteo_id=self.conteo.id).count(), 2)
+
+    def test_2_volcado_en_orden(self):
+        """Test 2: El volcado conserva el orden y la fecha de los movimientos"""
+        for cantidad in (1, 2, 3):
+            self.agregar(self.productos[0], cantidad)
+        fechas = list(MovimientoPendiente.objects.order_by('id').values_list('fecha_movimiento', flat=True))
+
+        self.assertEqual(volcar_movimientos_pendientes(limite=2), 2)
+        self.assertEqual(volcar_todos(), 1)
+        self.assertFalse(MovimientoPendiente.objects.exists())
+
+        movimientos = list(
+            MovimientoConteo.objects.filter(conteo=self.conteo).order_by('id')
+            .values_list('tipo', 'cantidad_anterior', 'cantidad_nueva', 'fecha_movimiento')
+        )
+        self.assertEqual(
+            movimientos,
+            [('agregar', 0, 1, fechas[0]), ('modificar', 1, 3, fechas[1]), ('modificar', 3, 6, fechas[2])]
+        )
+
+    def test_3_item_eliminado(self):
+        """Test 3: Si el item se elimina antes del volcado, el movimiento queda sin item"""
+        item_id = self.agregar(self.productos[1], 4)['item_id']
+        self.client.post(f'/conteo/item/{item_id}/eliminar/')
+        volcar_todos()
+        movimientos = list(
+            MovimientoConteo.objects.filter(conteo=self.conteo).order_by('id').values_list('tipo', 'item_conteo_id')
+        )
+        self.assertEqual(movimientos, [('agregar', None), ('eliminar', None)])
+
+    def test_4_finalizar_vuelca_pendientes(self):
+        """Test 4: Al finalizar el conteo se vuelcan sus movimientos pendientes"""
+        self.agregar(self.productos[0], 1)
+        self.client.post(f'/conteo/{self.conteo.pk}/finalizar/')
+        self.assertEqual(MovimientoConteo.objects.filter(conteo=self.conteo).count(), 1)
+        self.assertFalse(MovimientoPendiente.objects.filter(conteo_id=self.conteo.id).exists())
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
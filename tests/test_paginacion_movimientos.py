@@ -0,0 +1,114 @@
+"""
+Test de la paginación por cursor de las listas de movimientos: recorre todas las
+filas sin repetir ni saltar (también con fechas iguales), hacia adelante y hacia
+atrás, y cada página cuesta las mismas consultas.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from datetime import timedelta
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.utils import timezone
+from productos.models import Producto
+from conteo.models import Conteo
+from movimientos.acumulados import recalcular_acumulados
+from movimientos.models import MovimientoConteo
+from movimientos.paginacion import paginar_movimientos
+
+
+class TestPaginacionMovimientos(TestCase):
+    """Test de movimientos.paginacion"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        cache.clear()
+        self.admin = User.objects.create_user(username='test_paginacion_admin', password='test123', is_staff=True)
+        self.producto = Producto.objects.create(codigo_barras='TPAG-001', nombre='Producto Paginacion')
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Paginacion')
+        MovimientoConteo.objects.bulk_create([
+            MovimientoConteo(conteo=self.conteo, producto=self.producto, usuario=self.admin, tipo='agregar', cantidad_cambiada=1)
+            for _ in range(25)
+        ])
+        # Fechas repetidas de a tres para probar el desempate por id
+        base = timezone.now()
+        for indice, movimiento_id in enumerate(MovimientoConteo.objects.filter(conteo=self.conteo).order_by('id').values_list('id', flat=True)):
+            MovimientoConteo.objects.filter(pk=movimiento_id).update(fecha_movimiento=base + timedelta(seconds=indice // 3))
+        self.esperados = list(
+            MovimientoConteo.objects.filter(conteo=self.conteo).order_by('-fecha_movimiento', '-id').values_list('id', flat=True)
+        )
+        self.movimientos = MovimientoConteo.objects.filter(conteo=self.conteo)
+
+    def test_1_recorrer_paginas(self):
+        """Test 1: Adelante y atrás se recorren todas las filas en orden, con posiciones correctas"""
+        paginas = []
+        parametros = QueryDict()
+        while True:
+            pagina = paginar_movimientos(self.movimientos, parametros, por_pagina=10)
+            paginas.append(pagina)
+            if not pagina.has_next:
+                break
+            parametros = QueryDict(f'despues={pagina.siguiente_cursor}')
+
+        self.assertEqual([m.id for pagina in paginas for m in pagina], self.esperados)
+        self.assertEqual([(p.start_index, p.end_index) for p in paginas], [(1, 10), (11, 20), (21, 25)])
+        self.assertEqual([(p.has_previous, p.has_next) for p in paginas], [(False, True), (True, True), (True, False)])
+
+        anterior = paginar_movimientos(self.movimientos, QueryDict(f'antes={paginas[2].anterior_cursor}'), por_pagina=10)
+        self.assertEqual([m.id for m in anterior], [m.id for m in paginas[1]])
+        self.assertEqual((anterior.start_index, anterior.has_previous), (11, True))
+        primera = paginar_movimientos(self.movimientos, QueryDict(f'antes={anterior.anterior_cursor}'), por_pagina=10)
+        self.assertEqual([m.id for m in primera], self.esperados[:10])
+        self.assertFalse(primera.has_previous)
+
+        # Un cursor inválido muestra la primera página
+        invalida = paginar_movimientos(self.movimientos, QueryDict('despues=xyz'), por_pagina=10)
+        self.assertEqual([m.id for m in invalida], self.esperados[:10])
+
+    def test_2_costo_constante(self):
+        """Test 2: Una página profunda hace las mismas consultas que la primera, sin COUNT ni OFFSET"""
+        with self.assertNumQueries(1):
+            primera = paginar_movimientos(self.movimientos, QueryDict(), por_pagina=5)
+        with self.assertNumQueries(1) as consultas:
+            profunda = paginar_movimientos(
+                self.movimientos, QueryDict(f'despues={primera.siguiente_cursor}'), por_pagina=5
+            )
+            list(profunda)
+        sql = consultas.captured_queries[0]['sql'].upper()
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT(', sql)
+
+    def test_3_vistas(self):
+        """Test 3: Las vistas de movimientos paginan con cursor y conservan los filtros en los enlaces"""
+        client = Client()
+        client.login(username='test_paginacion_admin', password='test123')
+        MovimientoConteo.objects.bulk_create([
+            MovimientoConteo(conteo=self.conteo, producto=self.producto, usuario=self.admin, tipo='modificar')
+            for _ in range(100)
+        ])
+        # Los bulk_create directos no pasan por el registro: reconstruir los acumulados del conteo
+        recalcular_acumulados([self.conteo.id])
+
+        respuesta = client.get('/movimientos/', {'conteo': self.conteo.id})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, f'?conteo={self.conteo.id}&despues=')
+        self.assertContains(respuesta, '1 - 100 de 125')
+
+        pagina = paginar_movimientos(self.movimientos, QueryDict(), por_pagina=100)
+        respuesta = client.get(f'/movimientos/conteo/{self.conteo.id}/', {'despues': pagina.siguiente_cursor})
+        self.assertContains(respuesta, '101 - 125 de 125')
+        respuesta = client.get(f'/movimientos/usuario/{self.admin.id}/')
+        self.assertContains(respuesta, '?despues=')
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Test del avance por pareja (ConteoProgresoPareja): se mantiene incrementalmente
+con los escaneos, la edición y eliminación de items, las asignaciones de
+productos y las parejas del conteo, y coincide con el recálculo desde cero.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo.models import Conteo, ConteoProgresoPareja, ItemConteo
+from conteo.estadisticas import conteos_con_estadisticas
+from conteo.progreso import calcular_progreso, recalcular_progreso
+from conteo.registro import registrar_lote, sumar_cantidad
+from megaInventario.dashboard import DashboardSnapshot
+from usuarios.models import ParejaConteo
+
+
+class TestProgresoParejas(TestCase):
+    """Test del mantenimiento incremental de ConteoProgresoPareja"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.admin = User.objects.create_user(username='test_progreso_admin', password='test123', is_staff=True)
+        self.usuarios = [User.objects.create_user(username=f'test_progreso_{i}', password='test123') for i in range(4)]
+        self.pareja1 = ParejaConteo.objects.create(usuario_1=self.usuarios[0], usuario_2=self.usuarios[1])
+        self.pareja2 = ParejaConteo.objects.create(usuario_1=self.usuarios[2], usuario_2=self.usuarios[3])
+        self.productos = [
+            Producto.objects.create(codigo_barras=f'TPRO-{i:03d}', nombre=f'Producto Progreso {i}') for i in range(6)
+        ]
+        self.pareja1.productos_asignados.add(*self.productos[:3])
+        self.pareja2.productos_asignados.add(*self.productos[3:5])
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Progreso')
+        self.conteo.parejas.add(self.pareja1, self.pareja2)
+
+    def progreso(self, pareja):
+        fila = ConteoProgresoPareja.objects.get(conteo=self.conteo, pareja=pareja)
+        return fila.asignados, fila.contados, fila.cantidad_total
+
+    def verificar_recalculo(self, conteo=None):
+        """El avance incremental coincide con el recálculo desde cero"""
+        conteo = conteo or self.conteo
+        filas = ConteoProgresoPareja.objects.filter(conteo=conteo)
+        calculado = calcular_progreso(conteo, [fila.pareja_id for fila in filas])
+        self.assertEqual(
+            {fila.pareja_id: (fila.asignados, fila.contados, fila.cantidad_total) for fila in filas},
+            {fila.pareja_id: (fila.asignados, fila.contados, fila.cantidad_total) for fila in calculado},
+        )
+
+    def test_1_escaneos(self):
+        """Test 1: Los escaneos individuales y por lote suman items y cantidades a la pareja del producto"""
+        self.assertEqual(self.progreso(self.pareja1), (3, 0, 0))
+        self.assertEqual(self.progreso(self.pareja2), (2, 0, 0))
+
+        sumar_cantidad(self.conteo, self.productos[0], self.usuarios[0], 4)
+        sumar_cantidad(self.conteo, self.productos[0], self.usuarios[0], 2)
+        registrar_lote(self.conteo, self.usuarios[2], [
+            {'producto_id': self.productos[3].id, 'cantidad': 1},
+            {'producto_id': self.productos[4].id, 'cantidad': 0},
+        ])
+
+        self.assertEqual(self.progreso(self.pareja1), (3, 1, 6))
+        self.assertEqual(self.progreso(self.pareja2), (2, 2, 1))
+        self.assertIsNotNone(ConteoProgresoPareja.objects.get(conteo=self.conteo, pareja=self.pareja2).ultima_actividad)
+        self.verificar_recalculo()
+
+    def test_2_editar_y_eliminar_items(self):
+        """Test 2: Editar la cantidad y eliminar o crear items directamente actualiza el avance"""
+        item_id, _ = sumar_cantidad(self.conteo, self.productos[1], self.usuarios[0], 5)
+        ItemConteo.objects.create(conteo=self.conteo, producto=self.productos[2], usuario_conteo=self.usuarios[1], cantidad=3)
+        self.assertEqual(self.progreso(self.pareja1), (3, 2, 8))
+
+        client = Client()
+        client.login(username='test_progreso_admin', password='test123')
+        respuesta = client.post(f'/conteo/item/{item_id}/editar/', {'cantidad': 2})
+        self.assertTrue(respuesta.json()['success'])
+        self.assertEqual(self.progreso(self.pareja1), (3, 2, 5))
+
+        client.post(f'/conteo/item/{item_id}/eliminar/')
+        self.assertEqual(self.progreso(self.pareja1), (3, 1, 3))
+        self.verificar_recalculo()
+
+    def test_3_asignaciones(self):
+        """Test 3: Asignar y desasignar productos desde ambos lados ajusta asignados y contados"""
+        sumar_cantidad(self.conteo, self.productos[5], self.admin, 7)
+        sumar_cantidad(self.conteo, self.productos[0], self.admin, 1)
+        self.assertEqual(self.progreso(self.pareja2), (2, 0, 0))
+
+        self.productos[5].parejas_asignadas.add(self.pareja2)
+        self.assertEqual(self.progreso(self.pareja2), (3, 1, 7))
+
+        # Quitar una asignación inexistente no descuenta nada
+        self.productos[5].parejas_asignadas.remove(self.pareja1)
+        self.pareja2.productos_asignados.remove(self.productos[5], self.productos[0])
+        self.assertEqual(self.progreso(self.pareja2), (2, 0, 0))
+        self.assertEqual(self.progreso(self.pareja1), (3, 1, 1))
+
+        self.productos[0].parejas_asignadas.clear()
+        self.assertEqual(self.progreso(self.pareja1), (2, 0, 0))
+        self.pareja1.productos_asignados.clear()
+        self.assertEqual(self.progreso(self.pareja1), (0, 0, 0))
+        self.verificar_recalculo()
+
+    def test_4_parejas_y_reconteos(self):
+        """Test 4: Las filas siguen a las parejas del conteo y los reconteos solo cuentan sus productos"""
+        self.conteo.parejas.remove(self.pareja2)
+        self.assertFalse(ConteoProgresoPareja.objects.filter(conteo=self.conteo, pareja=self.pareja2).exists())
+
+        reconteo = Conteo.objects.create(
+            nombre='Reconteo Test Progreso', numero_conteo=2,
+            observaciones=f'Productos: {self.productos[0].id},{self.productos[3].id}'
+        )
+        self.pareja1.conteos.add(reconteo)
+        sumar_cantidad(reconteo, self.productos[0], self.usuarios[0], 2)
+        sumar_cantidad(reconteo, self.productos[1], self.usuarios[0], 9)
+        fila = ConteoProgresoPareja.objects.get(conteo=reconteo, pareja=self.pareja1)
+        self.assertEqual((fila.asignados, fila.contados, fila.cantidad_total), (1, 1, 2))
+        self.verificar_recalculo(reconteo)
+
+        # La reconstrucción deja las mismas filas
+        ConteoProgresoPareja.objects.filter(conteo=reconteo).update(contados=0, cantidad_total=0)
+        recalcular_progreso(conteos_ids=[reconteo.id])
+        fila.refresh_from_db()
+        self.assertEqual((fila.asignados, fila.contados, fila.cantidad_total), (1, 1, 2))
+
+    def test_5_lectores(self):
+        """Test 5: La lista de conteos y el dashboard leen el avance de la tabla"""
+        sumar_cantidad(self.conteo, self.productos[0], self.usuarios[0], 1)
+        sumar_cantidad(self.conteo, self.productos[3], self.usuarios[2], 1)
+
+        client = Client()
+        client.login(username='test_progreso_admin', password='test123')
+        respuesta = client.get('/conteo/')
+        self.assertEqual(respuesta.status_code, 200)
+        conteo = conteos_con_estadisticas(Conteo.objects.filter(pk=self.conteo.pk)).get()
+        self.assertEqual(conteo.productos_pendientes, 3)
+
+        progreso = next(p for p in DashboardSnapshot.calcular()['progreso_conteos'] if p['conteo']['id'] == self.conteo.id)
+        parejas = {pareja['nombre']: (pareja['contados'], pareja['asignados']) for pareja in progreso['parejas']}
+        self.assertEqual(parejas, {str(self.pareja1): (1, 3), str(self.pareja2): (1, 2)})
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Test del ritmo de conteo: escaneos y productos nuevos por minuto por conteo,
+pareja y usuario, y tiempo estimado a partir de los productos pendientes.
+"""
+import os
+import sys
+import django
+
+# Configurar Django
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'megaInventario.settings')
+django.setup()
+
+from datetime import timedelta, timezone as dt_timezone
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from productos.models import Producto
+from conteo.models import Conteo
+from conteo.registro import sumar_cantidad
+from conteo.ritmo import calcular_ritmo, ventana_ritmo
+from movimientos.models import MovimientoConteo
+from usuarios.models import ParejaConteo
+
+
+class TestRitmoConteos(TestCase):
+    """Test de conteo.ritmo"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        cache.clear()
+        self.admin = User.objects.create_user(username='test_ritmo_admin', password='test123', is_staff=True)
+        self.usuarios = [User.objects.create_user(username=f'test_ritmo_{i}', password='test123') for i in range(2)]
+        self.pareja = ParejaConteo.objects.create(usuario_1=self.usuarios[0], usuario_2=self.usuarios[1])
+        self.productos = [
+            Producto.objects.create(codigo_barras=f'TRIT-{i:03d}', nombre=f'Producto Ritmo {i}') for i in range(30)
+        ]
+        self.conteo = Conteo.objects.create(nombre='Conteo Test Ritmo')
+        self.conteo.parejas.add(self.pareja)
+        for producto in self.productos:
+            producto.parejas_asignadas.add(self.pareja)
+
+        # 10 productos nuevos y 5 modificaciones en 5 minutos
+        for i, producto in enumerate(self.productos[:10]):
+            sumar_cantidad(self.conteo, producto, self.usuarios[i % 2], 1)
+        for producto in self.productos[:5]:
+            sumar_cantidad(self.conteo, producto, self.usuarios[0], 1)
+        self.inicio = (MovimientoConteo.objects.filter(conteo=self.conteo).order_by('fecha_movimiento').first()
+                       .fecha_movimiento.astimezone(dt_timezone.utc).replace(second=0, microsecond=0))
+        MovimientoConteo.objects.filter(conteo=self.conteo).update(fecha_movimiento=self.inicio)
+        self.ahora = self.inicio + timedelta(minutes=5)
+
+    def ritmo_conteo(self, ritmo, conteo):
+        return next(item for item in ritmo['conteos'] if item['conteo']['id'] == conteo.id)
+
+    def test_1_ritmo_y_estimacion(self):
+        """Test 1: Tasas por conteo, pareja y usuario y tiempo estimado de los pendientes"""
+        ritmo = self.ritmo_conteo(calcular_ritmo(ahora=self.ahora), self.conteo)
+        self.assertEqual((ritmo['escaneos_por_minuto'], ritmo['productos_por_minuto']), (3.0, 2.0))
+        self.assertEqual(ritmo['pendientes'], 20)
+        self.assertEqual(ritmo['eta_minutos'], 10.0)
+        self.assertEqual(ritmo['fecha_estimada'], self.ahora + timedelta(minutes=10))
+        self.assertEqual(len(ritmo['serie']), ventana_ritmo())
+        self.assertEqual(sum(ritmo['serie']), 15)
+
+        self.assertEqual(ritmo['parejas'], [{
+            'nombre': 'test_ritmo_0 & test_ritmo_1', 'color': self.pareja.color,
+            'escaneos_por_minuto': 3.0, 'productos_por_minuto': 2.0, 'pendientes': 20, 'eta_minutos': 10.0,
+        }])
+        self.assertEqual(
+            [(u['username'], u['escaneos_por_minuto'], u['productos_por_minuto']) for u in ritmo['usuarios']],
+            [('test_ritmo_0', 2.0, 1.0), ('test_ritmo_1', 1.0, 1.0)]
+        )
+
+    def test_2_ventana(self):
+        """Test 2: Fuera de la ventana no hay ritmo; sin pendientes el conteo está completo"""
+        despues = self.ahora + timedelta(minutes=ventana_ritmo() + 1)
+        ritmo = self.ritmo_conteo(calcular_ritmo(ahora=despues), self.conteo)
+        self.assertEqual((ritmo['escaneos_por_minuto'], ritmo['eta_minutos'], ritmo['fecha_estimada']), (0, None, None))
+        self.assertEqual(sum(ritmo['serie']), 0)
+
+        for producto in self.productos[10:]:
+            sumar_cantidad(self.conteo, producto, self.usuarios[1], 1)
+        ritmo = self.ritmo_conteo(calcular_ritmo(), self.conteo)
+        self.assertEqual((ritmo['pendientes'], ritmo['eta_minutos']), (0, 0))
+
+    def test_3_vistas(self):
+        """Test 3: JSON del ritmo (cacheado) y tarjeta del dashboard"""
+        client = Client()
+        client.login(username='test_ritmo_admin', password='test123')
+        respuesta = client.get('/conteo/ritmo/')
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        self.assertTrue(datos['success'])
+        self.assertIn(self.conteo.id, [item['conteo']['id'] for item in datos['conteos']])
+        self.assertEqual(client.get('/conteo/ritmo/').json()['generado'], datos['generado'])
+
+        respuesta = client.get('/')
+        self.assertContains(respuesta, 'data-url="/conteo/ritmo/"')
+
+
+if __name__ == '__main__':
+    import unittest
+    unittest.main()
@@ -0,0 +1,137 @@
+"""
+Caché de productos asignados a las parejas de conteo.
+
+Cada pareja activa tiene un conjunto de ids de productos asignados. Los
+conjuntos se guardan en la caché de Django como arreglos compactos de enteros
+y en memoria del proceso como ``frozenset``, de modo que verificar si un
+producto está asignado es una prueba de pertenencia O(1).
+
+Toda la caché depende de un número de versión global que se renueva cuando
+cambian las asignaciones (``m2m_changed`` de ``Producto.parejas_asignadas``) o
+las parejas (guardado/eliminación de ``ParejaConteo``). Ver ``usuarios.signals``.
+La versión está en la base de datos (``VersionAsignaciones``, una fila) y se lee
+una vez por llamada: la caché de Django y la memoria son locales a cada proceso,
+y así un cambio hecho por un proceso invalida los conjuntos de todos los demás.
+Cada versión nueva es un número al azar y no el siguiente: si la transacción que
+la escribió se revierte, ese número no vuelve a usarse con otros datos.
+
+La memoria del proceso solo guarda conjuntos de la versión vigente (se vacía al
+ver una versión distinta) y como máximo ``MAXIMO_MEMORIA`` de ellos, descartando
+los menos usados. Quien necesita varios conjuntos en una petición lee la versión
+una vez y la pasa a cada función (parámetro ``version``).
+"""
+import secrets
+from array import array
+from collections import OrderedDict
+from threading import Lock
+
+from django.core.cache import cache
+from django.db.models import Q
+
+# Los conjuntos se guardan por versión: el tiempo solo limita la memoria ocupada
+# por versiones viejas
+TIEMPO_CACHE = 60 * 5
+# Conjuntos guardados en la memoria de cada proceso
+MAXIMO_MEMORIA = 1000
+
+_memoria = OrderedDict()
+_version_memoria = None
+_lock = Lock()
+
+
+def version_asignaciones():
+    """Versión actual de las asignaciones (cambia con cada modificación)"""
+    from .models import VersionAsignaciones
+
+    version = VersionAsignaciones.objects.filter(pk=1).values_list('version', flat=True).first()
+    return version if version is not None else 1
+
+
+def invalidar_asignaciones():
+    """Invalida todos los conjuntos de productos asignados, en todos los procesos"""
+    from .models import VersionAsignaciones
+
+    version = secrets.randbits(62)
+    if not VersionAsignaciones.objects.filter(pk=1).update(version=version):
+        VersionAsignaciones.objects.update_or_create(pk=1, defaults={'version': version})
+    with _lock:
+        _memoria.clear()
+
+
+def _obtener(clave, calcular, version=None):
+    """
+    Obtiene un valor versionado de la memoria del proceso, de la caché
+    o calculándolo, en ese orden.
+    """
+    global _version_memoria
+    if version is None:
+        version = version_asignaciones()
+    with _lock:
+        if version != _version_memoria:
+            # Los conjuntos de otra versión ya no sirven
+            _memoria.clear()
+            _version_memoria = version
+        valor = _memoria.get(clave)
+        if valor is not None:
+            _memoria.move_to_end(clave)
+            return valor
+
+    clave_cache = f'asignaciones:{version}:{clave}'
+    datos = cache.get(clave_cache)
+    if datos is None:
+        datos = array('q', sorted(calcular())).tobytes()
+        cache.set(clave_cache, datos, TIEMPO_CACHE)
+    ids = array('q')
+    ids.frombytes(datos)
+    resultado = frozenset(ids)
+
+    with _lock:
+        if version == _version_memoria:
+            _memoria[clave] = resultado
+            while len(_memoria) > MAXIMO_MEMORIA:
+                _memoria.popitem(last=False)
+    return resultado
+
+
+def parejas_activas_usuario(usuario, version=None):
+    """Ids de las parejas activas en las que participa el usuario"""
+    from .models import ParejaConteo
+
+    return _obtener(
+        f'usuario:{usuario.pk}:parejas',
+        lambda: ParejaConteo.objects.filter(
+            Q(usuario_1=usuario) | Q(usuario_2=usuario),
+            activa=True
+        ).values_list('id', flat=True),
+        version
+    )
+
+
+def productos_asignados_pareja(pareja_id, version=None):
+    """Ids de los productos asignados a una pareja"""
+    from productos.models import Producto
+
+    return _obtener(
+        f'pareja:{pareja_id}:productos',
+        lambda: Producto.parejas_asignadas.through.objects.filter(
+            parejaconteo_id=pareja_id
+        ).values_list('producto_id', flat=True),
+        version
+    )
+
+
+def productos_asignados_usuario(usuario, version=None):
+    """Ids de los productos asignados a las parejas activas del usuario"""
+    if version is None:
+        version = version_asignaciones()
+    parejas_ids = parejas_activas_usuario(usuario, version)
+    if len(parejas_ids) == 1:
+        return productos_asignados_pareja(next(iter(parejas_ids)), version)
+
+    def calcular():
+        ids = set()
+        for pareja_id in parejas_ids:
+            ids.update(productos_asignados_pareja(pareja_id, version))
+        return ids
+
+    return _obtener(f'usuario:{usuario.pk}:productos', calcular, version)
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:26
+
+from django.db import migrations, models
+
+
+def crear_version(apps, schema_editor):
+    """Crea la única fila del contador de versión"""
+    VersionAsignaciones = apps.get_model('usuarios', 'VersionAsignaciones')
+    VersionAsignaciones.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0003_perfilusuario_pin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionAsignaciones',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=1, verbose_name='Versión')),
+            ],
+            options={
+                'verbose_name': 'Versión de Asignaciones',
+                'verbose_name_plural': 'Versión de Asignaciones',
+            },
+        ),
+        migrations.RunPython(crear_version, migrations.RunPython.noop),
+    ]
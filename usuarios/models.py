@@ -50,3 +50,19 @@ class ParejaConteo(models.Model):
         if self.usuario_1 == self.usuario_2:
             raise ValidationError("Un usuario no puede ser pareja de sí mismo")
 
+
+
+class VersionAsignaciones(models.Model):
+    """
+    Versión global de las asignaciones de productos a parejas (una sola fila),
+    renovada con cada cambio. Vive en la base de datos para que todos los
+    procesos vean la misma versión; ver ``usuarios.asignaciones``.
+    """
+    version = models.PositiveBigIntegerField(default=1, verbose_name="Versión")
+
+    class Meta:
+        verbose_name = "Versión de Asignaciones"
+        verbose_name_plural = "Versión de Asignaciones"
+
+    def __str__(self):
+        return f"Asignaciones v{self.version}"
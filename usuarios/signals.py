@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from productos.models import Producto
+from .asignaciones import invalidar_asignaciones
+from .models import ParejaConteo
+
+
+def _invalidar():
+    invalidar_asignaciones()
+    # Repetir al confirmar la transacción: otra petición pudo cachear los datos anteriores mientras tanto
+    transaction.on_commit(invalidar_asignaciones)
+
+
+@receiver(m2m_changed, sender=Producto.parejas_asignadas.through)
+def asignaciones_modificadas(sender, action, **kwargs):
+    """Invalida la caché de asignaciones al asignar o desasignar productos"""
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        _invalidar()
+
+
+@receiver(post_save, sender=ParejaConteo)
+@receiver(post_delete, sender=ParejaConteo)
+@receiver(post_delete, sender=Producto)
+def parejas_modificadas(sender, **kwargs):
+    """Invalida la caché de asignaciones al activar, desactivar o eliminar parejas o productos"""
+    _invalidar()